@@ -14,9 +14,10 @@ import p4gf_lock
 import p4gf_p4msg
 import p4gf_p4msgid
 import p4gf_path
+import p4gf_reviews_index
 import p4gf_util
 import re
-from P4 import Map, P4Exception
+from P4 import P4Exception
 
 LOG = logging.getLogger(__name__)
 _   = p4gf_l10n._
@@ -139,7 +140,7 @@ def remove_non_gf_reviews(p4, p4_reviews_non_gf, p4key, data, change):
                       format(p4key))
     if filecount:
         update_repo_reviews(p4_reviews_non_gf, p4gf_const.P4GF_REVIEWS__NON_GF,
-                            None, action=REMOVE, change=change)
+                            None, action=REMOVE, change=change, p4=p4)
         P4Key.delete(p4, p4key)
 
 
@@ -213,15 +214,18 @@ def update_all_gf_reviews(ctx, map_tuple_list):
     with p4gf_create_p4.Connector(ctx.p4gf_reviews_all_gf) as p4_reviews:
         with p4gf_lock.ReviewsLock(p4):
             update_repo_reviews(p4_reviews, p4gf_const.P4GF_REVIEWS__ALL_GF,
-                                fake_p4map, action=ADD_UNIQUE, change=None)
+                                fake_p4map, action=ADD_UNIQUE, change=None, p4=p4)
 
 
-def update_repo_reviews(p4_reviews, user, clientmap, action=None, change=None):
+def update_repo_reviews(p4_reviews, user, clientmap, action=None, change=None, p4=None):
     """Add or remove view left maps to the review user Reviews.
 
     Using Map.join, check for a conflict with self - this gf_reviews user.
     This check handles the case of overlapping views pushed to the same GF server.
     If conflict, return INTERSECT and do not update the user reviews
+
+    :param p4: git-fusion-user connection for the p4key that versions
+               user's Reviews, or None to re-read Reviews every time.
     """
     # pylint: disable=too-many-branches
     repo_views = []
@@ -231,15 +235,11 @@ def update_repo_reviews(p4_reviews, user, clientmap, action=None, change=None):
     LOG.debug3("update_repo_reviews: user={0} clientmap={1} repo_views={2}"
                .format(user, clientmap, repo_views))
 
-    args_ = ['-o', user]
-    r = p4_reviews.run('user', args_)
-    vardict = p4gf_util.first_dict(r)
-    current_reviews = []
-    if "Reviews" in vardict:
-        current_reviews = vardict["Reviews"]
-        if action == ADD:
-            if has_intersecting_views(current_reviews, clientmap):
-                return INTERSECT
+    reviews_index = p4gf_reviews_index.get(p4_reviews, user, p4=p4)
+    current_reviews = reviews_index.lines
+    if current_reviews and action == ADD:
+        if reviews_index.intersects(clientmap.lhs()):
+            return INTERSECT
 
     if action == ADD:
         reviews = current_reviews + repo_views
@@ -263,6 +263,7 @@ def update_repo_reviews(p4_reviews, user, clientmap, action=None, change=None):
                            .format(action=action))
     LOG.debug3("for user {} setting reviews {}".format(user, reviews))
     p4gf_p4spec.set_spec(p4_reviews, 'user', user, values={"Reviews": reviews})
+    p4gf_reviews_index.updated(p4, user, reviews)
     return NO_INTERSECT
 
 
@@ -290,7 +291,8 @@ def lock_update_repo_reviews(ctx, action=None):
             # This check handles the case of overlapping views pushed to the same GF server
             # since shared views for two repos on the same GF could not otherwise be detected.
             # If it detects a conflict it returns INTERSECT and does not update the user reviews.
-            intersects = update_repo_reviews(p4_reviews, user, clientmap, action=action)
+            intersects = update_repo_reviews(p4_reviews, user, clientmap,
+                                             action=action, p4=p4)
 
             if intersects == INTERSECT:
                 msg = p4gf_const.P4GF_LOCKED_BY_MSG.format(user=user)
@@ -303,7 +305,8 @@ def lock_update_repo_reviews(ctx, action=None):
             if action == ADD:
                 is_locked, by_user = is_locked_by_review(p4, clientmap)
                 if is_locked:
-                    update_repo_reviews(p4_reviews, user, clientmap, action=REMOVE)
+                    update_repo_reviews(p4_reviews, user, clientmap,
+                                        action=REMOVE, p4=p4)
                     msg = p4gf_const.P4GF_LOCKED_BY_MSG.format(user=by_user)
                     LOG.error(msg)
                     LOG.error("clientmap: {}".format(clientmap))
@@ -336,23 +339,3 @@ def is_locked_by_review(p4, clientmap, check_for_self=False):
                 return True, _user
     return False, None
 
-
-def has_intersecting_views(current_reviews, clientmap):
-    """Determine whether the clientmap intersects the
-    current set of reviews for this GF reviews user.
-    """
-    reviews_map = Map()
-    for v in current_reviews:
-        reviews_map.insert(v)
-
-    repo_map = Map()
-    for l in clientmap.lhs():
-        repo_map.insert(l)
-
-    joined = Map.join(reviews_map, repo_map)
-
-    for l in joined.lhs():
-        if not l.startswith('-'):
-            return INTERSECT
-
-    return NO_INTERSECT
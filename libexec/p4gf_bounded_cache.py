@@ -0,0 +1,153 @@
+#! /usr/bin/env python3.3
+"""LRUCache: a size-limited dict that evicts its least recently used entry.
+
+Replaces the random-eviction caches that used to rebuild a list or
+materialize all keys on every insert. get(), put(), and eviction are all
+O(1): an OrderedDict keeps entries in least- to most-recently-used order.
+
+Each cache counts its hits, misses, and evictions, and reports them at
+exit in the p4gf_profiler report, one line per cache name: caches that
+share a name, such as one per Context, share a line.
+
+Size is an entry count, or, if the caller supplies a sizeof function,
+the sum of sizeof(value) over all entries: a byte budget for caches whose
+values vary from a few bytes to hundreds of megabytes.
+
+Maximum size comes from the global p4gf_config [undoc] section if the
+caller supplies a config key, else the caller's default. The config is
+not loaded yet when most of our caches are created (module import time),
+so we look it up on first use, and again after each clear().
+"""
+from   collections import OrderedDict
+import logging
+
+import p4gf_config
+import p4gf_profiler
+
+LOG = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Size-limited dict, least recently used entries evicted first."""
+
+    def __init__(self, name, default_max_size, *
+                , config_key = None
+                , on_evict   = None
+                , sizeof     = None ):
+        """
+        :param name:             for the profiler report and logs.
+        :param default_max_size: if config_key unset or unusable.
+        :param config_key:       optional p4gf_config [undoc] key.
+        :param on_evict:         optional function(key, value), called for
+                                 each evicted entry. Not called by clear().
+        :param sizeof:           optional function(value) that returns
+                                 value's size. If None, each entry counts 1.
+        """
+        self.name             = name
+        self.default_max_size = default_max_size
+        self.config_key       = config_key
+        self.on_evict         = on_evict
+        self.sizeof           = sizeof
+        self._max_size        = None
+        self._od              = OrderedDict()
+        self._sizes           = {}      # key ==> sizeof(value), if sizeof
+        self._total_size      = 0
+        self.stats            = p4gf_profiler.Counters( 'hit_ct'
+                                                      , 'miss_ct'
+                                                      , 'evict_ct' )
+        p4gf_profiler.add_counters(self.name, self, self.stats)
+
+    def __len__(self):
+        return len(self._od)
+
+    def __contains__(self, key):
+        """Test membership without counting a hit/miss or touching LRU order."""
+        return key in self._od
+
+    def get(self, key, default=None):
+        """Return the value for key and mark it most recently used,
+        or default if not cached.
+        """
+        try:
+            value = self._od[key]
+        except KeyError:
+            self.stats.miss_ct += 1
+            return default
+        self._od.move_to_end(key)
+        self.stats.hit_ct += 1
+        return value
+
+    def put(self, key, value):
+        """Insert or replace key's value, mark it most recently used.
+
+        Evict least recently used entries if this pushes us over size.
+        Never evict the entry just put, even if it alone is over size.
+        """
+        if key in self._od:
+            self._od.move_to_end(key)
+            self._forget_size(key)
+        self._od[key] = value
+        if self.sizeof:
+            self._sizes[key] = self.sizeof(value)
+            self._total_size += self._sizes[key]
+        max_size = self.max_size()
+        while max_size < self.size() and 1 < len(self._od):
+            old_key, old_value = self._od.popitem(last=False)
+            self._forget_size(old_key)
+            self.stats.evict_ct += 1
+            if self.on_evict:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        """Remove and return key's value, or default if not cached."""
+        self._forget_size(key)
+        return self._od.pop(key, default)
+
+    def clear(self):
+        """Remove all entries. Keep statistics."""
+        self._od.clear()
+        self._sizes.clear()
+        self._total_size = 0
+        self._max_size = None
+
+    def size(self):
+        """Return our current size: entry count, or total sizeof()."""
+        if self.sizeof:
+            return self._total_size
+        return len(self._od)
+
+    def _forget_size(self, key):
+        """Stop counting key's value toward our size."""
+        self._total_size -= self._sizes.pop(key, 0)
+
+    def max_size(self):
+        """Return the maximum size we hold."""
+        if self._max_size is not None:
+            return self._max_size
+        if self.config_key and not p4gf_config.GlobalConfig.instance():
+                        # Global config not loaded yet. Use the default
+                        # for now, ask again next time.
+            return self.default_max_size
+        self._max_size = self._config_max_size()
+        return self._max_size
+
+    def _config_max_size(self):
+        """Return the configured maximum size, or our default."""
+        if not self.config_key:
+            return self.default_max_size
+        value = p4gf_config.GlobalConfig.get( p4gf_config.SECTION_UNDOC
+                                            , self.config_key
+                                            , fallback = None )
+        if not value:
+            return self.default_max_size
+        try:
+            size = int(value)
+            if 0 < size:
+                return size
+        except ValueError:
+            pass
+        LOG.warning("{key}={value} not a positive integer, using {default}"
+                    .format( key     = self.config_key
+                           , value   = value
+                           , default = self.default_max_size ))
+        return self.default_max_size
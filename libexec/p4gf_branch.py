@@ -657,9 +657,12 @@ class Branch:
                 r = ctx.p4run('files', path_at)
             for rr in r:
                 if isinstance(rr, dict) and 'depotFile' in rr:
+                        # Cached results are shared: add our keys to a copy.
+                    rr = dict(rr)
                     c = self.view_p4map.translate(rr['depotFile'])
                     rr['clientFile'] = c
-                    rr['gwt_path'] = ctx.depot_to_gwt_path(rr['depotFile'])
+                    if 'gwt_path' not in rr:
+                        rr['gwt_path'] = ctx.depot_to_gwt_path(rr['depotFile'])
                     our_files.append(rr)
         return our_files
 
@@ -89,10 +89,14 @@ UML diagram at doc/p4gf_branch_id.uml.pdf
 
 """
 
+import array
+import binascii
 import configparser
 import logging
 import os
 import re
+import sys
+import time
 
 import p4gf_env_config  # pylint:disable=unused-import
 import p4gf_branch
@@ -104,6 +108,7 @@ from   p4gf_object_type import ObjectType
 import p4gf_proc
 from   p4gf_profiler import Timer
 import p4gf_progress_reporter as ProgressReporter
+from   p4gf_time_space_recorder import TimeSpaceRecorder, current_memory_kb
 import p4gf_util
 
 # cannot use __name__ since it will often be "__main__"
@@ -142,10 +147,18 @@ class Assigner:
         # newly pushed branches, or newly discovered anonymous branches.
         self.branch_dict      = branch_dict
 
-        # List of sha1, one for each Git commit being pushed. Order MUST
+        # Every commit we know about: pushed commits, their parents, and
+        # commits that branch refs point to. Parents, children, and
+        # work-in-progress assignments, all indexed by integer node id.
+        self.dag              = CommitDag()
+
+        # Node id, one for each Git commit being pushed. Order MUST
         # be in topological order with the newest/child commits before
-        # all of their older/parent commits.
-        self.rev_list         = []
+        # all of their older/parent commits. See rev_list for sha1s.
+        self._rev_ids         = array.array('i')
+
+        # Set by from_dict(): a plain list of sha1 instead of _rev_ids.
+        self._rev_list        = None
 
         # All these behavior controls tend to be set either all to True or all
         # to False, True for normal operation, False for Fast Push. We could
@@ -182,8 +195,12 @@ class Assigner:
         # we want for first-push.
         self.tunnel_assign    = False
 
-        # sha1 to Assign object, one for every pushed commit.
-        self.assign_dict      = {}
+        # sha1 to Assign view, one for every node in our dag.
+        self.assign_dict      = AssignDict(self.dag)
+
+        # Instrumentation: optional TimeSpaceRecorder, incremented once
+        # per commit loaded from git-rev-list.
+        self.recorder         = None
 
         # Instrumentation: How long are our branches?
         self.branch_len       = {}
@@ -222,6 +239,18 @@ class Assigner:
         with Timer(TIMER_FREE_MEMORY):
             self._free_memory()
 
+    @property
+    def rev_list(self):
+        """List of sha1, one for each Git commit being pushed, newest first."""
+        if self._rev_list is not None:
+            return self._rev_list
+        return [self.dag.sha1(node) for node in self._rev_ids]
+
+    @rev_list.setter
+    def rev_list(self, value):
+        """Replace our rev_list with a plain list of sha1."""
+        self._rev_list = value
+
     def is_assigned(self, sha1):
         """Do we have at least one branch assigned for this commit?"""
         return sha1 in self.assign_dict
@@ -241,15 +270,15 @@ class Assigner:
         if not self.ctx:
             return
 
-        for assign in self.assign_dict.values():
-            otl = ObjectType.commits_for_sha1(self.ctx, assign.sha1)
+        for node in range(len(self.dag)):
+            otl = ObjectType.commits_for_sha1(self.ctx, self.dag.sha1(node))
             for ot in otl:
-                self._assign_branch(assign, ot.branch_id)
+                self._assign_branch(node, ot.branch_id)
 
     def _free_memory(self):
         """Dump everything we no longer need once assignment is complete.
 
-        Replace large Assign instances with tiny AssignFrozen instances.
+        Drop the child links and reachability that only assignment needs.
         """
         if not self.flatten_memory:
             return
@@ -257,8 +286,7 @@ class Assigner:
         #self.ctx          = None
         #self.branch_dict  = None
         #self.rev_list     = None
-        self.assign_dict = {sha1: AssignFrozen(assign.branch_id)
-                            for sha1, assign in self.assign_dict.items()}
+        self.dag.free_work_arrays()
 
     def annotate_lines(self, lines):
         """Append "(branch_id1)" string to any line that contains a sha1
@@ -306,41 +334,26 @@ class Assigner:
 
         We just need the parent/child relationships.
         """
-        # pylint:disable=too-many-branches
         # A single call to git-rev-list produces both the commit sha1 list
         # that we need AND the child->parent associations that we need. It's
-        # screaming fast: 32,000 commit lines in <1 second.
-        with Timer(TIMER_RUN_REV_LIST):
-            range_list = sorted(set([prt.to_range()
-                                     for prt in self.pre_receive_list]))
-            cmd        = [ 'git', 'rev-list'
-                         , '--date-order', '--parents'] + range_list
-            LOG.debug2("DAG: {}".format(' '.join(cmd)))
-            d = p4gf_proc.popen(cmd)
-
-        seen_parents = set()
-
-        # Pass 1: Build up a dict of sha1->Assign objects, one per commit.
+        # screaming fast: 32,000 commit lines in <1 second. Parse its output
+        # as it streams in, straight into our CommitDag arrays.
+        range_list = sorted(set([prt.to_range()
+                                 for prt in self.pre_receive_list]))
+        cmd        = [ 'git', 'rev-list'
+                     , '--date-order', '--parents'] + range_list
         with Timer(TIMER_CONSUME_REV_LIST):
-            lines = d['out'].splitlines()
-            with ProgressReporter.Determinate(len(lines)):
-                for line in lines:
-                    ProgressReporter.increment(_('Loading commit tree into memory...'))
-                    sha1s = line.split()
-                    curr_sha1 = sha1s.pop(0)
-                    self.rev_list.append(curr_sha1)
-                    if LOG.isEnabledFor(logging.DEBUG3):
-                        LOG.debug3('DAG: rev_list {} {}'
-                                   .format( p4gf_util.abbrev(curr_sha1)
-                                          , ' '.join(p4gf_util.abbrev(sha1s))))
-                    self.assign_dict[curr_sha1] = Assign(curr_sha1, sha1s)
-                    seen_parents.update(sha1s)
+            with ProgressReporter.Indeterminate():
+                self._rev_ids = self.dag.load_rev_list(
+                      cmd
+                    , progress_msg = _('Loading commit tree into memory...')
+                    , recorder     = self.recorder )
 
         # git-rev-list is awesome in that it gives us only as much as we need
         # for self.rev_list, but unawesome in that this optimization tends to
         # omit paths to branch refs' OLD heads if the old heads are 2+ commits
         # back in time, and that time is ALREADY covered by some OTHER branch.
-        # Re-run each pushed branch separately to add enough Assign() nodes
+        # Re-run each pushed branch separately to add enough nodes
         # to form a full path to its old ref.
         if 2 <= len(self.pre_receive_list):
             for prt in self.pre_receive_list:
@@ -348,50 +361,18 @@ class Assigner:
                 # to connect up to anything.
                 if prt.old_sha1 == p4gf_const.NULL_COMMIT_SHA1:
                     continue
-                with Timer(TIMER_RUN_REV_LIST):
-                    cmd = ['git', 'rev-list'
-                           , '--date-order', '--parents', '--reverse', prt.to_range()]
-                    LOG.debug2("DAG: {}".format(' '.join(cmd)))
-                    d = p4gf_proc.popen(cmd)
-
+                cmd = ['git', 'rev-list'
+                       , '--date-order', '--parents', '--reverse', prt.to_range()]
                 with Timer(TIMER_CONSUME_REV_LIST):
-                    for line in d['out'].splitlines():
-                        sha1s = line.split()
-                        curr_sha1 = sha1s.pop(0)
-                        if curr_sha1 in self.assign_dict:
-                            break
-                        LOG.debug3('DAG: path     {} {}'
-                                   .format( p4gf_util.abbrev(curr_sha1)
-                                          , ' '.join(p4gf_util.abbrev(sha1s))))
-                        self.assign_dict[curr_sha1] = Assign(curr_sha1, sha1s)
-                        seen_parents.update(sha1s)
-
-        # Create acting-as-parent-only nodes in dict, too. We don't process
-        # these as part of iterating over revs, but we need them when
-        # tree walking.
-        with Timer(TIMER_CONSUME_REV_LIST):
-            parent_only = seen_parents - set(self.assign_dict.keys())
-            for curr_sha1 in parent_only:
-                if curr_sha1 in self.assign_dict:
-                    break
-                LOG.debug3('DAG: par only {}'.format(p4gf_util.abbrev(curr_sha1)))
-                self.assign_dict[curr_sha1] = Assign(curr_sha1, [])
+                    self.dag.load_rev_list(cmd, stop_at_loaded=True)
 
-        # Pass 2: Fill in Assign.children list
+        # Parents that git-rev-list did not list as commits of their own
+        # already have nodes: load_rev_list() creates a node for each sha1
+        # on first sight. We need them when tree walking.
+
+        # Pass 2: Fill in children.
         with Timer(TIMER_ASSIGN_CHILDREN):
-            with ProgressReporter.Determinate(len(self.assign_dict)):
-                for assign in self.assign_dict.values():
-                    ProgressReporter.increment(_('Finding child commits...'))
-                    for par_sha1 in assign.parents:
-                        par_assign = self.assign_dict.get(par_sha1)
-                        if par_assign:
-                            par_assign.children.add(assign.sha1)
-                        else:
-                            # Expected and okay: some parents already exist and
-                            # are not part of our push/fast-export list.
-                            LOG.debug2(
-                                "DAG: child {child} -> parent {parent}: parent not part of push"
-                                .format(child=assign.sha1[:7], parent=par_sha1[:7]))
+            self.dag.link_children()
 
     def _branch_id_to_sha1(self):
         """Return a dict of branch_id to sha1 of what the world should look
@@ -435,17 +416,14 @@ class Assigner:
                     branch.git_branch_name = ref[len('refs/heads/'):]
                 branch_id = branch.branch_id
 
-            a = self.assign_dict.get(sha1)
-            if not a:
-                # Push assigns branch ref to a commit we already had from
-                # some previous push/pull. Must store the assignment so that
-                # p4gf_copy_to_p4 will know where to put the branch ref.
-                #
-                # This Assign object lacks parent info, but that's okay
-                # since we're just using it to store a single branch ref
-                # assignment, not in deeper branch id calculations.
-                a = Assign(sha1)
-                self.assign_dict[sha1] = a
+            # Push assigns branch ref to a commit we already had from
+            # some previous push/pull. Must store the assignment so that
+            # p4gf_copy_to_p4 will know where to put the branch ref.
+            #
+            # Such a node lacks parent info, but that's okay
+            # since we're just using it to store a single branch ref
+            # assignment, not in deeper branch id calculations.
+            self.dag.add(sha1)
 
             result[branch_id] = sha1
 
@@ -455,23 +433,20 @@ class Assigner:
         """Make sure that each known or newly pushed branch reference has an
         Assign instance to (eventually) receive that branch assignment.
 
-        _load_commit_dag() creates Assign instances only for pushed refs that
+        _load_commit_dag() creates nodes only for pushed refs that
         point to a newly pushed commits. It does not see any old, unpushed refs,
         nor any pushed refs that point to commits that we received in an earlier
         push. Those are is not yet in rev_list or assign_dict.
 
-        This Assign object lacks parent info, but that's okay since we're just
+        Such a node lacks parent info, but that's okay since we're just
         using it to store a single branch ref  assignment, not in deeper
         branch id calculations.
 
-        The created Assign objects are NOT assigned to any branch yet. That's
+        The created nodes are NOT assigned to any branch yet. That's
         _assign_branches_named()'s job.
         """
         for sha1 in self._branch_id_to_sha1().values():
-            a = self.assign_dict.get(sha1)
-            if not a:
-                a = Assign(sha1)
-                self.assign_dict[sha1] = a
+            self.dag.add(sha1)
 
     def _force_assign_pushed_ref_heads(self):
         """Force all pushed references to be one of the (possibly multiple) branch
@@ -481,8 +456,7 @@ class Assigner:
         """
         for branch in self._pushed_branch_sequence():
             new_head_sha1 = self._branch_to_pushed_new_head_sha1(branch)
-            assign = self.assign_dict.get(new_head_sha1)
-            self._assign_branch(assign, branch.branch_id)
+            self._assign_branch(self.dag.node(new_head_sha1), branch.branch_id)
 
     def _assign_branches_named(self):
         """For each pushed branch reference, find a path from its new head location
@@ -575,50 +549,51 @@ class Assigner:
                                , assign_branch = p4gf_branch.abbrev(assign_branch)
                                , reachable_by  = p4gf_branch.abbrev(reachable_by)
                                ))
-        curr_assign = self.assign_dict.get(new_head_sha1)
+        dag = self.dag
+        curr = dag.node(new_head_sha1)
         self._tunnel_reset()
 
         while True:
-            if not curr_assign.branch_id:
-                self._assign_branch(curr_assign, assign_branch.branch_id)
+            if not dag.has_branch_id(curr):
+                self._assign_branch(curr, assign_branch.branch_id)
                 if LOG.isEnabledFor(logging.DEBUG3):
                     LOG.debug3('_assign_path curr={}         assigned {}'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
+                               .format( p4gf_util.abbrev(dag.sha1(curr))
                                       , p4gf_util.abbrev(assign_branch.branch_id)))
             else:
                         # Normally don't assign if already assigned,
                         # but in tunnel mode, yeah, assign.
                 if (    self.tunnel_assign
-                    and assign_branch.branch_id not in curr_assign.branch_id):
-                    self._assign_branch(curr_assign, assign_branch.branch_id)
+                    and not dag.has_branch_id(curr, assign_branch.branch_id)):
+                    self._assign_branch(curr, assign_branch.branch_id)
                     LOG.debug3('_assign_path curr={} tunnelling through ({})'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
-                                      , p4gf_util.abbrev(curr_assign.branch_id_str())))
+                               .format( p4gf_util.abbrev(dag.sha1(curr))
+                                      , p4gf_util.abbrev(dag.branch_id_str(curr))))
                 else:
                     LOG.debug3('_assign_path curr={} already assigned ({})'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
-                                      , p4gf_util.abbrev(curr_assign.branch_id_str())))
+                               .format( p4gf_util.abbrev(dag.sha1(curr))
+                                      , p4gf_util.abbrev(dag.branch_id_str(curr))))
 
-            chosen_par_assign = self._best_parent_assign( curr_assign, assign_branch.branch_id
-                                                        , reachable_by)
-            if not chosen_par_assign:
+            chosen_par = self._best_parent( curr, assign_branch.branch_id
+                                          , reachable_by)
+            if chosen_par is None:
                 if LOG.isEnabledFor(logging.DEBUG3):
                     LOG.debug3('_assign_path curr={} no usable parent. Done.'
-                               .format(p4gf_util.abbrev(curr_assign.sha1)))
+                               .format(p4gf_util.abbrev(dag.sha1(curr))))
                 self._tunnel_back_out(assign_branch.branch_id)
                 break
 
-            if not self._tunnel_check_passes( chosen_par_assign
+            if not self._tunnel_check_passes( chosen_par
                                             , assign_branch.branch_id):
                 if LOG.isEnabledFor(logging.DEBUG3):
                     LOG.debug3('_assign_path curr={} exceeds tunnel length. Done.'
-                               .format(p4gf_util.abbrev(curr_assign.sha1)))
+                               .format(p4gf_util.abbrev(dag.sha1(curr))))
                 break
 
-            curr_assign = chosen_par_assign
+            curr = chosen_par
 
-    def _best_parent_assign(self, child_assign, branch_id, required_reachable_by=None):
-        """Return one of child_assign's parent Assign instances.
+    def _best_parent(self, child, branch_id, required_reachable_by=None):
+        """Return the node id of one of child's parents, or None.
 
         First available match in this order:
 
@@ -632,63 +607,51 @@ class Assigner:
         If required_reachable_by passed in as non-None, then considers only
         parents with reachable_by==required_reachable_by
         """
-        # pylint: disable=too-many-branches
-
-        if not child_assign.parents:
+        dag     = self.dag
+        parents = dag.parents(child)
+        if not parents:
             return None
+        reachable_by = dag.reachable_by
 
         # 1. Do we already have one parent assigned to this branch?
         #    Never assign more than one parent to the same branch.
-        par_assign_list = None
-        for par_sha1 in child_assign.parents:
-            par_assign = self.assign_dict.get(par_sha1)
-            if not par_assign:
-                continue
-            if par_assign.branch_id and  branch_id in par_assign.branch_id:
-                return par_assign
+        for par in parents:
+            if dag.has_branch_id(par, branch_id):
+                return par
 
         # 2. unassigned first-parent    *reachable
-        first_par_assign = self.assign_dict.get(child_assign.parents[0])
+        first_par = parents[0]
         # Require reachable (if caller requested)
-        if (    first_par_assign
-            and required_reachable_by
-            and first_par_assign.reachable_by is not required_reachable_by):
+        if (    required_reachable_by
+            and reachable_by[first_par] is not required_reachable_by):
             LOG.debug('# par.reachable={} != req={}'
-                      .format( first_par_assign.reachable_by
+                      .format( reachable_by[first_par]
                              , required_reachable_by))
-            first_par_assign = None
+            first_par = None
         # Unassigned? We've got a winner.
-        if first_par_assign and not first_par_assign.branch_id:
-            return first_par_assign
+        if first_par is not None and not dag.has_branch_id(first_par):
+            return first_par
 
         # 3. unassigned any parent      *reachable
-        par_assign_list = None
-        for par_sha1 in child_assign.parents:
-            par_assign = self.assign_dict.get(par_sha1)
-            if not par_assign:
-                continue
+        first_assigned_par = None
+        for par in parents:
             if (    required_reachable_by
-                and par_assign.reachable_by is not required_reachable_by):
+                and reachable_by[par] is not required_reachable_by):
                 continue
             # Unassigned? We've got a winner.
-            if not par_assign.branch_id:
-                return par_assign
+            if not dag.has_branch_id(par):
+                return par
             # No unassigned winner yet?
-            # Remember our list of parent Assign for later
-            if not par_assign_list:
-                par_assign_list = [par_assign]
-            else:
-                par_assign_list.append(par_assign)
+            # Remember our first assigned parent for later
+            if first_assigned_par is None:
+                first_assigned_par = par
 
         # 4. assigned first-parent    *reachable
-        if first_par_assign:
-            return first_par_assign
+        if first_par is not None:
+            return first_par
 
         # 5. assigned any parent      *reachable
-        if par_assign_list:
-            return par_assign_list[0]
-
-        return None
+        return first_assigned_par
 
     def _set_reachable_by(self, old_head_sha1, reachable_by):
         """Tree-walk a commit and all of its descendants, setting their
@@ -700,38 +663,31 @@ class Assigner:
                    .format( p4gf_util.abbrev(old_head_sha1)
                           , p4gf_util.abbrev(reachable_by.branch_id)))
 
-        old_head_assign = self.assign_dict.get(old_head_sha1)
-        if not old_head_assign:
+        dag = self.dag
+        old_head = dag.node(old_head_sha1)
+        if old_head is None:
             LOG.debug3('_set_reachable_by() old_head not in assign_dict. Done.')
             return
-        work_queue = [old_head_assign]
+        work_queue = [old_head]
         while work_queue:
-            curr_assign = work_queue.pop()
-            if not curr_assign:
-                continue
-            curr_assign.reachable_by = reachable_by
+            curr = work_queue.pop()
+            dag.reachable_by[curr] = reachable_by
             LOG.debug2('curr={} set {}'
-                       .format( p4gf_util.abbrev(curr_assign.sha1)
+                       .format( p4gf_util.abbrev(dag.sha1(curr))
                               , p4gf_util.abbrev(reachable_by.branch_id)))
-            for child_sha1 in curr_assign.children:
+            for child in dag.children(curr):
                 # Visit children, but skip ones we've already seen due to some
                 # other path (merge commits)
-                child_assign = self.assign_dict.get(child_sha1)
-                if not child_assign:
-                    LOG.debug3('curr={} child={} not found'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
-                                      , p4gf_util.abbrev(child_sha1)))
-                    continue
-                elif child_assign.reachable_by is reachable_by:
+                if dag.reachable_by[child] is reachable_by:
                     LOG.debug3('curr={} child={} already set'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
-                                      , p4gf_util.abbrev(child_sha1)))
+                               .format( p4gf_util.abbrev(dag.sha1(curr))
+                                      , p4gf_util.abbrev(dag.sha1(child))))
                     continue
                 else:
                     LOG.debug3('curr={} child={} enqueued'
-                               .format( p4gf_util.abbrev(curr_assign.sha1)
-                                      , p4gf_util.abbrev(child_sha1)))
-                    work_queue.append(child_assign)
+                               .format( p4gf_util.abbrev(dag.sha1(curr))
+                                      , p4gf_util.abbrev(dag.sha1(child))))
+                    work_queue.append(child)
 
     def _pushed_branch_sequence(self):
         """Return a list of Branch instances, one for each pushed branch reference.
@@ -785,9 +741,8 @@ class Assigner:
                                   , key=lambda x: x.branch_id
                                   , reverse=True )
         # For each commit with no branch assignment
-        for sha1 in self.rev_list:
-            assign = self.assign_dict.get(sha1)
-            if assign.branch_id:
+        for node in self._rev_ids:
+            if self.dag.has_branch_id(node):
                 continue
 
             # Record if exist at least one anonymous branch
@@ -804,7 +759,7 @@ class Assigner:
             #     this commit and a single chain of parents back
             #     to the start of pushed history.
             self._assign_path( assign_branch=branch
-                             , new_head_sha1=sha1
+                             , new_head_sha1=self.dag.sha1(node)
                              , reachable_by =None)
 
     def _create_anon_branch(self):
@@ -839,14 +794,14 @@ class Assigner:
                 return bm.branch_id
         return None
 
-    def _assign_branch(self, assign, branch_id):
-        """Add branch_id to assign's list of branches."""
-        if assign.add_branch_id(branch_id):
+    def _assign_branch(self, node, branch_id):
+        """Add branch_id to node's list of branches."""
+        if self.dag.add_branch_id(node, branch_id):
             _increment_bucket(branch_id, self.branch_len)
 
-    def _unassign_branch(self, assign, branch_id):
-        """Remove branch_id from assign's list of branches."""
-        if assign.remove_branch_id(branch_id):
+    def _unassign_branch(self, node, branch_id):
+        """Remove branch_id from node's list of branches."""
+        if self.dag.remove_branch_id(node, branch_id):
             _decrement_bucket(branch_id, self.branch_len)
 
     def undeleted_branches(self):
@@ -878,7 +833,7 @@ class Assigner:
         result.assign_dict = {k: AssignFrozen.from_dict(ad[k]) for k in ad}
         return result
 
-    def _tunnel_check_passes(self, chosen_par_assign, branch_id):
+    def _tunnel_check_passes(self, chosen_par, branch_id):
         """Does this assignment fit within set limits about sharing
         commits with other branches?
 
@@ -890,7 +845,7 @@ class Assigner:
         if self.tunnel_max_ct == TUNNEL_UNLIMITED:
             return True
 
-        is_tunnel = 0 < len(chosen_par_assign.branch_id)
+        is_tunnel = self.dag.has_branch_id(chosen_par)
 
                         # Not tunnelling? Then clear any current tunnel
                         # tracking and permit it.
@@ -902,10 +857,10 @@ class Assigner:
                         # Then do so and we're done.
         if  len(self.tunnel_list) < self.tunnel_max_ct:
             LOG.debug("tunneling through {} for branch_id={} already assigned={}"
-                .format(p4gf_util.abbrev(chosen_par_assign.sha1)
+                .format(p4gf_util.abbrev(self.dag.sha1(chosen_par))
                     , branch_id
-                    , chosen_par_assign.branch_id_str()))
-            self.tunnel_list.append(chosen_par_assign)
+                    , self.dag.branch_id_str(chosen_par)))
+            self.tunnel_list.append(chosen_par)
             return True
 
                         # Tunnel cannot accept any more assignments.
@@ -913,10 +868,10 @@ class Assigner:
                         # everything in the tunnel, then reject.
         LOG.debug("backing out, len={} sha1={} branch_id={} tunnel={}"
                   .format(len(self.tunnel_list)
-                          , p4gf_util.abbrev(chosen_par_assign.sha1)
+                          , p4gf_util.abbrev(self.dag.sha1(chosen_par))
                           , branch_id
-                          , ", ".join( [p4gf_util.abbrev(a.sha1)
-                                        for a in self.tunnel_list])
+                          , ", ".join( [p4gf_util.abbrev(self.dag.sha1(node))
+                                        for node in self.tunnel_list])
                           ))
         self._tunnel_back_out(branch_id)
         return False
@@ -929,95 +884,366 @@ class Assigner:
 
     def _tunnel_back_out(self, branch_id):
         """Tunnel too long. Remove assignment."""
-        for assign in self.tunnel_list:
-            self._unassign_branch(assign, branch_id)
+        for node in self.tunnel_list:
+            self._unassign_branch(node, branch_id)
 
 
-# -- class Assign -------------------------------------------------------------
+# -- class CommitDag ----------------------------------------------------------
 
-class Assign:
+class CommitDag:
+
+    """Commits and their parent/child links, plus each commit's branch
+    assignment work, in flat arrays indexed by integer node id.
 
-    """A single commit's branch assignment and the work leading up to that
-    assignment.
+    A first push of millions of commits cannot afford a Python object,
+    two sets, and a handful of 40-char str per commit. Here each commit
+    costs a binary sha1, a dict slot, and a few array elements.
+
+    Node ids count up from 0 in the order we first see each sha1, either
+    as a commit line from git-rev-list or as some commit's parent.
     """
 
-    def __init__(self, sha1=None, parents=None):
-        # This commit's sha1
-        self.sha1       = sha1
+    def __init__(self):
+                        # 20-byte binary sha1 ==> node id
+        self._node          = {}
+                        # node id * 20 ==> 20-byte binary sha1
+        self._sha1          = bytearray()
+                        # node id ==> index of first parent in _par, or -1
+                        # if we have never seen this commit's own line.
+        self._par_start     = array.array('i')
+                        # node id ==> parent count
+        self._par_ct        = array.array('H')
+                        # Parent node ids, first-parent first.
+        self._par           = array.array('i')
+                        # node id ==> index of first child in _child, with one
+                        # extra element at the end. Built by link_children().
+        self._child_start   = array.array('i')
+        self._child         = array.array('i')
+
+                        # node id ==> None, one BranchId, or a tuple of
+                        # BranchId if multiple branches receive this commit.
+        self.branch_ids     = []
+                        # node id ==> the Branch whose old head this commit
+                        # descends from, or None. See _set_reachable_by().
+        self.reachable_by   = []
+
+    def __len__(self):
+        return len(self._par_start)
+
+    def node(self, sha1):
+        """Return a sha1's node id, or None if not in our DAG."""
+        try:
+            return self._node.get(binascii.unhexlify(sha1))
+        except (TypeError, ValueError, binascii.Error):
+            return None
 
-        # Which branches of Perforce file hierarchy receive this commit. Can
-        # be multiple if multiple branch heads point to the same commit
-        # (only happens for heads right now, we lack the smarts to know when
-        # to drag multiple branches back through shared history.)
-        #
-        # Likely to convert to single string, with heads' multi-branch-id
-        # stored in a field that we can leave None for most of the time.
-        self.branch_id  = set()
+    def sha1(self, node):
+        """Return a node's 40-char hex sha1."""
+        return binascii.hexlify(self._sha1[node * 20:node * 20 + 20]).decode()
+
+    def add(self, sha1):
+        """Return sha1's node id, creating a node if necessary."""
+        return self._add_bin(binascii.unhexlify(sha1))
+
+    def _add_bin(self, bin_sha1):
+        """Return a 20-byte binary sha1's node id, creating a node if necessary."""
+        node = self._node.get(bin_sha1)
+        if node is None:
+            node = len(self._par_start)
+            self._node[bin_sha1] = node
+            self._sha1.extend(bin_sha1)
+            self._par_start.append(-1)
+            self._par_ct.append(0)
+            self.branch_ids.append(None)
+            self.reachable_by.append(None)
+        return node
+
+    def is_loaded(self, node):
+        """Have we seen this commit's own line from git-rev-list,
+        or only heard of it as some other commit's parent?
+        """
+        return 0 <= self._par_start[node]
+
+    def parents(self, node):
+        """Return a node's parent node ids, first-parent first."""
+        start = self._par_start[node]
+        if start < 0:
+            return ()
+        return self._par[start:start + self._par_ct[node]]
+
+    def children(self, node):
+        """Return a node's child node ids.
+
+        Empty for nodes added after link_children().
+        """
+        if len(self._child_start) <= node + 1:
+            return ()
+        return self._child[self._child_start[node]:self._child_start[node + 1]]
+
+    def load_rev_list(self, cmd, stop_at_loaded=False
+                     , progress_msg=None, recorder=None):
+        """Run 'git rev-list --parents ...' and load its commits as they
+        stream in.
 
-        # List of child commit sha1s that use this commit as a parent.
-        self.children   = set()
+        Return an array of node ids, one per commit line, in git-rev-list's
+        order.
 
-        # List of parent sha1s, first-parent is [0].
-        self.parents    = parents
+        :param stop_at_loaded: stop at the first commit whose own line we
+                               have already loaded.
+        :param progress_msg:   ProgressReporter message per commit, or None.
+        :param recorder:       TimeSpaceRecorder to increment per commit.
 
-        # Is this commit a descendant of the current branch's old head commit?
-        # If so, then reachable_by points to the current branch instance. If
-        # not, then reachable_by is left pointing to either None or some other
-        # previous branch instance.
-        self.reachable_by   = None
+        Reads git-rev-list's output as it runs, through a p4gf_proc stream.
+        """
+        LOG.debug2("DAG: {}".format(' '.join(cmd)))
+        result     = array.array('i')
+        unhexlify  = binascii.unhexlify
+        add_bin    = self._add_bin
+        par        = self._par
+        stopped    = False
+        stream     = p4gf_proc.popen_stream(cmd)
+        try:
+            for line in stream.stdout:
+                node = add_bin(unhexlify(line[:40]))
+                if self._par_start[node] < 0:
+                    self._par_start[node] = len(par)
+                    self._par_ct[node]    = (len(line) - 40) // 41
+                    for i in range(41, len(line) - 1, 41):
+                        par.append(add_bin(unhexlify(line[i:i + 40])))
+                elif stop_at_loaded:
+                    stopped = True  # git-rev-list dies of SIGPIPE.
+                    break
+                result.append(node)
+                if progress_msg:
+                    ProgressReporter.increment(progress_msg)
+                if recorder:
+                    recorder.increment()
+                if LOG.isEnabledFor(logging.DEBUG3):
+                    LOG.debug3('DAG: rev_list {}'.format(line.decode().strip()))
+        finally:
+            r = stream.wait(expect_error=True)
+        if r['ec'] and not stopped:
+            raise RuntimeError(_('Command failed: {cmd}'
+                                 '\nexit code: {ec}.'
+                                 '\nstderr:\n{err}')
+                               .format( cmd = r['cmd']
+                                      , ec  = r['ec']
+                                      , err = r['err'] ))
+        return result
+
+    def link_children(self):
+        """Fill in every loaded node's children, from its parents."""
+        node_ct     = len(self)
+        child_ct    = array.array('i', [0]) * (node_ct + 1)
+        for p in self._par:
+            child_ct[p + 1] += 1
+                        # Running total: child_ct[n] is now where node n's
+                        # children start.
+        for n in range(node_ct):
+            child_ct[n + 1] += child_ct[n]
+        self._child_start = array.array('i', child_ct)
+        self._child       = array.array('i', [0]) * len(self._par)
+        fill = child_ct         # node ==> next free slot for its children
+        for child in range(node_ct):
+            for p in self.parents(child):
+                self._child[fill[p]] = child
+                fill[p] += 1
+
+    def free_work_arrays(self):
+        """Drop what only branch assignment needs."""
+        self._child_start = array.array('i')
+        self._child       = array.array('i')
+        self.reachable_by = [None] * len(self)
+
+    def has_branch_id(self, node, branch_id=None):
+        """Is this node assigned to branch_id, or to any branch if None?"""
+        b = self.branch_ids[node]
+        if branch_id is None or b is None:
+            return b is not None
+        if isinstance(b, tuple):
+            return branch_id in b
+        return b == branch_id
+
+    def branch_id_tuple(self, node):
+        """Return a tuple of the node's assigned branch_ids."""
+        b = self.branch_ids[node]
+        if b is None:
+            return ()
+        if isinstance(b, tuple):
+            return b
+        return (b,)
+
+    def branch_id_str(self, node):
+        """Return a node's branch ID(s) as a single string."""
+        b = self.branch_id_tuple(node)
+        if not b:
+            return None
+        return ' '.join(b)
 
-    def add_branch_id(self, branch_id):
+    def add_branch_id(self, node, branch_id):
         """Assign this commit to the given branch_id.
 
         Return True if actually added, False if already had
         this branch_id assigned.
         """
         assert isinstance(branch_id, p4gf_branch.BranchId)
-        if branch_id in self.branch_id:
+        if self.has_branch_id(node, branch_id):
             return False
-        self.branch_id.add(branch_id)
+        b = self.branch_ids[node]
+        if b is None:
+            self.branch_ids[node] = branch_id
+        else:
+            self.branch_ids[node] = self.branch_id_tuple(node) + (branch_id,)
         return True
 
-    def remove_branch_id(self, branch_id):
+    def remove_branch_id(self, node, branch_id):
         """Un-assign this commit from the given branch_id.
 
         Return True if actually removed, False if already lacked
         this branch_id.
         """
         assert isinstance(branch_id, p4gf_branch.BranchId)
-        if branch_id not in self.branch_id:
+        if not self.has_branch_id(node, branch_id):
             return False
-        self.branch_id.remove(branch_id)
+        b = tuple(x for x in self.branch_id_tuple(node) if x != branch_id)
+        if not b:
+            self.branch_ids[node] = None
+        elif len(b) == 1:
+            self.branch_ids[node] = b[0]
+        else:
+            self.branch_ids[node] = b
         return True
 
+    def sha1_ct(self):
+        """How many sha1s can node() find?"""
+        return len(self._node)
+
+    def sha1_node_items(self):
+        """Yield (sha1, node id) for each sha1 that node() can find."""
+        for bin_sha1, node in self._node.items():
+            yield (binascii.hexlify(bin_sha1).decode(), node)
+
+    def forget(self, sha1):
+        """Remove sha1 from our sha1 lookup, return its node id or None.
+
+        The node's arrays remain, for any Assign view that still points to it.
+        """
+        try:
+            return self._node.pop(binascii.unhexlify(sha1), None)
+        except (TypeError, ValueError, binascii.Error):
+            return None
+
+
+# -- class AssignDict ---------------------------------------------------------
+
+class AssignDict:
+
+    """Read-mostly dict-like view of a CommitDag: sha1 ==> Assign.
+
+    Supports what callers used to do with a dict of Assign instances:
+    get(), in, [], len(), iteration, and pop().
+    """
+
+    def __init__(self, dag):
+        self._dag = dag
+
+    def get(self, sha1, default=None):
+        """Return an Assign view of sha1, or default."""
+        node = self._dag.node(sha1)
+        if node is None:
+            return default
+        return Assign(self._dag, node)
+
+    def __contains__(self, sha1):
+        return self._dag.node(sha1) is not None
+
+    def __getitem__(self, sha1):
+        node = self._dag.node(sha1)
+        if node is None:
+            raise KeyError(sha1)
+        return Assign(self._dag, node)
+
+    def __len__(self):
+        return self._dag.sha1_ct()
+
+    def pop(self, sha1):
+        """Return an Assign view of sha1 and remove sha1 from this dict."""
+        node = self._dag.forget(sha1)
+        if node is None:
+            raise KeyError(sha1)
+        return Assign(self._dag, node)
+
+    def keys(self):
+        """Yield each sha1."""
+        for sha1, _node in self._dag.sha1_node_items():
+            yield sha1
+
+    __iter__ = keys
+
+    def values(self):
+        """Yield an Assign view of each sha1."""
+        for _sha1, node in self._dag.sha1_node_items():
+            yield Assign(self._dag, node)
+
+    def items(self):
+        """Yield (sha1, Assign) for each sha1."""
+        for sha1, node in self._dag.sha1_node_items():
+            yield (sha1, Assign(self._dag, node))
+
+
+# -- class Assign -------------------------------------------------------------
+
+class Assign:
+
+    """A single commit's branch assignment: a view of one CommitDag node.
+
+    Cheap to create, so AssignDict creates a new one for every lookup.
+    """
+
+    def __init__(self, dag, node):
+        self._dag = dag
+        self.node = node
+
+    @property
+    def sha1(self):
+        """This commit's sha1."""
+        return self._dag.sha1(self.node)
+
+    @property
+    def parents(self):
+        """List of parent sha1s, first-parent is [0]."""
+        return [self._dag.sha1(p) for p in self._dag.parents(self.node)]
+
     def branch_id_str(self):
         """Return our branch ID(s) as a single string."""
-        if not self.branch_id:
-            return None
-        return ' '.join(self.branch_id)
+        return self._dag.branch_id_str(self.node)
 
     def branch_id_list(self):
         """Return our branch ID(s) as a list.
 
         Return empty list if no assignments.
         """
-        return list(self.branch_id)
+        # Sorting solely to allow reproducible test results.
+        # Order should not matter.
+        return sorted(self._dag.branch_id_tuple(self.node))
 
     def release_links(self):
-        """Sever all ties to parents and children, but retain sha1.
+        """Drop our branch assignment, but retain sha1 and parents.
 
-        Called by FastPush as it iterates through our assignments, freeing
-        memory by destructively removing Assign elements as it process the
-        assigner dict.
+        Called by FastPush as it iterates through our assignments, after
+        it pops them from the assigner dict. The dag's arrays do not shrink,
+        but each branch_id tuple can go.
 
         Keep the sha1: before FastPush severs a child's link to its parent(s),
         it (very rarely) needs to its first-parent sha1 to use that for a ghost
         changelist.
         """
-        self.branch_id    = None
-        self.children     = None
-        self.parents      = None
-        self.reachable_by = None
+        self._dag.branch_ids[self.node] = None
+        self._dag.reachable_by[self.node] = None
+
+    def to_dict(self):
+        """Convert this object to a map that AssignFrozen.from_dict() reads."""
+        return {'branch_id': self.branch_id_list()}
 
     def __repr__(self):
         return '{} {}'.format(p4gf_util.abbrev(self.sha1), self.branch_id_str())
@@ -1146,7 +1372,6 @@ class PreReceiveTuple:
 
 # p4gf_profiler timer names
 TIMER_OVERALL                   = NTR('p4gf_branch_id total')
-TIMER_RUN_REV_LIST              = NTR('run_rev_list')
 TIMER_CONSUME_REV_LIST          = NTR('consume_rev_list')
 TIMER_ASSIGN_CHILDREN           = NTR('assign_children')
 TIMER_BRANCH_HEAD               = NTR('branch_head')
@@ -1235,6 +1460,29 @@ def _test_dump_all_commits(branch_dict, git_dir, pushed_ref_list):
     _test_dump_result_to_stdout(assigner)
 
 
+def _bench_load_dag(git_dir, refs):
+    """Load the commit DAG for refs, report time and memory as we go."""
+    os.chdir(git_dir)   # p4gf_proc runs git in our cwd.
+    log = logging.getLogger("p4gf_branch_id.bench")
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    recorder = TimeSpaceRecorder( report_period_event_ct = 100000
+                                , log                    = log
+                                , log_level              = logging.INFO )
+    start = time.time()
+    dag   = CommitDag()
+    rev_ids = dag.load_rev_list( ['git', 'rev-list', '--date-order', '--parents']
+                                 + refs
+                               , recorder = recorder )
+    load_seconds = time.time() - start
+    dag.link_children()
+    print(NTR("commits={:,} nodes={:,} load={:.2f}s link={:.2f}s maxrss={:,.1f}MB")
+          .format( len(rev_ids), len(dag)
+                 , load_seconds, time.time() - start - load_seconds
+                 , current_memory_kb() / 1024 ))
+
+
 def main():
     """Log information regarding branches in a repository."""
     desc = _("""Runs branch-id calculation on the branches defined in
@@ -1244,12 +1492,17 @@ See debug log for results.""")
     parser.add_argument('config_file', metavar='<repo-config-file>')
     parser.add_argument('git_dir', metavar='<git-dir>')
     parser.add_argument('ref', metavar='<ref>', nargs='*')
+    parser.add_argument('--bench', action='store_true',
+                        help=_('Only load the commit DAG, reporting time and memory.'))
     args = parser.parse_args()
 
     with p4gf_log.ExceptionLogger():
         p4gf_proc.init()
         p4gf_branch.init_case_handling()
         _refs = args.ref if args.ref else ['master']
+        if args.bench:
+            _bench_load_dag(args.git_dir, _refs)
+            return
         LOG.debug('config={} dir={}\nrefs={}'.format(args.config_file, args.git_dir, _refs))
         p4gf_branch.use_consecutive_branch_ids()
         _config = configparser.ConfigParser()
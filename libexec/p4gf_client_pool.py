@@ -117,6 +117,16 @@ class ClientPool:
         """Retrieve a client for the named stream."""
         return self._acquire_client(stream_name)
 
+    def add_ref_to_client(self, client_name):
+        """Increment the ref count of the named client."""
+        for client in self.clients.values():
+            if client.name == client_name:
+                client.add_ref()
+                LOG.debug("add_ref_to_client, adding {}".format(client))
+                return
+        raise RuntimeError(_("Can't reference unknown client {client_name}")
+                           .format(client_name=client_name))
+
     def release_client(self, client_name):
         """Decrement the ref count of the named client."""
         for client in self.clients.values():
@@ -95,9 +95,23 @@ VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_SINGLE_TABLE    = NTR('disk.single')
     # Reasonable performance and much less memory than Python dict
     # for high db.rev counts.
 VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MULTIPLE_TABLES = NTR('disk')
+    # Typed SQLite columns, one row per revision, batched writes.
+    # Least memory, and faster than 'disk' for high db.rev counts.
+VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED          = NTR('disk.typed')
 VALUE_DATE_SOURCE_GIT_AUTHOR    = NTR('git-author')
 VALUE_DATE_SOURCE_GIT_COMMITTER = NTR('git-pusher')
 KEY_MIRROR_MAX_COMMITS_PER_SUBMIT = NTR("gitmirror-max-commits-per-submit")
+KEY_FAST_PUSH_BLOB_READER  = NTR('fast-push-blob-reader')
+    # p4gf_git.get_blob() once per blob. Slowest, copies each blob 3 times.
+    # Useful only when comparing against the other two.
+VALUE_FAST_PUSH_BLOB_READER_GET_BLOB       = NTR('get-blob')
+    # pygit2 object database read, in-process, one copy per blob.
+VALUE_FAST_PUSH_BLOB_READER_ODB            = NTR('odb')
+    # One long-lived 'git cat-file --batch' per push, zero copies per blob.
+VALUE_FAST_PUSH_BLOB_READER_CAT_FILE_BATCH = NTR('cat-file-batch')
+    # How many worker processes extract/hash/deflate blobs in parallel.
+    # Unset or 0: one per CPU core. 1: no workers, one blob at a time.
+KEY_FAST_PUSH_BLOB_WORKERS = NTR('fast-push-blob-workers')
 # [perforce-to-git]
 # -----------------------------------------------------------------------------
 #                 Begin block copied to both p4gf_config.py
@@ -130,6 +144,18 @@ KEY_RECEIVED_LIMIT         = NTR('limit_megabytes_received')
 # [undoc]
 SECTION_UNDOC              = NTR('undoc')
 KEY_ENABLE_CHECKPOINTS     = NTR('enable_checkpoints')
+    # Maximum entries in ObjectType's in-memory caches. Global config only.
+KEY_CHANGE_NUM_TO_COMMIT_CACHE_SIZE = NTR('change_num_to_commit_cache_size')
+KEY_TREE_CACHE_SIZE        = NTR('tree_cache_size')
+    # Maximum bytes of 'p4 files'/'p4 fstat' results that G2PMatrix keeps
+    # in memory, per command. Global config only.
+KEY_P4RESULT_CACHE_BYTES   = NTR('p4result_cache_bytes')
+    # Maximum commits whose parents and commit time P2G keeps in memory
+    # for ancestry checks. Global config only.
+KEY_P2G_ANCESTRY_CACHE_SIZE = NTR('p2g_ancestry_cache_size')
+    # Maximum bytes of Git blob content that G2PWorkspace keeps on disk
+    # to hardlink or copy into later commits. Global config only.
+KEY_G2P_BLOB_CACHE_BYTES   = NTR('g2p_blob_cache_bytes')
 #
 # In [@repo] of the per-repo config files only
 #
@@ -160,6 +186,27 @@ KEY_GIT_LFS_INITIAL_TRACK  = NTR('git-lfs-initial-track')
 #                 and p4gf_submit_trigger.py.
 # -----------------------------------------------------------------------------
 KEY_DEPOT_ROOT             = NTR('depot-root')
+    # [perforce-to-git] Pipe commands to a running git-fast-import as we
+    # produce them, rather than running it on a complete temp-file script.
+KEY_FAST_IMPORT_STREAMING  = NTR('fast-import-streaming')
+    # [perforce-to-git] Where to store p4 printed file revisions:
+    # 'pack' (one packfile per copy) or 'loose' (one file per blob).
+KEY_PRINT_BLOB_STORAGE     = NTR('print-blob-storage')
+VALUE_PRINT_BLOB_STORAGE_PACK  = NTR('pack')
+VALUE_PRINT_BLOB_STORAGE_LOOSE = NTR('loose')
+    # [perforce-to-git] How many branch views to 'p4 print' at once, each
+    # on its own Perforce connection. 1 = one at a time.
+KEY_PRINT_CONCURRENCY      = NTR('print-concurrency')
+    # [git-to-perforce] While one commit submits, start the next commit's
+    # 'p4 fstat' discovery queries on a second Perforce connection.
+KEY_DISCOVER_PREFETCH      = NTR('discover-prefetch')
+    # [git-to-perforce] How G2PWorkspace reuses file content it already
+    # wrote for an earlier commit: 'copy' (reflink if the filesystem can),
+    # 'hardlink', or 'none' to always read from Git.
+KEY_WORKSPACE_BLOB_CACHE   = NTR('workspace-blob-cache')
+VALUE_WORKSPACE_BLOB_CACHE_COPY     = NTR('copy')
+VALUE_WORKSPACE_BLOB_CACHE_HARDLINK = NTR('hardlink')
+VALUE_WORKSPACE_BLOB_CACHE_NONE     = NTR('none')
 
 # When a feature is ready to turn on all the time, add to this list.
 #
@@ -1054,6 +1101,53 @@ def _print_config_file_tagged(p4, depot_path):
     * config content as string
     * 'p4 print' tagged dict with printed file's Perforce info (rev number!)
     """
+    if _PRINT_CACHE is not None:
+        return _print_config_file_tagged_cached(p4, depot_path)
+    return _print_config_file_tagged_uncached(p4, depot_path)
+
+
+                        # Long-running HTTP worker processes keep printed
+                        # config files between requests, and print again
+                        # only when Perforce has a newer revision.
+                        # depot_path ==> (head change, content str, tagged dict)
+                        # Change, not rev: an obliterated and re-added file
+                        # starts over at #1, but never at an old change.
+                        # None when disabled, as it is for one-shot processes.
+_PRINT_CACHE = None
+
+
+def enable_print_cache():
+    """Remember printed config files across requests in this process."""
+    global _PRINT_CACHE
+    if _PRINT_CACHE is None:
+        _PRINT_CACHE = {}
+
+
+def _print_config_file_tagged_cached(p4, depot_path):
+    """Return our remembered copy of a config file if it is still the head
+    revision. If not, print and remember the head revision.
+
+    One 'p4 fstat' instead of one 'p4 print' to a temporary file. Callers
+    parse their own copy, so nothing they change leaks into later requests.
+    """
+    hit = _PRINT_CACHE.get(depot_path)
+    if hit:
+        with p4.at_exception_level(p4.RAISE_NONE):
+            r = p4.run('fstat', '-T', 'headChange,headAction', depot_path)
+        d = p4gf_util.first_dict_with_key(r, 'headChange')
+        if (d and 'delete' not in d.get('headAction', '')
+                and int(d['headChange']) == hit[0]):
+            return (hit[1], hit[2])
+    (s, d) = _print_config_file_tagged_uncached(p4, depot_path)
+    if s is not None and d and 'change' in d:
+        _PRINT_CACHE[depot_path] = (int(d['change']), s, d)
+    else:
+        _PRINT_CACHE.pop(depot_path, None)
+    return (s, d)
+
+
+def _print_config_file_tagged_uncached(p4, depot_path):
+    """Print a config file, return its content and 'p4 print' tagged dict."""
     (b, d) = p4gf_util.print_depot_path_raw_tagged(p4, depot_path)
     if b:
         s = b.decode()    # as UTF-8
@@ -728,6 +728,13 @@ class Validator:
             all_options.add(p4gf_config.KEY_FORK_OF_BRANCH_ID)
             all_options.add(p4gf_config.KEY_ENABLE_MISMATCHED_RHS)
             all_options.add(p4gf_config.KEY_FAST_PUSH_WORKING_STORAGE)
+            all_options.add(p4gf_config.KEY_FAST_PUSH_BLOB_READER)
+            all_options.add(p4gf_config.KEY_FAST_PUSH_BLOB_WORKERS)
+            all_options.add(p4gf_config.KEY_FAST_IMPORT_STREAMING)
+            all_options.add(p4gf_config.KEY_PRINT_BLOB_STORAGE)
+            all_options.add(p4gf_config.KEY_PRINT_CONCURRENCY)
+            all_options.add(p4gf_config.KEY_DISCOVER_PREFETCH)
+            all_options.add(p4gf_config.KEY_WORKSPACE_BLOB_CACHE)
             default_cfg = p4gf_config.default_config_global()
             for section in default_cfg.sections():
                 for option in default_cfg.options(section):
@@ -819,6 +826,16 @@ class Validator:
                                            .KEY_GIT_MERGE_AVOIDANCE_AFTER_CHANGE_NUM))
                 valid = False
 
+        value = global_cfg.get(p4gf_config.SECTION_PERFORCE_TO_GIT,
+                               p4gf_config.KEY_PRINT_CONCURRENCY, fallback=None)
+        if value:
+            try:
+                int(value)
+            except ValueError:
+                self._report_error(_("Perforce: Improperly configured {key} value\n")
+                                   .format(key=p4gf_config.KEY_PRINT_CONCURRENCY))
+                valid = False
+
         valid &= self._value_expected(
               cfg                 = global_cfg
             , section_name        = p4gf_config.SECTION_GIT_TO_PERFORCE
@@ -830,6 +847,35 @@ class Validator:
                 , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MULTIPLE_TABLES
                 ]
             )
+        valid &= self._value_expected(
+              cfg                 = global_cfg
+            , section_name        = p4gf_config.SECTION_GIT_TO_PERFORCE
+            , key_name            = p4gf_config.KEY_FAST_PUSH_BLOB_READER
+            , expected_value_list =
+                [ p4gf_config.VALUE_FAST_PUSH_BLOB_READER_GET_BLOB
+                , p4gf_config.VALUE_FAST_PUSH_BLOB_READER_ODB
+                , p4gf_config.VALUE_FAST_PUSH_BLOB_READER_CAT_FILE_BATCH
+                ]
+            )
+        valid &= self._value_expected(
+              cfg                 = global_cfg
+            , section_name        = p4gf_config.SECTION_PERFORCE_TO_GIT
+            , key_name            = p4gf_config.KEY_PRINT_BLOB_STORAGE
+            , expected_value_list =
+                [ p4gf_config.VALUE_PRINT_BLOB_STORAGE_PACK
+                , p4gf_config.VALUE_PRINT_BLOB_STORAGE_LOOSE
+                ]
+            )
+        valid &= self._value_expected(
+              cfg                 = global_cfg
+            , section_name        = p4gf_config.SECTION_GIT_TO_PERFORCE
+            , key_name            = p4gf_config.KEY_WORKSPACE_BLOB_CACHE
+            , expected_value_list =
+                [ p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_COPY
+                , p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_HARDLINK
+                , p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_NONE
+                ]
+            )
         return valid
 
     def _value_expected(self, *
@@ -855,6 +901,7 @@ class Validator:
                        , value    = value
                        , expected = expected_value_list))
             return False
+        return True
 
 
 def main():
@@ -62,6 +62,7 @@ P4GF_P4KEY_PERMISSION_GROUP_DEFAULT \
 P4GF_P4KEY_PUSH_STARTED             = NTR('git-fusion-{repo_name}-push-start')
 P4GF_P4KEY_LAST_COPIED_CHANGE       = NTR('git-fusion-{repo_name}-{server_id}-last-copied-changelist-number')
 P4GF_P4KEY_LAST_SEEN_CHANGE         = NTR('git-fusion-{repo_name}-{server_id}-last-seen-changelist-number')
+P4GF_P4KEY_LAST_POLLED_CHANGE       = NTR('git-fusion-{repo_name}-{server_id}-last-polled-changelist-number')
 P4GF_P4KEY_REPO_SERVER_CONFIG_REV   = NTR('git-fusion-{repo_name}-{server_id}-p4gf-config-rev')
 P4GF_P4KEY_PERM_CHECK               = NTR('git-fusion-auth-server-perm-check')
 # -----------------------------------------------------------------------------
@@ -116,6 +117,8 @@ P4GF_BRANCH_TEMP_N                  = NTR('git-fusion-temp-branch-{}')
 P4GF_AUTH_P4USER                    = NTR('P4GF_AUTH_P4USER')
 P4GF_FORK_PUSH                      = NTR('P4GF_FORK_PUSH')
 P4GF_FORUSER                        = NTR('P4GF_FORUSER')
+# How many p4gf_proc runner children to start. Default 2.
+P4GF_PROC_RUNNER_CT                 = NTR('P4GF_PROC_RUNNER_CT')
 
 # Internal debugging keys
 # section in rc file for test vars
@@ -251,11 +254,12 @@ NON_GF_REVIEWS_BEGIN_MARKER_PATTERN = '//GF-{0}/BEGIN'
 NON_GF_REVIEWS_END_MARKER_PATTERN   = '//GF-{0}/END'
 P4GF_REVIEWS_COMMON_LOCK            = NTR('git-fusion-reviews-common-lock')
 P4GF_REVIEWS_COMMON_LOCK_OWNER      = NTR('git-fusion-reviews-common-lock-owner')
+P4GF_P4KEY_REVIEWS_VERSION          = NTR('git-fusion-reviews-version-{user}')
 
 # Is the Atomic Push submit trigger installed and at the correct version?
 #
 P4GF_P4KEY_TRIGGER_VERSION      = NTR('git-fusion-submit-trigger-version')
-P4GF_TRIGGER_VERSION                = NTR('2016.1')
+P4GF_TRIGGER_VERSION                = NTR('2016.1.1')
 P4GF_P4KEY_LOCK_USER                = NTR('git-fusion-user-{user_name}-lock')
 
 #
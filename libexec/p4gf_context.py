@@ -377,7 +377,10 @@ class Context:
             self._repo_lock.release()
         if self.p4.connected():
             p4gf_create_p4.p4_disconnect(self.p4)
-        if self.p4gf.connected():
+        if p4gf_create_p4.is_kept(self.p4gf):
+            # A long-running server's kept connection outlives us.
+            p4gf_create_p4.return_kept_temp_client()
+        elif self.p4gf.connected():
             p4gf_create_p4.p4_disconnect(self.p4gf)
         if self.p4gf_reviews.connected():
             p4gf_create_p4.p4_disconnect(self.p4gf_reviews)
@@ -1133,6 +1136,18 @@ class Context:
         """
         return View(self, branch=branch, set_client=set_client)
 
+    def add_ref_to_temp_client(self, client_name):
+        """Keep the client pool from recycling a temp client that we are still
+        using after leaving its switched_to_xxx() block.
+
+        Must be balanced by a matching call to release_temp_client().
+        """
+        self._client_pool.add_ref_to_client(client_name)
+
+    def release_temp_client(self, client_name):
+        """Release a reference taken by add_ref_to_temp_client()."""
+        self._client_pool.release_client(client_name)
+
     def switched_to_swarm_client(self, branch):
         """Return an RAII object to switch p4 connection to the pre-repo
         permanent swarm client spec, with  a view matching the specified branch,
@@ -1,7 +1,7 @@
 #! /usr/bin/env python3.3
 """Copy Perforce changes to Git."""
 
-from   collections              import namedtuple, defaultdict
+from   collections              import namedtuple, defaultdict, deque
 import logging
 import pprint
 import re
@@ -37,6 +37,7 @@ import p4gf_git
 import p4gf_lfs_attributes
 import p4gf_log
 import p4gf_mem_gc
+import p4gf_p2g_print_scheduler
 import p4gf_path
 import p4gf_proc
 import p4gf_progress_reporter as ProgressReporter
@@ -49,6 +50,10 @@ LOG = logging.getLogger(__name__)
 LOG_MEMORY = logging.getLogger('memory')
 
 
+                        # P2G._split_path_range() never splits a branch's
+                        # print range into parts with fewer changelists.
+_PRINT_SPLIT_MIN_CHANGE_CT = 500
+
 FastImportResult = namedtuple('FastImportResult',
                               ['marks', 'mark_to_branch_id', 'lfs_files', 'text_pointers'])
 
@@ -482,6 +487,110 @@ class P2G:
             result.extend(l)
         return result
 
+    def _copy_print_discover(self, new_change_set, seen_depot_branch_set, work_queue):
+        """Append to work_queue any depot branches that contributed to
+        new_change_set that we have not yet seen.
+        """
+        # get set of branches not previously seen
+        dbi_set = self._to_depot_branch_set(new_change_set)
+        dbi_new = dbi_set - seen_depot_branch_set
+        seen_depot_branch_set |= set(dbi_new)
+
+        new_branch_view_list = self._to_branch_view_list(dbi_new)
+        LOG.debug('_copy_print() new_branch_view_list={}'
+                  .format(new_branch_view_list))
+        # add these new branches to our dictionary of start CL
+        # These are loaded from @1 to capture all of history
+        for b in new_branch_view_list:
+            self.add_to_branch_start_list(b.branch_id, self.new_branch_start)
+        work_queue.extend(new_branch_view_list)
+        p4gf_mem_gc.report_growth(NTR('in P2G._copy_print() work queue'))
+
+    def _copy_print_concurrent( self, printhandler, args, worker_ct
+                              , seen_depot_branch_set, work_queue ):
+        """Print up to worker_ct view elements at a time, each on its own
+        P4 connection.
+
+        Same results as printing them one at a time: we wait for jobs, and
+        discover new depot branches, in the same order that the one-at-a-time
+        loop would have printed them. New branches still go to the end of
+        work_queue, behind any elements already submitted.
+
+        A large view element splits into several parts, each its own job.
+        We wait for an element's parts in order, so its revisions merge in
+        the same order that one 'p4 print' of the whole range would list them.
+        """
+        pending        = deque()  # of lists of PrintJob, one list per element
+        pending_job_ct = 0
+        with p4gf_p2g_print_scheduler.PrintScheduler(
+                self.ctx, args, worker_ct, printhandler) as sched:
+            while work_queue or pending:
+                while work_queue and pending_job_ct < worker_ct:
+                    view_element = work_queue.pop(0)
+                    job_list = self._submit_print_view_element(
+                        sched, worker_ct, view_element)
+                    pending.append(job_list)
+                    pending_job_ct += len(job_list)
+                job_list = pending.popleft()
+                pending_job_ct -= len(job_list)
+                new_change_set = set()
+                for job in job_list:
+                    new_change_set |= sched.wait(job)
+                self._copy_print_discover( new_change_set
+                                         , seen_depot_branch_set
+                                         , work_queue )
+
+    def _submit_print_view_element(self, sched, part_ct, view_element):
+        """Concurrent version of _copy_print_view_element(): start printing
+        the given view, return a list of PrintJob to wait for, one per part
+        of the view's path range, in changelist order.
+        """
+        with self.ctx.switched_to_branch(view_element):
+            self.current_branch_id = view_element.branch_id
+
+            LOG.debug('_submit_print_view_element() printing for element={}'
+                      .format(view_element.to_log()))
+            return [sched.submit(path)
+                    for path in self._split_path_range(part_ct)]
+
+    def _split_path_range(self, part_ct):
+        """Return a list of up to part_ct '//<client>/...@a,@b' strings
+        that together cover the same revisions as _path_range().
+
+        Lets a single large branch keep more than one print connection busy.
+        Splits at changelists that we already know we're going to copy,
+        never into parts smaller than _PRINT_SPLIT_MIN_CHANGE_CT of them.
+        The parts are contiguous, so any changes we don't know about still
+        fall inside exactly one part.
+        """
+        unsplit = [self._path_range()]
+        if part_ct < 2 or not self.current_branch_id:
+            return unsplit
+        begin = self.branch_start_list[self.current_branch_id][0]
+        if not (begin.startswith('@') and begin[1:].isdigit()):
+            return unsplit
+        begin_num = int(begin[1:])
+        end_num = None
+        if self.stop_at.startswith('@') and self.stop_at[1:].isdigit():
+            end_num = int(self.stop_at[1:])
+        change_nums = sorted(n for n in self.changes.keys()
+                             if begin_num <= n and (end_num is None or n <= end_num))
+        part_ct = min(part_ct, len(change_nums) // _PRINT_SPLIT_MIN_CHANGE_CT)
+        if part_ct < 2:
+            return unsplit
+
+        result = []
+        start = begin_num
+        for i in range(1, part_ct):
+            end = change_nums[i * len(change_nums) // part_ct - 1]
+            result.append(self.ctx.client_view_path()
+                          + NTR('@{begin},@{end}').format(begin=start, end=end))
+            start = end + 1
+        result.append(self.ctx.client_view_path()
+                      + NTR('@{begin},{end}').format(begin=start, end=self.stop_at))
+        LOG.debug2('_split_path_range() {}'.format(result))
+        return result
+
     def _copy_print(self):
         """p4 print all revs and git-hash-object them into the git repo."""
         printhandler = PrintHandler(ctx=self.ctx)
@@ -506,26 +615,24 @@ class P2G:
                 work_queue.append(br)
 
         with ProgressReporter.Indeterminate() \
-            , p4gf_git.suppress_gitattributes(self.ctx):
-            while work_queue:
-                view_element = work_queue.pop(0)
-                new_change_set = self._copy_print_view_element(printhandler
-                                                               , args
-                                                               , view_element)
-                # get set of branches not previously seen
-                dbi_set = self._to_depot_branch_set(new_change_set)
-                dbi_new = dbi_set - seen_depot_branch_set
-                seen_depot_branch_set |= set(dbi_new)
-
-                new_branch_view_list = self._to_branch_view_list(dbi_new)
-                LOG.debug('_copy_print() new_branch_view_list={}'
-                          .format(new_branch_view_list))
-                # add these new branches to our dictionary of start CL
-                # These are loaded from @1 to capture all of history
-                for b in new_branch_view_list:
-                    self.add_to_branch_start_list(b.branch_id, self.new_branch_start)
-                work_queue.extend(new_branch_view_list)
-                p4gf_mem_gc.report_growth(NTR('in P2G._copy_print() work queue'))
+            , p4gf_git.suppress_gitattributes(self.ctx) \
+            , printhandler:
+            worker_ct = p4gf_p2g_print_scheduler.worker_ct(self.ctx)
+            if worker_ct <= 1:
+                while work_queue:
+                    view_element = work_queue.pop(0)
+                    new_change_set = self._copy_print_view_element(printhandler
+                                                                   , args
+                                                                   , view_element)
+                    self._copy_print_discover( new_change_set
+                                             , seen_depot_branch_set
+                                             , work_queue )
+            else:
+                self._copy_print_concurrent( printhandler
+                                           , args
+                                           , worker_ct
+                                           , seen_depot_branch_set
+                                           , work_queue )
 
             p4gf_mem_gc.report_objects(NTR('after P2G._copy_print() work queue'))
 
@@ -545,6 +652,10 @@ class P2G:
 
             p4gf_mem_gc.report_objects(NTR('after P2G._copy_print() graft change'))
 
+                        # Finish writing printed blobs before
+                        # git-fast-import references them.
+            printhandler.close()
+
         self.printed_revs = printhandler.revs
         if self.printed_revs:
             self.printed_rev_count += len(self.printed_revs)
@@ -708,12 +819,12 @@ class P2G:
                ]
                         # _copy_print_view_element()
         printhandler.change_set = set()
-        with p4gf_util.raw_encoding(self.ctx.p4):
-            with self.ctx.p4.using_handler(printhandler):
-                with self.ctx.p4.at_exception_level(P4.RAISE_ALL):
-                    self.ctx.p4run('print', args,
-                                   list(rev_path_to_p4file.keys()) )
-        printhandler.flush()
+        with printhandler:
+            with p4gf_util.raw_encoding(self.ctx.p4):
+                with self.ctx.p4.using_handler(printhandler):
+                    with self.ctx.p4.at_exception_level(P4.RAISE_ALL):
+                        self.ctx.p4run('print', args,
+                                       list(rev_path_to_p4file.keys()) )
                         # end copypasta
 
                         # Copy newly discovered sha1 to p4file_list's elements.
@@ -1727,17 +1838,15 @@ class P2G:
 
         Return True if this works.
         """
-        branch_heads, objects = p4gf_fast_reclone.fast_reclone(self.ctx)
+        branch_heads, _objects = p4gf_fast_reclone.fast_reclone(self.ctx)
         if not branch_heads:
             return False
         self._log_memory('_generate_tags')
         self._set_branch_refs_fast_reclone(branch_heads)
-        success = p4gf_fast_reclone.check_fast_reclone(objects)
-        if success:
-            p4gf_tag.generate_tags(self.ctx)
+        p4gf_tag.generate_tags(self.ctx)
         self._log_memory('_set_branch_refs_fast_reclone')
         p4gf_git.git_prune_and_repack()
-        return success
+        return True
 
     def _copy_normal_reclone(self, repo_empty):
         """Do clone the hard way."""
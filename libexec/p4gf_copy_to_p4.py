@@ -3,7 +3,7 @@
 
 import os
 from   collections                  import defaultdict, namedtuple
-from   contextlib                   import ExitStack
+from   contextlib                   import ExitStack, contextmanager
 import copy
 import pprint
 import shutil
@@ -26,6 +26,8 @@ from   p4gf_fastimport_mark         import Mark
 import p4gf_g2p_job                 as     G2PJob
 from   p4gf_g2p_matrix2             import G2PMatrix as G2PMatrix2
 import p4gf_g2p_matrix_dump
+import p4gf_g2p_prefetch
+import p4gf_g2p_workspace
 from   p4gf_g2p_user                import G2PUser
 import p4gf_mem_gc
 import p4gf_git
@@ -102,6 +104,7 @@ MIRROR          = NTR('Mirror Git Objects')
 CHUNKIFY        = NTR('Chunkify')
 COPY_CHUNKS     = NTR('CopyChunks')
 COPY_GSREVIEW   = NTR('CopyGSReview')
+PREFETCH        = NTR('discover prefetch')
 
 N_BLOBS = NTR('Number of Blobs')
 
@@ -171,6 +174,15 @@ class G2P:
         self._curr_fe_commit            = None   # Current git-fast-export 'commit'.
         self._matrix                    = None
 
+            # DiscoverPrefetcher while _copy_commits() runs, if enabled, and
+            # the (commit, branch_id) it will copy after the current one.
+        self._prefetcher                = None
+        self._next_copy_job             = None
+
+            # G2PWorkspace while _copy_commits() runs. G2PMatrix clears and
+            # writes local files through it.
+        self.workspace                  = None
+
             # PreflightChecker instance created in preflight(), reused
             # later in _copy_commit_matrix() and preflight_shelve_gsreviews().
             # Lazy-created in property preflight_checker()
@@ -843,6 +855,13 @@ class G2P:
                 except Exception as e:  # pylint: disable=broad-except
                     self._revert_and_raise(str(e), exception=e, branch_id=branch_id)
 
+                        # Overlap our submit with the next commit's
+                        # read-only discovery queries.
+                if self._prefetcher and self._next_copy_job and not gsreview:
+                    with Timer(PREFETCH):
+                        self._prefetcher.prefetch( self._next_copy_job[0]
+                                                 , submit_branch_id = branch_id )
+
                 with Timer(P4_SUBMIT):
                     LOG.debug("Pusher is: {}, author is: {}".format(
                         commit['pusher_p4user'], commit['author_p4user']))
@@ -1670,10 +1689,10 @@ class G2P:
         Returns:
             self.marks will be populated for use in object cache.
         """
-        with Timer(COPY):
+        with Timer(COPY), self._discover_prefetcher(), self._g2p_workspace():
             last_copied_change_num = 0
             commits_completed = 0
-            for commit in commits:
+            for commit_i, commit in enumerate(commits):
                 ProgressReporter.increment(_('Copying changelists...'))
                 commit_sha1 = commit['sha1']
                 self._curr_fe_commit = commit
@@ -1690,8 +1709,9 @@ class G2P:
                               .format(p4gf_util.abbrev(commit_sha1)))
                     continue
 
-                for branch_id in self.assigner.assign_dict[commit_sha1] \
-                        .branch_id_list():
+                branch_id_list = self.assigner.assign_dict[commit_sha1] \
+                                     .branch_id_list()
+                for branch_i, branch_id in enumerate(branch_id_list):
                     if self.already_copied_commit(commit_sha1, branch_id):
                         LOG.debug('_copy_commits() {} {} '
                                   ' Commit already copied to Perforce. Skipping.'
@@ -1699,6 +1719,8 @@ class G2P:
                                          , p4gf_util.abbrev(branch_id)))
                         continue
 
+                    self._next_copy_job = self._find_next_copy_job(
+                          commits, commit_i, branch_id_list[branch_i + 1:])
                     change_num = self._copy_commit_matrix( commit
                                                          , branch_id
                                                          , gsreview            = None
@@ -1736,6 +1758,49 @@ class G2P:
         if last_copied_change_num:
             self.ctx.write_last_copied_change(last_copied_change_num)
 
+    @contextmanager
+    def _discover_prefetcher(self):
+        """Run a DiscoverPrefetcher for the duration of _copy_commits(),
+        if this repo wants one.
+        """
+        if not p4gf_g2p_prefetch.is_enabled(self.ctx):
+            yield
+            return
+        with p4gf_g2p_prefetch.DiscoverPrefetcher(self.ctx, self) as prefetcher:
+            self._prefetcher = prefetcher
+            try:
+                yield
+            finally:
+                self._prefetcher    = None
+                self._next_copy_job = None
+
+    @contextmanager
+    def _g2p_workspace(self):
+        """Run a G2PWorkspace for the duration of _copy_commits()."""
+        with p4gf_g2p_workspace.G2PWorkspace(self.ctx) as workspace:
+            self.workspace = workspace
+            try:
+                yield
+            finally:
+                self.workspace = None
+
+    def _find_next_copy_job(self, commits, commit_i, later_branch_id_list):
+        """Return the (commit, branch_id) that _copy_commits() will most
+        likely copy after the current one, or None if nothing left.
+
+        Only a guess for DiscoverPrefetcher: skips the already-copied
+        check, which can cost a Perforce query. A wrong guess just wastes
+        a prefetch.
+        """
+        if later_branch_id_list:
+            return (commits[commit_i], later_branch_id_list[0])
+        for i in range(commit_i + 1, len(commits)):
+            assign = self.assigner.assign_dict.get(commits[i]['sha1'])
+            branch_id_list = assign.branch_id_list() if assign else None
+            if branch_id_list:
+                return (commits[i], branch_id_list[0])
+        return None
+
     def _copy_commit_gsreviews(self, fe_commit):
         """If current commit is the head commit of one or more Git Swarm reviews,
         copy those to Swarm.
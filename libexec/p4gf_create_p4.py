@@ -27,6 +27,21 @@ LOG = logging.getLogger(__name__)
 # Every known connection we've created. So that we can close them when done.
 _CONNECTION_LIST = []
 
+# Long-running HTTP worker processes keep one connection from request to
+# request, rather than connect for every request. Each request still gets
+# its own temp client. close_all() leaves the connection alone.
+_KEEP_TEMP_CLIENT = False
+_KEPT_TEMP_CLIENT = None        # _KeptTempClient
+
+# P4 settings that a request might change, and that we restore before
+# handing our kept connection to the next request. Not port, api_level
+# or track: P4 refuses to change those once connected.
+_KEPT_P4_SETTINGS = [ 'charset', 'client', 'cwd', 'encoding'
+                    , 'exception_level', 'handler', 'host', 'language'
+                    , 'logger', 'maxlocktime', 'maxresults', 'maxscanrows'
+                    , 'password', 'prog', 'progress', 'streams', 'tagged'
+                    , 'ticket_file', 'user', 'version' ]
+
 
 def create_p4(port=None, user=None, client=None, connect=True, warn_no_client=True):
     """Return a new P4.P4() instance.
@@ -163,20 +178,100 @@ def unregister(p4):
         _CONNECTION_LIST.remove(p4)
 
 
-def create_p4_temp_client(port=None, user=None, skip_count=False):
-    """Create a connected P4 instance with a generic temporary client.
+class _KeptTempClient:
 
-    Dropping the connection will automatically delete the client. This is
-    useful for owning the locks and permitting reliable lock stealing by
-    other processes.
+    """The connection that keep_temp_client() keeps, its current temp
+    client, and the settings to restore before each reuse.
+    """
 
-    :return: P4API instance.
+    def __init__(self, p4, name):
+        self.p4       = p4
+        self.name     = name
+        self.settings = {k: getattr(p4, k) for k in _KEPT_P4_SETTINGS
+                         if hasattr(p4, k)}
+        self.in_use   = True
+
+
+def keep_temp_client():
+    """Reuse one connection for the rest of this process.
 
+    For long-running servers only, which must call return_kept_temp_client()
+    at the end of each request.
+
+    Each reuse gets a new temp client, and the previous temp client is
+    deleted. A lock that a failed request never released names a temp
+    client that no longer exists, and is stale, for anyone to steal.
     """
-    p4 = create_p4(port, user, warn_no_client=False)
-    if p4 is None:
-        # Propagate the error (that has already been reported).
+    global _KEEP_TEMP_CLIENT
+    _KEEP_TEMP_CLIENT = True
+
+
+def is_kept(p4):
+    """Is this the connection that keep_temp_client() told us to keep?"""
+    return p4 is not None and _KEPT_TEMP_CLIENT is not None \
+        and p4 is _KEPT_TEMP_CLIENT.p4
+
+
+def return_kept_temp_client():
+    """Our kept connection's user is done with it: the next call to
+    create_p4_temp_client() may reuse it.
+    """
+    if _KEPT_TEMP_CLIENT:
+        _KEPT_TEMP_CLIENT.in_use = False
+
+
+def close_kept_temp_client():
+    """Delete our kept connection's temp client and disconnect."""
+    global _KEPT_TEMP_CLIENT
+    kept = _KEPT_TEMP_CLIENT
+    _KEPT_TEMP_CLIENT = None
+    if not (kept and kept.p4.connected()):
+        return
+    try:
+        with kept.p4.at_exception_level(P4.P4.RAISE_NONE):
+            kept.p4.run('client', '-d', '-f', kept.name)
+        p4_disconnect(kept.p4)
+    except Exception:  # pylint: disable=broad-except
+        LOG.exception('closing kept p4 connection failed')
+
+
+def _reuse_kept_temp_client():
+    """Return our kept connection with a new temp client, or None if we
+    have none to spare.
+
+    Restore every connection setting our previous request may have
+    changed, then replace its temp client with a new one.
+    """
+    kept = _KEPT_TEMP_CLIENT
+    if not kept:
         return None
+    if not kept.p4.connected():
+        close_kept_temp_client()
+        return None
+    if kept.in_use:
+                        # Someone else in this request still has it.
+                        # Give this caller a connection of its own.
+        return None
+    p4 = kept.p4
+    try:
+        for k, v in kept.settings.items():
+            if getattr(p4, k) != v:
+                setattr(p4, k, v)
+        p4.run('client', '-d', '-f', kept.name)
+        kept.name = _save_temp_client(p4)
+    except P4.P4Exception as e:
+        LOG.warning("cannot reuse kept p4 connection, reconnecting: %s", e)
+        close_kept_temp_client()
+        return None
+    kept.settings['client'] = kept.name
+    kept.in_use = True
+    LOG.debug("create_p4_temp_client() reusing connection, temp client %s",
+              kept.name)
+    return p4
+
+
+def _save_temp_client(p4):
+    """Create a new temp client, make it p4's current client, return its name."""
     name = p4gf_const.P4GF_OBJECT_CLIENT_UNIQUE.format(server_id=p4gf_util.get_server_id(),
                                                        uuid=str(uuid.uuid1()))
     client = p4.fetch_client(name)
@@ -195,6 +290,37 @@ def create_p4_temp_client(port=None, user=None, skip_count=False):
     p4.client = name
     p4.save_client(client, '-x')
     LOG.debug("create_p4_temp_client() created temp client %s", name)
+    return name
+
+
+def create_p4_temp_client(port=None, user=None, skip_count=False):
+    """Create a connected P4 instance with a generic temporary client.
+
+    Dropping the connection will automatically delete the client. This is
+    useful for owning the locks and permitting reliable lock stealing by
+    other processes.
+
+    After keep_temp_client(), return the same connection, with a new temp
+    client, each time we are called with default port and user, unless
+    some earlier caller has not yet returned it.
+
+    :return: P4API instance.
+
+    """
+    global _KEPT_TEMP_CLIENT
+    keep = _KEEP_TEMP_CLIENT and port is None and user is None
+    if keep:
+        p4 = _reuse_kept_temp_client()
+        if p4:
+            return p4
+    p4 = create_p4(port, user, warn_no_client=False)
+    if p4 is None:
+        # Propagate the error (that has already been reported).
+        return None
+    _save_temp_client(p4)
+    if keep and not _KEPT_TEMP_CLIENT:
+        _KEPT_TEMP_CLIENT = _KeptTempClient(p4, p4.client)
+        _CONNECTION_LIST.remove(p4)
     if 'P4T4TEST_ORIG_LANG' in os.environ and not skip_count:
         # In the testing environment, we check that each process created no
         # more than one temporary client (concurrently). Keep the highest
@@ -273,6 +273,9 @@ def delete_non_client_repo_data(args, p4, client_name, metrics, prune_objs=True,
                       , p4gf_const.P4GF_P4KEY_LAST_SEEN_CHANGE
                         .format( repo_name = repo_name
                                , server_id = p4gf_util.get_server_id())
+                      , p4gf_const.P4GF_P4KEY_LAST_POLLED_CHANGE
+                        .format( repo_name = repo_name
+                               , server_id = p4gf_util.get_server_id())
                       ]
 
     else:
@@ -294,6 +297,9 @@ def delete_non_client_repo_data(args, p4, client_name, metrics, prune_objs=True,
                        , p4gf_const.P4GF_P4KEY_LAST_SEEN_CHANGE
                             .format( repo_name = repo_name
                                    , server_id = p4gf_util.get_server_id())
+                       , p4gf_const.P4GF_P4KEY_LAST_POLLED_CHANGE
+                            .format( repo_name = repo_name
+                                   , server_id = p4gf_util.get_server_id())
                        , p4gf_const.P4GF_P4KEY_REV_SHA1
                             .format( repo_name  = repo_name
                                    , change_num = '*')
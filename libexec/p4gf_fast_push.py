@@ -11,6 +11,7 @@ from   functools                    import lru_cache
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
 from   pickle                       import Pickler, Unpickler
 from   pprint                       import pformat
@@ -26,13 +27,15 @@ import p4gf_create_p4
 import p4gf_depot_branch
 from   p4gf_desc_info               import DescInfo
 import p4gf_eta
+from   p4gf_fast_push_blob_pipeline import BlobPipeline
 from   p4gf_fast_push_librarian     import LibrarianStore, lbr_rev_str
-from   p4gf_fast_push_rev_history   import RevHistoryStore
+from   p4gf_fast_push_rev_history   import RevHistoryStore, RevHistoryTable
 from   p4gf_fastexport              import FastExport
 from   p4gf_filemode                import FileModeStr, FileModeInt
 from   p4gf_g2p_user                import G2PUser
 from   p4gf_gfunzip                 import GFUnzip
 import p4gf_git
+import p4gf_git_blob_reader
 import p4gf_gitmirror
 from   p4gf_hex_str                 import md5_str
 from   p4gf_l10n                    import _, NTR
@@ -199,6 +202,17 @@ class FastPush:
         self._bat_gfunzip               = None
         self._bat_gfunzip_abspath       = None
 
+                        # p4gf_git_blob_reader.BlobReader that feeds
+                        # blob content to _bat_gfunzip. Open only
+                        # during pre_receive().
+        self._blob_reader               = None
+
+                        # p4gf_fast_push_blob_pipeline.BlobPipeline whose
+                        # worker processes feed _gfe_commit_iter(). None
+                        # if configured for a single worker. Open only
+                        # during pre_receive().
+        self._blob_pipeline             = None
+
                         # Our translated changelists zip archive.
         self._commit_gfunzip              = None
                         # Count of currently open commit_gfunzip's written
@@ -336,6 +350,8 @@ class FastPush:
             start_dt = datetime.datetime.now()
             self._delete_fast_push_files()
             p4gf_util.ensure_dir(self._persistent_dir)
+            self._open_blob_reader()
+            self._open_blob_pipeline()
             self._create_big_stores()
             assigner = self._assign_branches()
             self._create_g2p()
@@ -352,9 +368,12 @@ class FastPush:
             self._close_desc_info_file()
             self._close_commit_gfunzip()
             self._close_bat_gfunzip()
+            self._close_blob_reader()
             self._write_pickle()
             self._log_pre_receive_summary(start_dt)
         except Exception: # pylint: disable=broad-except
+            self._close_blob_pipeline(terminate=True)
+            self._close_blob_reader()
             self._delete_fast_push_files()
             LOG.debug("pre_receive() exit with exception")
             raise
@@ -553,7 +572,7 @@ class FastPush:
 
     def _create_big_stores(self):
         """Create our disk-based storage for pre-receive calculations."""
-        default = p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MULTIPLE_TABLES
+        default = p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED
         store_how = self.ctx.repo_config.get(
                           p4gf_config.SECTION_GIT_TO_PERFORCE
                         , p4gf_config.KEY_FAST_PUSH_WORKING_STORAGE
@@ -564,6 +583,7 @@ class FastPush:
                    , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MEMORY
                    , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_SINGLE_TABLE
                    , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MULTIPLE_TABLES
+                   , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED
                    ]
         if store_how not in expected:
             LOG.warning("{key} {value} not in {expected}, using {default}"
@@ -587,7 +607,12 @@ class FastPush:
         self._tree_store = TreeStore(
                                 os.path.join(d, "TreeStore.db")
                               , store_how_smaller)
-        self._rev_store  = RevHistoryStore(
+        if store_how == p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED:
+            self._rev_store = RevHistoryTable(
+                                self.ctx
+                              , os.path.join(d, "RevHistoryStore.db"))
+        else:
+            self._rev_store = RevHistoryStore(
                                 self.ctx
                               , os.path.join(d, "RevHistoryStore.db")
                               , store_how)
@@ -683,10 +708,10 @@ class FastPush:
                         )
                 self._othistory.add(ot)
 
-                        # Sever the child<->parent links within the Assigner
-                        # nodes so that their memory becomes available while.
+                        # Drop this commit's branch assignment within the
+                        # Assigner so that its memory becomes available while
                         # we iterate, rather than only at the end when we drop
-                        # the very last node.
+                        # the whole Assigner.
             branch_assignment.release_links()
 
                         # Because our OTHistory replaces/impersonates a branch
@@ -898,6 +923,157 @@ class FastPush:
                         # so that it will see the newly fast-exported marks.
         self._g2p.fast_export_marks = _FPMarks(self._gfe_mark_to_sha1)
 
+    def _open_blob_reader(self):
+        """Start our blob reader.
+
+        Called early in pre_receive(), before our stores and Assigner
+        grow, so that any git-cat-file child forks from a small process.
+        """
+        self._blob_reader = p4gf_git_blob_reader.create_blob_reader(
+                                  self.ctx.repo, self._blob_reader_how())
+
+    def _open_blob_pipeline(self):
+        """Start _gfe_commit_iter()'s blob worker processes.
+
+        Like _open_blob_reader(), called before our stores and Assigner
+        grow, so that each worker forks from a small process.
+        """
+        worker_ct = self._blob_worker_ct()
+        if worker_ct <= 1:
+            return
+        self._blob_pipeline = BlobPipeline(
+                                  git_dir   = self.ctx.repo_dirs.GIT_DIR
+                                , how       = self._blob_reader_how()
+                                , worker_ct = worker_ct )
+        self._blob_pipeline.start()
+
+    def _close_blob_pipeline(self, terminate=False):
+        """Stop _gfe_commit_iter()'s blob worker processes, if running."""
+        if self._blob_pipeline:
+            self._blob_pipeline.close(terminate=terminate)
+            self._blob_pipeline = None
+
+    def _blob_reader_how(self):
+        """Which p4gf_git_blob_reader to use?"""
+        return self.ctx.repo_config.get(
+                          p4gf_config.SECTION_GIT_TO_PERFORCE
+                        , p4gf_config.KEY_FAST_PUSH_BLOB_READER
+                        , fallback = p4gf_git_blob_reader.HOW_DEFAULT)
+
+    def _blob_worker_ct(self):
+        """How many blob worker processes for _gfe_commit_iter()?"""
+        value = self.ctx.repo_config.get(
+                          p4gf_config.SECTION_GIT_TO_PERFORCE
+                        , p4gf_config.KEY_FAST_PUSH_BLOB_WORKERS
+                        , fallback = '0')
+        try:
+            worker_ct = int(value)
+        except ValueError:
+            LOG.warning("{key} {value} not an integer, using 0"
+                        .format( key   = p4gf_config.KEY_FAST_PUSH_BLOB_WORKERS
+                               , value = value ))
+            worker_ct = 0
+        if worker_ct <= 0:
+            worker_ct = multiprocessing.cpu_count()
+        return worker_ct
+
+    def _gfe_commit_iter(self):
+        """Generator: parse our git-fast-export script, once, and yield
+        each commit dict, in order, ready for _translate_commit().
+
+        With a blob pipeline, feed each commit's new blobs to the pipeline
+        as we parse, and hold each commit back until the pipeline's results
+        for all of its blobs are in the bat_gfunzip and librarian. Worker
+        processes extract, hash, and deflate later commits' blobs while we
+        translate earlier ones. Commits that add no new blobs can pile up
+        behind one that does, for at most the pipeline's in-flight window.
+
+        Without a pipeline, yield each commit as soon as it is parsed, and
+        let _translate_commit() extract each blob the first time it needs
+        it, same as always.
+        """
+        if not self._blob_pipeline:
+            for gfe_commit in self._gfe.parse_next_command():
+                yield gfe_commit
+            return
+        held     = deque()  # (gfe_commit, blob count to store before it)
+        blob_ct  = 0
+        for br in self._blob_pipeline.run(self._gfe_blob_sha1_iter(held)):
+            self._store_blob_result(br)
+            blob_ct += 1
+            while held and held[0][1] <= blob_ct:
+                yield held.popleft()[0]
+        self._close_blob_pipeline()
+        LOG.debug("_gfe_commit_iter() pipeline blob_ct={:,} byte_ct={:,}"
+                  .format(blob_ct, self._byte_ct))
+        while held:
+            yield held.popleft()[0]
+
+    def _gfe_blob_sha1_iter(self, held):
+        """Generator: parse our git-fast-export script, yield each file
+        blob sha1 it references, once each, in the order that
+        _translate_commits() would first encounter it. Append each parsed
+        commit to held, along with how many sha1s we have yielded so far,
+        for _gfe_commit_iter() to translate once they are stored.
+
+        Skips blobs already in our librarian store, and blobs whose
+        path lies outside the view of every branch that the commit is
+        assigned to: _translate_commits() never stores those.
+        """
+        seen = set()
+        sha1_ct = 0
+        branch_dict = self.ctx.branch_dict()
+        for gfe_commit in self._gfe.parse_next_command():
+            branch_list = [branch_dict[ot.branch_id] for ot in
+                           self._othistory.sha1_to_otl(gfe_commit["sha1"])]
+            for gfe_file in gfe_commit["files"]:
+                sha1 = gfe_file.get("sha1")
+                if (   not sha1
+                    or gfe_file.get("mode") == FileModeStr.COMMIT
+                    or sha1 in seen):
+                    continue
+                if not any(self._gwt_to_depot_path( gwt_path = gfe_file["path"]
+                                                  , branch   = b )
+                           for b in branch_list):
+                    continue
+                seen.add(sha1)
+                if self._lbr_store.get(sha1):
+                    continue
+                sha1_ct += 1
+                yield sha1
+            held.append((gfe_commit, sha1_ct))
+
+    def _store_blob_result(self, br):
+        """Write one pipeline BlobResult to the bat_gfunzip and librarian.
+
+        Skip it if _translate_commit() already stored that blob, such as
+        the empty placeholder blob, after we parsed ahead and sent it.
+        """
+        if self._lbr_store.get(br.sha1):
+            return
+        p4filetype = self._lbr_filetype_storage \
+                   + self._p4filetype_str_to_bits(br.p4filetype_str)
+        self._bat_gfunzip.write_blob_rev_1_deflated(
+                             sha1          = br.sha1
+                           , md5           = br.md5
+                           , byte_ct       = br.byte_ct
+                           , crc           = br.crc
+                           , deflated      = br.deflated
+                           , lbr_file_type = p4filetype )
+        self._lbr_store.store(
+                             sha1          = br.sha1
+                           , md5           = br.md5
+                           , byte_ct       = br.byte_ct
+                           , lbr_file_type = p4filetype )
+        self._byte_ct += br.byte_ct
+
+    def _close_blob_reader(self):
+        """Stop our blob reader, if running."""
+        if self._blob_reader:
+            LOG.debug("_close_blob_reader() {}".format(self._blob_reader))
+            self._blob_reader.close()
+            self._blob_reader = None
+
     def _open_bat_gfunzip(self):
         """Create a new object to receive blobs and trees as
         we encounter them later when we translate commits.
@@ -1135,7 +1311,7 @@ class FastPush:
         self._eta = p4gf_eta.ETA(total_ct = changelist_ct)
         with ProgressReporter.Determinate(changelist_ct):
             LOG.debug("Total changelists: {:,d}".format(changelist_ct))
-            for gfe_commit in self._gfe.parse_next_command():
+            for gfe_commit in self._gfe_commit_iter():
                 self._translate_commit(gfe_commit)
 
                             # Debugging: early termination for huge repos.
@@ -1881,7 +2057,9 @@ class FastPush:
         entries, and Perforce probably won't appreciate a zip archive with
         multiple rev#1 of the same file.
         """
-        raw_bytes  = p4gf_git.get_blob(sha1, self.ctx.repo)
+                        # A memoryview, possibly into a buffer that the
+                        # reader reuses for its next blob. Do not keep it.
+        raw_bytes  = self._blob_reader.get(sha1)
         self._byte_ct += len(raw_bytes)
         return self._create_blob_librarian_file_bytes(
                           sha1         = sha1
@@ -1894,6 +2072,8 @@ class FastPush:
 
         Implementation for _create_blob_librarian_file() when you already
         have the bytes (such as for the empty placeholder blob)
+
+        :param raw_bytes: bytes or memoryview. Not retained.
         """
 
         md5_strr   = hashlib.md5(raw_bytes).hexdigest().upper()
@@ -1997,7 +2177,8 @@ class FastPush:
         sources under //.git-fusion/objects/...
         """
         r = self._lbr_filetype_storage
-        detected = self._detect_p4filetype(raw_bytes)
+        detected = self._p4filetype_str_to_bits(
+                        p4gf_p4filetype.detect(raw_bytes))
         # VERY noisy, fills debug log with entire content of every file rev.
         # Use only when debugging a specific, small, problem.
         #LOG.getChild("p4filetype").debug3("_calc_lbr_p4filetype() {:08x} {}"
@@ -2005,9 +2186,10 @@ class FastPush:
         return r + detected
 
     @staticmethod
-    def _detect_p4filetype(raw_bytes):
-        """What kind of file is this?"""
-        p4filetype_str = p4gf_p4filetype.detect(raw_bytes)
+    def _p4filetype_str_to_bits(p4filetype_str):
+        """Convert p4gf_p4filetype.detect()'s "text" or "binary" to
+        FileType bits.
+        """
         if p4filetype_str == "text":
             return p4gf_p4dbschema.FileType.TEXT
         else:
@@ -0,0 +1,196 @@
+#! /usr/bin/env python3.3
+"""Extract, hash, type-detect, and deflate Git blobs in parallel worker
+processes, for FastPush's bat_gfunzip archive.
+
+Without this, FastPush does all of that one blob at a time, on one core,
+as it encounters each blob while translating commits. That's fine for
+small pushes, but the first push of a 200,000-blob repo spends most of
+its pre-receive time in md5 and zlib.
+
+Workers do everything that depends only on blob content:
+    git-cat-file (one p4gf_git_blob_reader per worker)
+    md5
+    p4gf_p4filetype.detect()
+    crc32 + raw deflate, exactly as zipfile would have deflated it
+
+The caller's process remains the only writer: it receives BlobResult
+instances in the same order as the sha1 list it submitted, and appends
+each pre-deflated entry to the zip archive with no further compression.
+Same input, same archive, no matter how many workers.
+
+Expected call sequence:
+
+    pipeline = BlobPipeline(git_dir, how, worker_ct)
+    pipeline.start()    # early, while our process is still small
+    ... build Assigner, stores, fast-export ...
+    for blob_result in pipeline.run(sha1_iter):
+        ... write blob_result to zip, librarian ...
+    pipeline.close()    # also on error
+"""
+from   collections import deque
+import hashlib
+import logging
+import multiprocessing
+import zlib
+
+import pygit2
+
+import p4gf_git_blob_reader
+import p4gf_log
+import p4gf_p4filetype
+
+LOG = logging.getLogger("p4gf_fast_push.blob_pipeline")
+
+                        # How many sha1s to send to a worker in a single
+                        # task. Big enough to amortize pickle/queue
+                        # overhead, small enough to keep all workers busy
+                        # near the end of the list.
+_CHUNK_SHA1_CT = 64
+
+                        # How many chunks per worker may be in flight
+                        # (submitted, or finished but not yet written)
+                        # at any one time. Bounds memory when the writer
+                        # falls behind the workers.
+_CHUNKS_IN_FLIGHT_PER_WORKER = 4
+
+                        # Raw deflate, no zlib header, same parameters
+                        # as zipfile.ZIP_DEFLATED uses.
+_ZIP_DEFLATE_WBITS = -15
+
+                        # One BlobReader per worker process, opened by
+                        # _worker_init().
+_worker_reader = None
+
+
+class BlobResult:
+    """Everything the writer needs to store one blob."""
+    __slots__ = [ "sha1"
+                , "md5"
+                , "byte_ct"
+                , "p4filetype_str"
+                , "crc"
+                , "deflated"
+                ]
+
+    def __init__(self, *, sha1, md5, byte_ct, p4filetype_str, crc, deflated):
+        self.sha1           = sha1
+        self.md5            = md5       # uppercase hex str
+        self.byte_ct        = byte_ct   # uncompressed
+        self.p4filetype_str = p4filetype_str  # "text" or "binary"
+        self.crc            = crc       # crc32 of uncompressed content
+        self.deflated       = deflated  # raw deflate bytes
+
+
+def process_blob(sha1, raw_bytes):
+    """Hash, type-detect, and deflate one blob's content.
+
+    Same results whether called from a worker or the writer's process.
+    """
+    co       = zlib.compressobj( zlib.Z_DEFAULT_COMPRESSION
+                               , zlib.DEFLATED
+                               , _ZIP_DEFLATE_WBITS )
+    deflated = co.compress(raw_bytes) + co.flush()
+    return BlobResult(
+              sha1           = sha1
+            , md5            = hashlib.md5(raw_bytes).hexdigest().upper()
+            , byte_ct        = len(raw_bytes)
+            , p4filetype_str = p4gf_p4filetype.detect(raw_bytes)
+            , crc            = zlib.crc32(raw_bytes) & 0xffffffff
+            , deflated       = deflated )
+
+
+def _worker_init(git_dir, how):
+    """multiprocessing.Pool initializer: open this worker's BlobReader."""
+    p4gf_log.reset()
+    global _worker_reader
+    _worker_reader = p4gf_git_blob_reader.create_blob_reader(
+                              pygit2.Repository(git_dir), how)
+
+
+def _worker_process_chunk(sha1_list):
+    """multiprocessing.Pool task: process a chunk of blobs.
+
+    Return a list of BlobResult, same order as sha1_list.
+    """
+    return [process_blob(sha1, _worker_reader.get(sha1))
+            for sha1 in sha1_list]
+
+
+class BlobPipeline:
+    """Bounded, order-preserving fan-out of blob sha1s to a pool of
+    worker processes.
+    """
+    def __init__(self, git_dir, how, worker_ct):
+        self.git_dir   = git_dir
+        self.how       = how
+        self.worker_ct = max(1, worker_ct)
+        self._pool     = None
+
+    def start(self):
+        """Fork our worker processes.
+
+        Call this before the caller's process grows: each worker is a
+        fork of the caller, and copy-on-write only helps until the
+        caller starts writing to all that memory.
+        """
+        if self._pool:
+            return
+        LOG.debug("start() worker_ct={} how={}".format(self.worker_ct, self.how))
+        self._pool = multiprocessing.Pool( processes   = self.worker_ct
+                                         , initializer = _worker_init
+                                         , initargs    = (self.git_dir, self.how) )
+
+    def close(self, terminate=False):
+        """Stop our worker processes, if running."""
+        if not self._pool:
+            return
+        if terminate:
+            self._pool.terminate()
+        else:
+            self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def run(self, sha1_iter):
+        """Generator: yield one BlobResult per sha1, in sha1_iter order.
+
+        Starts the pool if start() has not. Closes the pool when exhausted
+        or abandoned.
+        """
+        self.start()
+        pool          = self._pool
+        max_in_flight = self.worker_ct * _CHUNKS_IN_FLIGHT_PER_WORKER
+        in_flight     = deque()
+        chunk_iter    = _chunks(sha1_iter, _CHUNK_SHA1_CT)
+        blob_ct       = 0
+        try:
+            for chunk in chunk_iter:
+                in_flight.append(pool.apply_async( _worker_process_chunk
+                                                 , (chunk,) ))
+                if len(in_flight) < max_in_flight:
+                    continue
+                for blob_result in in_flight.popleft().get():
+                    blob_ct += 1
+                    yield blob_result
+            while in_flight:
+                for blob_result in in_flight.popleft().get():
+                    blob_ct += 1
+                    yield blob_result
+        except BaseException:
+                        # Includes GeneratorExit if our caller abandons us.
+            self.close(terminate=True)
+            raise
+        self.close()
+        LOG.debug("run() done blob_ct={:,}".format(blob_ct))
+
+
+def _chunks(iterable, chunk_len):
+    """Generator: yield lists of up to chunk_len elements."""
+    chunk = []
+    for x in iterable:
+        chunk.append(x)
+        if chunk_len <= len(chunk):
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
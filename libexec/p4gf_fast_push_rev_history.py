@@ -1,10 +1,20 @@
 #! /usr/bin/env python3.3
-"""Code to recall every revision of every file we've created."""
+"""Code to recall every revision of every file we've created.
+
+Run this module as a script to time each fast-push-working-storage choice
+for one large push.
+"""
+import argparse
 import bisect
 import logging
+import os
+import tempfile
+import time
 
 import p4gf_config
+from   p4gf_hex_str                 import md5_str
 from   p4gf_l10n                    import _
+from   p4gf_p4dbschema              import DbRev
 import p4gf_squee_value
 
 LOG = logging.getLogger("p4gf_fast_push.rev_history")
@@ -102,6 +112,171 @@ class RevHistoryStore:
 
 # ----------------------------------------------------------------------------
 
+class RevHistoryTable:
+    """RevHistoryStore's interface, stored in typed SQLite columns.
+
+    head: one row per depot file: its most recent DbRev, how many
+          revisions it has, and whether the most recent one deleted it.
+    rev:  one row per revision: its changelist number, and whether it
+          re-added the file after a delete.
+
+    RevHistoryStore's SQLite modes pickle a whole RevHistory, every
+    revision so far plus the head DbRev, and write it back for every new
+    revision. Here each new revision writes one small rev row and replaces
+    one head row, batched through SqueeTable's write-behind buffer.
+    """
+    def __init__(self, ctx, file_path):
+        self.file_path = file_path
+        self.ctx       = ctx
+        db = p4gf_squee_value.squee_connect(file_path)
+        self._head = p4gf_squee_value.SqueeTable(db, "head", _HEAD_COLUMNS)
+        self._rev  = p4gf_squee_value.SqueeTable(db, "rev", _REV_COLUMNS
+                                                , key_ct = 2)
+        self._is_contextdata_written = set()
+
+    def _head_row(self, depot_path_key):
+        """Return a depot file's head row, or None."""
+        return self._head.get((depot_path_key,))
+
+    def head_db_rev(self, depot_path):
+        """Return the DbRev record most recently record_head()ed for this
+        depot_path.
+        """
+        row = self._head_row(self.ctx.path_to_key(depot_path))
+        if row:
+            return DbRev(**dict(zip(_DB_REV_FIELDS, row[_DB_REV_COL:])))
+        return None
+
+    def record_head(self, db_rev, is_delete):
+        """Record a new head revision."""
+        depot_path_key = self.ctx.path_to_key(db_rev.depot_path)
+        row = self._head_row(depot_path_key)
+        rev_ct          = row[_REV_CT_COL]     if row else 0
+        deleted_at_head = row[_IS_DELETED_COL] if row else False
+        if is_delete and (not rev_ct or deleted_at_head):
+            LOG.warning("RevHistoryTable.record_head()"
+                        " attempt to delete a depot file that"
+                        " does not exist, undeleted at head: {}"
+                        .format(db_rev.depot_path))
+
+                        # Record "add" revisions so that they can
+                        # act as #startRev integ sources later.
+        rev_num = rev_ct + 1
+        is_add  = deleted_at_head and not is_delete and 1 < rev_num
+        self._rev.put(( depot_path_key
+                      , rev_num
+                      , int(db_rev.change_num)
+                      , int(is_add) ))
+        self._head.put(( depot_path_key
+                       , rev_num
+                       , int(is_delete)
+                       , db_rev.depot_path
+                       , db_rev.depot_rev
+                       , db_rev.depot_file_type_bits
+                       , db_rev.file_action_bits
+                       , db_rev.change_num
+                       , db_rev.date_p4d_secs
+                       , md5_str(db_rev.md5)
+                       , db_rev.uncompressed_byte_ct
+                       , db_rev.lbr_is_lazy
+                       , db_rev.lbr_path
+                       , db_rev.lbr_rev
+                       , db_rev.lbr_file_type_bits ))
+        self._is_contextdata_written.add(depot_path_key)
+
+    def next_rev_num(self, depot_path):
+        """Return the integer rev number to use for the next
+        file action on depot_path.
+        """
+        row = self._head_row(self.ctx.path_to_key(depot_path))
+        if row:
+            return 1 + row[_DEPOT_REV_COL]
+        return 1
+
+    def is_contextdata_written(self, depot_path):
+        """Have we already written this depot path to the current
+        commit_gfunzip's contextdata.jnl?
+        """
+        depot_path_key = self.ctx.path_to_key(depot_path)
+        return depot_path_key in self._is_contextdata_written
+
+    def clear_all_contextdata_written(self):
+        """Clear is_contextdata_written() for all depot paths.
+
+        Call this when you open a new commit_gfunzip.
+        """
+        self._is_contextdata_written = set()
+
+    def exists_at_head(self, depot_path):
+        """Does this depot file current exist, undeleted, at head?"""
+        row = self._head_row(self.ctx.path_to_key(depot_path))
+        return bool(row) and not row[_IS_DELETED_COL]
+
+    def src_range(self, depot_path, change_num):
+        """Return a (#startRev,endRev) integer pair to use as an integ
+        source for 'p4 integ -f src@change_num.
+
+        Return (None, None) if no revision at that change_num.
+
+        Assumes changelist numbers increase with revision number, as
+        RevHistory does.
+        """
+        depot_path_key = self.ctx.path_to_key(depot_path)
+        change_num     = int(change_num)
+        buffered       = self._rev.buffered(depot_path_key)
+                        # Highest #rev number at or before @change_num.
+        end_rev = self._rev.query(
+                      "SELECT MAX(rev) FROM rev WHERE key=? AND change_num<=?"
+                    , (depot_path_key, change_num)).fetchone()[0]
+        end_rev = max([end_rev or 0] + [ r[_REV_REV_COL] for r in buffered
+                                         if r[_REV_CHANGE_COL] <= change_num ])
+        if not end_rev:
+            return (None, None)
+                        # Highest #rev number at or before #end_rev
+                        # that 'p4 add'ed this file.
+        start_rev = self._rev.query(
+                      "SELECT MAX(rev) FROM rev WHERE key=? AND is_add=1"
+                      " AND rev<=?"
+                    , (depot_path_key, end_rev)).fetchone()[0]
+        start_rev = max([start_rev or 1] + [ r[_REV_REV_COL] for r in buffered
+                                             if r[_REV_IS_ADD_COL]
+                                             and r[_REV_REV_COL] <= end_rev ])
+        return (start_rev, end_rev)
+
+_REV_COLUMNS  = [ "key                  TEXT"
+                , "rev                  INTEGER"
+                , "change_num           INTEGER"
+                , "is_add               INTEGER" ]
+_REV_REV_COL    = 1
+_REV_CHANGE_COL = 2
+_REV_IS_ADD_COL = 3
+
+_HEAD_COLUMNS = [ "key                  TEXT"
+                , "rev_ct               INTEGER"
+                , "is_deleted           INTEGER"
+                        # DbRev fields, in DbRev.__init__() order.
+                , "depot_path           TEXT"
+                , "depot_rev            INTEGER"
+                , "depot_file_type_bits INTEGER"
+                , "file_action_bits     INTEGER"
+                , "change_num           INTEGER"
+                , "date_p4d_secs        INTEGER"
+                , "md5                  TEXT"
+                , "uncompressed_byte_ct INTEGER"
+                , "lbr_is_lazy          INTEGER"
+                , "lbr_path             TEXT"
+                , "lbr_rev              TEXT"
+                , "lbr_file_type_bits   INTEGER" ]
+_REV_CT_COL     = 1
+_IS_DELETED_COL = 2
+_DB_REV_COL     = 3
+_DEPOT_REV_COL  = 4
+_DB_REV_FIELDS  = [c.split()[0] for c in _HEAD_COLUMNS[_DB_REV_COL:]]
+
+# end class RevHistoryTable
+
+# ----------------------------------------------------------------------------
+
 class RevHistory:
     """Every revision of a single depot file.
 
@@ -216,3 +391,83 @@ def _index_le(lisst, val):
     if i:
         return i - 1
     return -1
+
+# -- benchmark ---------------------------------------------------------------
+
+class _BenchCtx:
+    """Just enough of a Context for our stores: a case-sensitive server."""
+    @staticmethod
+    def path_to_key(path):
+        """Case-sensitive: the path is its own key."""
+        return path
+
+
+def _bench_one(store, rev_ct, file_ct):
+    """Push rev_ct revisions across file_ct depot files, the way fast_push
+    does: look up each file's head, record a new one, and now and then ask
+    for an integ source range. Return seconds.
+    """
+    start = time.time()
+    for i in range(rev_ct):
+        change_num = 1 + i // 100
+        depot_path = "//depot/bench/dir{}/file{}".format( (i % file_ct) // 1000
+                                                          , i % file_ct )
+        p4_exists = store.exists_at_head(depot_path)
+        prev      = store.head_db_rev(depot_path)
+        rev_num   = store.next_rev_num(depot_path)
+        is_delete = p4_exists and i % 97 == 0
+        store.record_head(DbRev( depot_path           = depot_path
+                               , depot_rev            = rev_num
+                               , depot_file_type_bits = 0
+                               , file_action_bits     = 2 if is_delete
+                                                        else 1 if prev else 0
+                               , change_num           = change_num
+                               , date_p4d_secs        = 1400000000 + i
+                               , md5                  = "{:032X}".format(i)
+                               , uncompressed_byte_ct = i
+                               , lbr_is_lazy          = 1
+                               , lbr_path             = depot_path
+                               , lbr_rev              = "1.1"
+                               , lbr_file_type_bits   = 0 )
+                         , is_delete )
+        if i % 10 == 0:
+            store.src_range(depot_path, change_num)
+    return time.time() - start
+
+
+def main():
+    """Time each working storage for one large fast push."""
+    parser = argparse.ArgumentParser(
+            description=_("Time fast_push working storage choices."))
+    parser.add_argument('--revs', type=int, default=1000000,
+                        help=_('revisions to record'))
+    parser.add_argument('--files', type=int, default=200000,
+                        help=_('distinct depot files'))
+    parser.add_argument('--how', nargs='*',
+                        default=[ p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MEMORY
+                                , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_MULTIPLE_TABLES
+                                , p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED ],
+                        help=_('working storage values to time'))
+    args = parser.parse_args()
+
+    ctx = _BenchCtx()
+    for how in args.how:
+        with tempfile.TemporaryDirectory() as d:
+            file_path = os.path.join(d, "RevHistoryStore.db")
+            if how == p4gf_config.VALUE_FAST_PUSH_WORKING_STORAGE_SQLITE_TYPED:
+                store = RevHistoryTable(ctx, file_path)
+            else:
+                store = RevHistoryStore(ctx, file_path, how)
+            secs = _bench_one(store, args.revs, args.files)
+            db_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        print("{how:<12} {revs:>10,} revs {secs:8.2f}s {rate:>10,} revs/second"
+              " {mb:8.1f}MB db"
+              .format( how  = how
+                     , revs = args.revs
+                     , secs = secs
+                     , rate = int(args.revs / secs) if secs else 0
+                     , mb   = db_size / (1024 * 1024) ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,54 @@
 #! /usr/bin/env python3.3
-"""Clone into an empty repo from the mirror in Perforce."""
+"""Clone into an empty repo from the mirror in Perforce.
+
+Copy the repo's commit objects from Perforce, then only the trees that
+those commits reach: start at each commit's root tree and follow subtree
+entries, printing trees from Perforce a chunk at a time. Each printed tree
+goes straight into one pack file, and 'git index-pack --strict' checks
+every tree's content and that every blob and subtree it names exists.
+
+We used to sync every tree from every repo into loose objects, then run
+'git fsck' over the whole object store to check the result.
+"""
+import binascii
 import glob
+import hashlib
 import logging
 import os
 import re
+import struct
+import zlib
+
+import P4
+from   P4 import OutputHandler
 
-import p4gf_git
+import p4gf_const
+import p4gf_file_action
+from   p4gf_l10n import NTR
 import p4gf_object_type
 import p4gf_path
+from   p4gf_p4file import string_from_print
 import p4gf_proc
 import p4gf_util
 
-
 LOG = logging.getLogger(__name__)
 
-MAX_TREES_PER_COMMIT = 2
+                        # How many trees to pass to one 'p4 print'.
+PRINT_CHUNK_CT = 500
+
+                        # Git pack object type for trees.
+                        # See git/Documentation/technical/pack-format.txt
+_OBJ_TREE = 2
+
+_MODE_TREE = b'40000'
 
 
 def fast_reclone(ctx):
-    """Try to do fast reclone from mirror."""
+    """Try to do fast reclone from mirror.
+
+    Return (branch_heads, object paths) if every copied object checks out,
+    else (None, None) with nothing left behind.
+    """
     # don't try this on a non-empty GF repo
     if not ctx.repo.is_empty:
         LOG.debug("fast_reclone: repo not empty")
@@ -31,29 +61,22 @@ def fast_reclone(ctx):
         LOG.debug('fast_reclone: failed to write empty tree: {}'.format(result))
         return None, None
 
-    # copy commits and trees into the repo
-    branch_heads, commits, dirs = _get_commits(ctx)
-    trees = _get_trees(ctx, dirs)
-
-    return branch_heads, commits + trees
-
-
-BROKEN_REGEX = re.compile("^(broken link from |missing blob)")
-
-
-def check_fast_reclone(objects):
-    """Run git fsck to see if reclone worked.  If not, remove copied objects.
-
-    Return True if clone is ok, else False.
-    """
-    # make sure the result is complete and correct
-    # if not, clean up the mess we created and bail
-    check = p4gf_git.git_fsck()
-    if any(BROKEN_REGEX.match(item) for item in check['out'].split('\n')):
-        for path in objects:
-            os.unlink(path)
-        return False
-    return True
+    # copy commits and the trees they reach into the repo
+    branch_heads, commits = _get_commits(ctx)
+    objects = list(commits.values())
+    ok = False
+    try:
+        tree_sha1s, parent_sha1s = _read_commits(commits)
+        pack = _get_trees(ctx, tree_sha1s)
+        if pack is not None:
+            objects.extend(pack)
+            ok = _parents_present(set(parent_sha1s) - set(commits))
+    finally:
+        if not ok:
+            _remove(objects)
+    if not ok:
+        return None, None
+    return branch_heads, objects
 
 
 COMMIT_REGEX = re.compile("/(?P<slashed_sha1>[^-]+)"
@@ -62,7 +85,10 @@ COMMIT_REGEX = re.compile("/(?P<slashed_sha1>[^-]+)"
 
 
 def _get_commits(ctx):
-    """Copy commit objects for repo from depot."""
+    """Copy commit objects for repo from depot.
+
+    Return (branch_heads, dict of sha1 ==> loose object path).
+    """
     # sync the commit objects for the repo
     commit_path = p4gf_object_type.commit_depot_path('*', '*', ctx.config.repo_name, '*')
     ctx.p4run('sync', '-p', commit_path)
@@ -72,7 +98,7 @@ def _get_commits(ctx):
                                 'objects', 'repos', ctx.config.repo_name, 'commits')
     glob_path = os.path.join(commits_root, '*', '*', '*')
     branch_heads = {}
-    commits = set()
+    commits = {}
     dirs = set()
     for path in glob.iglob(glob_path):
         # make sure the path is one of our commit objects
@@ -97,29 +123,220 @@ def _get_commits(ctx):
             p4gf_util.ensure_parent_dir(git_path)
             dirs.add(parent_dir)
         os.rename(path, git_path)
-        commits.add(git_path)
-    return branch_heads, list(commits), dirs
-
-
-def _get_trees(ctx, dirs):
-    """Copy all trees (for all repos) from depot."""
-    # sync all tree objects (not just for this repo)
-    tree_path = p4gf_path.tree_p4_path('*')
-    ctx.p4run('sync', '-p', tree_path)
-    # copy each tree into the repo, keeping track of all copied trees for
-    # possible later undo
-    trees_root = os.path.join(ctx.repo_dirs.p4root, 'objects', 'trees')
-    glob_path = os.path.join(trees_root, '*', '*', '*')
-    LOG.debug('glob_path: {}'.format(glob_path))
+        commits[sha1] = git_path
+    return branch_heads, commits
+
+
+def _read_commits(commits):
+    """Return (root tree sha1s, parent commit sha1s) of the loose commits."""
     trees = set()
-    for path in glob.iglob(glob_path):
-        sha1 = path[len(trees_root):].replace('/', '')
-        git_path = os.path.join(ctx.repo_dirs.GIT_DIR, p4gf_util.sha1_to_git_objects_path(sha1))
-        # path including only first two digits of sha1
-        parent_dir = git_path[:-39]
-        if parent_dir not in dirs:
-            p4gf_util.ensure_parent_dir(git_path)
-            dirs.add(parent_dir)
-        os.rename(path, git_path)
-        trees.add(git_path)
-    return list(trees)
+    parents = set()
+    for path in commits.values():
+        with open(path, 'rb') as f:
+            raw = zlib.decompress(f.read())
+        body = raw[raw.index(b'\0') + 1:]
+        for line in body.split(b'\n'):
+            if not line:
+                break           # end of header, start of message
+            if line.startswith(b'tree '):
+                trees.add(line[5:].decode())
+            elif line.startswith(b'parent '):
+                parents.add(line[7:].decode())
+    trees.discard(p4gf_const.EMPTY_TREE_SHA1)
+    return trees, parents
+
+
+def _get_trees(ctx, root_sha1s):
+    """Copy every tree reachable from root_sha1s into one new pack.
+
+    Return the new .pack and .idx paths, or None if Perforce lacks any
+    tree, or if git rejects the pack.
+    """
+    if not root_sha1s:
+        return []
+    pack_dir = os.path.join(ctx.repo_dirs.GIT_DIR, 'objects', 'pack')
+    tmp_path = os.path.join(pack_dir, NTR('tmp-fast-reclone.pack'))
+    if not os.path.isdir(pack_dir):
+        os.makedirs(pack_dir)
+    seen = set(root_sha1s)
+    todo = list(seen)
+    writer = _PackWriter(tmp_path)
+    try:
+        while todo:
+            chunk = todo[-PRINT_CHUNK_CT:]
+            del todo[-PRINT_CHUNK_CT:]
+            printed = _print_trees(ctx.p4gf, chunk)
+            missing = [sha1 for sha1 in chunk if sha1 not in printed]
+            if missing:
+                LOG.debug('fast_reclone: {} trees missing from Perforce, such as {}'
+                          .format(len(missing), missing[0]))
+                return None
+            for content in printed.values():
+                writer.add(_OBJ_TREE, content)
+                for subtree in _subtree_sha1s(content):
+                    if subtree not in seen:
+                        seen.add(subtree)
+                        todo.append(subtree)
+        writer.close()
+        LOG.debug('fast_reclone: packed {} trees'.format(writer.obj_ct))
+
+        # index-pack --strict checks each tree, and that every object
+        # it names is either in this pack or already in the repo.
+        result = p4gf_proc.popen_no_throw(['git', 'index-pack', '--strict', tmp_path])
+        if result['ec']:
+            LOG.debug('fast_reclone: index-pack rejected trees: {}'.format(result))
+            return None
+        pack_sha1 = result['out'].strip()
+        base = os.path.join(pack_dir, NTR('pack-{}').format(pack_sha1))
+        os.rename(tmp_path[:-len('.pack')] + '.idx', base + '.idx')
+        os.rename(tmp_path, base + '.pack')
+        return [base + '.pack', base + '.idx']
+    finally:
+        writer.close()
+        _remove([tmp_path, tmp_path[:-len('.pack')] + '.idx'])
+
+
+def _print_trees(p4, sha1_list):
+    """Print trees from Perforce.
+
+    Return a dict of sha1 ==> uncompressed tree content, for each tree
+    that Perforce has and whose content matches its sha1.
+    """
+    path_to_sha1 = {p4gf_path.tree_p4_path(sha1): sha1 for sha1 in sha1_list}
+    handler = _TreePrintHandler(path_to_sha1)
+    with p4gf_util.raw_encoding(p4) \
+        , p4.using_handler(handler) \
+        , p4.at_exception_level(P4.P4.RAISE_ERROR):
+        p4.run('print', list(path_to_sha1.keys()))
+
+    result = {}
+    for sha1, chunks in handler.sha1_to_chunks.items():
+        raw = zlib.decompress(b''.join(chunks))
+        if hashlib.sha1(raw).hexdigest() != sha1 or not raw.startswith(b'tree '):
+            LOG.warning('fast_reclone: tree {} is corrupt in Perforce'.format(sha1))
+            continue
+        result[sha1] = raw[raw.index(b'\0') + 1:]
+    return result
+
+
+class _TreePrintHandler(OutputHandler):
+
+    """OutputHandler for 'p4 print' of tree objects: collect each tree's
+    compressed content, keyed by tree sha1.
+    """
+
+    def __init__(self, path_to_sha1):
+        OutputHandler.__init__(self)
+        self.path_to_sha1   = path_to_sha1
+        self.sha1_to_chunks = {}
+        self.chunks         = None
+
+    def outputStat(self, h):
+        """Start collecting content for the next tree."""
+        self.chunks = None
+        try:
+            if string_from_print(h['action']) not in p4gf_file_action.DELETE_ACTIONS:
+                sha1 = self.path_to_sha1.get(string_from_print(h['depotFile']))
+                if sha1:
+                    self.chunks = self.sha1_to_chunks.setdefault(sha1, [])
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("outputStat")
+        return OutputHandler.HANDLED
+
+    def outputText(self, h):
+        """Content of a file that Perforce considers text."""
+        return self.outputBinary(h)
+
+    def outputBinary(self, h):
+        """Save one chunk of the current tree's content."""
+        if self.chunks is not None:
+            if isinstance(h, str):
+                h = h.encode('utf-8')
+            self.chunks.append(h)
+        return OutputHandler.HANDLED
+
+
+def _subtree_sha1s(content):
+    """Return the sha1 of each subtree entry in a tree's content.
+
+    Each entry is "<mode> <name>\\0<20-byte sha1>". Skip blobs and
+    submodule commits: index-pack checks the blobs, and Git Fusion does
+    not store submodules' commits.
+    """
+    result = []
+    i = 0
+    end = len(content)
+    while i < end:
+        sp = content.index(b' ', i)
+        nul = content.index(b'\0', sp)
+        if content[i:sp] == _MODE_TREE:
+            result.append(binascii.hexlify(content[nul + 1:nul + 21]).decode())
+        i = nul + 21
+    return result
+
+
+class _PackWriter:
+
+    """Write objects to a version 2 pack file, without deltas.
+
+    The header's object count is not known until the end, so close()
+    patches it, then appends the trailing sha1 over everything before it.
+    """
+
+    def __init__(self, path):
+        self.obj_ct = 0
+        self._file = open(path, 'w+b')
+        self._file.write(b'PACK' + struct.pack('>II', 2, 0))
+
+    def add(self, obj_type, content):
+        """Append one object."""
+        size = len(content)
+        header = [(obj_type << 4) | (size & 0x0f)]
+        size >>= 4
+        while size:
+            header[-1] |= 0x80
+            header.append(size & 0x7f)
+            size >>= 7
+        self._file.write(bytes(header))
+        self._file.write(zlib.compress(content))
+        self.obj_ct += 1
+
+    def close(self):
+        """Patch the object count, append the trailer, close. Idempotent."""
+        if not self._file:
+            return
+        f = self._file
+        self._file = None
+        f.seek(8)
+        f.write(struct.pack('>I', self.obj_ct))
+        f.seek(0)
+        sha1 = hashlib.sha1()
+        while True:
+            buf = f.read(1024 * 1024)
+            if not buf:
+                break
+            sha1.update(buf)
+        f.write(sha1.digest())
+        f.close()
+
+
+def _parents_present(sha1s):
+    """Are all of these commits, parents of our commits, already in the repo?"""
+    if not sha1s:
+        return True
+    result = p4gf_proc.popen_no_throw(['git', 'cat-file', '--batch-check'],
+                                      stdin=('\n'.join(sha1s) + '\n').encode())
+    missing = [line for line in result['out'].splitlines()
+               if line.endswith(' missing')]
+    if result['ec'] or missing:
+        LOG.debug('fast_reclone: {} parent commits missing, such as {}'
+                  .format(len(missing), missing[:1]))
+        return False
+    return True
+
+
+def _remove(paths):
+    """Unlink each path that exists."""
+    for path in paths:
+        if os.path.exists(path):
+            os.unlink(path)
@@ -7,10 +7,13 @@ import logging
 import os
 import re
 from   subprocess import CalledProcessError
+import threading
+import time
 
 import pytz
 
 from   p4gf_branch    import Branch
+import p4gf_config
 import p4gf_const
 from   p4gf_desc_info import DescInfo
 import p4gf_p4key     as     P4Key
@@ -32,6 +35,13 @@ RUN          = NTR('Run')
 SCRIPT_LINES = NTR('Script length')
 SCRIPT_BYTES = NTR('Script size')
 
+                        # Streaming mode: how many commits between each
+                        # 'progress' line that git-fast-import echoes back
+                        # for our log. Never 'checkpoint': that would
+                        # update refs partway through, and a P2G failure
+                        # after it would leave them on partial history.
+_PROGRESS_COMMIT_CT = 5000
+
 
 def _log_crash_report(errmsg):
     """Capture the fast-import crash report to a separate log file.
@@ -83,11 +93,28 @@ class FastImport:
        by steps 1-4.
     3) 'git checkout' or 'git branch -f' to put HEAD and branch refs where
        you want them.
+
+    Two modes, chosen by [perforce-to-git] fast-import-streaming:
+
+    streaming   (default) Launch git-fast-import at the first add_commit()
+                and pipe each command to it as we produce it. Git writes
+                objects while we're still producing commits, and the
+                script never lands on disk. run_fast_import() just
+                finishes the stream and waits.
+
+    temp file   Accumulate the entire script in a temp file, then run
+                git-fast-import on it in run_fast_import().
     """
 
     def __init__(self, ctx):
         self.ctx = ctx
-        self.script = p4gf_tempfile.new_temp_file(prefix='fastimport-')
+        self.script = None
+        self._stream = None
+        if _is_streaming_enabled(ctx):
+            self._stream = FastImportStream()
+        else:
+            self.script = p4gf_tempfile.new_temp_file(prefix='fastimport-')
+        self._commit_ct = 0
         self.timezone = ctx.timezone
         self.__tzname = None
         self.project_root_path_length = len(ctx.contentlocalroot)
@@ -134,7 +161,10 @@ class FastImport:
         """Append data to script."""
         if type(data) == str:
             data = data.encode()
-        self.script.write(data)
+        if self._stream:
+            self._stream.write(data)
+        else:
+            self.script.write(data)
         self._byte_count += len(data)
         self._line_count += data.count(b'\n')
         if LOG_SCRIPT.isEnabledFor(logging.DEBUG):
@@ -481,6 +511,11 @@ class FastImport:
                 if desc_info and desc_info.gitlinks:
                     self.__add_gitlinks_m(desc_info.gitlinks)
 
+                self._commit_ct += 1
+                if self._stream and not self._commit_ct % _PROGRESS_COMMIT_CT:
+                    self.__append(NTR('progress {ct} commits\n')
+                                  .format(ct=self._commit_ct))
+
     def run_fast_import(self):
         """Run git-fast-import to create the git commits.
 
@@ -489,6 +524,8 @@ class FastImport:
 
         The returned list is also written to a file called marks.
         """
+        if self._stream:
+            return self._finish_stream()
         with Timer(OVERALL):
             with Timer(RUN):
                 LOG.debug("running git fast-import")
@@ -515,9 +552,38 @@ class FastImport:
                     self.script.close()
                     marks_file.close()
 
+    def _finish_stream(self):
+        """Streaming mode's run_fast_import(): tell git-fast-import that
+        we're done, wait for it to finish, return its marks.
+        """
+        with Timer(OVERALL):
+            with Timer(RUN):
+                LOG.debug("finishing git fast-import stream")
+                try:
+                    ec = self._stream.finish()
+                    if ec:
+                        _log_crash_report('git-fast-import failed for {}'.format(
+                            self.ctx.config.repo_name))
+                        raise CalledProcessError(ec, NTR('git fast-import'))
+                    marks = self._stream.read_marks()
+                    if LOG.getChild('marks').isEnabledFor(logging.DEBUG3):
+                        LOG.getChild('marks').debug3('git-fast-import returned marks ct={}\n'
+                                                     .format(len(marks))
+                                                     + '\n'.join(marks))
+                    return marks
+                finally:
+                    self._stream.close()
+
     def cleanup(self):
-        """Ensure temporary files are closed so they may be deleted."""
-        self.script.close()
+        """Ensure temporary files are closed so they may be deleted.
+
+        Streaming mode: abandon any unfinished git-fast-import. It never
+        saw our 'done' command, so it updates no refs.
+        """
+        if self._stream:
+            self._stream.close()
+        else:
+            self.script.close()
 
     def __repr__(self):
         return "\n".join([repr(self.ctx),
@@ -536,6 +602,100 @@ class FastImport:
                           ])
 
 
+class FastImportStream:
+
+    """A git-fast-import process that we feed one command at a time.
+
+    Launched on first write(). Runs with --done: if we close its stdin
+    without first writing 'done', such as when P2G fails partway through,
+    git-fast-import treats the stream as truncated and updates no refs.
+
+    git-fast-import writes 'progress' lines to stdout. A reader thread
+    logs those so that the pipe never fills and blocks git.
+
+    Launched through p4gf_proc.popen_stream(), so that a p4gf_proc runner
+    child forks git-fast-import, not our own, by then much larger, process.
+    """
+
+    def __init__(self):
+        self._stream        = None
+        self._marks_file    = None
+        self._reader        = None
+        self._start_time    = None
+
+    def _start(self):
+        """Launch git-fast-import."""
+        self._marks_file = p4gf_tempfile.new_temp_file(prefix='marks-')
+        self._stream = p4gf_proc.popen_stream(
+                [ 'git', 'fast-import', '--quiet', '--done'
+                , '--export-marks=' + self._marks_file.name ]
+                , feed = True )
+        self._start_time = time.time()
+        self._reader = threading.Thread( target = self._log_progress
+                                       , name   = NTR('fast-import-progress')
+                                       , daemon = True )
+        self._reader.start()
+        LOG.debug("FastImportStream started")
+
+    def _log_progress(self):
+        """Reader thread: log each 'progress' line until git exits."""
+        for line in self._stream.stdout:
+            LOG.debug("git-fast-import {:.1f}s: {}"
+                      .format( time.time() - self._start_time
+                             , line.decode().rstrip()))
+
+    def write(self, data):
+        """Send bytes to git-fast-import."""
+        if not self._stream:
+            self._start()
+        self._stream.stdin.write(data)
+
+    def finish(self):
+        """Write 'done', wait for git-fast-import to exit.
+        Return its exit code.
+        """
+        if not self._stream:
+            self._start()
+        self._stream.stdin.write(b'done\n')
+        self._stream.stdin.close()
+        self._reader.join()
+        ec = self._stream.wait()["ec"]
+        LOG.debug("FastImportStream exit={} after {:.1f}s"
+                  .format(ec, time.time() - self._start_time))
+        return ec
+
+    def read_marks(self):
+        """Return the marks that git-fast-import exported, as a list of
+        ":mark sha1" lines.
+        """
+        with open(self._marks_file.name, "r") as marksfile:
+            return [l.strip() for l in marksfile.readlines()]
+
+    def close(self):
+        """Stop any still-running git-fast-import, delete temp files."""
+        if self._stream:
+            if self._stream.stdin and not self._stream.stdin.closed:
+                LOG.debug("FastImportStream abandoning")
+            try:
+                self._stream.stdin.close()
+            except (IOError, OSError):
+                pass
+            self._reader.join()
+            self._stream.wait(expect_error=True)
+            self._stream = None
+        if self._marks_file:
+            self._marks_file.close()
+            self._marks_file = None
+
+
+def _is_streaming_enabled(ctx):
+    """Pipe our script to a running git-fast-import, or write to temp file?"""
+    return ctx.repo_config.getboolean(
+              p4gf_config.SECTION_PERFORCE_TO_GIT
+            , p4gf_config.KEY_FAST_IMPORT_STREAMING
+            , fallback = True )
+
+
 def _clean_timezone(tz):
     """Ensure timezone offset is legal for git-fast-import.
 
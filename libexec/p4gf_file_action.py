@@ -36,3 +36,10 @@ ALL =   [ ADD
         , MOVE_DELETE
         , PURGE
         ]
+
+# Actions that leave no file content at the head revision.
+DELETE_ACTIONS = { DELETE
+                 , MOVE_DELETE
+                 , PURGE
+                 , ARCHIVE
+                 }
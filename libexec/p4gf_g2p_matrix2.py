@@ -1485,17 +1485,6 @@ class G2PMatrix:
             src_branch = column.branch.copy_rerooted(None)
         return src_branch
 
-    def _store_gwt_path(self, result_list):
-        """Stuff a 'gwt_path' value into each element of result_list,
-        using the current branch view.
-
-        Do this under the same "with ctx.switched_to_branch():" context
-        that you ran the p4 command that produced result_list. Otherwise
-        the gwt_path calc will return incorrect results.
-        """
-        for r in result_list:
-            r['gwt_path'] = self._gwt_path(r)
-
     def _files_at(self, column):
         """@DEPRECATED use _fstat_at because it includes MD5 digest and fileSize.
 
@@ -1518,7 +1507,7 @@ class G2PMatrix:
                                              ctx        = self.ctx
                                            , branch     = src_branch
                                            , change_num = column.change_num )
-            self._store_gwt_path(result_list)
+                        # Cached results already carry 'gwt_path'.
             return result_list
 
     @staticmethod
@@ -1567,7 +1556,7 @@ class G2PMatrix:
                                           ctx        = self.ctx
                                         , branch     = src_branch
                                         , change_num = column.change_num)
-            self._store_gwt_path(result_list)
+                        # Cached results already carry 'gwt_path'.
             # Maud'dib no longer needs the weirding module.
             # self._make_fstat_look_like_files(result_list)
             return result_list
@@ -1678,11 +1667,9 @@ class G2PMatrix:
             return
 
         row  = self._row(gwt_path=gwt_path)
-        cell = row.cell(column.index)
-        if cell.discovered:
-            cell.discovered.update(p4result)
-        else:
-            cell.discovered = p4result
+                        # p4result may be a shared, read-only cache entry.
+                        # Cell layers over it rather than copying it.
+        row.cell(column.index).store_shared(p4result)
 
     def _discover_git_diff_tree_files(self, col_index, old_sha1, new_sha1,
                                       find_copy_rename_args=None):
@@ -1988,6 +1975,9 @@ class G2PMatrix:
         LOG.debug('_do_create_local_placeholder_if() {}'.format(local_path))
         with open(local_path, 'w') as f:
             f.write('')
+        workspace = self._workspace()
+        if workspace:
+            workspace.note_written(local_path)
 
     def decide_rows_linear_fp(self):
         """Blindly obey git-fast-export."""
@@ -2193,7 +2183,15 @@ class G2PMatrix:
         the symlink.
         """
         with Timer(timer_name):
-            p4gf_util.rm_dir_contents(self.ctx.contentlocalroot)
+            workspace = self._workspace()
+            if workspace:
+                workspace.clear()
+            else:
+                p4gf_util.rm_dir_contents(self.ctx.contentlocalroot)
+
+    def _workspace(self):
+        """Return G2P's G2PWorkspace, or None if G2P has none."""
+        return self.g2p.workspace if self.g2p else None
 
     def _requires_sync_f(self, row, col_index_list):
         """What combinations of integ + resolve flags will fail if we don't
@@ -3243,10 +3241,14 @@ class G2PMatrix:
                              , p4filetype = str(p4filetype)
                              , gwt_path   = str(row.gwt_path)
                              , req        = str(p4_request) ))
-        p4gf_git.cat_file_to_local_file( sha1       = blob_sha1
-                                       , p4filetype = p4filetype
-                                       , local_file = local_path
-                                       , view_repo = self.ctx.repo )
+        workspace = self._workspace()
+        if workspace:
+            workspace.write_blob(local_path, blob_sha1, p4filetype)
+        else:
+            p4gf_git.cat_file_to_local_file( sha1       = blob_sha1
+                                           , p4filetype = p4filetype
+                                           , local_file = local_path
+                                           , view_repo = self.ctx.repo )
 
     def _copy_files_from_git(self):
         """Copy files from Git's internal file blobs to local Perforce workspace
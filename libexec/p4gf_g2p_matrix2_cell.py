@@ -1,6 +1,7 @@
 #! /usr/bin/env python3.3
 """A single cell in a G2PMatrix."""
 
+from   collections.abc          import MutableMapping
 import logging
 import pprint
 
@@ -9,20 +10,94 @@ from   p4gf_l10n                import NTR
 import p4gf_util
 
 
+class Discovered(MutableMapping):
+
+    """A cell's discovered dict, layered over one shared, read-only
+    'p4 fstat' result dict from P4ResultCache.
+
+    Reads check our own values first, then the shared dict. Writes go
+    only to our own values, created upon first write. A wide merge can
+    fill hundreds of thousands of cells per column from the same cached
+    results. Most of those cells never change, so they share the cached
+    dict instead of each holding a private copy.
+    """
+
+    __slots__ = ('_shared', '_own')
+
+    def __init__(self, shared, own=None):
+        self._shared = shared
+        self._own    = own      # None until first write.
+
+    def __getitem__(self, key):
+        own = self._own
+        if own and key in own:
+            return own[key]
+        return self._shared[key]
+
+    def get(self, key, default=None):
+        own = self._own
+        if own and key in own:
+            return own[key]
+        return self._shared.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._shared or bool(self._own and key in self._own)
+
+    def __setitem__(self, key, value):
+        if self._own is None:
+            self._own = {}
+        self._own[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+                        # Rare. Fold everything into our own dict so that
+                        # the shared dict can no longer supply this key.
+        own = dict(self)
+        del own[key]
+        self._shared = {}
+        self._own    = own
+
+    def __iter__(self):
+        yield from self._shared
+        if self._own:
+            for key in self._own:
+                if key not in self._shared:
+                    yield key
+
+    def __len__(self):
+        if not self._own:
+            return len(self._shared)
+        return len(self._shared) + sum(1 for key in self._own
+                                       if key not in self._shared)
+
+    def __bool__(self):
+        return bool(self._shared) or bool(self._own)
+
+    def __copy__(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class G2PMatrixCell:
 
     """A file's intersection with a single branch.
 
     in "How does this branch contribute to this file?
 
-    Actual contents vary by column. Usually a dict with results
-    from some Git or Perforce operation.
+    Actual contents vary by column. Usually a dict, or a Discovered
+    overlay of a shared dict, with results from some Git or Perforce
+    operation.
     """
 
+    __slots__ = ('discovered', 'decided')
+
     def __init__(self):
 
-                            # Contents vary by column. Usually a dict if
-                            # anything discovered, None if not.
+                            # Contents vary by column. Usually a dict or
+                            # Discovered if anything discovered, None if not.
         self.discovered    = None
 
                             # Decided instance if we're doing something,
@@ -36,11 +111,26 @@ class G2PMatrixCell:
         return self.decided
 
     def discovered_(self):
-        """Guaranteed to return a Decided instance. Creates one if necessary."""
+        """Guaranteed to return a discovered dict. Creates one if necessary."""
         if not self.discovered:
             self.discovered = {}
         return self.discovered
 
+    def store_shared(self, p4result):
+        """Record discovered values from a shared, read-only result dict.
+
+        Does not copy p4result, and never modifies it.
+        Values in p4result replace any we already hold for the same keys.
+        """
+        d = self.discovered
+        if isinstance(d, Discovered):
+            d.update(p4result)
+        elif d:
+            own = {k: v for k, v in d.items() if k not in p4result}
+            self.discovered = Discovered(p4result, own)
+        else:
+            self.discovered = Discovered(p4result)
+
     @staticmethod
     def safe_discovered(cell, key):
         """If cell exists and has a value discovered for key, return that value.
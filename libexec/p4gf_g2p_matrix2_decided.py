@@ -27,6 +27,10 @@ class Decided:
 
     """What we've decided to do."""
 
+    __slots__ = ( 'integ_flags', 'resolve_flags', 'on_integ_failure'
+                , 'integ_fallback', 'p4_request', 'branch_delete'
+                , 'integ_input', 'ghost_p4filetype' )
+
     # If integ fails to open a file for integ, do what?
     NOP      = NTR('NOP')
     RAISE    = NTR('RAISE')
@@ -168,6 +168,7 @@ this table.
 """
 from   collections  import namedtuple
 
+import p4gf_g2p_matrix2_table
 from   p4gf_l10n               import NTR
 
                         # pylint:disable=invalid-name
@@ -402,12 +403,29 @@ def to_input( p4jitfp_cell
     return row_input
 
 
+                        # Every value that to_input() can produce, one
+                        # list per input field.
+FIELDS = [ [_GDEST_P4  (e) for e in (_E, NE, DL)]
+         , [_P4JITFP_P4(e) for e in (_E, NE, DL)]
+         , [_H_W (d) for d in (A, M, T, D, N)]
+         , [_FP_W(d) for d in (A, M, T, D, N)]
+         , [_GFE (d) for d in (A, M, T, D, N)]
+         , [CRS_S, CRS__]
+         , [LW, FP]
+         , [POP, P__]
+         ]
+
+                        # TABLE, compiled: input ==> first matching row.
+COMPILED = p4gf_g2p_matrix2_table.compile_table(TABLE, FIELDS)
+p4gf_g2p_matrix2_table.check_compiled(COMPILED, TABLE, FIELDS)
+
+
 def find_row(row_input):
-    """Search the above table to match the above input."""
-    for row in TABLE:
-        if (row.input & row_input) == row_input:
-            return row
-    return None
+    """Find the first row of the above table to match the above input."""
+    row = COMPILED.get(row_input, p4gf_g2p_matrix2_table.MISS)
+    if row is p4gf_g2p_matrix2_table.MISS:
+        row = p4gf_g2p_matrix2_table.scan(TABLE, row_input)
+    return row
 
 
 def _lw_or_fp(lw, fp):
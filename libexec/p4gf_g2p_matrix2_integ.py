@@ -4,6 +4,7 @@
 from   collections  import namedtuple
 import logging
 
+import p4gf_g2p_matrix2_table
 from   p4gf_l10n    import NTR
 
                         # pylint:disable=line-too-long
@@ -303,6 +304,22 @@ _GIT_ACTION_TO_INPUT = { 'A' : A
                        , 'Rs' : D
                        }
 
+                        # Every value that to_input() can produce, one
+                        # list per input field.
+FIELDS = [ [P4S_E__, P4S_E_D]
+         , [P4D_E__, P4D_E_D, P4D____]
+         , [GD_E, GD__]
+         , [A, M, T, D, N]
+         , [ST_EQ, ST_NE]
+         , [SC_EQ, SC_NE]
+         , [DT_EQ, DT_NE]
+         , [DC_EQ, DC_NE]
+         ]
+
+                        # TABLE, compiled: input ==> first matching row.
+COMPILED = p4gf_g2p_matrix2_table.compile_table(TABLE, FIELDS)
+p4gf_g2p_matrix2_table.check_compiled(COMPILED, TABLE, FIELDS)
+
 
 def to_input(row, integ_src_cell, integ_dest_cell, git_delta_cell, gdest_cell):
     """Return the appropriate input to use when searching the above table."""
@@ -319,17 +336,18 @@ def to_input(row, integ_src_cell, integ_dest_cell, git_delta_cell, gdest_cell):
 
 
 def find_row(row_input):
-    """Search the above table to match the above input."""
-    for row in TABLE:
-        if (row.input & row_input) == row_input:
-            if LOG.isEnabledFor(logging.DEBUG3):
-                LOG.debug3('integ matrix input = {} output={}'
-                           .format(deb(row_input), row))
-            return row
+    """Find the first row of the above table to match the above input."""
+    row = COMPILED.get(row_input, p4gf_g2p_matrix2_table.MISS)
+    if row is p4gf_g2p_matrix2_table.MISS:
+        row = p4gf_g2p_matrix2_table.scan(TABLE, row_input)
 
     if LOG.isEnabledFor(logging.DEBUG3):
-        LOG.debug3('integ matrix input = {} no match'.format(deb(row_input)))
-    return None
+        if row:
+            LOG.debug3('integ matrix input = {} output={}'
+                       .format(deb(row_input), row))
+        else:
+            LOG.debug3('integ matrix input = {} no match'.format(deb(row_input)))
+    return row
 
 
 def _action(cell):
@@ -2,10 +2,13 @@
 """A single row in a G2PMatrix, including each cell's data."""
 
 import logging
+import sys
+import time
 
 from   p4gf_g2p_matrix2_cell    import G2PMatrixCell as Cell
 from   p4gf_g2p_matrix2_decided import Decided
-from   p4gf_l10n                import NTR
+from   p4gf_l10n                import _, NTR
+from   p4gf_time_space_recorder import current_memory_kb
 import p4gf_util
 
 LOG = logging.getLogger('p4gf_g2p_matrix2').getChild('row')  # subcategory of G2PMatrix.
@@ -17,6 +20,12 @@ class G2PMatrixRow:
     change to Perforce.
     """
 
+                # A wide merge holds one Row per file, hundreds of thousands
+                # of them. No per-instance __dict__.
+    __slots__ = ( 'gwt_path', 'depot_path', 'sha1', 'mode', 'cells'
+                , 'p4_request', 'p4filetype', 'copy_rename_source_row'
+                , 'lfs_row', 'skip_edit' )
+
                 # pylint:disable=too-many-arguments
                 # This is intentional. I prefer to fully construct an instance
                 # with a single call to an initializer, not construct, then
@@ -39,11 +48,15 @@ class G2PMatrixRow:
 
                 # Destination/result data. What git-fast-export gives us, or
                 # what we decide based on cross-branch integrations.
-        self.gwt_path       = gwt_path
+                #
+                # Interned, as are P4ResultCache's 'gwt_path' and 'depotFile'
+                # values: one copy of each path no matter how many columns
+                # and cached results carry it.
+        self.gwt_path       = _intern(gwt_path)
 
                 # Destination depot path, calculated via current branch view
                 # mapping. Caller supplies.
-        self.depot_path     = depot_path
+        self.depot_path     = _intern(depot_path)
 
                 # file sha1 and mode copied from initial git-fast-export or
                 # git-ls-tree. Left None if Git has no record of this gwt_path
@@ -188,3 +201,83 @@ class G2PMatrixRow:
         if not c.decided:
             c.decided = Decided()
         return c.decided
+
+# -- module-wide --------------------------------------------------------------
+
+
+def _intern(path):
+    """Return the one shared copy of path, or None if no path."""
+    return sys.intern(path) if path else path
+
+
+def _bench_wide_merge(file_ct, col_ct, copy):
+    """Fill a synthetic wide merge's rows and cells, report time and memory.
+
+    Each column gets its own branch's 'p4 fstat' results, shared the way
+    P4ResultCache shares them. One cell in ten also records a Git sha1
+    and mode, as G2PMatrix does for GPARN cells. With copy=True, each cell
+    holds a private copy of its result dict, the old way, for comparison.
+    """
+    intern = sys.intern
+    start_kb = current_memory_kb()
+    start = time.time()
+    results = []
+    for col in range(col_ct):
+        results.append(tuple(
+            { intern('depotFile')  : intern('//depot/branch{}/dir{}/file{}.c'
+                                            .format(col, i % 100, i))
+            , intern('gwt_path')   : intern('dir{}/file{}.c'.format(i % 100, i))
+            , intern('headAction') : intern('edit')
+            , intern('headType')   : intern('text')
+            , intern('headRev')    : intern(str(1 + i % 7))
+            , intern('headChange') : intern(str(1000 + col))
+            , intern('digest')     : '{:032X}'.format(i)
+            , intern('fileSize')   : str(i % 10000)
+            } for i in range(file_ct)))
+    fstat_seconds = time.time() - start
+    fstat_kb = current_memory_kb()
+
+    start = time.time()
+    rows = {}
+    for col, result in enumerate(results):
+        for i, r in enumerate(result):
+            gwt_path = r['gwt_path']
+            row = rows.get(gwt_path)
+            if not row:
+                row = G2PMatrixRow( gwt_path   = gwt_path
+                                  , depot_path = '//depot/dest/' + gwt_path
+                                  , col_ct     = col_ct )
+                rows[gwt_path] = row
+            cell = row.cell(col)
+            if copy:
+                cell.discovered = dict(r)
+            else:
+                cell.store_shared(r)
+            if not i % 10:
+                cell.discovered['sha1']     = r['digest'][:40]
+                cell.discovered['git-mode'] = '100644'
+    row_seconds = time.time() - start
+    print(NTR("files={:,} columns={} copy={}"
+              " fstat={:.2f}s {:,.1f}MB rows={:.2f}s {:,.1f}MB")
+          .format( file_ct, col_ct, copy
+                 , fstat_seconds, (fstat_kb - start_kb) / 1024
+                 , row_seconds, (current_memory_kb() - fstat_kb) / 1024 ))
+
+
+def main():
+    """Run the wide merge memory benchmark."""
+    parser = p4gf_util.create_arg_parser(
+        desc=_('Report memory used by G2PMatrix rows and cells'
+               ' for a synthetic wide merge.'))
+    parser.add_argument('--files', type=int, default=150000,
+                        help=_('Number of files (rows).'))
+    parser.add_argument('--columns', type=int, default=6,
+                        help=_('Number of branches (columns).'))
+    parser.add_argument('--copy', action='store_true',
+                        help=_('Copy each result dict into its cell.'))
+    args = parser.parse_args()
+    _bench_wide_merge(args.files, args.columns, args.copy)
+
+
+if __name__ == "__main__":
+    main()
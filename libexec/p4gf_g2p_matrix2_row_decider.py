@@ -2,6 +2,7 @@
 """class RowDecider."""
 
 from   collections              import deque, namedtuple
+from   collections.abc          import Mapping
 import logging
 
                         # Avoid import cycles:
@@ -839,7 +840,7 @@ def _p4_branch_or_delete(integ_dict):
     Perforce prohibits multiple branch or delete actions on the same
     file in the same changelists.
     """
-    return (    isinstance(integ_dict, dict)
+    return (    isinstance(integ_dict, Mapping)
             and 'depotFile' in integ_dict
             and 'action'    in integ_dict
             and integ_dict['action'] in ['branch', 'delete'])
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3.3
+"""Compile a G2PMatrix decision table into a lookup dict.
+
+The integ and ghost decision tables are lists of rows, each with an
+integer bit-field input. Every input field is one-hot: exactly one bit
+per field describes a file, and a table row sets several bits in a field
+to say "any of these". find_row() used to scan the table for the first
+row whose input covers all of a file's bits, once per cell of every row
+in G2PMatrix.
+
+The input space is small: a handful of fields, a few values each. So
+compile_table() visits every table row once, last row first, and expands
+each into the inputs that it covers. Earlier rows overwrite later ones,
+which preserves first-match semantics. check_compiled() then confirms,
+input by input, that the compiled dict agrees with the linear scan.
+"""
+from   itertools import product
+import random
+import sys
+import time
+
+from   p4gf_l10n import _, NTR
+
+                        # Returned by compiled dict .get() for inputs outside
+                        # the compiled input space. Distinct from None, which
+                        # means "no table row matches".
+MISS = object()
+
+
+def scan(table, row_input):
+    """Return the first table row whose input covers row_input, or None."""
+    for row in table:
+        if (row.input & row_input) == row_input:
+            return row
+    return None
+
+
+def compile_table(table, fields):
+    """Return a dict of every input in the space of fields to its first
+    matching table row, or None if no row matches.
+
+    fields : list of input fields, each a list of that field's one-hot
+             bit values.
+    """
+    compiled = dict.fromkeys(_inputs(fields))
+    for row in reversed(table):
+        covered = [[v for v in field if (row.input & v) == v]
+                   for field in fields]
+        for combo in product(*covered):
+            compiled[_or(combo)] = row
+    return compiled
+
+
+def check_compiled(compiled, table, fields):
+    """Raise RuntimeError if compiled disagrees with scan() for any input."""
+    for row_input in _inputs(fields):
+        want = scan(table, row_input)
+        got  = compiled.get(row_input, MISS)
+        if got is not want:
+            raise RuntimeError(_('Compiled decision table mismatch for'
+                                 ' input {input:b}: compiled={got} scan={want}')
+                               .format( input = row_input
+                                      , got   = got
+                                      , want  = want ))
+
+
+def _inputs(fields):
+    """Iterate every input in the space of fields."""
+    for combo in product(*fields):
+        yield _or(combo)
+
+
+def _or(values):
+    """Bitwise-OR of values."""
+    r = 0
+    for v in values:
+        r |= v
+    return r
+
+
+def _bench_one(name, module, input_list):
+    """Time linear scan and compiled lookup for each input in input_list."""
+    start = time.time()
+    for row_input in input_list:
+        scan(module.TABLE, row_input)
+    scan_seconds = time.time() - start
+
+    start = time.time()
+    for row_input in input_list:
+        module.find_row(row_input)
+    find_seconds = time.time() - start
+
+    print(NTR("{name:<6} inputs={ct:,} scan={scan:.2f}s find_row={find:.2f}s")
+          .format( name = name
+                 , ct   = len(input_list)
+                 , scan = scan_seconds
+                 , find = find_seconds ))
+
+
+def main():
+    """Microbenchmark both compiled decision tables over synthetic inputs."""
+                        # Avoid import cycles: both import this module.
+    import p4gf_g2p_matrix2_ghost
+    import p4gf_g2p_matrix2_integ
+                        # Defines logging.DEBUG3 for find_row().
+    import p4gf_log     # pylint:disable=unused-import
+
+    ct = int(sys.argv[1]) if 1 < len(sys.argv) else 1000000
+    rand = random.Random(0)
+    for name, module in [ (NTR('integ'), p4gf_g2p_matrix2_integ)
+                        , (NTR('ghost'), p4gf_g2p_matrix2_ghost) ]:
+        start = time.time()
+        check_compiled(module.COMPILED, module.TABLE, module.FIELDS)
+        print(NTR("{name:<6} compiled={ct:,} inputs, checked in {sec:.3f}s")
+              .format( name = name
+                     , ct   = len(module.COMPILED)
+                     , sec  = time.time() - start ))
+        input_list = [_or(rand.choice(field) for field in module.FIELDS)
+                      for _i in range(ct)]
+        _bench_one(name, module, input_list)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#! /usr/bin/env python3.3
+"""DiscoverPrefetcher: fetch the next commit's 'p4 fstat' discovery results
+while the current commit submits.
+
+G2P._copy_commits() copies one Git commit at a time: G2PMatrix discover,
+decide, do_it, then 'p4 submit', then the next commit. While 'p4 submit'
+runs, we sit idle waiting on the server.
+
+Much of the next commit's discovery is 'p4 fstat //branch-client/...@nn'
+of each branch that holds one of its Git parent commits. For any parent
+already copied to Perforce, that branch@change is already submitted and
+will not change. Just before the current commit's submit, we send those
+queries to a worker thread with its own P4 connection. G2PMatrix picks up
+the results through ctx.branch_fstat_cache when it gets to them.
+
+Dependency check: we skip, and leave G2PMatrix to run it later as usual,
+any query that
+* needs a parent commit that is not yet copied, usually the commit now
+  submitting. Such a parent has no branch@change yet.
+* reads the branch that the current commit is submitting to, or goes
+  through the client that holds the current commit's open files. Those
+  results would change once the submit completes.
+
+Expected call sequence, once per copied commit:
+
+    with DiscoverPrefetcher(ctx, g2p) as prefetcher:
+        ...decide, do_it...
+        prefetcher.prefetch(next_commit, submit_branch_id)
+        ...p4 submit...
+"""
+from   concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+import p4gf_config
+import p4gf_create_p4
+from   p4gf_g2p_matrix2 import G2PMatrix
+import p4gf_profiler
+import p4gf_util
+
+LOG = logging.getLogger('p4gf_copy_to_p4').getChild('prefetch')
+
+                        # Never pin more than this many temp clients for one
+                        # commit's prefetches. The client pool has only
+                        # MAX_TEMP_CLIENTS to go around.
+MAX_PREFETCH_PER_COMMIT = 2
+
+
+def is_enabled(ctx):
+    """Does this repo want discovery prefetch?"""
+    return ctx.repo_config.getboolean( p4gf_config.SECTION_GIT_TO_PERFORCE
+                                     , p4gf_config.KEY_DISCOVER_PREFETCH
+                                     , fallback = True )
+
+
+class FstatPrefetch:
+    """One 'p4 fstat' query, running or done on our worker thread.
+
+    Holds a reference to the temp client it queries until result() or
+    release(), so that the client pool does not repurpose that client
+    while the worker uses it.
+    """
+
+    def __init__(self, prefetcher, client_name, path):
+        self.prefetcher  = prefetcher
+        self.client_name = client_name
+        self.path        = path
+        self.future      = None
+        self.released    = False
+
+    def __str__(self):
+        return "FstatPrefetch client={} path={}".format(self.client_name, self.path)
+
+    def result(self):
+        """Wait for the worker, return its raw 'p4 fstat' result list.
+
+        Re-raise any exception from the worker.
+        """
+        start = time.time()
+        try:
+            return self.future.result()
+        finally:
+            self.prefetcher.stats.wait_seconds += time.time() - start
+            self.prefetcher.stats.used_ct += 1
+            self.release()
+
+    def release(self):
+        """Let the client pool have our temp client back."""
+        if not self.released:
+            self.released = True
+            self.prefetcher.ctx.release_temp_client(self.client_name)
+
+
+class DiscoverPrefetcher:
+    """One worker thread with its own P4 connection."""
+
+    def __init__(self, ctx, g2p):
+        self.ctx          = ctx
+        self.g2p          = g2p
+        self.cache        = ctx.branch_fstat_cache
+        self._executor    = None
+        self._p4          = None
+        self._outstanding = []      # (branch, change_num, FstatPrefetch)
+
+        self.stats = p4gf_profiler.Counters(
+                      'started_ct'
+                    , 'used_ct'
+                    , 'unused_ct'
+                    , 'skipped_ct'      # blocked by the dependency check
+                    , 'worker_seconds'
+                    , 'wait_seconds' )
+        p4gf_profiler.add_counters("G2P discover prefetch", self, self.stats)
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+        return False  # False = do not squelch exception
+
+    def prefetch(self, fe_commit, submit_branch_id):
+        """Start fetching the 'p4 fstat' results that G2PMatrix will want
+        when it discovers fe_commit's Git parents.
+
+        Call from within the current commit's client_view block, just
+        before its submit. Also drops any of the previous commit's
+        prefetches that its G2PMatrix never asked for.
+        """
+        self._drop_unused()
+        submit_client = self.ctx.p4.client
+        for (branch, change_num) in self._fstat_keys(fe_commit):
+            if len(self._outstanding) == MAX_PREFETCH_PER_COMMIT:
+                break
+            if branch.branch_id == submit_branch_id:
+                self.stats.skipped_ct += 1
+                continue
+            if self.cache.has(branch, change_num):
+                continue
+            with self.ctx.switched_to_branch(branch):
+                client_name = self.ctx.p4.client
+                if client_name == submit_client:
+                    self.stats.skipped_ct += 1
+                    continue
+                path = self.ctx.client_view_path(change_num)
+                self.ctx.add_ref_to_temp_client(client_name)
+            pf = FstatPrefetch(self, client_name, path)
+            LOG.debug2("prefetch() {} {}".format(p4gf_util.abbrev(fe_commit['sha1']), pf))
+            pf.future = self._executor.submit(self._run, pf)
+            self.cache.add_pending(branch, change_num, pf)
+            self._outstanding.append((branch, change_num, pf))
+            self.stats.started_ct += 1
+
+    def _fstat_keys(self, fe_commit):
+        """Return a list of (branch, change_num) for each branch view that
+        holds one of fe_commit's already-copied Git parents, the same
+        branch@change that G2PMatrix's GPARN columns will 'p4 fstat'.
+
+        First parent first.
+        """
+        # pylint:disable=protected-access
+        # G2PMatrix uses these same G2P helpers for its own GPARN columns.
+        otl = []
+        for par_sha1 in self.g2p._parents_for_commit(fe_commit):
+            otl.extend(self.g2p.commit_sha1_to_otl(par_sha1))
+        otl = G2PMatrix._keep_highest_change_num_per_branch_id(otl)
+        branch_dict = self.ctx.branch_dict()
+        keys = []
+        for ot in otl:
+            branch = branch_dict.get(ot.branch_id)
+            if branch and branch.branch_id:
+                keys.append((branch, int(ot.change_num)))
+        return keys
+
+    def _drop_unused(self):
+        """Forget prefetches that G2PMatrix never asked for."""
+        for (branch, change_num, pf) in self._outstanding:
+            if self.cache.discard_pending(branch, change_num, pf):
+                LOG.debug2("unused {}".format(pf))
+                self.stats.unused_ct += 1
+                        # Client pool is not thread-safe: wait here for
+                        # the worker to let go of its client, then
+                        # release it from this thread.
+                if not pf.future.cancel():
+                    try:
+                        pf.future.result()
+                    except Exception:  # pylint: disable=broad-except
+                        pass           # Unused anyway.
+                pf.release()
+        self._outstanding = []
+
+    def close(self):
+        """Wait for the worker, drop unused results, disconnect."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._drop_unused()
+        if self._p4:
+            p4gf_create_p4.destroy(self._p4)
+            self._p4 = None
+
+    def _run(self, pf):
+        """Worker thread: run one 'p4 fstat' on our own connection."""
+        start = time.time()
+        try:
+            p4 = self._acquire_p4()
+            p4.client = pf.client_name
+            return p4.run(self.cache.cmd() + [pf.path])
+        finally:
+            self.stats.worker_seconds += time.time() - start
+
+    def _acquire_p4(self):
+        """Return our connection, creating it on first use."""
+        if self._p4:
+            return self._p4
+        template = self.ctx.p4
+        p4 = p4gf_create_p4.create_p4( port    = template.port
+                                     , user    = template.user
+                                     , client  = template.client
+                                     , connect = False )
+        if template.charset:
+            p4.charset = template.charset
+        p4gf_create_p4.p4_connect(p4)
+        self._p4 = p4
+        return p4
@@ -0,0 +1,308 @@
+#! /usr/bin/env python3.3
+"""G2PWorkspace: the files that G2PMatrix writes under the Perforce client
+workspace root, and a local cache of their content.
+
+G2PMatrix needs an empty workspace before each commit's 'p4 integ', then
+writes each added or edited file's content from Git. Before G2PWorkspace,
+that meant 'rm -rf' of the whole workspace root two or three times per
+commit, and a full in-memory copy of each blob, three copies actually, to
+write each file.
+
+Now:
+
+* clear() removes only the files that we know we wrote since the last
+  clear(), then the directories that held them. If the workspace root
+  is not empty after that, something else wrote there too ('p4 integ',
+  'p4 sync -f', ...), and we fall back to the old 'rm -rf'.
+* write_blob() streams content from one long-lived 'git cat-file --batch'
+  child, one chunk at a time. No blob is ever held in memory whole.
+* Instead of deleting a file that we wrote and that nothing has modified
+  since, clear() moves it into a content-addressed cache, one file per
+  blob sha1. A later write_blob() of that same blob, for any path, copies
+  it from the cache (a reflink where the filesystem supports one, so no
+  data copied) or hardlinks it, instead of reading it from Git again.
+
+The cache lives next to the workspace root, on the same filesystem, only
+for the duration of one push. It is bounded in bytes by the global config
+[undoc] g2p_blob_cache_bytes.
+
+Hardlink mode shares one inode between the cache and every workspace file
+with that content. We stat-check each cache file before each use and
+discard any that were modified in place, but file permission bits are
+shared. Use 'copy' unless you know your filetypes do not care.
+"""
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import stat
+
+import p4gf_bounded_cache
+import p4gf_config
+import p4gf_git_blob_reader
+from   p4gf_l10n      import NTR
+import p4gf_profiler
+import p4gf_util
+
+LOG = logging.getLogger('p4gf_g2p_matrix2').getChild('workspace')  # subcategory of G2PMatrix.
+
+_MAX_CACHE_BYTES = 1024 * 1024 * 1024
+
+                        # Linux ioctl: make dest file share source file's
+                        # extents, copy-on-write. btrfs, xfs, others.
+_FICLONE = 0x40049409
+
+                        # ioctl failures that mean "this filesystem cannot
+                        # reflink", not "something is wrong".
+_NO_REFLINK_ERRNO = { errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL
+                    , errno.EXDEV, errno.EBADF }
+
+
+def blob_cache_how(ctx):
+    """Return one of the VALUE_WORKSPACE_BLOB_CACHE_xxx values."""
+    how = ctx.repo_config.get( p4gf_config.SECTION_GIT_TO_PERFORCE
+                             , p4gf_config.KEY_WORKSPACE_BLOB_CACHE
+                             , fallback = p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_COPY )
+    expected = [ p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_COPY
+               , p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_HARDLINK
+               , p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_NONE ]
+    if how not in expected:
+        LOG.warning("{key} {value} not in {expected}, using {default}"
+                    .format( key      = p4gf_config.KEY_WORKSPACE_BLOB_CACHE
+                           , value    = how
+                           , expected = expected
+                           , default  = p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_COPY ))
+        how = p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_COPY
+    return how
+
+
+class G2PWorkspace:
+
+    """What we wrote where, and a cache of blob content to write it again."""
+
+    def __init__(self, ctx):
+        self.ctx       = ctx
+        self.how       = blob_cache_how(ctx)
+        self.cache_dir = os.path.join( ctx.repo_dirs.repo_container
+                                     , NTR('g2p-blobs'))
+
+                        # Workspace root ==> { local_path : (sha1, size, mtime_ns) }
+                        # for each file that we wrote under that root since
+                        # its last clear(). sha1 None for symlinks.
+        self._written  = {}
+
+                        # Blob sha1 ==> (size, mtime_ns) of its cache file.
+        self._cache    = p4gf_bounded_cache.LRUCache(
+                              "G2P workspace blob cache"
+                            , _MAX_CACHE_BYTES
+                            , config_key = p4gf_config.KEY_G2P_BLOB_CACHE_BYTES
+                            , on_evict   = self._on_evict
+                            , sizeof     = lambda v: v[0] )
+        self._reflink_ok = True
+        self._reader   = None
+
+        self.stats = p4gf_profiler.Counters(
+                      'clear_ct'
+                    , 'full_clear_ct'   # fell back to 'rm -rf'
+                    , 'write_ct'        # from Git
+                    , 'write_byte_ct'
+                    , 'park_ct'         # moved into cache by clear()
+                    , 'reflink_ct'
+                    , 'copy_ct'
+                    , 'link_ct' )
+        p4gf_profiler.add_counters("G2P workspace", self, self.stats)
+
+    def __enter__(self):
+        self._remove_cache_dir()
+        if self._cache_enabled():
+            p4gf_util.ensure_dir(self.cache_dir)
+                        # Start git-cat-file now, before our memory grows.
+        self._reader = p4gf_git_blob_reader.create_blob_reader(
+                              self.ctx.repo
+                            , p4gf_git_blob_reader.HOW_CAT_FILE_BATCH )
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+        return False  # False = do not squelch exception
+
+    def close(self):
+        """Stop git-cat-file, delete the cache."""
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+        self._cache.clear()
+        self._remove_cache_dir()
+
+    def clear(self):
+        """Leave the current workspace root empty."""
+        self.stats.clear_ct += 1
+        root = self.ctx.contentlocalroot
+        written = self._written.pop(root, {})
+        dir_set = set()
+        real_dir = _RealDir(root)
+        for local_path, w in written.items():
+            d = os.path.dirname(local_path)
+                        # Never follow a symlink out of the workspace: if
+                        # some parent directory is now a symlink, leave
+                        # this file for 'rm -rf', which does not follow.
+            if not real_dir.is_real(d):
+                continue
+            self._park_or_unlink(local_path, w)
+            while d not in dir_set and d.startswith(root):
+                dir_set.add(d)
+                d = os.path.dirname(d)
+                        # Deepest first, so that children go before parents.
+        for d in sorted(dir_set, key=len, reverse=True):
+            try:
+                os.rmdir(d)
+            except OSError:
+                pass    # Not empty or already gone. Checked below.
+
+        if os.path.isdir(root) and os.listdir(root):
+            self.stats.full_clear_ct += 1
+            LOG.debug2("clear() {} not empty, rm -rf".format(root))
+            p4gf_util.rm_dir_contents(root)
+
+    def note_written(self, local_path):
+        """Someone else wrote local_path. Delete it in the next clear()."""
+        self._written.setdefault(self.ctx.contentlocalroot, {}) \
+            [local_path] = (None, None, None)
+
+    def write_blob(self, local_path, blob_sha1, p4filetype):
+        """Write a Git blob's content to local_path.
+
+        Caller must ensure that local_path does not exist and that its
+        parent directory does.
+        """
+        if p4filetype and 'symlink' in p4filetype:
+            os.symlink(bytes(self._reader.get(blob_sha1)), local_path)
+            self.stats.write_ct += 1
+            self.note_written(local_path)
+            return
+
+        if not self._write_from_cache(blob_sha1, local_path):
+            with open(local_path, 'wb') as fout:
+                self.stats.write_byte_ct += self._reader.write_to(blob_sha1, fout)
+            self.stats.write_ct += 1
+
+        st = os.lstat(local_path)
+        self._written.setdefault(self.ctx.contentlocalroot, {}) \
+            [local_path] = (blob_sha1, st.st_size, st.st_mtime_ns)
+
+    def _cache_enabled(self):
+        """Are we keeping a blob cache?"""
+        return self.how != p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_NONE
+
+    def _cache_path(self, blob_sha1):
+        """Where in the cache does this blob go?"""
+        return os.path.join(self.cache_dir, blob_sha1)
+
+    def _park_or_unlink(self, local_path, w):
+        """Move a file that we wrote into the cache, or delete it if it
+        has changed since we wrote it, or the cache already has a copy.
+        """
+        (blob_sha1, size, mtime_ns) = w
+        try:
+            st = os.lstat(local_path)
+        except FileNotFoundError:
+            return
+        if stat.S_ISDIR(st.st_mode):
+            return      # Not ours anymore. Leave for 'rm -rf'.
+        if (    blob_sha1
+            and self._cache_enabled()
+            and blob_sha1 not in self._cache
+            and stat.S_ISREG(st.st_mode)
+            and st.st_size     == size
+            and st.st_mtime_ns == mtime_ns):
+            try:
+                os.rename(local_path, self._cache_path(blob_sha1))
+                self._cache.put(blob_sha1, (size, mtime_ns))
+                self.stats.park_ct += 1
+                return
+            except OSError as e:
+                LOG.debug("cannot cache {}: {}".format(local_path, e))
+        os.unlink(local_path)
+
+    def _write_from_cache(self, blob_sha1, local_path):
+        """If the cache holds this blob, copy or link it to local_path and
+        return True. If not, return False.
+        """
+        if not self._cache_enabled():
+            return False
+        w = self._cache.get(blob_sha1)
+        if not w:
+            return False
+        cache_path = self._cache_path(blob_sha1)
+        try:
+            st = os.lstat(cache_path)
+        except FileNotFoundError:
+            st = None
+        if not (st and (st.st_size, st.st_mtime_ns) == w):
+                        # Modified through a hardlink. Stop trusting it.
+            LOG.debug("cache file changed, discarding: {}".format(cache_path))
+            self._cache.pop(blob_sha1)
+            self._on_evict(blob_sha1, w)
+            return False
+
+        if self.how == p4gf_config.VALUE_WORKSPACE_BLOB_CACHE_HARDLINK:
+            os.link(cache_path, local_path)
+            self.stats.link_ct += 1
+        else:
+            self._reflink_or_copy(cache_path, local_path)
+        return True
+
+    def _reflink_or_copy(self, src_path, dst_path):
+        """Copy src_path to dst_path, sharing extents if we can."""
+        with open(src_path, 'rb') as fin, open(dst_path, 'wb') as fout:
+            if self._reflink_ok:
+                try:
+                    fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+                    self.stats.reflink_ct += 1
+                    return
+                except OSError as e:
+                    if e.errno not in _NO_REFLINK_ERRNO:
+                        raise
+                    LOG.debug("reflink not supported, copying: {}".format(e))
+                    self._reflink_ok = False
+            shutil.copyfileobj(fin, fout)
+            self.stats.copy_ct += 1
+
+    def _on_evict(self, blob_sha1, _value):
+        """Delete an evicted blob's cache file."""
+        try:
+            os.unlink(self._cache_path(blob_sha1))
+        except FileNotFoundError:
+            pass
+
+    def _remove_cache_dir(self):
+        """Delete our cache directory and everything in it."""
+        if os.path.lexists(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+# -- module-wide --------------------------------------------------------------
+
+
+class _RealDir:
+
+    """Which directories under a workspace root are real directories, no
+    symlinks between them and the root?
+    """
+
+    def __init__(self, root):
+        self.root      = root       # ends with '/'
+        self.real_root = os.path.join(os.path.realpath(root), '')
+        self._memo     = {}
+
+    def is_real(self, d):
+        """Is directory d under our root, and reached without symlinks?"""
+        r = self._memo.get(d)
+        if r is None:
+            dd = os.path.join(d, '')
+            r = (    dd.startswith(self.root)
+                 and (   os.path.join(os.path.realpath(d), '')
+                      == self.real_root + dd[len(self.root):] ))
+            self._memo[d] = r
+        return r
@@ -42,7 +42,10 @@ Implementation Details:
     ... Hours and GB for Steps 3 + 4 ...
 
 5. Scan the Git repo for all objects "reachable from" any commit in any repo,
-   update sqlite database with reachable successes.
+   update sqlite database with reachable successes. One 'git rev-list
+   --objects' streams each reachable sha1 once into a reachable_objects
+   table, then one UPDATE per trees_xxx/blobs_xxx table marks them all.
+   Progress is saved as we go, so --cont resumes an interrupted scan.
 
     ... Hours for Step 5 ...
 
@@ -61,6 +64,8 @@ import re
 import pygit2
 import shutil
 import sqlite3
+import subprocess
+import tempfile
 import time
 import datetime
 import pickle
@@ -100,8 +105,14 @@ DELETED_COMMITS            = 'deleted_commits'
 TREES_FROM_COMMITS         = "trees_from_commits"
 MISSING_TREES_FROM_COMMITS = "missing_trees_from_commits"
 
+REACHABLE_OBJECTS          = "reachable_objects"
+
 SHA1_PREFIX_LEN            = 3  # used to scatter the inserts across a family of table names.
 
+                        # How many reachable sha1s to buffer from
+                        # 'git rev-list' before one executemany() INSERT.
+REACHABLE_BATCH_CT         = 50000
+
 
                         # Log level reminder from p4gf_util.apply_log_args():
                         # verbose   = INFO
@@ -759,6 +770,154 @@ class GC(object):  # pylint: disable=too-many-public-methods,too-many-instance-a
             print(_("Use the '--doreport' option to re-create the report."))
 
     def find_reachable(self):
+        """Mark every tree and blob reachable from a commit's tree.
+
+        Two resumable passes:
+        1. list_reachable() streams every reachable sha1 into the
+           reachable_objects table.
+        2. mark_listed_reachable() joins that table against each
+           trees_xxx/blobs_xxx table, one UPDATE per table.
+
+        If our git cannot do pass 1 (no 'rev-list --missing', git < 2.16),
+        fall back to walking the trees with pygit2.
+        """
+        if self.sql_get_admin('reachable_listed') != '1':
+            if not self.list_reachable():
+                self.find_reachable_pygit2()
+                return
+            self.sql_set_admin('1', 'reachable_listed')
+            self.db.commit()
+        self.mark_listed_reachable()
+
+    def list_reachable(self):
+        """Run one 'git rev-list --objects' over every tree in
+        TREES_FROM_COMMITS, insert each sha1 it reports into the
+        reachable_objects table.
+
+        rev-list visits each object once no matter how many commits share
+        it, and keeps its bookkeeping in git's compact object hash rather
+        than in a Python set of sha1 strings.
+
+        Our repo holds trees but not blobs, and not every tree made it
+        from Perforce. --missing=print lists each missing object as
+        "?<sha1>" rather than failing: still reachable, just not
+        something we can look inside. --ignore-missing skips any
+        starting tree that we lack.
+
+        Return False if git failed.
+        """
+        self.db.execute("CREATE TABLE IF NOT EXISTS {}(key TEXT PRIMARY KEY)"
+                        .format(REACHABLE_OBJECTS))
+        self.db.commit()
+
+        # Feed rev-list its starting points from a file rather than a
+        # pipe: no writer thread, no deadlock while we read its output.
+        with tempfile.TemporaryFile(dir=self.dir_abspath) as stdin_file, \
+             tempfile.TemporaryFile(dir=self.dir_abspath) as stderr_file:
+            for table in self.table_names[TREES_FROM_COMMITS]:
+                for row in self.db.execute("SELECT key FROM {}".format(table)):
+                    stdin_file.write(row[0].encode() + b'\n')
+            stdin_file.seek(0)
+
+            cmd = p4gf_proc.translate_git_cmd(
+                    [ 'git', '--git-dir=' + self.git_dir_abspath
+                    , 'rev-list', '--objects', '--missing=print'
+                    , '--ignore-missing'
+                    , '--stdin' ])      # after --ignore-missing, or it
+                                        # does not apply to stdin.
+            LOG.debug("list_reachable() {}".format(' '.join(cmd)))
+            proc = subprocess.Popen( cmd
+                                   , stdin  = stdin_file
+                                   , stdout = subprocess.PIPE
+                                   , stderr = stderr_file )
+            start  = time.time()
+            obj_ct = 0
+            batch  = []
+            with ProgressReporter.Indeterminate():
+                for line in proc.stdout:
+                    if line.startswith(b'?'):
+                        batch.append((line[1:41].decode(),))
+                    else:
+                        batch.append((line[:40].decode(),))
+                    if REACHABLE_BATCH_CT <= len(batch):
+                        obj_ct += self._insert_reachable(batch)
+                        batch = []
+                        if not self.quiet:
+                            ProgressReporter.increment(
+                                _("Listing reachable trees and blobs ... {ct:,}")
+                                .format(ct = obj_ct))
+                obj_ct += self._insert_reachable(batch)
+            proc.stdout.close()
+            ec = proc.wait()
+            if ec:
+                stderr_file.seek(0)
+                LOG.warning("git rev-list failed, using pygit2 instead: ec={} {}"
+                            .format(ec, stderr_file.read().decode(errors='replace')))
+                return False
+        self._report_rate(_("Listed reachable trees and blobs"), obj_ct, start)
+        return True
+
+    def _insert_reachable(self, batch):
+        """Insert a list of (sha1,) tuples into reachable_objects, commit.
+
+        Return len(batch).
+        """
+        if batch:
+            self.db.executemany("INSERT OR IGNORE INTO {} VALUES(?)"
+                                .format(REACHABLE_OBJECTS), batch)
+            self.db.commit()
+        return len(batch)
+
+    def mark_listed_reachable(self):
+        """Mark each trees_xxx/blobs_xxx row whose sha1 is in
+        reachable_objects.
+
+        One UPDATE per table, restricted to the slice of reachable_objects
+        with that table's sha1 prefix, so each is a primary key range scan
+        plus index lookups, not a row-at-a-time round trip through Python.
+        rev-list does not tell us which sha1s are trees and which blobs:
+        check both families, a sha1 only matches in one.
+
+        Record how many tables are done, so that --cont resumes after
+        the last one.
+        """
+        table_list = self.table_names[TREES] + self.table_names[BLOBS]
+        done_ct    = int(self.sql_get_admin('reachable_marked_table_ct') or 0)
+        start      = time.time()
+        marked_ct  = 0
+        self.eta   = p4gf_eta.ETA(total_ct = len(table_list) - done_ct)
+        with ProgressReporter.Determinate(len(table_list) - done_ct):
+            for i, table in enumerate(table_list[done_ct:], start=done_ct + 1):
+                prefix = table.split('_', 1)[1]
+                cursor = self.db.execute(
+                          "UPDATE {table} SET reachable=1"
+                          " WHERE reachable=0 AND key IN"
+                          " (SELECT key FROM {reachable} WHERE ? <= key AND key < ?)"
+                          .format(table = table, reachable = REACHABLE_OBJECTS)
+                        , (prefix, prefix + 'g'))   # 'g' sorts after any hex digit
+                marked_ct += max(0, cursor.rowcount)
+                self.sql_set_admin(str(i), 'reachable_marked_table_ct')
+                self.db.commit()
+                if not self.quiet:
+                    self.eta.increment()
+                    ProgressReporter.increment(
+                            _("Marking reachable trees and blobs ... {et} {ed}")
+                            .format( et = self.eta.eta_str()
+                                   , ed = self.eta.eta_delta_str()))
+        self._report_rate(_("Marked reachable trees and blobs"), marked_ct, start)
+
+    def _report_rate(self, what, obj_ct, start):
+        """Print and log how many objects, how fast."""
+        seconds = time.time() - start
+        msg = _("{what}: {ct:,} objects in {sec:.1f} seconds, {rate:,} objects/second") \
+              .format( what = what
+                     , ct   = obj_ct
+                     , sec  = seconds
+                     , rate = int(obj_ct / seconds) if seconds else obj_ct )
+        LOG.info(msg)
+        self.print_quiet(msg)
+
+    def find_reachable_pygit2(self):
         """Mark every tree and blob reachable in the database.
         The trees in these tables are already marked reachable.
         Use recursion into the trees and mark trees/blobs reachable."""
@@ -782,6 +941,7 @@ class GC(object):  # pylint: disable=too-many-public-methods,too-many-instance-a
                     tree = row[0]
                     # this method recurses for any tree entry within this top-level tree
                     self.mark_tree_contents_reachable(str(tree))
+        self.sql_commit(force=True)
 
     def mark_tree_contents_reachable(self, tree):
         """Mark each tree and blob in this tree as reachable.
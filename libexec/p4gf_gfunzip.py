@@ -113,6 +113,10 @@ class GFUnzip:
         //.git-fusion/objects/blobs/... and trees/...
 
         I'll either write a separate function for adding
+
+        :param raw_bytes: bytes or memoryview, such as from a
+                          p4gf_git_blob_reader. Written immediately,
+                          not retained.
         """
         self._add_gmchange_rev(
               depot_path         = p4gf_path.blob_p4_path(sha1)
@@ -122,6 +126,33 @@ class GFUnzip:
             , lbr_rev_change_num = 1
             )
 
+    def write_blob_rev_1_deflated( self, *
+                                 , sha1
+                                 , md5
+                                 , byte_ct
+                                 , crc
+                                 , deflated
+                                 , lbr_file_type
+                                 ):
+        """Write a 'p4 add rev#1' record to zipfile, for a blob whose
+        content some other process already deflated.
+
+        See p4gf_fast_push_blob_pipeline.
+        """
+        depot_path = p4gf_path.blob_p4_path(sha1)
+        self.p4unzip.write_deflated(
+              archive_relpath = depot_to_archive_path(depot_path)
+            , deflated_bytes  = deflated
+            , crc             = crc
+            , byte_ct         = byte_ct )
+        self._write_gmchange_rev_jnl(
+              depot_path         = depot_path
+            , md5                = md5
+            , byte_ct            = byte_ct
+            , lbr_file_type      = lbr_file_type
+            , lbr_rev_change_num = 1
+            )
+
     def write_rev(self, db_rev, *
                  , context_db_rev = None
                  , context_rev_0  = False
@@ -293,10 +324,27 @@ class GFUnzip:
                 strings to "1.1"
             If non-zero, use that. bat_gfunzip passes int(1).
         """
-        lbr_path     = depot_path
         archive_path = depot_to_archive_path(depot_path)
         self.p4unzip.zip.fp.writestr(archive_path, raw_bytes)
+        self._write_gmchange_rev_jnl(
+              depot_path         = depot_path
+            , md5                = md5
+            , byte_ct            = len(raw_bytes)
+            , lbr_file_type      = lbr_file_type
+            , lbr_rev_change_num = lbr_rev_change_num
+            )
 
+    def _write_gmchange_rev_jnl( self, *
+               , depot_path
+               , md5
+               , byte_ct
+               , lbr_file_type
+               , lbr_rev_change_num
+               ):
+        """Write the db.rev records for _add_gmchange_rev(), to both
+        change and context journal files. Content already written to zip.
+        """
+        lbr_path     = depot_path
                         # Open for 'p4 add'.
         self.gmchange.ensure_writable()
         jnl_rev = p4gf_p4dbschema.db_rev(
@@ -307,7 +355,7 @@ class GFUnzip:
                 , change_num            = self.gmchange.change_num
                 , date                  = self.gmchange.date_seconds()
                 , md5                   = md5_str(md5)
-                , uncompressed_byte_ct  = len(raw_bytes)
+                , uncompressed_byte_ct  = byte_ct
                 , lbr_is_lazy           = p4gf_p4dbschema.RevStatus.NOT_LAZY
                 , lbr_path              = lbr_path
                 , lbr_rev               = lbr_rev_str(lbr_rev_change_num)
@@ -325,7 +373,7 @@ class GFUnzip:
                 , change_num            = self.gmchange.change_num
                 , date                  = self.gmchange.date_seconds()
                 , md5                   = md5_str(md5)
-                , uncompressed_byte_ct  = len(raw_bytes)
+                , uncompressed_byte_ct  = byte_ct
                 , lbr_is_lazy           = p4gf_p4dbschema.RevStatus.NOT_LAZY
                 , lbr_path              = lbr_path
                 , lbr_rev               = lbr_rev_str(lbr_rev_change_num)
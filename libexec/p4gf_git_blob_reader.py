@@ -0,0 +1,310 @@
+#! /usr/bin/env python3.3
+"""Read many Git blobs, one after another, without paying per-blob
+setup costs or copying blob content more than once.
+
+p4gf_git.get_blob() is fine for one blob. It is not fine for the
+200,000 blobs of a first push: pygit2 read_raw() returns one copy,
+cat_file() glues a header onto the front of a second copy, and
+get_blob() slices that header back off into a third copy.
+
+A BlobReader returns a memoryview of just the blob content, no header.
+
+Expected call sequence:
+
+    with create_blob_reader(repo, how) as reader:
+        for sha1 in ...:
+            mv = reader.get(sha1)
+            ... use mv ...
+
+The memoryview that get() returns is valid only until your next call to
+get() or close(). Some readers reuse a single buffer for every blob. Copy
+it with bytes(mv) if you must keep it longer.
+"""
+import hashlib
+import logging
+import subprocess
+import time
+
+import pygit2
+
+import p4gf_config
+import p4gf_const
+import p4gf_git
+from   p4gf_l10n      import _, NTR
+import p4gf_log
+import p4gf_proc
+import p4gf_util
+
+LOG = logging.getLogger(__name__)
+
+                        # Values for p4gf_config KEY_FAST_PUSH_BLOB_READER.
+HOW_GET_BLOB       = p4gf_config.VALUE_FAST_PUSH_BLOB_READER_GET_BLOB
+HOW_ODB            = p4gf_config.VALUE_FAST_PUSH_BLOB_READER_ODB
+HOW_CAT_FILE_BATCH = p4gf_config.VALUE_FAST_PUSH_BLOB_READER_CAT_FILE_BATCH
+HOW_DEFAULT        = HOW_CAT_FILE_BATCH
+HOW_LIST           = [HOW_GET_BLOB, HOW_ODB, HOW_CAT_FILE_BATCH]
+
+                        # How many bytes to copy at a time when write_to()
+                        # streams a blob to a file.
+_CHUNK_BYTE_CT = 1024 * 1024
+
+
+def create_blob_reader(view_repo, how=HOW_DEFAULT):
+    """Factory: return a BlobReader instance.
+
+    :param view_repo: pygit2.Repository
+    :param how:       one of HOW_LIST. Unknown values get HOW_DEFAULT.
+    """
+    if how not in HOW_LIST:
+        LOG.warning("Unknown blob reader '{how}', using '{default}'"
+                    .format(how=how, default=HOW_DEFAULT))
+        how = HOW_DEFAULT
+    LOG.debug("create_blob_reader() {}".format(how))
+    if how == HOW_GET_BLOB:
+        return GetBlobReader(view_repo)
+    if how == HOW_ODB:
+        return OdbBlobReader(view_repo)
+    return CatFileBatchBlobReader(view_repo)
+
+
+class BlobReader:
+    """Base class for something that returns blob content, one blob at a
+    time, as a header-free memoryview.
+    """
+    def __init__(self, view_repo):
+        self.view_repo = view_repo
+        self.blob_ct   = 0
+        self.byte_ct   = 0
+
+    def get(self, sha1):
+        """Return a memoryview of the blob's raw content, no header.
+
+        Valid only until the next call to get() or close().
+        Raise KeyError if no such blob.
+        """
+        mv = self._get(sha1)
+        self.blob_ct += 1
+        self.byte_ct += len(mv)
+        return mv
+
+    def _get(self, sha1):
+        """Subclass implementation of get()."""
+        raise NotImplementedError()
+
+    def write_to(self, sha1, fout):
+        """Write the blob's raw content to binary file object fout.
+
+        Return the number of bytes written.
+        Raise KeyError if no such blob.
+        """
+        mv = self.get(sha1)
+        fout.write(mv)
+        return len(mv)
+
+    def close(self):
+        """Release any resources. Safe to call more than once."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+        return False  # False = do not squelch exception
+
+    def __str__(self):
+        return NTR("{klass} blobs={blob_ct:,} bytes={byte_ct:,}").format(
+                      klass   = type(self).__name__
+                    , blob_ct = self.blob_ct
+                    , byte_ct = self.byte_ct )
+
+
+class GetBlobReader(BlobReader):
+    """Today's path: p4gf_git.get_blob(), three copies per blob.
+
+    Here only so that we can switch back to it via p4gf_config, and
+    so that the benchmark has something to compare against.
+    """
+    def _get(self, sha1):
+        if sha1 not in self.view_repo:
+            raise KeyError(sha1)
+        return memoryview(p4gf_git.get_blob(sha1, self.view_repo))
+
+
+class OdbBlobReader(BlobReader):
+    """In-process pygit2 object database read.
+
+    One copy per blob: the bytes object that libgit2 inflates into.
+    No subprocess, but each read pays for libgit2's pack lookup and
+    inflate while holding the GIL.
+    """
+    def _get(self, sha1):
+        if sha1 == p4gf_const.EMPTY_BLOB_SHA1:
+            return memoryview(b'')
+        git_object = self.view_repo.get(sha1)
+        if not git_object:
+            raise KeyError(sha1)
+        return memoryview(git_object.read_raw())
+
+
+class CatFileBatchBlobReader(BlobReader):
+    """One long-lived `git cat-file --batch` child process, fed one sha1
+    at a time, content read straight into a single reusable buffer.
+
+    Zero copies per blob once the buffer has grown to fit the largest
+    blob seen so far. Git's own pack reader and delta base cache do the
+    work, outside of our GIL.
+
+    We launch the child with subprocess directly rather than through
+    p4gf_proc: p4gf_proc's runner only knows how to run a command to
+    completion. Create this reader early, before the caller's memory
+    grows, for the same fork() cost reasons that p4gf_proc exists.
+    """
+    def __init__(self, view_repo):
+        BlobReader.__init__(self, view_repo)
+        self._proc   = None
+        self._buf    = bytearray(64 * 1024)
+        self._start()
+
+    def _start(self):
+        """Launch git-cat-file."""
+        cmd = p4gf_proc.translate_git_cmd(
+                    [ 'git', '--git-dir=' + self.view_repo.path
+                    , 'cat-file', '--batch'])
+        logging.getLogger("cmd.cmd").debug(' '.join(cmd))
+        self._proc = subprocess.Popen( cmd
+                                     , stdin           = subprocess.PIPE
+                                     , stdout          = subprocess.PIPE
+                                     , restore_signals = False )
+        LOG.debug("CatFileBatchBlobReader started pid={}"
+                  .format(self._proc.pid))
+
+    def _get(self, sha1):
+        size = self._header(sha1)
+        mv = self._read_into(size + 1)             # content + trailing LF
+        return mv[:size]
+
+    def _header(self, sha1):
+        """Request one blob, read its header, return its content size.
+
+        Leaves the content, plus a trailing LF, for the caller to read.
+        """
+        if not self._proc:
+            raise RuntimeError(_("git cat-file --batch reader already closed."))
+        self._proc.stdin.write(sha1.encode() + b'\n')
+        self._proc.stdin.flush()
+
+                        # <sha1> SP <type> SP <size> LF
+                        # <sha1> SP missing LF
+        header = self._proc.stdout.readline()
+        if not header:
+            raise RuntimeError(_("git cat-file --batch exited unexpectedly."))
+        fields = header.split()
+        if len(fields) != 3:
+            raise KeyError(sha1)
+        if fields[1] != b'blob':
+            self._read_into(int(fields[2]) + 1)    # discard non-blob + LF
+            raise KeyError(sha1)
+        return int(fields[2])
+
+    def write_to(self, sha1, fout):
+        """Stream the blob from git-cat-file to fout, _CHUNK_BYTE_CT bytes
+        at a time. Never holds the whole blob in memory, never grows our
+        reusable buffer past one chunk.
+        """
+        size = self._header(sha1)
+        remaining = size
+        while remaining:
+            mv = self._read_into(min(remaining, _CHUNK_BYTE_CT))
+            fout.write(mv)
+            remaining -= len(mv)
+        self._read_into(1)                         # trailing LF
+        self.blob_ct += 1
+        self.byte_ct += size
+        return size
+
+    def _read_into(self, byte_ct):
+        """Fill the first byte_ct bytes of our buffer from git-cat-file's
+        stdout. Return a memoryview of those bytes.
+        """
+        if len(self._buf) < byte_ct:
+            self._buf = bytearray(byte_ct)
+        mv   = memoryview(self._buf)[:byte_ct]
+        got  = 0
+        while got < byte_ct:
+            n = self._proc.stdout.readinto(mv[got:])
+            if not n:
+                raise RuntimeError(_("git cat-file --batch exited unexpectedly."))
+            got += n
+        return mv
+
+    def close(self):
+        if not self._proc:
+            return
+        try:
+            self._proc.stdin.close()
+            self._proc.stdout.close()
+            ec = self._proc.wait()
+            LOG.debug("CatFileBatchBlobReader exit={ec} {s}"
+                      .format(ec=ec, s=self))
+        except (IOError, OSError) as e:
+            LOG.warning("CatFileBatchBlobReader close failed: {}".format(e))
+        self._proc = None
+
+
+# -- benchmark ----------------------------------------------------------------
+
+def _list_blob_sha1s(git_dir, max_ct):
+    """Return a list of up to max_ct blob sha1s, in 'git rev-list --objects'
+    order, which is close to the order that fast_push requests them.
+    """
+    cmd = ['git', '--git-dir=' + git_dir, 'rev-list', '--objects', '--all']
+    p = p4gf_proc.popen(cmd)
+    sha1_list = [line.split()[0] for line in p['out'].splitlines()
+                 if ' ' in line]          # trees and blobs have a path
+    cmd = ['git', '--git-dir=' + git_dir, 'cat-file', '--batch-check']
+    p = p4gf_proc.popen(cmd, stdin='\n'.join(sha1_list) + '\n')
+    blobs = [line.split()[0] for line in p['out'].splitlines()
+             if line.split()[1:2] == ['blob']]
+    if max_ct:
+        blobs = blobs[:max_ct]
+    return blobs
+
+
+def _bench_one(view_repo, how, sha1_list):
+    """Read every blob in sha1_list, md5 it as fast_push would.
+    Return (seconds, reader).
+    """
+    start = time.time()
+    with create_blob_reader(view_repo, how) as reader:
+        for sha1 in sha1_list:
+            hashlib.md5(reader.get(sha1)).hexdigest()
+    return (time.time() - start, reader)
+
+
+def main():
+    """Compare each blob reader against a Git repo's blobs."""
+    parser = p4gf_util.create_arg_parser(
+            desc=_("Time each blob reader against the blobs in a Git repo."))
+    parser.add_argument('git_dir', metavar='<git-dir>')
+    parser.add_argument('--max', type=int, default=0,
+                        help=_('read at most this many blobs'))
+    parser.add_argument('--how', nargs='*', default=HOW_LIST,
+                        choices=HOW_LIST)
+    args = parser.parse_args()
+
+    with p4gf_log.ExceptionLogger():
+        p4gf_proc.init()
+        sha1_list = _list_blob_sha1s(args.git_dir, args.max)
+        view_repo = pygit2.Repository(args.git_dir)
+        for how in args.how:
+            secs, reader = _bench_one(view_repo, how, sha1_list)
+            print(NTR("{how:<15} {secs:8.3f} seconds {rate:>12,} blobs/second  {r}")
+                  .format( how  = how
+                         , secs = secs
+                         , rate = int(reader.blob_ct / secs) if secs else 0
+                         , r    = reader ))
+
+
+if __name__ == "__main__":
+    main()
@@ -96,6 +96,67 @@ def to_histogram(coll, bucket_ct=10, bucket_prefix=[1, 2, 5], log=False):
     return hist
 
 
+def bucket_end_logarithmic(val):
+    """Return the end of the 1, 2, 5, 10, 20, 50... bucket that holds val."""
+    end = 1
+    while True:
+        for k in [1, 2, 5]:
+            if val <= k * end:
+                return k * end
+        end *= 10
+
+
+class LogHistogram:
+
+    """A running histogram: logarithmic bucket counts, plus count, total
+    and max of every value added.
+
+    Memory stays fixed no matter how many values we add, so long-lived
+    daemon processes can keep one without keeping every sample.
+    """
+
+    def __init__(self):
+        self.ct      = 0
+        self.total   = 0
+        self.max     = 0
+        self.buckets = {}       # bucket end ==> count
+
+    def add(self, val):
+        """Count one value."""
+        self.ct    += 1
+        self.total += val
+        if self.max < val:
+            self.max = val
+        be = bucket_end_logarithmic(val)
+        self.buckets[be] = self.buckets.get(be, 0) + 1
+
+    def percentile(self, pct):
+        """Return the end of the bucket that holds the value pct percent
+        of the way through all values. An upper bound, never above max.
+        """
+        want = self.ct * pct / 100.0
+        seen = 0
+        for be in sorted(self.buckets):
+            seen += self.buckets[be]
+            if want < seen:
+                return min(be, self.max)
+        return self.max
+
+    def to_histogram(self):
+        """Return a {bucket end: count} dict for to_lines(), including
+        any empty buckets below the highest.
+        """
+        if not self.buckets:
+            return {}
+        top = max(self.buckets)
+        hist = {}
+        be = 1
+        while be <= top:
+            hist[be] = self.buckets.get(be, 0)
+            be = bucket_end_logarithmic(be + 1)
+        return hist
+
+
 def bar_of_stars(nom, denom, max_stars=60):
     """Return a string of *, suitable for a bar for a bar graph."""
     if not (denom and max_stars):
@@ -0,0 +1,197 @@
+#! /usr/bin/env python3.3
+"""Load test for the stand-alone LFS/HTTP server.
+
+Sends many concurrent Git LFS requests to a running server, or to one we
+start ourselves, and reports throughput and latency percentiles. Use it
+to compare plain --port serving against --workers N.
+
+    p4gf_http_load.py --url http://localhost:8080/~alice/myrepo \\
+                      --oids oids.txt --clients 32 --requests 5000
+
+    p4gf_http_load.py --start --workers 8 --p4d-root /tmp/p4root \\
+                      --url http://localhost:8080/~alice/myrepo --oids oids.txt
+
+--p4d-root runs the server against a stand-in Perforce server: an
+'rsh:' P4PORT that starts a private p4d on the given server root for
+each connection. No p4d daemon, no network. The server root must already
+hold a Git Fusion repo with Git LFS enabled and the listed objects.
+
+Each request is one of:
+  get    GET  .../info/lfs/objects/<oid>         (content)
+  meta   GET  .../info/lfs/objects/<oid>         (Accept: LFS JSON)
+  batch  POST .../info/lfs/objects/batch         (--batch-size oids)
+"""
+from   concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+
+from   p4gf_l10n import _, NTR
+import p4gf_log
+import p4gf_util
+
+_CONTENT_TYPE_LFS_JSON = 'application/vnd.git-lfs+json'
+_HOW_LIST = [NTR('get'), NTR('meta'), NTR('batch')]
+
+
+class Result:
+    """One request's outcome."""
+
+    def __init__(self, seconds, status, byte_ct):
+        self.seconds = seconds
+        self.status  = status
+        self.byte_ct = byte_ct
+
+
+def _request(url, how, oid_list):
+    """Send one request. Return a Result."""
+    u = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=300)
+    path = u.path.rstrip('/') + '/info/lfs/objects'
+    start = time.time()
+    try:
+        if how == 'batch':
+            body = json.dumps({ 'operation' : 'download'
+                              , 'objects'   : [{'oid': o, 'size': 0}
+                                               for o in oid_list] })
+            conn.request('POST', path + '/batch', body=body.encode('utf-8'),
+                         headers={ 'Accept'       : _CONTENT_TYPE_LFS_JSON
+                                 , 'Content-Type' : _CONTENT_TYPE_LFS_JSON })
+        else:
+            accept = _CONTENT_TYPE_LFS_JSON if how == 'meta' \
+                     else 'application/octet-stream'
+            conn.request('GET', path + '/' + oid_list[0],
+                         headers={'Accept': accept})
+        resp = conn.getresponse()
+        byte_ct = 0
+        while True:
+            buf = resp.read(65536)
+            if not buf:
+                break
+            byte_ct += len(buf)
+        return Result(time.time() - start, resp.status, byte_ct)
+    except OSError:
+        return Result(time.time() - start, None, 0)
+    finally:
+        conn.close()
+
+
+def _percentile(sorted_list, pct):
+    """Return the pct-th percentile of an already sorted list."""
+    if not sorted_list:
+        return 0.0
+    i = min(len(sorted_list) - 1, int(len(sorted_list) * pct / 100))
+    return sorted_list[i]
+
+
+def _report(how, clients, results, wall_seconds):
+    """Print one line of throughput and latency figures."""
+    ok = sorted(r.seconds for r in results if r.status == 200)
+    err_ct = len(results) - len(ok)
+    mb = sum(r.byte_ct for r in results) / (1024 * 1024)
+    print(NTR("{how:<5} clients={c:<4} requests={n:>7,} errors={e:>5,}"
+              "  {rps:>8.1f} req/s {mbps:>8.1f} MB/s"
+              "  p50={p50:.3f}s p90={p90:.3f}s p99={p99:.3f}s max={mx:.3f}s")
+          .format( how  = how
+                 , c    = clients
+                 , n    = len(results)
+                 , e    = err_ct
+                 , rps  = len(results) / wall_seconds if wall_seconds else 0
+                 , mbps = mb / wall_seconds if wall_seconds else 0
+                 , p50  = _percentile(ok, 50)
+                 , p90  = _percentile(ok, 90)
+                 , p99  = _percentile(ok, 99)
+                 , mx   = ok[-1] if ok else 0.0 ))
+
+
+def _run(args, oid_list):
+    """Send args.requests requests from args.clients threads."""
+    def _oids_for(i):
+        """Return the oids for request number i."""
+        if args.how == 'batch':
+            return [oid_list[(i + j) % len(oid_list)]
+                    for j in range(args.batch_size)]
+        return [oid_list[i % len(oid_list)]]
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(_request, args.url, args.how, _oids_for(i))
+                   for i in range(args.requests)]
+        results = [f.result() for f in futures]
+    _report(args.how, args.clients, results, time.time() - start)
+
+
+def _start_server(args):
+    """Launch p4gf_lfs_http_server.py and wait for it to listen."""
+    env = os.environ.copy()
+    if args.p4d_root:
+        env['P4PORT'] = NTR('rsh:p4d -r {root} -L log -i').format(root=args.p4d_root)
+    port = urllib.parse.urlsplit(args.url).port
+    cmd = [ sys.executable
+          , os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'p4gf_lfs_http_server.py')
+          , '--port', str(port) ]
+    if args.workers:
+        cmd += ['--workers', str(args.workers)]
+    proc = subprocess.Popen(cmd, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        probe = http.client.HTTPConnection('localhost', port, timeout=1)
+        try:
+            probe.connect()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            probe.close()
+    proc.terminate()
+    raise RuntimeError(_('server did not start listening on port {port}')
+                       .format(port=port))
+
+
+def main():
+    """Parse the command line, send the requests, report."""
+    parser = p4gf_util.create_arg_parser(
+            desc=_("Load test the Git Fusion LFS/HTTP server."))
+    parser.add_argument('--url', required=True,
+                        help=_('repo URL, such as http://host:port/~user/repo'))
+    parser.add_argument('--oids', required=True,
+                        help=_('file with one LFS oid per line'))
+    parser.add_argument('--how', choices=_HOW_LIST, default='get')
+    parser.add_argument('--clients', type=int, default=16,
+                        help=_('concurrent client connections'))
+    parser.add_argument('--requests', type=int, default=1000,
+                        help=_('total requests to send'))
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help=_('oids per batch request'))
+    parser.add_argument('--start', action='store_true',
+                        help=_('start p4gf_lfs_http_server.py on the --url port'))
+    parser.add_argument('--workers', type=int, default=0,
+                        help=_('with --start, pre-forked worker count'))
+    parser.add_argument('--p4d-root',
+                        help=_('with --start, use a stand-in rsh p4d on this'
+                               ' server root'))
+    args = parser.parse_args()
+
+    with open(args.oids) as f:
+        oid_list = [line.strip() for line in f if line.strip()]
+    if not oid_list:
+        sys.stderr.write(_('no oids in {path}\n').format(path=args.oids))
+        sys.exit(1)
+
+    with p4gf_log.ExceptionLogger():
+        proc = _start_server(args) if args.start else None
+        try:
+            _run(args, oid_list)
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
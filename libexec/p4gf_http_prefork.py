@@ -0,0 +1,119 @@
+#! /usr/bin/env python3.3
+"""Pre-forked worker processes for the stand-alone HTTP servers.
+
+p4gf_http_server.py and p4gf_lfs_http_server.py, when run with --port,
+serve from wsgiref.simple_server: one request at a time, in one process.
+Run under a web server as CGI instead, and every request pays to start
+Python, import Git Fusion, read the environment config, and connect to
+Perforce.
+
+With --workers N, the parent binds the listening socket, then forks N
+workers that each accept connections on it. Each worker stays up across
+requests, and keeps:
+
+* one Perforce connection with its temp client (p4gf_create_p4),
+* printed copies of the config files, re-printed only when Perforce has
+  a newer revision (p4gf_config).
+
+Workers are processes, not threads. Request handling changes os.environ,
+the current working directory, and signal handlers, all of which are
+shared by every thread in a process.
+
+The parent restarts any worker that exits, including workers that retire
+after --max-requests requests. On a terminating signal the parent stops
+every worker and exits.
+"""
+import logging
+import os
+import signal
+import sys
+import time
+
+import p4gf_config
+import p4gf_create_p4
+import p4gf_proc
+
+LOG = logging.getLogger(__name__)
+
+                        # Restart workers no faster than this, in case they
+                        # die as soon as they start.
+_MIN_WORKER_LIFE_SECONDS = 1.0
+
+_TERM_SIGNALS = [ signal.SIGHUP, signal.SIGINT, signal.SIGQUIT
+                , signal.SIGTERM, signal.SIGTSTP ]
+
+
+def init_worker():
+    """Turn on the per-process caches that pay off only when one process
+    serves many requests.
+    """
+    p4gf_create_p4.keep_temp_client()
+    p4gf_config.enable_print_cache()
+
+
+def serve_forever(httpd, worker_ct, max_requests=0):
+    """Fork worker_ct workers to serve httpd's requests. Never return.
+
+    :param httpd:        a bound, listening socketserver.
+    :param worker_ct:    how many workers to keep running.
+    :param max_requests: retire each worker after this many requests,
+                         or 0 to keep each worker forever.
+    """
+    workers = {}            # pid ==> start time
+
+    def _signal_handler(signum, _frame):
+        """Stop every worker, then exit."""
+        LOG.info("Received signal %s, pid=%s, stopping %s workers",
+                 signum, os.getpid(), len(workers))
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        httpd.server_close()
+        sys.exit(0)
+    for signum in _TERM_SIGNALS:
+        signal.signal(signum, _signal_handler)
+
+    while True:
+        while len(workers) < worker_ct:
+            pid = os.fork()
+            if pid == 0:
+                _run_worker(httpd, max_requests)
+            workers[pid] = time.time()
+            LOG.debug("serve_forever() started worker pid=%s", pid)
+        (pid, status) = os.wait()
+        start = workers.pop(pid, None)
+        if start is None:
+            continue
+        LOG.info("HTTP worker pid=%s exited, status=%s", pid, status)
+        life = time.time() - start
+        if life < _MIN_WORKER_LIFE_SECONDS:
+            time.sleep(_MIN_WORKER_LIFE_SECONDS - life)
+
+
+def _run_worker(httpd, max_requests):
+    """Child process: serve requests until retired or signaled."""
+    for signum in _TERM_SIGNALS:
+        signal.signal(signum, signal.SIG_DFL)
+    ec = 0
+    try:
+        init_worker()
+        LOG.info("HTTP worker started, pid=%s", os.getpid())
+        request_ct = 0
+        while not max_requests or request_ct < max_requests:
+            httpd.handle_request()
+                        # Whatever this request did not release, the next
+                        # request may reuse.
+            p4gf_create_p4.return_kept_temp_client()
+            request_ct += 1
+    except Exception:   # pylint: disable=broad-except
+        LOG.exception("HTTP worker failed, pid=%s", os.getpid())
+        ec = 1
+    finally:
+        p4gf_create_p4.close_kept_temp_client()
+        p4gf_create_p4.close_all()
+        p4gf_proc.stop()
+    # Skip the atexit handlers we inherited from the parent: they are
+    # the parent's to run, and we just ran the one that is ours.
+    os._exit(ec)     # pylint: disable=protected-access
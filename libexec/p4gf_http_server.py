@@ -23,6 +23,7 @@ import p4gf_env_config  # pylint: disable=unused-import
 import p4gf_atomic_lock
 import p4gf_const
 import p4gf_http_common
+import p4gf_http_prefork
 from p4gf_l10n import _, NTR, log_l10n
 import p4gf_lfs_http_server
 import p4gf_log
@@ -480,12 +481,13 @@ def _app_wrapper(environ, start_response):
     return p4gf_http_common.wsgi_run_request_handler(handler, start_response)
 
 
-class GitFusionHandler(wsgiref.handlers.SimpleHandler):
+class GitFusionHandler(p4gf_http_common.SendfileMixin, wsgiref.handlers.SimpleHandler):
 
     """Handler subclass.
 
     A WSGI handler that allows for sending data that already includes
     relevant headers, without the need for calling start_response.
+    Sends LFS file content with os.sendfile().
     """
 
     # pylint: disable=too-many-public-methods
@@ -563,14 +565,22 @@ user name. To stop the server, send a terminating signal to the process.
     parser = p4gf_util.create_arg_parser(desc, epilog=epilog)
     parser.add_argument('-p', '--port', type=int,
                         help=_('port on which to listen for HTTP requests'))
+    parser.add_argument('--workers', type=int, default=0,
+                        help=_('with --port, serve from this many pre-forked'
+                               ' worker processes'))
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help=_('with --workers, restart each worker after'
+                               ' this many requests'))
     args = parser.parse_args()
     if args.port:
         LOG.info("Listening for HTTP requests on port %s, pid=%s", args.port, os.getpid())
         httpd = wsgiref.simple_server.make_server(
             '', args.port, _app_wrapper, handler_class=GitFusionRequestHandler)
         print(_('Serving on port {}...').format(args.port))
-        p4gf_http_common.wsgi_install_signal_handler(httpd)
         p4gf_proc.install_stack_dumper()
+        if args.workers:
+            p4gf_http_prefork.serve_forever(httpd, args.workers, args.max_requests)
+        p4gf_http_common.wsgi_install_signal_handler(httpd)
         httpd.serve_forever()
     else:
         # Assume we are running inside a web server...
@@ -0,0 +1,206 @@
+#! /usr/bin/env python3.3
+"""Which Git LFS objects has Perforce already stored, and how large are they?
+
+The LFS batch API hands us up to thousands of oids per request. We used to
+ask Perforce about each one separately: 'p4 files -e' to see if it exists,
+then 'p4 fstat -Ol' for its size. Two round trips per object.
+
+depot_sizes() answers for all of a request's oids with one 'p4 fstat -Ol'
+per chunk of depot paths, and remembers its answers:
+
+* Positive answers stay until evicted. LFS objects are content-addressed:
+  once submitted, an oid's depot file and size never change.
+* Negative answers expire after a few seconds. Another push can submit
+  the object at any time, and forget() drops an answer the moment this
+  process sees the object uploaded.
+
+The caches are per-process. They pay off in long-running servers, and
+cost nothing elsewhere.
+
+Run this module as a script to time lookups for batches of 1 to 10,000
+oids, per-oid versus batched.
+"""
+import binascii
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import P4
+
+import p4gf_bounded_cache
+import p4gf_const
+import p4gf_create_p4
+import p4gf_file_action
+from   p4gf_l10n          import _, NTR
+from   p4gf_lfs_file_spec import LFS_DEPOT_PATH, split_sha256
+import p4gf_log
+import p4gf_util
+
+LOG = logging.getLogger(__name__)
+
+                        # How many depot paths to pass to one 'p4 fstat'.
+                        # Large enough to amortize the round trip, small
+                        # enough to keep each server request short.
+CHUNK_PATH_CT = 500
+
+                        # How long to believe "Perforce does not have it".
+NEGATIVE_TTL_SECONDS = 10
+
+                        # (repo_name, oid) ==> size in bytes
+_POSITIVE = p4gf_bounded_cache.LRUCache( "LFS exists cache", 100 * 1000 )
+                        # (repo_name, oid) ==> time.time() after which
+                        #                      we must ask again
+_NEGATIVE = p4gf_bounded_cache.LRUCache( "LFS missing cache", 10 * 1000 )
+_LOCK     = threading.Lock()
+
+
+def depot_path(repo_name, oid):
+    """Return an LFS object's depot path."""
+    return LFS_DEPOT_PATH.format( P4GF_DEPOT = p4gf_const.P4GF_DEPOT
+                                , repo       = repo_name
+                                , sha256     = split_sha256(oid) )
+
+
+def depot_sizes(p4, repo_name, oid_list):
+    """Return a dict of oid ==> size in bytes, for each oid in oid_list
+    that Perforce has stored for repo_name. Omit oids that Perforce lacks.
+    """
+    result   = {}
+    ask_list = []
+    now      = time.time()
+    with _LOCK:
+        for oid in oid_list:
+            key  = (repo_name, oid)
+            size = _POSITIVE.get(key)
+            if size is not None:
+                result[oid] = size
+                continue
+            expire = _NEGATIVE.get(key)
+            if expire is not None and now < expire:
+                continue
+            ask_list.append(oid)
+
+    if ask_list:
+        found = _fstat_sizes(p4, repo_name, ask_list)
+        expire = time.time() + NEGATIVE_TTL_SECONDS
+        with _LOCK:
+            for oid in ask_list:
+                key = (repo_name, oid)
+                if oid in found:
+                    _POSITIVE.put(key, found[oid])
+                    _NEGATIVE.pop(key)
+                else:
+                    _NEGATIVE.put(key, expire)
+        result.update(found)
+    LOG.debug("depot_sizes() oids={} asked={} found={}"
+              .format(len(oid_list), len(ask_list), len(result)))
+    return result
+
+
+def forget(repo_name, oid):
+    """Drop any cached "Perforce does not have it" for oid.
+
+    Call when a client uploads oid, so that nothing in this process
+    keeps believing a stale negative once the object is submitted.
+    """
+    with _LOCK:
+        _NEGATIVE.pop((repo_name, oid))
+
+
+def _fstat_sizes(p4, repo_name, oid_list):
+    """Ask Perforce, CHUNK_PATH_CT oids at a time.
+
+    Return a dict of oid ==> size for each non-deleted depot file found.
+    """
+    path_to_oid = {depot_path(repo_name, oid): oid for oid in oid_list}
+    path_list   = list(path_to_oid.keys())
+    result      = {}
+                        # RAISE_NONE: each missing path earns a
+                        # "no such file(s)" warning, and that is fine.
+    with p4.at_exception_level(P4.P4.RAISE_NONE):
+        for i in range(0, len(path_list), CHUNK_PATH_CT):
+            chunk = path_list[i:i + CHUNK_PATH_CT]
+            r = p4.run('fstat', '-Ol', '-T', 'depotFile,headAction,fileSize'
+                      , chunk)
+            for rr in r:
+                if not (isinstance(rr, dict) and 'depotFile' in rr):
+                    continue
+                if rr.get('headAction') in p4gf_file_action.DELETE_ACTIONS:
+                    continue
+                oid = path_to_oid.get(rr['depotFile'])
+                if oid and 'fileSize' in rr:
+                    result[oid] = int(rr['fileSize'])
+    return result
+
+
+def _clear_caches():
+    """Forget everything, so each benchmark pass starts cold."""
+    with _LOCK:
+        _POSITIVE.clear()
+        _NEGATIVE.clear()
+
+
+def _list_oids(p4, repo_name, max_ct):
+    """Return up to max_ct oids that Perforce has stored for repo_name."""
+    path = NTR('//{depot}/objects/repos/{repo}/lfs/sha256/...') \
+           .format(depot=p4gf_const.P4GF_DEPOT, repo=repo_name)
+    with p4.at_exception_level(P4.P4.RAISE_NONE):
+        r = p4.run('files', '-e', '-m', max_ct, path)
+    prefix_len = len(path) - len('...')
+    return [rr['depotFile'][prefix_len:].replace('/', '')
+            for rr in r if isinstance(rr, dict) and 'depotFile' in rr]
+
+
+def _bench_one(p4, repo_name, oid_list, batched):
+    """Look up every oid, one at a time or all at once. Return seconds."""
+    _clear_caches()
+    start = time.time()
+    if batched:
+        depot_sizes(p4, repo_name, oid_list)
+    else:
+        for oid in oid_list:
+            _fstat_sizes(p4, repo_name, [oid])
+    return time.time() - start
+
+
+def main():
+    """Time per-oid versus batched existence checks."""
+    parser = p4gf_util.create_arg_parser(
+            desc=_("Time Git LFS existence checks, per-oid versus batched."))
+    parser.add_argument('repo', metavar='<repo>')
+    parser.add_argument('--sizes', type=int, nargs='*',
+                        default=[1, 10, 100, 1000, 10000],
+                        help=_('batch sizes to time'))
+    parser.add_argument('--missing-pct', type=int, default=50,
+                        help=_('percentage of each batch that does not exist'))
+    args = parser.parse_args()
+
+    with p4gf_log.ExceptionLogger():
+        p4 = p4gf_create_p4.create_p4_temp_client()
+        if not p4:
+            sys.exit(2)
+        stored = _list_oids(p4, args.repo, max(args.sizes))
+        for size in args.sizes:
+            missing_ct = size * args.missing_pct // 100
+            oid_list = stored[:size - missing_ct]
+            oid_list += [binascii.hexlify(os.urandom(32)).decode()
+                         for _i in range(size - len(oid_list))]
+            random.shuffle(oid_list)
+            each  = _bench_one(p4, args.repo, oid_list, batched=False) \
+                    if size <= 1000 else None
+            batch = _bench_one(p4, args.repo, oid_list, batched=True)
+            print(NTR("{size:>6,} oids  per-oid {each:>9}  batched {batch:8.3f}s"
+                      "  {rate:>10,} oids/second")
+                  .format( size  = size
+                         , each  = "{:8.3f}s".format(each) if each is not None
+                                   else NTR('skipped')
+                         , batch = batch
+                         , rate  = int(size / batch) if batch else 0 ))
+        p4gf_create_p4.destroy(p4)
+
+
+if __name__ == "__main__":
+    main()
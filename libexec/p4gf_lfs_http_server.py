@@ -11,10 +11,12 @@ import re
 import shutil
 import socket
 import sys
-import wsgiref.handlers
+import tempfile
 import wsgiref.simple_server
 import wsgiref.util
 
+from P4 import OutputHandler
+
 # Ensure the system path includes our modules.
 try:
     import p4gf_version_3
@@ -26,7 +28,9 @@ import p4gf_config
 import p4gf_const
 import p4gf_env_config  # pylint: disable=unused-import
 import p4gf_http_common
+import p4gf_http_prefork
 from p4gf_l10n import _, log_l10n
+import p4gf_lfs_existence
 from p4gf_lfs_file_spec import LFSFileSpec
 import p4gf_log
 import p4gf_proc
@@ -61,6 +65,8 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
         super(LargeFileHttpServer, self).__init__(environ)
         self._start_response = start_response
         self._input_file = input_file
+        # WSGI iterable to return instead of write()ing, if any.
+        self.response_body = None
 
     def _load_request_data(self):
         """Read the request data (from the temporary file).
@@ -107,9 +113,10 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
             return
 
         # Ensure the repository has already been initialized as
-        # initialization via LFS request is forbidden.
+        # initialization via LFS request is forbidden. Keep what we load,
+        # so that self.repo_config need not load it again.
         try:
-            p4gf_config.RepoConfig.from_depot_file(
+            self._repo_config = p4gf_config.RepoConfig.from_depot_file(
                 self.repo_name, self.p4, create_if_missing=False)
         except p4gf_config.ConfigLoadError:
             raise p4gf_server_common.BadRequestException(_("Repo not yet initialized\n"))
@@ -235,7 +242,7 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
 
         # Check if object already exists in our cache or the depot.
         lfs_spec = LFSFileSpec(oid=oid)
-        if lfs_spec.exists_in_cache(ctx) or lfs_spec.exists_in_depot(ctx):
+        if lfs_spec.exists_in_cache(ctx) or _depot_size(ctx, oid) is not None:
             write = self.start_response(200, [])
             write(''.encode('utf-8'))
             return
@@ -287,6 +294,7 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
                     # Simply rename/move the file we saved earlier.
                     shutil.move(self._input_file, fname)
                     os.close(fd)
+        p4gf_lfs_existence.forget(ctx.config.repo_name, oid)
         write = self.start_response(200, [])
         write(''.encode('utf-8'))
         LOG.debug("LFS put content complete: %s", oid)
@@ -298,12 +306,12 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
         LOG.debug("LFS GET metadata request: %s", oid)
         lfs_spec = LFSFileSpec(oid=oid)
         if not lfs_spec.exists_in_cache(ctx):
-            if not lfs_spec.exists_in_depot(ctx):
+            file_size = _depot_size(ctx, oid)
+            if file_size is None:
                 LOG.debug('LFS GET content missing for %s', oid)
                 write = self.start_response(404, [])
                 write(''.encode('utf-8'))
                 return
-            file_size = _get_object_size(ctx, lfs_spec)
         else:
             fname = lfs_spec.cache_path(ctx)
             file_size = os.stat(fname).st_size
@@ -331,37 +339,75 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
         write(body.encode('utf-8'))
 
     def _process_lfs_get_content(self, ctx):
-        """Process the GET content request from an LFS client."""
+        """Process the GET content request from an LFS client.
+
+        Send cached content with the server's file wrapper (sendfile()
+        where possible). On a cache miss, stream 'p4 print' output to the
+        client and into the cache at the same time. Either way, honor a
+        single-range Range header so that clients can resume downloads.
+        """
         self._check_perms()
         oid = os.path.basename(self.environ['PATH_INFO'])
         LOG.debug("LFS GET content request: %s", oid)
         lfs_spec = LFSFileSpec(oid=oid)
-        if not lfs_spec.exists_in_cache(ctx):
-            if not lfs_spec.exists_in_depot(ctx):
-                LOG.debug('LFS GET content missing for %s', oid)
-                write = self.start_response(404, [])
-                write(''.encode('utf-8'))
-                return
-            depot_path = lfs_spec.depot_path(ctx)
-            cache_path = lfs_spec.cache_path(ctx)
-            with p4gf_util.raw_encoding(ctx.p4):
-                ctx.p4run('print', '-q', '-o', cache_path, depot_path)
-        else:
-            cache_path = lfs_spec.cache_path(ctx)
-        file_size = os.stat(cache_path).st_size
+        cache_path = lfs_spec.cache_path(ctx)
+        try:
+            file_size = os.stat(cache_path).st_size
+            in_cache = True
+        except FileNotFoundError:
+            file_size = _depot_size(ctx, oid)
+            in_cache = False
+        if file_size is None:
+            LOG.debug('LFS GET content missing for %s', oid)
+            write = self.start_response(404, [])
+            write(''.encode('utf-8'))
+            return
+        try:
+            byte_range = p4gf_http_common.parse_range(
+                self.environ.get('HTTP_RANGE'), file_size)
+        except ValueError:
+            LOG.debug('LFS GET unsatisfiable range %s for %s',
+                      self.environ.get('HTTP_RANGE'), oid)
+            write = self.start_response(416, [
+                ('Content-Range', 'bytes */{}'.format(file_size))])
+            write(''.encode('utf-8'))
+            return
         headers = [
             ('Content-Type', 'application/octet-stream'),
-            ('Content-Length', str(file_size))
+            ('Accept-Ranges', 'bytes')
         ]
-        write = self.start_response(200, headers)
-        with open(cache_path, 'rb') as fobj:
-            while True:
-                buf = fobj.read(131072)
-                if not buf:
-                    break
-                write(buf)
+        if byte_range:
+            (offset, length) = byte_range
+            headers.append(('Content-Range', 'bytes {}-{}/{}'.format(
+                offset, offset + length - 1, file_size)))
+            status = 206
+        else:
+            (offset, length) = (0, file_size)
+            status = 200
+        headers.append(('Content-Length', str(length)))
+        if in_cache:
+            self.response_body = self._file_wrapper(cache_path, offset, length, file_size)
+            self.start_response(status, headers)
+        else:
+            write = self.start_response(status, headers)
+            _print_to_client_and_cache(ctx, lfs_spec, file_size, write, offset, length)
         LOG.debug("LFS GET content complete: %s", oid)
 
+    def _file_wrapper(self, path, offset, length, file_size):
+        """Return a WSGI iterable for (part of) a file.
+
+        Whole files go through the server's own wsgi.file_wrapper, if it
+        has one. Ranges need our FileRangeWrapper, which our own handlers
+        send with sendfile() and other servers simply iterate.
+        """
+        fobj = open(path, 'rb')
+        server_wrapper = self.environ.get('wsgi.file_wrapper')
+        if (server_wrapper and offset == 0 and length == file_size
+                and server_wrapper is not p4gf_http_common.FileRangeWrapper):
+            return server_wrapper(fobj, p4gf_http_common.CHUNK_SIZE)
+        return p4gf_http_common.FileRangeWrapper(
+            fobj, p4gf_http_common.CHUNK_SIZE, offset, length)
+
     def _process_lfs_batch(self, ctx):
         """Process the batch API request from an LFS client."""
         # Load the HTTP POST payload. It's a JSON text block.
@@ -402,28 +448,40 @@ class LargeFileHttpServer(p4gf_http_common.HttpServer):
         write(body.encode('utf-8'))
 
     def _build_batch_response(self, ctx, request):
-        """Build the response to the batch request."""
+        """Build the response to the batch request.
+
+        Objects in our upload cache need only a local stat(). Ask Perforce
+        about all the rest at once, rather than one object at a time.
+        """
         objects = []
         http_url = self._get_lfs_url()
+        oid_to_size = {}
+        for obj in request['objects']:
+            oid = obj['oid']
+            try:
+                fname = LFSFileSpec(oid=oid).cache_path(ctx)
+                oid_to_size[oid] = os.stat(fname).st_size
+            except FileNotFoundError:
+                pass
+        ask_list = [obj['oid'] for obj in request['objects']
+                    if obj['oid'] not in oid_to_size]
+        if ask_list:
+            oid_to_size.update(p4gf_lfs_existence.depot_sizes(
+                ctx.p4, ctx.config.repo_name, ask_list))
         for obj in request['objects']:
             oid = obj['oid']
             resp = {
                 "oid": oid
             }
             href = _construct_lfs_href(self.environ, http_url, oid)
-            lfs_spec = LFSFileSpec(oid=oid)
-            if not lfs_spec.exists_in_cache(ctx):
-                if not lfs_spec.exists_in_depot(ctx):
-                    resp['actions'] = {
-                        "upload": {
-                            "href": href
-                        }
+            if oid not in oid_to_size:
+                resp['actions'] = {
+                    "upload": {
+                        "href": href
                     }
-                else:
-                    resp['size'] = _get_object_size(ctx, lfs_spec)
+                }
             else:
-                fname = lfs_spec.cache_path(ctx)
-                resp['size'] = os.stat(fname).st_size
+                resp['size'] = oid_to_size[oid]
             if 'actions' not in resp:
                 resp['actions'] = {
                     "download": {
@@ -558,11 +616,117 @@ def _validate_json_object(data):
                          .format(size=size))
 
 
-def _get_object_size(ctx, lfs_spec):
-    """Determine the size of the object stored in Git Fusion."""
-    depot_path = lfs_spec.depot_path(ctx)
-    cmd = ['fstat', '-m1', '-Ol', '-T', 'fileSize', depot_path]
-    return int(p4gf_util.first_value_for_key(ctx.p4run(cmd), 'fileSize'))
+class _TeePrintHandler(OutputHandler):
+
+    """OutputHandler for 'p4 print' of one LFS object: send the requested
+    byte range to the client as it arrives, and copy everything into a
+    temporary file that becomes the cache file once verified.
+    """
+
+    def __init__(self, write, temp_file, offset, length):
+        """Initialize the handler.
+
+        :param write: WSGI write() callable.
+        :param temp_file: binary file object to receive the whole file.
+        :param int offset: first byte to send to the client.
+        :param int length: number of bytes to send to the client.
+
+        """
+        OutputHandler.__init__(self)
+        self.write = write
+        self.temp_file = temp_file
+        self.sha256 = hashlib.sha256()
+        self.pos = 0
+        self.send_begin = offset
+        self.send_end = offset + length
+        self.client_gone = False
+        self.cache_failed = False
+
+    def outputStat(self, _h):
+        """Ignore the file's tagged metadata."""
+        return OutputHandler.HANDLED
+
+    def outputText(self, h):
+        """Content of a file that Perforce considers text."""
+        return self.outputBinary(h)
+
+    def outputBinary(self, h):
+        """Tee one chunk of content to the cache file and the client."""
+        if isinstance(h, str):
+            h = h.encode('utf-8')
+        try:
+            self._cache_chunk(h)
+            begin = max(self.pos, self.send_begin)
+            end = min(self.pos + len(h), self.send_end)
+            if begin < end and not self.client_gone:
+                try:
+                    self.write(h[begin - self.pos:end - self.pos])
+                except OSError as e:
+                    # Keep printing: the cache still wants the content.
+                    LOG.warning("LFS client went away mid-download: %s", e)
+                    self.client_gone = True
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("outputBinary")
+        finally:
+            self.pos += len(h)
+        return OutputHandler.HANDLED
+
+    def _cache_chunk(self, h):
+        """Copy one chunk to the cache file, unless we already failed to.
+
+        A failed cache write (disk full) costs us the cache file, not the
+        client's download.
+        """
+        if self.cache_failed:
+            return
+        try:
+            self.temp_file.write(h)
+            self.sha256.update(h)
+        except OSError as e:
+            LOG.warning("LFS cache write failed, not caching: %s", e)
+            self.cache_failed = True
+
+
+def _print_to_client_and_cache(ctx, lfs_spec, file_size, write, offset, length):
+    """Print an LFS object from Perforce, streaming it to the client while
+    writing it to our cache.
+
+    The cache file appears only after its size and sha256 match the oid:
+    a partial or corrupt print never poisons the cache.
+    """
+    cache_path = lfs_spec.cache_path(ctx)
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=cache_dir, prefix=os.path.basename(cache_path) + '.', delete=False)
+    handler = _TeePrintHandler(write, temp_file, offset, length)
+    try:
+        with p4gf_util.raw_encoding(ctx.p4), ctx.p4.using_handler(handler):
+            ctx.p4run('print', lfs_spec.depot_path(ctx))
+        try:
+            temp_file.close()
+        except OSError as e:
+            LOG.warning("LFS cache write failed, not caching: %s", e)
+            handler.cache_failed = True
+        if handler.cache_failed:
+            LOG.warning("LFS object %s sent but not cached", lfs_spec.oid)
+        elif handler.pos == file_size and handler.sha256.hexdigest() == lfs_spec.oid:
+            os.rename(temp_file.name, cache_path)
+        else:
+            LOG.error("LFS print of %s returned %s bytes sha256=%s, expected %s bytes",
+                      lfs_spec.oid, handler.pos, handler.sha256.hexdigest(), file_size)
+    finally:
+        if not temp_file.closed:
+            temp_file.close()
+        p4gf_http_common.rm_file_quietly(temp_file.name)
+
+
+def _depot_size(ctx, oid):
+    """Return the size of the object stored in Git Fusion's depot,
+    or None if not stored there.
+    """
+    return p4gf_lfs_existence.depot_sizes(
+        ctx.p4, ctx.config.repo_name, [oid]).get(oid)
 
 
 def _construct_lfs_href(environ, base_url, suffix):
@@ -685,6 +849,8 @@ def _wsgi_app(environ, start_response):
     finally:
         p4gf_http_common.rm_file_quietly(input_file)
 
+    if server.response_body is not None:
+        return server.response_body
     return []
 
 
@@ -709,7 +875,7 @@ def _handle_cgi():
         # much of our code expects PATH_INFO to include the portion of the
         # request URI that tells us the name of the repository.
         os.environ['PATH_INFO'] = os.environ['SCRIPT_NAME']
-    handler = wsgiref.handlers.CGIHandler()
+    handler = p4gf_http_common.SendfileCGIHandler()
     handler.run(_wsgi_app)
 
 
@@ -731,13 +897,23 @@ user name. To stop the server, send a terminating signal to the process.
     parser = p4gf_util.create_arg_parser(desc, epilog=epilog)
     parser.add_argument('-p', '--port', type=int,
                         help=_('port on which to listen for LFS reqeuests'))
+    parser.add_argument('--workers', type=int, default=0,
+                        help=_('with --port, serve from this many pre-forked'
+                               ' worker processes'))
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help=_('with --workers, restart each worker after'
+                               ' this many requests'))
     args = parser.parse_args()
     if args.port:
         LOG.info("Listening for LFS-HTTP requests on port %s, pid=%s", args.port, os.getpid())
-        httpd = wsgiref.simple_server.make_server('', args.port, app_wrapper)
+        httpd = wsgiref.simple_server.make_server(
+            '', args.port, app_wrapper,
+            handler_class=p4gf_http_common.SendfileRequestHandler)
         print(_('Serving on port {port}...').format(port=args.port))
-        p4gf_http_common.wsgi_install_signal_handler(httpd)
         p4gf_proc.install_stack_dumper()
+        if args.workers:
+            p4gf_http_prefork.serve_forever(httpd, args.workers, args.max_requests)
+        p4gf_http_common.wsgi_install_signal_handler(httpd)
         httpd.serve_forever()
     else:
         # Assume we are running inside a web server...
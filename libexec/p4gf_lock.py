@@ -1,17 +1,32 @@
 #! /usr/bin/env python3.3
-"""Acquire and release a lock using p4keys."""
+"""Acquire and release a lock using p4keys.
 
+Waiting for a busy lock reads its p4key again and again. Between reads,
+sleep for an exponentially growing, randomly jittered period, so that a
+crowd of waiters neither hammers Perforce nor retries in lockstep. Waiters
+on the same Git Fusion host also wait on a FIFO, which the releasing
+process writes to, so that they wake as soon as the lock is released
+rather than at the end of their sleep.
+"""
+
+import atexit
 import datetime
+import errno
 import json
 import logging
 import os
+import random
+import select
+import threading
 import time
 import traceback
 
 import p4gf_const
+import p4gf_histogram
 import p4gf_p4key as P4Key
 from p4gf_l10n import _
 import p4gf_log
+import p4gf_profiler
 import p4gf_util
 
 LOG = logging.getLogger(__name__)
@@ -19,8 +34,19 @@ LOG = logging.getLogger(__name__)
 # time.sleep() accepts a float, which is how you get sub-second sleep durations.
 MS = 1.0 / 1000.0
 
-# How often we retry to acquire the lock.
-_RETRY_PERIOD = 500 * MS
+# How often we retry to acquire the lock: starting at _MIN_RETRY_PERIOD,
+# doubling after each attempt up to _MAX_RETRY_PERIOD, then jittered down by
+# up to half.
+_MIN_RETRY_PERIOD = 20 * MS
+_MAX_RETRY_PERIOD = 1000 * MS
+
+# Where waiters on this host create their FIFOs, one directory per p4key,
+# one FIFO per waiting thread: "<pid>-<thread id>".
+_WAIT_DIR = "lock-wait"
+
+# label ==> p4gf_histogram.LogHistogram of milliseconds spent waiting.
+_WAIT_MS = {}
+_WAIT_MS_LOCK = threading.Lock()
 
 # Set DEBUG_TRACE to True to have stack traces in the log when acquiring
 # and releasing the locks. Having this on by default makes grepping the
@@ -34,6 +60,156 @@ def _process_start_time():
     return date.isoformat(sep=' ').split('.')[0]
 
 
+class LockWaiter:
+
+    """Sleep between attempts to acquire or release a busy lock.
+
+    Each wait() sleeps longer than the last, up to _MAX_RETRY_PERIOD, but
+    returns early if some process on this host calls notify_waiters() with
+    the same p4key.
+
+    Call done() when finished waiting to remove the FIFO and record the
+    total wait time for the histograms logged at exit. Calling done() again
+    does nothing.
+    """
+
+    def __init__(self, wait_key, label):
+        """Init the waiter. No FIFO until the first wait()."""
+        self.wait_key   = wait_key
+        self.label      = label
+        self.attempt_ct = 0
+        self.start_time = time.time()
+        self._fifo_path = None
+        self._read_fd   = None
+        self._write_fd  = None
+
+    def wait(self):
+        """Sleep until our next attempt, or until notified."""
+        period = min(_MAX_RETRY_PERIOD, _MIN_RETRY_PERIOD * (2 ** self.attempt_ct))
+        period *= random.uniform(0.5, 1.0)
+        self.attempt_ct += 1
+        if self.attempt_ct == 1:
+            self._open_fifo()
+        if self._read_fd is None:
+            time.sleep(period)
+            return
+        readable, _w, _x = select.select([self._read_fd], [], [], period)
+        if readable:
+            LOG.debug3("lock-waiter notified %s", self.wait_key)
+            self._drain()
+
+    def done(self):
+        """Remove our FIFO and record how long we waited."""
+        if self.attempt_ct:
+            _record_wait(self.label, time.time() - self.start_time)
+            self.attempt_ct = 0
+        self._close_fifo()
+
+    def _close_fifo(self):
+        """Close and remove our FIFO, if any."""
+        for fd in (self._read_fd, self._write_fd):
+            if fd is not None:
+                os.close(fd)
+        self._read_fd = self._write_fd = None
+        if self._fifo_path:
+            _unlink(self._fifo_path)
+            self._fifo_path = None
+
+    def _open_fifo(self):
+        """Create and open our FIFO. Fall back to plain sleep on failure."""
+        path = os.path.join( _wait_dir_name(self.wait_key)
+                           , "{}-{}".format(os.getpid(), threading.get_ident()))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _unlink(path)
+            os.mkfifo(path, 0o600)
+            self._fifo_path = path
+            self._read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            # Hold our own write end open so that the FIFO never reads as
+            # end-of-file once a notifier closes its write end.
+            self._write_fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            LOG.debug("lock-waiter cannot use FIFO %s: %s", path, e)
+            self._close_fifo()
+
+    def _drain(self):
+        """Discard all notifications so far."""
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+
+def notify_waiters(wait_key):
+    """Wake any process on this host that waits on wait_key."""
+    dir_name = _wait_dir_name(wait_key)
+    try:
+        names = os.listdir(dir_name)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(dir_name, name)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # No reader: waiter died without cleaning up.
+                _unlink(path)
+            continue
+        try:
+            os.write(fd, b'.')
+        except OSError:
+            pass            # FIFO full: waiter already has plenty of wakeups.
+        finally:
+            os.close(fd)
+
+
+def _wait_dir_name(wait_key):
+    """Return the directory that holds FIFOs of waiters on wait_key."""
+    return os.path.join(p4gf_const.P4GF_HOME, _WAIT_DIR,
+                        wait_key.replace(os.sep, '_'))
+
+
+def _unlink(path):
+    """Remove a file, if it exists."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _record_wait(label, seconds):
+    """Remember one wait's duration for the reports at exit."""
+    with _WAIT_MS_LOCK:
+        if not _WAIT_MS:
+            p4gf_profiler.add_counter_report("p4key-lock waits", _wait_stats_str)
+        _WAIT_MS.setdefault(label, p4gf_histogram.LogHistogram()) \
+            .add(max(1, int(seconds * 1000 + 0.5)))
+
+
+def _wait_stats_str():
+    """Return a one-line summary of lock waits, for p4gf_profiler."""
+    with _WAIT_MS_LOCK:
+        return ", ".join("{label} ct={ct} total={total}ms max={max}ms"
+                         .format( label = label
+                                , ct    = ms.ct
+                                , total = ms.total
+                                , max   = ms.max)
+                         for label, ms in sorted(_WAIT_MS.items()))
+
+
+@atexit.register
+def _log_wait_histograms():
+    """Log a histogram of wait times, one per kind of wait."""
+    for label, ms in sorted(_WAIT_MS.items()):
+        histo = ms.to_histogram()
+        LOG.debug("lock wait histogram: {}: how many waits took N ms?\n"
+                  .format(label)
+                  + "\n".join(p4gf_histogram.to_lines(histo)))
+
+
 class LockBusy(Exception):
 
     """LockBusy is used to signal that a lock could not be acquired.
@@ -92,6 +268,14 @@ class Lock:
         assert not self.has_lock
 
         wait_reporter = p4gf_log.LongWaitReporter("accessing p4key-lock", LOG)
+        waiter = LockWaiter(self.wait_key(), type(self).__name__ + " acquire")
+        try:
+            return self._acquire(wait_reporter, waiter)
+        finally:
+            waiter.done()
+
+    def _acquire(self, wait_reporter, waiter):
+        """Loop until we acquire the lock, or raise LockBusy."""
         while True:
             if self.do_acquire():
                 self.has_lock = True
@@ -119,7 +303,7 @@ class Lock:
             if DEBUG_TRACE:
                 LOG.debug3("lock-waiting stack trace:\n%s",
                            "".join(traceback.format_stack()))
-            time.sleep(_RETRY_PERIOD)
+            waiter.wait()
 
     def release(self):
         """Release a held lock."""
@@ -148,6 +332,10 @@ class Lock:
         # pylint: disable=no-self-use
         raise Exception("Not implemented.")
 
+    def wait_key(self):
+        """Return the p4key whose release wakes our waiters."""
+        return str(self)
+
     def remove_stale_owners(self):
         """Remove stale lock owners and indicate if any change was made.
 
@@ -187,6 +375,7 @@ class SimpleLock(Lock):
     def do_release(self):
         """Release a held lock."""
         P4Key.delete(self.p4, self.lock_key)
+        notify_waiters(self.lock_key)
 
     def __str__(self):
         """For logging purposes."""
@@ -244,6 +433,8 @@ class RepoLock(Lock):
             with self.lock:
                 content = self._add_self(self._read())
                 self._write(content)
+            # Wake any releaser waiting for us to clear 'acquire_pending'.
+            notify_waiters(self.owners_key)
             self._acquire_time = time.time()
             LOG.debug("p4key-lock acquired: %s", self._repo_name)
             return True
@@ -254,6 +445,15 @@ class RepoLock(Lock):
         """Release a held lock."""
         label = "releasing p4key-lock for {}".format(self._repo_name)
         wait_reporter = p4gf_log.LongWaitReporter(label, LOG)
+        waiter = LockWaiter(self.owners_key, "RepoLock release")
+        try:
+            self._release(wait_reporter, waiter)
+        finally:
+            waiter.done()
+        notify_waiters(self.owners_key)
+
+    def _release(self, wait_reporter, waiter):
+        """Loop until no acquire is pending, then remove ourself as owner."""
         while True:
             with self.lock:
                 content = self._read()
@@ -271,7 +471,7 @@ class RepoLock(Lock):
                     LOG.debug("p4key-lock released: %s after %s ms", self._repo_name, td)
                     return
             wait_reporter.been_waiting()
-            time.sleep(_RETRY_PERIOD)
+            waiter.wait()
 
     def remove_stale_owners(self):
         """Remove any lock owners that have gone stale."""
@@ -299,6 +499,7 @@ class RepoLock(Lock):
                 else:
                     content['owners'] = fresh_owners
                     self._write(content)
+                notify_waiters(self.owners_key)
                 return True
         return False
 
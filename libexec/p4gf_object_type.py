@@ -5,7 +5,9 @@
 Checks only the local filesystem for .git-fusion/...
 """
 
+import atexit
 import logging
+import sqlite3
 
 from   p4gf_object_type_change_num_to_commit_cache  import ChangeNumToCommitCache
 import p4gf_branch
@@ -13,6 +15,7 @@ import p4gf_const
 import p4gf_p4key                   as     P4Key
 from   p4gf_l10n                    import NTR
 from   p4gf_object_type_cache       import ObjectTypeCache
+import p4gf_object_type_index
 from   p4gf_object_type_list        import ObjectTypeList
 from   p4gf_object_type_tree_cache  import TreeCache
 import p4gf_object_type_util        as     util
@@ -44,6 +47,9 @@ class ObjectType:
     last_commits_cache = {}
     last_commits_cache_complete = False
     change_num_to_commit_cache = ChangeNumToCommitCache()
+                        # Persistent on-disk index, opened on first use.
+                        # False if we tried and failed: stop trying.
+    commit_index = None
 
     def __init__(self, *
                 , sha1
@@ -112,8 +118,37 @@ class ObjectType:
         ObjectType.last_commits_cache = {}
         ObjectType.last_commits_cache_complete = False
         ObjectType.change_num_to_commit_cache.clear()
+                        # Persistent index stays: update_indexes() catches
+                        # it up after the submit.
         LOG.debug2("cache cleared")
 
+    @staticmethod
+    def _commit_index(ctx):
+        """Return the repo's validated ObjectTypeIndex, or None if unavailable."""
+        idx = ObjectType.commit_index
+        if idx is False:
+            return None
+        try:
+            if idx is None or idx.repo_name != ctx.config.repo_name:
+                if idx:
+                    idx.close()
+                        # None: repo container not there yet. Leave
+                        # commit_index None so that a later call retries.
+                idx = p4gf_object_type_index.open_index(ctx)
+                ObjectType.commit_index = idx
+                if not idx:
+                    return None
+            if not idx.is_valid:
+                ObjectType._load_last_commits_cache(ctx)
+                idx.validate(ctx.p4gf, ObjectType.last_commits_cache)
+            return idx
+        except sqlite3.Error as e:
+            LOG.warning("Object index disabled: {}".format(e))
+            if idx:
+                idx.close()
+            ObjectType.commit_index = False
+            return None
+
     @staticmethod
     def commit_from_filepath(filepath):
         """Take a (client or depot) file path and parse off the "xxx-commit-nnn" suffix.
@@ -256,13 +291,51 @@ class ObjectType:
         if otl:
             otl = otl.ot_list
         else:
-            path = commit_depot_path(sha1, '*', ctx.config.repo_name, '*')
-            otl = _otl_for_p4path(ctx.p4gf, path)
+            otl = ObjectType._commits_for_sha1_from_index(ctx, sha1)
+            if otl is None:
+                path = commit_depot_path(sha1, '*', ctx.config.repo_name, '*')
+                otl = _otl_for_p4path(ctx.p4gf, path)
+                ObjectType._index_set_complete(ctx, sha1, otl)
             ObjectType.object_cache.append(ObjectTypeList(sha1, otl))
         if not branch_id:
             return otl
         return [ot for ot in otl if ot.branch_id == branch_id]
 
+    @staticmethod
+    def _commits_for_sha1_from_index(ctx, sha1):
+        """Return list of ObjectType from the persistent index, or None if
+        the index does not know all of sha1's commits.
+        """
+        idx = ObjectType._commit_index(ctx)
+        if not idx:
+            return None
+        try:
+            bc_list = idx.commits_for_sha1(sha1)
+        except sqlite3.Error as e:
+            LOG.warning("Object index lookup failed: {}".format(e))
+            return None
+        if bc_list is None:
+            return None
+        return [ObjectType.create_commit( sha1       = sha1
+                                        , repo_name  = ctx.config.repo_name
+                                        , change_num = str(change_num)
+                                        , branch_id  = branch_id )
+                for branch_id, change_num in bc_list]
+
+    @staticmethod
+    def _index_set_complete(ctx, sha1, otl):
+        """Record Perforce's complete list of sha1's commits in the
+        persistent index.
+        """
+        idx = ObjectType._commit_index(ctx)
+        if not idx:
+            return
+        try:
+            idx.set_complete(sha1, [(ot.branch_id, ot.change_num, ot.sha1)
+                                    for ot in otl])
+        except sqlite3.Error as e:
+            LOG.warning("Object index update failed: {}".format(e))
+
     @staticmethod
     def sha1_to_change_num(ctx, sha1, branch_id=None):
         """If a commit exists as specified, return the change_num, else None.
@@ -293,7 +366,23 @@ class ObjectType:
                                            , change_num = change_num
                                            , branch_id  = from_cache[0] )
 
-        # not in cache, use index to find commit(s)
+        # not in cache, try persistent index
+        idx = ObjectType._commit_index(ctx)
+        if idx:
+            try:
+                from_index = idx.change_num_to_commit(change_num, branch_id)
+            except sqlite3.Error as e:
+                LOG.warning("Object index lookup failed: {}".format(e))
+                from_index = None
+            if from_index:
+                ObjectType.change_num_to_commit_cache.append(
+                    change_num, from_index[0], from_index[1])
+                return ObjectType.create_commit( sha1       = from_index[1]
+                                               , repo_name  = ctx.config.repo_name
+                                               , change_num = change_num
+                                               , branch_id  = from_index[0] )
+
+        # not in either cache, use p4 key index to find commit(s)
         if not branch_id:
             branch_id = '*'
         key_pattern = p4gf_const.P4GF_P4KEY_INDEX_OT\
@@ -326,13 +415,42 @@ class ObjectType:
 
         Ignore trees, but update for any commits.
         """
+        commits = []
+        change_num = None
         for rr in r:
+            if 'submittedChange' in rr:
+                change_num = int(rr['submittedChange'])
             if 'depotFile' not in rr:
                 continue
             depot_file = rr['depotFile']
             commit = ObjectType.commit_from_filepath(depot_file)
             if commit:
                 ObjectType.update_last_change_num(ctx, commit)
+                commits.append(commit)
+        if commits and change_num:
+            ObjectType._index_advance(ctx, change_num)
+
+    @staticmethod
+    def _index_advance(ctx, change_num):
+        """Catch the persistent index up to the changelist that we just
+        submitted, rather than re-validating it on next lookup.
+        """
+        idx = ObjectType.commit_index
+        if not idx:
+            return
+        try:
+            idx.advance(ctx.p4gf, change_num)
+        except sqlite3.Error as e:
+            LOG.warning("Object index disabled: {}".format(e))
+            idx.close()
+            ObjectType.commit_index = False
+
+    @staticmethod
+    def close_index():
+        """Close the persistent index, if open. Next use reopens it."""
+        if ObjectType.commit_index:
+            ObjectType.commit_index.close()
+            ObjectType.commit_index = None
 
     def to_index_key_value(self):
         """Return a (name, value) pair for our index P4Key."""
@@ -490,3 +608,9 @@ def commit_depot_path(commit_sha1, change_num, repo, branch_id):
                     slashed=p4gf_path.slashify_sha1(commit_sha1),
                     branch_id=branch_id,
                     change_num=change_num))
+
+
+@atexit.register
+def _close_index():
+    """Close the persistent index's SQLite connection at exit."""
+    ObjectType.close_index()
@@ -1,48 +1,51 @@
 #! /usr/bin/env python3.3
 """ChangeNumToCommitCache."""
 
-import random
+import p4gf_bounded_cache
+import p4gf_config
 
 
 class ChangeNumToCommitCache:
 
     """Maintains a limited size cache of (branch+change_num)-to-commit mappings
     for different branches.
+
+    Least recently used mappings are evicted first.
     """
 
     MAX_SIZE = 10000
 
     def __init__(self):
-                        # dict[branch-id] to dict[change_num] to commit sha1
-        self._branches = {}
-        self._count = 0
+                        # LRU of (branch_id, change_num) to commit sha1
+        self._lru = p4gf_bounded_cache.LRUCache(
+                          "ChangeNumToCommitCache"
+                        , ChangeNumToCommitCache.MAX_SIZE
+                        , config_key = p4gf_config.KEY_CHANGE_NUM_TO_COMMIT_CACHE_SIZE
+                        , on_evict   = self._on_evict )
+                        # dict[change_num] to set(branch_id), so that
+                        # get() without a branch_id need not scan every
+                        # branch.
+        self._change_num_to_branches = {}
 
     def clear(self):
         """Remove all elements from this cache."""
-        self._branches = {}
-        self._count = 0
+        self._lru.clear()
+        self._change_num_to_branches = {}
 
-    def _remove_one(self):
-        """Remove a randomly selected element."""
-        assert self._count == ChangeNumToCommitCache.MAX_SIZE
-        self._count -= 1
-        i = random.randrange(ChangeNumToCommitCache.MAX_SIZE)
-        for j in self._branches.values():
-            if len(j) <= i:
-                i -= len(j)
-                continue
-            key = list(j.keys())[i]
-            del j[key]
+    def _on_evict(self, key, _sha1):
+        """Keep _change_num_to_branches in sync with the LRU."""
+        branch_id, change_num = key
+        branch_ids = self._change_num_to_branches.get(change_num)
+        if branch_ids is None:
+            return
+        branch_ids.discard(branch_id)
+        if not branch_ids:
+            del self._change_num_to_branches[change_num]
 
     def append(self, change_num, branch_id, sha1):
         """Add an entry mapping change_num on branch_id to commit sha1."""
-        if self._count == ChangeNumToCommitCache.MAX_SIZE:
-            self._remove_one()
-
-        if branch_id not in self._branches:
-            self._branches[branch_id] = {}
-        self._branches[branch_id][change_num] = sha1
-        self._count += 1
+        self._lru.put((branch_id, change_num), sha1)
+        self._change_num_to_branches.setdefault(change_num, set()).add(branch_id)
 
     def get(self, change_num, branch_id):
         """Return matching (branch_id, commit_sha1) if in cache, else None.
@@ -51,17 +54,16 @@ class ChangeNumToCommitCache:
         """
         if not branch_id:
             return self._get_any_branch(change_num)
-        branch_commits = self._branches.get(branch_id)
-        if not branch_commits:
-            return None
-        sha1 = branch_commits.get(change_num)
+        sha1 = self._lru.get((branch_id, change_num))
         if not sha1:
             return None
         return branch_id, sha1
 
     def _get_any_branch(self, change_num):
         """Return first matching (branch_id,commit_sha1) or None."""
-        for branch_id, changes in self._branches.items():
-            if change_num in changes:
-                return branch_id, changes[change_num]
+        for branch_id in self._change_num_to_branches.get(change_num, ()):
+            sha1 = self._lru.get((branch_id, change_num))
+            if sha1:
+                return branch_id, sha1
+        self._lru.stats.miss_ct += 1
         return None
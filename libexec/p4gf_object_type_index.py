@@ -0,0 +1,321 @@
+#! /usr/bin/env python3.3
+"""ObjectTypeIndex: a local, persistent index of commit sha1 <->
+(branch_id, change_num) for one repo.
+
+ObjectType.commits_for_sha1() runs 'p4 files' against
+//.git-fusion/objects/repos/<repo>/commits/... on every cache miss, and
+ObjectType.change_num_to_commit() runs 'p4 keys' pattern queries. The
+in-memory caches die with each process, so every pull and push pays for
+the same lookups again.
+
+This index lives in an SQLite file in the repo's container directory,
+P4GF_HOME/views/<repo>/, and survives across processes.
+
+Keeping it correct:
+
+* Watermark. We record the highest changelist that touched the repo's
+  commit objects in Perforce that we have seen. Before first use in a
+  process, one 'p4 changes -m1' tells us whether Perforce has moved on.
+  If it has, one 'p4 files' over just the new changelists catches us up,
+  adding and removing rows. After we submit new commit objects
+  ourselves, we catch up to that changelist the same way.
+
+* Validation. If the head changelist went backwards, or a second
+  'p4 changes -m1 ...@watermark' no longer finds our watermark
+  changelist, it was obliterated, and we start over with an empty index.
+  We also check our rows against the repo's git-fusion-index-last-*
+  p4keys, which record each branch's last commit: a key whose commit we
+  hold under some other sha1, or that a rollback lowered below rows we
+  hold, sends us back to an empty index, too. None of this scans the
+  repo's history, so we can afford it on every pull and push. An
+  obliterate below the watermark that spares the watermark changelist
+  and every branch's last commit goes unnoticed. p4gf_rollback.py
+  lowers the index-last keys, which we do notice.
+
+* Completeness. Rows reach the index from ObjectType.update_indexes()
+  and from catch-up, but the index starts empty for repos that existed
+  before it did. A sha1 can have commit objects on several branches, so
+  commits_for_sha1() only trusts the index for sha1s whose complete
+  'p4 files' result we have stored. change_num_to_commit() needs no such
+  mark: a (branch_id, change_num) maps to at most one commit.
+
+Any SQLite error disables the index for the rest of the process; callers
+fall back to asking Perforce.
+"""
+import logging
+import os
+import sqlite3
+
+import p4gf_const
+import p4gf_file_action
+from   p4gf_l10n      import NTR
+import p4gf_object_type_util as util
+import p4gf_profiler
+
+LOG = logging.getLogger(__name__)
+
+FILE_NAME = NTR('object-type-index.db')
+
+                        # Bump if the schema changes. Older files are
+                        # discarded and rebuilt.
+_SCHEMA_VERSION = '1'
+
+
+def index_path(ctx):
+    """Return the absolute path to a repo's index file."""
+    return os.path.join(ctx.repo_dirs.repo_container, FILE_NAME)
+
+
+def commits_depot_path(repo_name):
+    """Return "//.git-fusion/objects/repos/<repo>/commits/..."."""
+    return (NTR('{objects_root}/repos/{repo}/commits/...')
+            .format(objects_root=p4gf_const.objects_root(), repo=repo_name))
+
+
+class ObjectTypeIndex:
+    """One repo's sha1 <-> (branch_id, change_num) index."""
+
+    def __init__(self, file_path, repo_name):
+        self.file_path  = file_path
+        self.repo_name  = repo_name
+        self.is_valid   = False     # validate()d in this process?
+        self.stats      = p4gf_profiler.Counters('hit_ct', 'miss_ct')
+        self._db        = sqlite3.connect( database = file_path
+                                         , timeout  = 30 )
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema()
+        p4gf_profiler.add_counters("ObjectTypeIndex", self, self.stats)
+
+    def _create_schema(self):
+        """Create tables if missing. Discard any older schema."""
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS meta"
+                   "(key TEXT PRIMARY KEY, val TEXT)")
+        version = self._get_meta('schema_version')
+        if version not in (None, _SCHEMA_VERSION):
+            LOG.debug("discarding index schema_version={} {}"
+                      .format(version, self.file_path))
+            db.execute("DROP TABLE IF EXISTS commits")
+            db.execute("DROP TABLE IF EXISTS complete_sha1")
+            db.execute("DELETE FROM meta")
+        db.execute("CREATE TABLE IF NOT EXISTS commits"
+                   "( branch_id  TEXT"
+                   ", change_num INTEGER"
+                   ", sha1       TEXT"
+                   ", PRIMARY KEY (branch_id, change_num))")
+        db.execute("CREATE INDEX IF NOT EXISTS commits_sha1 ON commits(sha1)")
+        db.execute("CREATE TABLE IF NOT EXISTS complete_sha1"
+                   "(sha1 TEXT PRIMARY KEY)")
+        self._set_meta('schema_version', _SCHEMA_VERSION)
+        db.commit()
+
+    def _get_meta(self, key):
+        """Return a meta value, or None if not set."""
+        row = self._db.execute("SELECT val FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, val):
+        """Set a meta value. Caller commits."""
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES(?, ?)", (key, val))
+
+    def close(self):
+        """Close the SQLite connection."""
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    # -- watermark ------------------------------------------------------------
+
+    def validate(self, p4, last_commits):
+        """Bring the index up to date with Perforce, and check that
+        history at or below our watermark has not changed under us.
+
+        Call once per process, before first use. Use advance() to keep up
+        with our own submits after that.
+
+        :param last_commits: dict of branch_id ==> "change_num,sha1", the
+                             repo's git-fusion-index-last-* p4key values.
+        """
+        path = commits_depot_path(self.repo_name)
+        head = _last_change_num(p4, path)
+        wm_str = self._get_meta('watermark')
+        watermark = int(wm_str) if wm_str else None
+
+        if watermark and (   head < watermark
+                          or _last_change_num(p4, '{path}@{wm}'
+                                  .format(path=path, wm=watermark)) != watermark):
+            LOG.warning("Object index for {repo} watermark @{wm} no longer"
+                        " in Perforce (head @{head}), rebuilding."
+                        .format(repo=self.repo_name, wm=watermark, head=head))
+            self._clear()
+            watermark = None
+
+        if watermark is None:
+                        # New index. Nothing to catch up on: every row
+                        # from here on comes from a lookup or an update.
+            LOG.debug("validate() new index watermark={}".format(head))
+        elif watermark < head:
+            self._catch_up(p4, path, watermark, head)
+
+        if not self._matches_last_commits(head, last_commits):
+            LOG.warning("Object index for {repo} does not match"
+                        " index-last p4keys, rebuilding."
+                        .format(repo=self.repo_name))
+            self._clear()
+        self._set_watermark(head)
+        self.is_valid = True
+
+    def advance(self, p4, change_num):
+        """We just submitted commit objects in change_num. Catch up to it.
+
+        Covers anything else submitted since our watermark, too, without
+        re-checking older history. No-op if not yet validate()d: that
+        will catch up anyway.
+        """
+        if not self.is_valid:
+            return
+        watermark = int(self._get_meta('watermark') or 0)
+        if change_num <= watermark:
+            return
+        path = commits_depot_path(self.repo_name)
+        self._catch_up(p4, path, watermark, change_num)
+        self._set_watermark(change_num)
+
+    def _set_watermark(self, change_num):
+        """Record our new watermark. Commit."""
+        self._set_meta('watermark', str(change_num))
+        self._db.commit()
+
+    def _catch_up(self, p4, path, watermark, head):
+        """Apply every commit object add/delete after watermark, up to and
+        including head. Caller commits.
+        """
+        begin = watermark + 1
+        r = p4.run('files', '{path}@{begin},@{end}'
+                   .format(path=path, begin=begin, end=head))
+        add_ct = 0
+        del_ct = 0
+        for rr in r:
+            if not (isinstance(rr, dict) and 'depotFile' in rr):
+                continue
+            m = util.OBJPATH_COMMIT_REGEX.search(rr['depotFile'])
+            if not m:
+                continue
+            sha1       = m.group('slashed_sha1').replace('/', '')
+            branch_id  = m.group('branch_id')
+            change_num = int(m.group('change_num'))
+            if rr.get('action') in p4gf_file_action.DELETE_ACTIONS:
+                self._db.execute("DELETE FROM commits"
+                                 " WHERE branch_id=? AND change_num=?"
+                                 , (branch_id, change_num))
+                del_ct += 1
+            else:
+                self._db.execute("INSERT OR REPLACE INTO commits VALUES(?, ?, ?)"
+                                 , (branch_id, change_num, sha1))
+                add_ct += 1
+        LOG.debug("_catch_up() @{},@{} added={} deleted={}"
+                  .format(begin, head, add_ct, del_ct))
+
+    def _matches_last_commits(self, watermark, last_commits):
+        """Do our rows agree with each branch's index-last p4key, for keys
+        at or below watermark?
+
+        A row we lack is fine: we fill rows lazily. A row with some other
+        sha1, or a row above the branch's last commit, is not.
+        """
+        db = self._db
+        for branch_id, value in last_commits.items():
+            m = util.VALUE_LAST_REGEX.search(value)
+            if not m:
+                continue
+            change_num = int(m.group('change_num'))
+            if watermark < change_num:
+                continue
+            row = db.execute("SELECT sha1 FROM commits"
+                             " WHERE branch_id=? AND change_num=?"
+                             , (branch_id, change_num)).fetchone()
+            if row and row[0] != m.group('sha1'):
+                LOG.debug("index-last {},{} != {}".format(branch_id, value, row[0]))
+                return False
+            row = db.execute("SELECT change_num FROM commits"
+                             " WHERE branch_id=? AND ? < change_num"
+                             " AND change_num <= ? LIMIT 1"
+                             , (branch_id, change_num, watermark)).fetchone()
+            if row:
+                LOG.debug("index-last {},{} < {}".format(branch_id, value, row[0]))
+                return False
+        return True
+
+    def _clear(self):
+        """Forget everything. Caller commits."""
+        self._db.execute("DELETE FROM commits")
+        self._db.execute("DELETE FROM complete_sha1")
+        self._db.execute("DELETE FROM meta WHERE key='watermark'")
+
+    # -- lookups --------------------------------------------------------------
+
+    def commits_for_sha1(self, sha1):
+        """Return a list of (branch_id, change_num) for sha1, or None if
+        we do not know sha1's complete list.
+        """
+        db = self._db
+        if not db.execute("SELECT 1 FROM complete_sha1 WHERE sha1=?"
+                          , (sha1,)).fetchone():
+            self.stats.miss_ct += 1
+            return None
+        self.stats.hit_ct += 1
+        return db.execute("SELECT branch_id, change_num FROM commits"
+                          " WHERE sha1=?", (sha1,)).fetchall()
+
+    def change_num_to_commit(self, change_num, branch_id=None):
+        """Return (branch_id, sha1) for a commit, or None if not indexed.
+
+        If branch_id is None, return any matching branch.
+        """
+        if branch_id:
+            row = self._db.execute("SELECT branch_id, sha1 FROM commits"
+                                   " WHERE branch_id=? AND change_num=?"
+                                   , (branch_id, int(change_num))).fetchone()
+        else:
+            row = self._db.execute("SELECT branch_id, sha1 FROM commits"
+                                   " WHERE change_num=? LIMIT 1"
+                                   , (int(change_num),)).fetchone()
+        if row:
+            self.stats.hit_ct += 1
+        else:
+            self.stats.miss_ct += 1
+        return row
+
+    # -- updates --------------------------------------------------------------
+
+    def set_complete(self, sha1, bcs_list):
+        """Record Perforce's complete list of commits for sha1."""
+        self._db.execute("DELETE FROM commits WHERE sha1=?", (sha1,))
+        self._db.executemany("INSERT OR REPLACE INTO commits VALUES(?, ?, ?)"
+                             , [(b, int(c), s) for b, c, s in bcs_list])
+        self._db.execute("INSERT OR REPLACE INTO complete_sha1 VALUES(?)", (sha1,))
+        self._db.commit()
+
+    def __str__(self):
+        return "ObjectTypeIndex {} {}".format(self.repo_name, self.stats)
+
+
+def _last_change_num(p4, path):
+    """Return the highest submitted changelist number that touched path,
+    or 0 if none.
+    """
+    r = p4.run('changes', '-m1', '-s', 'submitted', path)
+    return int(r[0]['change']) if r and isinstance(r[0], dict) else 0
+
+
+def open_index(ctx):
+    """Return an ObjectTypeIndex for ctx's repo, or None if the repo's
+    container directory does not exist yet.
+
+    Raises sqlite3.Error if the index file cannot be opened.
+    """
+    path = index_path(ctx)
+    if not os.path.isdir(os.path.dirname(path)):
+        return None
+    return ObjectTypeIndex(path, ctx.config.repo_name)
@@ -3,9 +3,9 @@
 
 import binascii
 import logging
-import random
-import bisect
 
+import p4gf_bounded_cache
+import p4gf_config
 import p4gf_object_type_util as util
 import p4gf_path
 
@@ -14,49 +14,24 @@ LOG = logging.getLogger(__name__)
 
 class TreeCache:
 
-    """Keeps track of which tree objects exist in perforce."""
+    """Keeps track of which tree objects exist in perforce.
+
+    Remembers only trees that do exist. Least recently used trees are
+    forgotten first.
+    """
 
     MAX_SIZE = 10000
 
     def __init__(self):
-        self._tree_cache = [None]*TreeCache.MAX_SIZE
-        self._tree_cache_size = 0
+                        # LRU of binary sha1 to True
+        self._lru = p4gf_bounded_cache.LRUCache(
+                          "TreeCache"
+                        , TreeCache.MAX_SIZE
+                        , config_key = p4gf_config.KEY_TREE_CACHE_SIZE )
 
     def clear(self):
         """Remove all elements from this cache."""
-        self._tree_cache = [None]*TreeCache.MAX_SIZE
-        self._tree_cache_size = 0
-
-    def _tree_cache_insert(self, j, bsha1):
-        """Insert an entry in the cache of tree sha1 values.
-
-        If the cache is already full, remove one entry at random first.
-        """
-        # NOP if already in list
-        if j < self._tree_cache_size and self._tree_cache[j] == bsha1:
-            return
-
-        # just insert if not at capacity
-        if self._tree_cache_size < TreeCache.MAX_SIZE:
-            self._tree_cache = self._tree_cache[:j] \
-                             + [bsha1] \
-                             + self._tree_cache[j:TreeCache.MAX_SIZE-1]
-            self._tree_cache_size += 1
-            return
-
-        # remove a random entry and insert new entry
-        i = random.randrange(TreeCache.MAX_SIZE)
-        if i == j:
-            self._tree_cache[i] = bsha1
-        elif i < j:
-            self._tree_cache = self._tree_cache[:i] \
-                             + self._tree_cache[i+1:j] \
-                             + [bsha1] + self._tree_cache[j:]
-        else:
-            self._tree_cache = self._tree_cache[:j] \
-                             + [bsha1] \
-                             + self._tree_cache[j:i] \
-                             + self._tree_cache[i+1:]
+        self._lru.clear()
 
     def tree_exists(self, p4, sha1):
         """Return true if sha1 identifies a tree object in
@@ -65,8 +40,7 @@ class TreeCache:
         # convert to binary rep for space savings
         bsha1 = binascii.a2b_hex(sha1)
         # test if already in cache
-        j = bisect.bisect_left(self._tree_cache, bsha1, hi=self._tree_cache_size)
-        if j < self._tree_cache_size and self._tree_cache[j] == bsha1:
+        if self._lru.get(bsha1):
             LOG.debug2('tree cache hit for {}'.format(sha1))
             return True
         # not in cache, check server
@@ -82,5 +56,5 @@ class TreeCache:
         found_sha1 = m.group('slashed_sha1').replace('/', '')
         if sha1 != found_sha1:
             return False
-        self._tree_cache_insert(j, bsha1)
+        self._lru.put(bsha1, True)
         return True
@@ -0,0 +1,269 @@
+#! /usr/bin/env python3.3
+"""Where PrintHandler puts the file revisions that it `p4 print`s.
+
+PackBlobSink  (default) One long-running `git fast-import` per copy
+              session, fed one blob at a time. Git writes a single
+              packfile. No loose objects, no per-blob fsync/rename.
+
+LooseBlobSink One loose object per blob, via pygit2, as we always did.
+
+Both compute each blob's sha1 as soon as the blob is added, so callers
+can record it immediately. Both are safe to share between PrintScheduler's
+worker threads. Objects written to a PackBlobSink are not
+visible to Git until close() returns.
+
+Expected call sequence:
+
+    sink = create_blob_sink(ctx)
+    sha1 = sink.add_bytes(content)      # small files, already in memory
+    sha1 = sink.add_file(abspath)       # large files, spilled to disk
+    sink.close()                        # or abort() on error
+
+Or use the sink as a context manager: close() on success, abort() on error.
+"""
+import binascii
+import hashlib
+import logging
+import os
+import threading
+
+import p4gf_config
+import p4gf_git
+from   p4gf_l10n      import _, NTR
+import p4gf_proc
+import p4gf_pygit2
+import p4gf_util
+
+LOG = logging.getLogger('p4gf_copy_to_git').getChild('blob_sink')
+
+                        # How many bytes to read/hash/send at a time when
+                        # streaming a large file to git-fast-import.
+_CHUNK_BYTE_CT = 1024 * 1024
+
+
+def create_blob_sink(ctx):
+    """Factory: return a PackBlobSink or LooseBlobSink, as configured."""
+    how = ctx.repo_config.get(
+              p4gf_config.SECTION_PERFORCE_TO_GIT
+            , p4gf_config.KEY_PRINT_BLOB_STORAGE
+            , fallback = p4gf_config.VALUE_PRINT_BLOB_STORAGE_PACK )
+    if how == p4gf_config.VALUE_PRINT_BLOB_STORAGE_LOOSE:
+        return LooseBlobSink(ctx)
+    if how != p4gf_config.VALUE_PRINT_BLOB_STORAGE_PACK:
+        LOG.warning("{key} {value} not in {expected}, using {default}"
+                    .format( key      = p4gf_config.KEY_PRINT_BLOB_STORAGE
+                           , value    = how
+                           , expected = [ p4gf_config.VALUE_PRINT_BLOB_STORAGE_PACK
+                                        , p4gf_config.VALUE_PRINT_BLOB_STORAGE_LOOSE ]
+                           , default  = p4gf_config.VALUE_PRINT_BLOB_STORAGE_PACK))
+    return PackBlobSink(ctx)
+
+
+def blob_header(byte_ct):
+    """Return the "blob <size>\\0" header that prefixes Git blob content
+    when calculating its sha1.
+    """
+    return NTR('blob {}\0').format(byte_ct).encode()
+
+
+class LooseBlobSink:
+    """One loose object per blob, written by pygit2.
+
+    Writes to ctx.repo unless given some other pygit2 repo, such as
+    repo_compare's scratch repo.
+    """
+
+    def __init__(self, ctx, repo=None):
+        self.ctx   = ctx
+        if repo is None:
+            self.repo      = ctx.repo
+            self.work_tree = ctx.repo_dirs.GIT_WORK_TREE
+        else:
+            self.repo      = repo
+            self.work_tree = repo.workdir
+        self._lock = threading.Lock()   # pygit2 Repository is not thread-safe
+
+    def add_bytes(self, data):
+        """Write one blob, return its sha1."""
+        with self._lock:
+            sha1 = p4gf_pygit2.oid_to_sha1(self.repo.create_blob(data))
+        self._chmod_644_minimum(sha1)
+        return sha1
+
+    def add_file(self, abspath):
+        """Write one blob from a file in the current working directory,
+        return its sha1.
+        """
+        with self._lock:
+            sha1 = p4gf_pygit2.create_blob_fromdisk(
+                        self.repo, os.path.basename(abspath))
+        self._chmod_644_minimum(sha1)
+        return sha1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+        return False  # False = do not squelch exception
+
+    def close(self):
+        """Nothing to flush."""
+        pass
+
+    def abort(self):
+        """Nothing to discard: each blob is already its own object."""
+        pass
+
+    def _chmod_644_minimum(self, sha1):
+        """Ensure blob file mode is correct.
+
+        pygit2 created a blob. If that blob is a loose object,
+        make sure that loose object's file has at least file mode 644
+        so that we (owner) has read+write, and the world has read access.
+
+        Don't raise/abort if this fails due to file not found. Assume that
+        is due to the blob landing in a packfile.
+        """
+        obj_path = p4gf_git.object_path(sha1)
+        if obj_path is None:
+            # Object is already in the repo in a pack file? Nothing
+            # more do be done here.
+            if LOG.isEnabledFor(logging.DEBUG2):
+                LOG.debug2("_chmod_644_minimum() no such loose blob %s, nothing to do", sha1)
+            return
+        blob_path = os.path.join(self.work_tree, obj_path)
+        try:
+            p4gf_util.chmod_644_minimum(blob_path)
+        except OSError as e:
+            LOG.warning("chmod 644 failed path={path} err={e}".format(path=blob_path, e=e))
+
+
+class PackBlobSink:
+    """Every blob goes to a single git-fast-import, which writes them all
+    to a single packfile.
+
+    We hash each blob ourselves rather than wait for git-fast-import's
+    marks, so that add_xxx() can return a sha1 immediately.
+
+    Skips blobs that Git already has, or that we already sent.
+
+    git-fast-import launched at construction, from whichever thread
+    creates the sink rather than whichever print worker sends the first
+    blob, and through p4gf_proc, so that a small runner child forks it.
+    """
+
+    def __init__(self, ctx):
+        self.repo      = ctx.repo
+        self._stream   = None   # p4gf_proc.Stream to git-fast-import
+        self._sent     = set()  # binary sha1 digests already sent
+        self._lock     = threading.Lock()   # one blob at a time to stdin
+        self.blob_ct   = 0
+        self.byte_ct   = 0
+        self.dup_ct    = 0
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, _exc_value, _traceback):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+        return False  # False = do not squelch exception
+
+    def _start(self):
+        """Launch git-fast-import."""
+        self._stream = p4gf_proc.popen_stream(
+                [ 'git', 'fast-import', '--quiet', '--done' ]
+                , feed = True )
+        LOG.debug("PackBlobSink started")
+
+    def _is_dup(self, sha1_digest):
+        """Already sent, or already in Git?
+
+        Caller must hold self._lock.
+        """
+        if sha1_digest in self._sent:
+            self.dup_ct += 1
+            return True
+        self._sent.add(sha1_digest)
+        if p4gf_git.object_exists(binascii.hexlify(sha1_digest).decode(), self.repo):
+            self.dup_ct += 1
+            return True
+        return False
+
+    def _write_header(self, byte_ct):
+        """Begin one 'blob' command."""
+        if not self._stream:
+            raise RuntimeError(_("PackBlobSink already closed"))
+        self._stream.stdin.write(NTR('blob\ndata {}\n').format(byte_ct).encode())
+        self.blob_ct += 1
+        self.byte_ct += byte_ct
+
+    def add_bytes(self, data):
+        """Send one blob, return its sha1."""
+        h = hashlib.sha1(blob_header(len(data)))
+        h.update(data)
+        with self._lock:
+            if not self._is_dup(h.digest()):
+                self._write_header(len(data))
+                self._stream.stdin.write(data)
+                self._stream.stdin.write(b'\n')
+        return h.hexdigest()
+
+    def add_file(self, abspath):
+        """Send one blob from a file, return its sha1.
+
+        Reads the file twice: once to hash (so we can skip duplicates
+        before sending anything), once to send. Both reads stream in
+        chunks, never holding the whole file in memory.
+        """
+        byte_ct = os.path.getsize(abspath)
+        h = hashlib.sha1(blob_header(byte_ct))
+        with open(abspath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_BYTE_CT), b''):
+                h.update(chunk)
+        with self._lock:
+            if not self._is_dup(h.digest()):
+                self._write_header(byte_ct)
+                with open(abspath, 'rb') as f:
+                    for chunk in iter(lambda: f.read(_CHUNK_BYTE_CT), b''):
+                        self._stream.stdin.write(chunk)
+                self._stream.stdin.write(b'\n')
+        return h.hexdigest()
+
+    def close(self):
+        """Finish the packfile. Raise if git-fast-import fails."""
+        with self._lock:
+            stream = self._stream
+            self._stream = None
+        if not stream:
+            return
+        try:
+            stream.stdin.write(b'done\n')
+            stream.stdin.close()
+        finally:
+            ec = stream.wait()["ec"]
+        LOG.debug("PackBlobSink exit={ec} blobs={b:,} bytes={by:,} dups={d:,}"
+                  .format(ec=ec, b=self.blob_ct, by=self.byte_ct, d=self.dup_ct))
+        if ec:
+            raise RuntimeError(_("git fast-import failed writing printed"
+                                 " file revisions: exit code {ec}")
+                               .format(ec=ec))
+
+    def abort(self):
+        """Stop git-fast-import and wait for it to exit.
+
+        No 'done', so git-fast-import treats its input as truncated. Any
+        blobs that it already wrote stay behind, unreferenced, for git-gc.
+        Call on error, instead of close().
+        """
+        with self._lock:
+            stream = self._stream
+            self._stream = None
+        if not stream:
+            return
+        LOG.debug("PackBlobSink abort blobs={b:,}".format(b=self.blob_ct))
+        stream.wait(expect_error=True)
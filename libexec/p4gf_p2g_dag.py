@@ -10,9 +10,10 @@ P2GDAGIndex is the main entry point, knows how to find stuff.
 P2GDAGNode is an internal node in our own DAG.
 
 Only build up in-memory data for stuff in the git-fast-import script.
-No need for stuff already in the Git repo: use
+No need for stuff already in the Git repo: GitAncestry answers
+reachability within existing Git commits in-process, the same way
   git merge-base --is-ancestor <ancestor> <child>
-to test reachability within existing Git commits.
+does, without a git subprocess per question.
 
 Uses int/str to differentiate between mark (int) and sha1 (str).
 
@@ -20,9 +21,14 @@ Marks, including parent marks, MUST be integers. No ":1234" strings.
 Parent sha1s MUST be 40-char strs.
 """
 from   collections import deque
+import heapq
 import logging
 
+from   p4gf_bounded_cache import LRUCache
+import p4gf_config
+import p4gf_profiler
 import p4gf_proc
+import p4gf_pygit2
 
 LOG = logging.getLogger(__name__)
 
@@ -97,6 +103,10 @@ class P2GDAGIndex(object):
 
         self.mark_to_node = {}
 
+                        # Reachability between already-copied-to-Git
+                        # commits, remembered for the rest of this P2G run.
+        self.git_ancestry = GitAncestry(ctx)
+
     def to_node(self, child_mark, parent_sha1mark_list):
         """Return a new P2GDAGNode with correct parent pointers.
 
@@ -144,18 +154,149 @@ class P2GDAGIndex(object):
             raise RuntimeError("BUG: mark {} not yet add()ed.".format(mark))
         return node
 
-    @staticmethod
-    def is_ancestor(parent_sha1mark, child_node):
+    def is_ancestor(self, parent_sha1mark, child_node):
         """Return true if parent sha1/mark is reachable as an ancestor
         of proposed child.
         """
         if is_mark(parent_sha1mark):
             return _is_ancestor_mark(parent_sha1mark, child_node)
         else:
-            return _is_ancestor_sha1(parent_sha1mark, child_node)
+            return _is_ancestor_sha1( parent_sha1mark, child_node
+                                    , self.git_ancestry )
 
 # -- end class P2GDAGIndex ---------------------------------------------------
 
+class GitAncestry(object):
+    """Is one already-copied-to-Git commit an ancestor of another?
+
+    Answers in-process, from commits read through pygit2, instead of one
+    'git merge-base --is-ancestor' subprocess per question. Remembers
+    every answer, and every commit's parents and commit time, for the rest
+    of the P2G run: the same old branch heads and dividing-line commits
+    come up again and again on merge-heavy depots.
+
+    The DAGwalk is Git's own "paint down to common": walk both commits'
+    ancestry newest-first, painting each commit with which side reached
+    it. Stop once the child's side reaches the proposed ancestor, or once
+    every commit left to walk is reachable from both sides, at which point
+    nothing left can reach the proposed ancestor. Exact no matter how
+    skewed the commit times: times only pick the walk order, so in the
+    common case the walk stops a few commits below both tips.
+
+    Falls back to 'git merge-base --is-ancestor' if pygit2 cannot read a
+    commit.
+    """
+    _PARENT = 0x1       # reachable from the proposed ancestor
+    _CHILD  = 0x2       # reachable from the proposed child
+    _BOTH   = _PARENT | _CHILD
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+                        # (parent_sha1, child_sha1) ==> bool
+        self._memo = {}
+
+                        # sha1 ==> (commit_time, (parent sha1, ...))
+        self._commit_cache = LRUCache( "P2G ancestry commits"
+                                     , 100000
+                                     , config_key = p4gf_config.KEY_P2G_ANCESTRY_CACHE_SIZE )
+
+        self.stats = p4gf_profiler.Counters(
+                      'query_ct'
+                    , 'memo_hit_ct'
+                    , 'walk_ct'         # answered in-process by a DAGwalk
+                    , 'walk_node_ct'    # commits visited by those DAGwalks
+                    , 'subprocess_ct' ) # fell back to 'git merge-base'
+        p4gf_profiler.add_counters("P2G ancestry", self, self.stats)
+
+    def is_ancestor(self, parent_sha1, child_sha1):
+        """Return True if parent_sha1 is reachable from child_sha1.
+
+        A commit is its own ancestor, same as 'git merge-base --is-ancestor'.
+        """
+        self.stats.query_ct += 1
+        if parent_sha1 == child_sha1:
+            return True
+        key = (parent_sha1, child_sha1)
+        result = self._memo.get(key)
+        if result is not None:
+            self.stats.memo_hit_ct += 1
+            return result
+
+        try:
+            result = self._walk(parent_sha1, child_sha1)
+            self.stats.walk_ct += 1
+        except KeyError as e:
+            LOG.debug("is_ancestor() cannot read commit {}, asking git".format(e))
+            result = _git_is_ancestor(parent_sha1, child_sha1)
+            self.stats.subprocess_ct += 1
+
+        LOG.debug3("is_ancestor() {} {} ==> {}"
+                   .format(parent_sha1, child_sha1, result))
+        self._memo[key] = result
+        return result
+
+    def _walk(self, parent_sha1, child_sha1):
+        """DAGwalk both commits' ancestry, newest first, until the child's
+        side reaches parent_sha1, or until there's nothing left that could.
+
+        Raises KeyError if pygit2 cannot read a commit we need.
+        """
+        flags    = {}       # sha1 ==> _PARENT/_CHILD/_BOTH
+        heap     = []       # (-commit_time, sha1), newest first
+        in_heap  = set()
+        nonstale = 0        # in_heap members not yet _BOTH
+
+        def paint(sha1, bits):
+            """Add bits to sha1, queue it to pass them on to its parents."""
+            nonlocal nonstale
+            old = flags.get(sha1, 0)
+            new = old | bits
+            if new == old:
+                return
+            flags[sha1] = new
+            if sha1 in in_heap:
+                if new == self._BOTH:
+                    nonstale -= 1
+                return
+            (commit_time, _par) = self._commit(sha1)
+            heapq.heappush(heap, (-commit_time, sha1))
+            in_heap.add(sha1)
+            if new != self._BOTH:
+                nonstale += 1
+
+        paint(parent_sha1, self._PARENT)
+        paint(child_sha1,  self._CHILD)
+        while nonstale:
+            (_t, sha1) = heapq.heappop(heap)
+            in_heap.discard(sha1)
+            bits = flags[sha1]
+            if bits != self._BOTH:
+                nonstale -= 1
+            self.stats.walk_node_ct += 1
+            for par in self._commit(sha1)[1]:
+                paint(par, bits)
+            if flags[parent_sha1] & self._CHILD:
+                return True
+        return False
+
+    def _commit(self, sha1):
+        """Return a commit's (commit_time, (parent sha1, ...)).
+
+        Raises KeyError if pygit2 cannot read the commit.
+        """
+        c = self._commit_cache.get(sha1)
+        if c is None:
+            obj = self.ctx.repo.get(sha1)
+            if obj is None:
+                raise KeyError(sha1)
+            c = ( obj.commit_time
+                , tuple(p4gf_pygit2.oid_to_sha1(p) for p in obj.parent_ids) )
+            self._commit_cache.put(sha1, c)
+        return c
+
+# -- end class GitAncestry ---------------------------------------------------
+
 def _is_ancestor_mark(parent_mark, child_node):
     """Return true if not-yet-copied-to-Git parent_mark is reachable
     as an ancestor of proposed child.
@@ -174,12 +315,12 @@ def _is_ancestor_mark(parent_mark, child_node):
             continue                    # previously via some other path.
 
                     # "recurse" up the ancestry.
-        work_node_queue.append(p.parents())
+        work_node_queue.extend(p.parents())
         seen_set.add(p.mark)
     return False
 
 
-def _is_ancestor_sha1(parent_sha1, child_node):
+def _is_ancestor_sha1(parent_sha1, child_node, git_ancestry):
     """Return true if already-copied-to-Git parent_sha1 is reachable
     as an ancestor of proposed child.
     """
@@ -199,7 +340,7 @@ def _is_ancestor_sha1(parent_sha1, child_node):
                 continue
 
                     # "recurse" up the ancestry.
-            work_node_queue.append(p.parents())
+            work_node_queue.extend(p.parents())
             seen_set.add(p.mark)
             continue
 
@@ -210,8 +351,8 @@ def _is_ancestor_sha1(parent_sha1, child_node):
                     # the dividing line?
 
                     # +++ Common case is the old branch head sits right on
-                    #     the dividing line. Avoid the cost of
-                    #     out-of-process 'git merge-base' here.
+                    #     the dividing line. Avoid even an in-process
+                    #     DAGwalk here.
         if p == parent_sha1:
             return True
 
@@ -220,7 +361,7 @@ def _is_ancestor_sha1(parent_sha1, child_node):
         elif p in seen_set:
             continue
 
-        elif _git_is_ancestor(parent_sha1, p):
+        elif git_ancestry.is_ancestor(parent_sha1, p):
                     # Child can reach p, p can reach parent_sha1, so by the
                     # transitive property of reachability, child can reach
                     # parent_sha1.
@@ -2,34 +2,53 @@
 """PrintHandler."""
 
 import codecs
+import io
 import os
 import logging
 import tempfile
+import threading
 
 from P4 import OutputHandler, P4Exception
 
-import p4gf_git
 from   p4gf_l10n                  import _
+import p4gf_p2g_blob_sink
 from   p4gf_p2g_rev_list          import RevList
 from   p4gf_p4file                import P4File
 import p4gf_progress_reporter     as     ProgressReporter
-import p4gf_pygit2
-import p4gf_util
 
 LOG = logging.getLogger('p4gf_copy_to_git').getChild('print_handler')
 
+                        # Files larger than this go to a temp file rather
+                        # than stay in memory until flush().
+_SPILL_BYTE_CT = 32 * 1024 * 1024
+
+                        # PrintScheduler runs several PrintHandlers at once.
+_PROGRESS_LOCK = threading.Lock()
+
 
 class PrintHandler(OutputHandler):
 
-    """OutputHandler for p4 print, hashes files into git repo."""
+    """OutputHandler for p4 print, hashes files into git repo.
+
+    Call close() when done, before using any printed blob. Or use as a
+    context manager, which also stops the blob sink if printing fails.
+    """
 
-    def __init__(self, ctx):
-        """Initialize the PrintHandler instance."""
+    def __init__(self, ctx, p4=None, blob_sink=None):
+        """Initialize the PrintHandler instance.
+
+        PrintScheduler's worker threads pass their own p4 connection, and
+        share one blob_sink with the main thread's PrintHandler.
+        """
         OutputHandler.__init__(self)
         self.rev = None             # a P4File
         self.revs = RevList()
-        self.temp_file = None
-        self.p4 = ctx.p4
+        self.temp_file = None       # only for files too large for _buf
+        self._buf = bytearray()
+        if blob_sink is None:
+            blob_sink = p4gf_p2g_blob_sink.create_blob_sink(ctx)
+        self.blob_sink = blob_sink
+        self.p4 = p4 if p4 is not None else ctx.p4
         self.p4gf = ctx.p4gf
         self.change_set = set()
         self.repo = ctx.repo
@@ -81,31 +100,93 @@ class PrintHandler(OutputHandler):
         return OutputHandler.HANDLED
 
     def appendContent(self, h):  # pylint: disable=invalid-name
-        """Append a chunk of content to the temp file.
+        """Append a chunk of content to the current revision's buffer.
 
-        It would be nice to incrementally compress and hash the file
-        but that requires knowing the size up front, which p4 print does
-        not currently supply.  If/when it does, this can be reworked to
-        be more efficient with large files.  As it is, as long as the
-        TemporaryFile doesn't rollover, it won't make much of a difference.
+        p4 print does not tell us the file size up front, so we cannot
+        stream content straight into Git: a Git blob's sha1 and the
+        git-fast-import 'data' command both need the size first.
 
-        So with that limitation, the incoming content is stuffed into
-        a TemporaryFile.
+        Most files are small: accumulate them in memory. Once a file grows
+        past _SPILL_BYTE_CT, move it to a temp file in the Git work tree
+        and append there instead.
         """
         if not len(h):
             return
-        if self.temp_file is None:
+        if self.rev is None:
             LOG.warning('outputBinary/outputText called before outputStat, nothing can be done')
             # In fact, we don't even have the file meta information, so we
             # cannot provide any details for debugging this issue.
             return
-        self.temp_file.write(h)
+        if self.temp_file is not None:
+            self.temp_file.write(h)
+            return
+        self._buf += h
+        if _SPILL_BYTE_CT < len(self._buf):
+            self._spill()
+
+    def _spill(self):
+        """Move the in-memory buffer to a temp file, continue there."""
+        # use the git working tree so we can use create_blob_fromfile()
+        tmpdir = os.getcwd()
+        self.temp_file = tempfile.NamedTemporaryFile(
+            buffering=10000000, prefix='p2g-print-', dir=tmpdir, delete=False)
+        LOG.debug3('_spill() temporary file created: {}'.format(self.temp_file.name))
+        self.temp_file.write(self._buf)
+        self._buf = bytearray()
+
+    def _is_utf16_conversion_required(self):
+        """Do we need to convert UTF-8 content to UTF-16?
+
+        Only for non-Unicode servers, in which case we would have already
+        handled the conversion in the outputText() function.
+        """
+        # p4.charset could be None, empty string, or 'none'
+        return ((not self.p4.charset or self.p4.charset == 'none')
+                and 'utf16' in self.rev.type)
+
+    def _to_utf16(self, temp_str):
+        """Return UTF-16LE bytes, with a Byte Order Mark.
+
+        Include a Byte Order Mark (why doesn't P4API do this for us?).
+        The choice of Little Endian is arbitrary, since we are including
+        the BOM anyway. Regardless, it is not possible to know the
+        endianness of the client, but LE is most likely.
+        """
+        LOG.debug('flush() converting {} to UTF-16'.format(self.rev.depot_path))
+        return codecs.BOM_UTF16_LE + getattr(self.p4, '__convert')("utf16le", temp_str)
 
     def flush(self):
         """Hash the last printed file into the repo."""
         if not self.rev:
             LOG.debug3('flush() nothing to flush')
             return
+        if self.temp_file is not None:
+            self._flush_temp_file()
+        else:
+            self._flush_buf()
+
+    def _flush_buf(self):
+        """Hash the last printed file, held in memory, into the repo."""
+        data = self._buf
+        if data and self.rev.is_symlink() and data[-1] == 10:
+            # p4 print adds a trailing newline, which is no good for symlinks.
+            del data[-1]
+        if self._is_utf16_conversion_required():
+            # Same universal-newline decode as _flush_temp_file()'s open().
+            with io.TextIOWrapper(io.BytesIO(data), encoding="utf8") as fobj:
+                data = self._to_utf16(fobj.read())
+        LOG.debug3('flush() writing {} to Git repository'.format(self.rev.depot_path))
+        try:
+            self.rev.sha1 = self.blob_sink.add_bytes(data)
+            self.revs.append(self.rev)
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('failed to write blob to repository')
+        finally:
+            self._buf = bytearray()
+            self.rev = None
+
+    def _flush_temp_file(self):
+        """Hash the last printed file, spilled to a temp file, into the repo."""
         size = self.temp_file.tell()
         if size > 0 and self.rev.is_symlink():
             # p4 print adds a trailing newline, which is no good for symlinks.
@@ -114,28 +195,16 @@ class PrintHandler(OutputHandler):
             if b[0] == 10:
                 size = self.temp_file.truncate(size - 1)
         self.temp_file.close()
-        # p4.charset could be None, empty string, or 'none'
-        if (not self.p4.charset or self.p4.charset == 'none') and 'utf16' in self.rev.type:
-            # Convert UTF-8 encoded files to UTF-16, but only for non-
-            # Unicode servers, in which case we would have already handled
-            # the conversion in the outputText() function.
-            LOG.debug('flush() converting {} to UTF-16'.format(self.rev.depot_path))
+        if self._is_utf16_conversion_required():
             with open(self.temp_file.name, 'r', encoding="utf8") as fobj:
                 temp_str = fobj.read()
-            # Include a Byte Order Mark (why doesn't P4API do this for
-            # us?). The choice of Little Endian is arbitrary, since we are
-            # including the BOM anyway. Regardless, it is not possible to
-            # know the endianness of the client, but LE is most likely.
-            temp_data = getattr(self.p4, '__convert')("utf16le", temp_str)
+            temp_data = self._to_utf16(temp_str)
             with open(self.temp_file.name, 'wb') as fobj:
-                fobj.write(codecs.BOM_UTF16_LE)
                 fobj.write(temp_data)
         LOG.debug3('flush() writing {} to Git repository'.format(self.rev.depot_path))
         try:
-            tmpname = os.path.basename(self.temp_file.name)
-            self.rev.sha1 = p4gf_pygit2.create_blob_fromdisk(self.repo, tmpname)
+            self.rev.sha1 = self.blob_sink.add_file(self.temp_file.name)
             self.revs.append(self.rev)
-            self._chmod_644_minimum(self.rev.sha1)
         except Exception:  # pylint: disable=broad-except
             LOG.exception('failed to write blob to repository')
         finally:
@@ -146,20 +215,35 @@ class PrintHandler(OutputHandler):
                 self.temp_file = None
                 self.rev = None
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, _exc_value, _traceback):
+        """close() on success. On error, abandon any unfinished blobs."""
+        if exc_type:
+            self.blob_sink.abort()
+        else:
+            self.close()
+        return False  # False = do not squelch exception
+
+    def close(self):
+        """Flush the last printed file, then finish writing all blobs.
+
+        Printed blobs are not guaranteed to exist in Git until this returns.
+        """
+        self.flush()
+        self.blob_sink.close()
+
     def outputStat(self, h):
         """Save path of current file."""
         try:
             self.flush()
             self.rev = P4File.create_from_print(h)
             self.change_set.add(self.rev.change)
-            ProgressReporter.increment(_('Copying files'))
+            with _PROGRESS_LOCK:
+                ProgressReporter.increment(_('Copying files'))
             LOG.debug2("PrintHandler.outputStat() ch={} {}#{}".format(
                 self.rev.change, self.rev.depot_path, self.rev.revision))
-            # use the git working tree so we can use create_blob_fromfile()
-            tmpdir = os.getcwd()
-            self.temp_file = tempfile.NamedTemporaryFile(
-                buffering=10000000, prefix='p2g-print-', dir=tmpdir, delete=False)
-            LOG.debug3('outputStat() temporary file created: {}'.format(self.temp_file.name))
         except Exception:  # pylint: disable=broad-except
             LOG.exception("outputStat")
         return OutputHandler.HANDLED
@@ -179,26 +263,3 @@ class PrintHandler(OutputHandler):
         except Exception:  # pylint: disable=broad-except
             LOG.exception("outputMessage")
         return OutputHandler.REPORT
-
-    def _chmod_644_minimum(self, sha1):
-        """Ensure blob file mode is correct.
-
-        pygit2 created a blob. If that blob is a loose object,
-        make sure that loose object's file has at least file mode 644
-        so that we (owner) has read+write, and the world has read access.
-
-        Don't raise/abort if this fails due to file not found. Assume that
-        is due to the blob landing in a packfile.
-        """
-        obj_path = p4gf_git.object_path(sha1)
-        if obj_path is None:
-            # Object is already in the repo in a pack file? Nothing
-            # more do be done here.
-            if LOG.isEnabledFor(logging.DEBUG2):
-                LOG.debug2("_chmod_644_minimum() no such loose blob %s, nothing to do", sha1)
-            return
-        blob_path = os.path.join(self.ctx.repo_dirs.GIT_WORK_TREE, obj_path)
-        try:
-            p4gf_util.chmod_644_minimum(blob_path)
-        except OSError as e:
-            LOG.warning("chmod 644 failed path={path} err={e}".format(path=blob_path, e=e))
@@ -0,0 +1,190 @@
+#! /usr/bin/env python3.3
+"""PrintScheduler: run P2G's `p4 print` requests on several P4 connections
+at once.
+
+P2G._copy_print() used to print one branch view at a time on ctx.p4.
+Repos with dozens of lightweight depot branches spent most of their
+copy time waiting on the network, one branch after another.
+
+PrintScheduler keeps a small pool of extra P4 connections, one per
+worker thread. Each job is one `p4 print` path range, printed through
+its own PrintHandler into a single shared blob sink. A large branch view
+splits into several contiguous ranges, one job each, so that one branch
+can keep more than one connection busy. Jobs finish in any order, but
+callers wait() for them in submission order and merge each job's RevList
+into their own, so the result is the same as printing them one after
+another on ctx.p4.
+
+Expected call sequence:
+
+    with PrintScheduler(ctx, args, worker_ct, printhandler) as sched:
+        with ctx.switched_to_branch(branch):
+            job_list = [sched.submit(path) for path in path_list]
+        ...
+        for job in job_list:
+            change_set |= sched.wait(job)
+"""
+from   concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+
+import P4
+
+import p4gf_config
+import p4gf_const
+import p4gf_create_p4
+from   p4gf_p2g_print_handler import PrintHandler
+import p4gf_util
+
+LOG = logging.getLogger('p4gf_copy_to_git').getChild('print_scheduler')
+
+                        # Default for p4gf_config KEY_PRINT_CONCURRENCY.
+DEFAULT_WORKER_CT = 4
+
+
+def worker_ct(ctx):
+    """How many concurrent `p4 print` connections does this repo allow?
+
+    Never more than the client pool can supply, while leaving room for the
+    main thread's own switched_to_branch() clients. 1 means "no
+    concurrency, print everything on ctx.p4 as we always did."
+    """
+    value = ctx.repo_config.get( p4gf_config.SECTION_PERFORCE_TO_GIT
+                               , p4gf_config.KEY_PRINT_CONCURRENCY
+                               , fallback = None )
+    try:
+        ct = int(value) if value else DEFAULT_WORKER_CT
+    except ValueError:
+        LOG.warning("{key}={value} not an integer, using {default}"
+                    .format( key     = p4gf_config.KEY_PRINT_CONCURRENCY
+                           , value   = value
+                           , default = DEFAULT_WORKER_CT ))
+        ct = DEFAULT_WORKER_CT
+    return max(1, min(ct, p4gf_const.MAX_TEMP_CLIENTS - 2))
+
+
+class PrintJob:
+    """One `p4 print` request: a branch view, or one part of a branch view."""
+
+    def __init__(self, seq, client_name, path):
+        self.seq         = seq
+        self.client_name = client_name
+        self.path        = path
+        self.future      = None
+
+    def __str__(self):
+        return "PrintJob seq={} client={} path={}".format(
+            self.seq, self.client_name, self.path)
+
+
+class PrintScheduler:
+    """Bounded pool of worker threads, each with its own P4 connection."""
+
+    def __init__(self, ctx, args, worker_ct_, printhandler):
+        self.ctx          = ctx
+        self.args         = args
+        self.worker_ct    = worker_ct_
+        self.printhandler = printhandler
+        self._executor    = None
+        self._p4_queue    = queue.Queue()
+        self._p4_list     = []
+        self._seq         = 0
+        self._unwaited    = {}      # seq => PrintJob submitted, not yet wait()ed
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.worker_ct)
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+        return False  # False = do not squelch exception
+
+    def submit(self, path):
+        """Start printing path through ctx.p4's current client.
+
+        Call from within a ctx.switched_to_xxx() block. We hold our own
+        reference to that temp client until wait(), so the client pool does
+        not recycle it out from under the worker thread.
+        """
+        client_name = self.ctx.p4.client
+        self.ctx.add_ref_to_temp_client(client_name)
+        self._seq += 1
+        job = PrintJob(self._seq, client_name, path)
+        LOG.debug2("submit() {}".format(job))
+        job.future = self._executor.submit(self._run, job)
+        self._unwaited[job.seq] = job
+        return job
+
+    def wait(self, job):
+        """Wait for job to complete, merge its printed revisions into
+        our caller's PrintHandler.
+
+        Return the set of change numbers included in job's output.
+        Re-raise any exception from job.
+        """
+        try:
+            handler = job.future.result()
+        finally:
+            del self._unwaited[job.seq]
+            self.ctx.release_temp_client(job.client_name)
+        self.printhandler.revs.extend(handler.revs)
+        self.printhandler.change_set |= handler.change_set
+        LOG.debug2("wait() {} rev_ct={}".format(job, len(handler.revs)))
+        return handler.change_set
+
+    def close(self):
+        """Wait for any remaining jobs, then disconnect our connections.
+
+        Jobs never wait()ed, usually because an earlier job raised, are
+        discarded.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for job in self._unwaited.values():
+            self.ctx.release_temp_client(job.client_name)
+        self._unwaited = {}
+        for p4 in self._p4_list:
+            p4gf_create_p4.destroy(p4)
+        self._p4_list = []
+
+    def _run(self, job):
+        """Worker thread: print one job on one of our connections."""
+        p4 = self._acquire_p4()
+        try:
+            p4.client = job.client_name
+            handler = PrintHandler( self.ctx
+                                  , p4        = p4
+                                  , blob_sink = self.printhandler.blob_sink )
+            with p4gf_util.raw_encoding(p4) \
+                , p4.using_handler(handler) \
+                , p4.at_exception_level(P4.P4.RAISE_ALL):
+                LOG.debug2("p4 print {} {}".format(' '.join(self.args), job.path))
+                p4.run('print', self.args, job.path)
+            handler.flush()
+            return handler
+        finally:
+            self._p4_queue.put(p4)
+
+    def _acquire_p4(self):
+        """Return an idle connection, creating one if all are busy.
+
+        Never creates more than worker_ct connections: there are only
+        worker_ct threads to ask for them.
+        """
+        try:
+            return self._p4_queue.get_nowait()
+        except queue.Empty:
+            pass
+        template = self.ctx.p4
+        p4 = p4gf_create_p4.create_p4( port    = template.port
+                                     , user    = template.user
+                                     , client  = template.client
+                                     , connect = False )
+        if template.charset:
+            p4.charset = template.charset
+        p4gf_create_p4.p4_connect(p4)
+        self._p4_list.append(p4)
+        LOG.debug("_acquire_p4() new connection {} of {}"
+                  .format(len(self._p4_list), self.worker_ct))
+        return p4
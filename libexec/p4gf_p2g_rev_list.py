@@ -27,6 +27,11 @@ class RevList:
         """
         self.changes.setdefault(p4file.change, []).append(p4file)
 
+    def extend(self, other):
+        """Append all of another RevList's p4files, in its order."""
+        for change, p4file_list in other.changes.items():
+            self.changes.setdefault(change, []).extend(p4file_list)
+
     def __iter__(self):
         for change in self.changes.values():
             for p4file in change:
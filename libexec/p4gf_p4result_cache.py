@@ -1,14 +1,44 @@
 #! /usr/bin/env python3.3
-"""P4ResultCache."""
-
-from collections import deque, namedtuple
+"""P4ResultCache.
+
+Results for a fully populated branch can run to hundreds of thousands of
+file dicts, and G2PMatrix asks for the same branch@change again and again
+within a push. So:
+
+* Hits return the cached results themselves, a tuple of dicts, without
+  copying. Each dict already carries its 'gwt_path', calculated once on
+  the miss under the branch's view. Callers must not modify these dicts:
+  copy any dict you need to change.
+* Dict keys, and values such as 'action' and 'type' that repeat across
+  thousands of files, are interned: every dict shares one copy. So are
+  'depotFile' and 'gwt_path': the same file's results from other
+  changelists of the same branch, and its 'gwt_path' from other branches,
+  share one copy with G2PMatrixRow's own paths.
+* Results are found by (branch_id, change_num) in a dict, and the cache is
+  bounded by an estimate of its results' size in bytes, not by a fixed
+  count of entries.
+* A miss can be answered by a pending prefetch that some other thread
+  started earlier: see p4gf_g2p_prefetch.
+"""
 import logging
+import sys
 
+import p4gf_bounded_cache
+import p4gf_config
 import p4gf_util
 
 LOG = logging.getLogger(__name__)
 
-_MAX = 10
+_MAX_BYTES = 256 * 1024 * 1024
+
+                        # Result dict values to intern: few distinct values
+                        # across many files.
+_INTERN_KEYS = { 'action', 'headAction'
+               , 'type',   'headType'
+               , 'rev',    'headRev'
+               , 'change', 'headChange'
+               , 'time',   'headTime', 'headModTime'
+               , 'isMapped' }
 
 
 class P4ResultCache:
@@ -16,64 +46,118 @@ class P4ResultCache:
     """Generic cache of 'p4 xxx' results for some branch at some changelist.
 
     G2PMatrix runs enough duplicate 'p4 fstat //branch-client/...@nn' in close
-    temporal proximity that it could benefit from a small bounded cache.
+    temporal proximity that it could benefit from a bounded cache.
     """
 
     def __init__(self, cmd):
-        self.cache = deque(maxlen=_MAX)    # of CacheLine
-        self._hit_ct  = 0
-        self._miss_ct = 0
-        self._cmd     = cmd
+        self._cmd = cmd
+                        # (branch_id, change_num) ==> tuple of result dicts
+        self._lru = p4gf_bounded_cache.LRUCache(
+                          "P4ResultCache '{}'".format(' '.join(cmd))
+                        , _MAX_BYTES
+                        , config_key = p4gf_config.KEY_P4RESULT_CACHE_BYTES
+                        , sizeof     = _sizeof )
+                        # (branch_id, change_num) ==> a pending prefetch
+                        # whose result() returns raw 'p4 xxx' results.
+        self._pending = {}
+
+    def cmd(self):
+        """Return our 'p4 xxx' command as a list, without its path."""
+        return list(self._cmd)
+
+    def has(self, branch, change_num):
+        """Do we already have, or expect, results for branch@change_num?"""
+        key = (branch.branch_id, change_num)
+        return key in self._lru or key in self._pending
+
+    def add_pending(self, branch, change_num, pending):
+        """Answer the next miss for branch@change_num with pending.result()."""
+        self._pending[(branch.branch_id, change_num)] = pending
+
+    def discard_pending(self, branch, change_num, pending):
+        """Forget pending if no get() has used it yet. Return True if forgotten."""
+        key = (branch.branch_id, change_num)
+        if self._pending.get(key) is not pending:
+            return False
+        del self._pending[key]
+        return True
 
     def get(self, ctx, branch, change_num):
-        """Fetch files in branch at change and return result list."""
-        result_list = self._find(branch, change_num)
-        if not result_list:
-            self._miss_ct += 1
+        """Fetch files in branch at change and return result list.
+
+        Returned tuple and its dicts are shared: do not modify.
+        """
+        # Never cache results for temp branch views that lack a permanent
+        # branch_id: a branch_id of None is used for multiple branch views.
+        if not branch.branch_id:
+            return self._fetch(ctx, branch, change_num)
+
+        key = (branch.branch_id, change_num)
+        result = self._lru.get(key)
+        if result is None:
             LOG.debug2('{cmd} {branch}@{change} miss {ct}'
                        .format( branch  = p4gf_util.abbrev(branch.branch_id)
                               , change  = change_num
-                              , ct      = self._miss_ct
+                              , ct      = self._lru.stats.miss_ct
                               , cmd     = self._cmd ))
-            result_list = self._fetch(ctx, branch, change_num)
-            self._insert(branch, change_num, result_list)
+            result = self._fetch(ctx, branch, change_num, self._pending.pop(key, None))
+            self._lru.put(key, result)
         else:
-            self._hit_ct += 1
             LOG.debug2('{cmd} {branch}@{change} hit  {ct}'
                        .format( branch  = p4gf_util.abbrev(branch.branch_id)
                               , change  = change_num
-                              , ct      = self._hit_ct
+                              , ct      = self._lru.stats.hit_ct
                               , cmd     = self._cmd ))
-        return result_list
-
-    def _fetch(self, ctx, branch, change_num):
-        """Run 'p4 files' and return results."""
-        with ctx.switched_to_branch(branch):
-            return ctx.p4run(self._cmd + [ctx.client_view_path(change_num)])
-
-    def _find(self, branch, change_num):
-        """Find a CacheLine with matching path and return its result_list.
+        return result
 
-        Or return None if not found.
+    def _fetch(self, ctx, branch, change_num, pending=None):
+        """Run 'p4 xxx', or take a pending prefetch's results, and return
+        results as a tuple of compacted dicts.
         """
-        # Never cache results for temp branch views that lack a permanent
-        # branch_id: a branch_id of None is used for multiple branch views.
-        if not branch.branch_id:
-            return None
-
-        for cl in self.cache:
-            if (    cl.branch           == branch.branch_id
-                and cl.change_num       == change_num):
-                return cl.result_list
-        return None
-
-    def _insert(self, branch, change_num, result_list):
-        """Add a CacheLine for path + result_list.
-
-        Assumes we don't already have such a line.
-        """
-        self.cache.appendleft(CacheLine( branch      = branch.branch_id
-                                       , change_num  = change_num
-                                       , result_list = result_list ))
-
-CacheLine = namedtuple('CacheLine', ['branch', 'change_num', 'result_list'])
+        with ctx.switched_to_branch(branch):
+            r = None
+            if pending:
+                try:
+                    r = pending.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    LOG.debug('{cmd} {branch}@{change} prefetch failed, rerunning: {e}'
+                              .format( branch = p4gf_util.abbrev(branch.branch_id)
+                                     , change = change_num
+                                     , cmd    = self._cmd
+                                     , e      = e ))
+            if r is None:
+                r = ctx.p4run(self._cmd + [ctx.client_view_path(change_num)])
+            return tuple(_compact(ctx, rr) if isinstance(rr, dict) else rr
+                         for rr in r)
+
+
+def _compact(ctx, rr):
+    """Return a copy of one result dict with interned keys and repeated
+    values, plus its 'gwt_path'.
+
+    Call under the same "with ctx.switched_to_branch():" context that ran
+    the p4 command. Otherwise the gwt_path calc will return incorrect results.
+    """
+    intern = sys.intern
+    d = {}
+    for k, v in rr.items():
+        k = intern(k)
+        if k in _INTERN_KEYS and isinstance(v, str):
+            v = intern(v)
+        d[k] = v
+    if 'depotFile' in d:
+        d['depotFile'] = intern(d['depotFile'])
+        d['gwt_path']  = intern(ctx.depot_to_gwt_path(d['depotFile']))
+    return d
+
+
+def _sizeof(result):
+    """Estimate one cached result's size in bytes."""
+    size = sys.getsizeof(result)
+    for rr in result:
+        size += sys.getsizeof(rr)
+        if isinstance(rr, dict):
+            for k, v in rr.items():
+                if k not in _INTERN_KEYS:
+                    size += sys.getsizeof(v)
+    return size
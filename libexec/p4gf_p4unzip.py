@@ -2,7 +2,9 @@
 """Code for creating a generic `p4 unzip` archive."""
 import logging
 import os
-import zipfile
+import struct
+import time
+import zlib
 import p4gf_util
 
 LOG = logging.getLogger("p4gf_fast_push.zip")
@@ -37,8 +39,10 @@ class P4Unzip:
             p4unzip.context.jnl( record_str )
             p4unzip.integ.jnl( record_str )
 
-        Write zip archive files
+        Write zip archive files (p4unzip.zip.fp is a ZipWriter)
             p4unzip.zip.fp.writestr(archive_relpath, raw_bytes)
+          or, if you already deflated them elsewhere
+            p4unzip.write_deflated(archive_relpath, deflated, crc, byte_ct)
 
         Close journal files, write MANIFEST, close zip archive
             close_all()
@@ -74,12 +78,27 @@ class P4Unzip:
         for j in self.jnl:
             assert j.fp is None
             j.fp = open(j.abspath, "w", encoding="utf-8")
-        self.zip.fp = zipfile.ZipFile(self.zip.abspath, "w"
-            #, compression = zipfile.ZIP_STORED
-                        # ZIP_DEFLATED saves 50% temporary/working disk space,
-                        # but costs 5% additional time for the compression.
-            , compression = zipfile.ZIP_DEFLATED
-            , allowZip64  = True )
+                        # Always deflate: saves 50% temporary/working disk
+                        # space, but costs 5% additional time for the
+                        # compression.
+        self.zip.fp = ZipWriter(self.zip.abspath)
+
+    def write_deflated(self, archive_relpath, deflated_bytes, crc, byte_ct):
+        """Write one archive file whose content is already raw-deflated.
+
+        Same result as zip.fp.writestr(archive_relpath, raw_bytes), but
+        without paying for compression here. Lets worker processes
+        compress while we write.
+
+        :param deflated_bytes: raw deflate stream, no zlib header
+                               (zlib wbits=-15), like ZIP_DEFLATED writes.
+        :param crc:            crc32 of the uncompressed content.
+        :param byte_ct:        length of the uncompressed content.
+        """
+        self.zip.fp.write_deflated( arcname        = archive_relpath
+                                  , deflated_bytes = deflated_bytes
+                                  , crc            = crc
+                                  , byte_ct        = byte_ct )
 
     def copy_journal_files_to_zip_file(self):
         """Copy our change/context/whatever journal files to zipfile.
@@ -157,6 +176,234 @@ class FileStruct:
         if is_db_change:
             self.db_change_ct += 1
 
+class ZipWriter:
+    """Write-only, always-deflated zip archive.
+
+    Just enough of zipfile.ZipFile's write API for P4Unzip: writestr(),
+    write(), close(). Plus write_deflated(), which zipfile offers no public
+    API for: store content that some other process already deflated.
+
+    Writes local file headers, central directory, and (when sizes, offsets,
+    or entry counts outgrow 32/16 bits) Zip64 records itself with struct,
+    per PKWARE APPNOTE.TXT. Never reads back what it wrote.
+    """
+
+    _LOCAL_HEADER       = struct.Struct("<4s5H3L2H")
+    _CENTRAL_HEADER     = struct.Struct("<4s6H3L5H2L")
+    _END_RECORD         = struct.Struct("<4s4H2LH")
+    _END_RECORD_64      = struct.Struct("<4sQ2H2L4Q")
+    _END_LOCATOR_64     = struct.Struct("<4sLQL")
+    _EXTRA_64_HEADER    = struct.Struct("<2H")
+
+    _SIG_LOCAL          = b"PK\x03\x04"
+    _SIG_CENTRAL        = b"PK\x01\x02"
+    _SIG_END            = b"PK\x05\x06"
+    _SIG_END_64         = b"PK\x06\x06"
+    _SIG_END_LOCATOR_64 = b"PK\x06\x07"
+
+    _VERSION            = 20            # 2.0: deflate
+    _VERSION_64         = 45            # 4.5: Zip64
+    _CREATE_SYSTEM      = 3             # Unix: external_attr is st_mode << 16
+    _EXTRA_ID_64        = 0x0001
+    _LIMIT_16           = 0xFFFF
+    _LIMIT_32           = 0xFFFFFFFF
+    _CHUNK_SIZE         = 1024 * 1024
+
+    def __init__(self, abspath):
+        self.fp = open(abspath, "wb")   # pylint:disable=invalid-name
+        self._entries = []      # _ZipEntry, in archive order.
+        self._names   = set()
+
+    def writestr(self, arcname, data):
+        """Deflate and write one archive file from bytes or str."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        deflated = comp.compress(data) + comp.flush()
+        self.write_deflated( arcname        = arcname
+                           , deflated_bytes = deflated
+                           , crc            = zlib.crc32(data)
+                           , byte_ct        = len(data) )
+
+    def write_deflated(self, arcname, deflated_bytes, crc, byte_ct):
+        """Write one archive file whose content is already raw-deflated
+        (zlib wbits=-15).
+        """
+        e = self._new_entry(arcname, time.time(), 0o600 << 16)
+        e.crc           = crc & self._LIMIT_32
+        e.file_size     = byte_ct
+        e.compress_size = len(deflated_bytes)
+        self.fp.write(self._local_header(e, zip64=self._is_zip64(e)))
+        self.fp.write(deflated_bytes)
+
+    def write(self, filename, arcname):
+        """Deflate and write one archive file from a file on disk.
+
+        Streams the file through zlib, so sizes are not known until after
+        the content is written: always writes a Zip64 local header, then
+        seeks back to fill in its sizes and crc.
+        """
+        st = os.stat(filename)
+        e = self._new_entry(arcname, st.st_mtime, (st.st_mode & 0xFFFF) << 16)
+        self.fp.write(self._local_header(e, zip64=True))
+        comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        crc = 0
+        with open(filename, "rb") as f:
+            while True:
+                chunk = f.read(self._CHUNK_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                e.file_size += len(chunk)
+                deflated = comp.compress(chunk)
+                e.compress_size += len(deflated)
+                self.fp.write(deflated)
+        deflated = comp.flush()
+        e.compress_size += len(deflated)
+        self.fp.write(deflated)
+        e.crc = crc & self._LIMIT_32
+
+        end = self.fp.tell()
+        self.fp.seek(e.header_offset)
+        self.fp.write(self._local_header(e, zip64=True))
+        self.fp.seek(end)
+
+    def close(self):
+        """Write the central directory and end records, close the file."""
+        if self.fp is None:
+            return
+        cd_offset = self.fp.tell()
+        for e in self._entries:
+            self.fp.write(self._central_header(e))
+        cd_size = self.fp.tell() - cd_offset
+        entry_ct = len(self._entries)
+
+        if (   self._LIMIT_16 <= entry_ct
+            or self._LIMIT_32 <= cd_size
+            or self._LIMIT_32 <= cd_offset):
+            end_64_offset = self.fp.tell()
+            self.fp.write(self._END_RECORD_64.pack(
+                  self._SIG_END_64
+                , self._END_RECORD_64.size - 12     # size of remaining record
+                , (self._CREATE_SYSTEM << 8) | self._VERSION_64
+                , self._VERSION_64
+                , 0, 0                              # this disk, cd disk
+                , entry_ct, entry_ct
+                , cd_size, cd_offset ))
+            self.fp.write(self._END_LOCATOR_64.pack(
+                  self._SIG_END_LOCATOR_64, 0, end_64_offset, 1))
+            entry_ct  = min(entry_ct,  self._LIMIT_16)
+            cd_size   = min(cd_size,   self._LIMIT_32)
+            cd_offset = min(cd_offset, self._LIMIT_32)
+
+        self.fp.write(self._END_RECORD.pack(
+              self._SIG_END
+            , 0, 0                                  # this disk, cd disk
+            , entry_ct, entry_ct
+            , cd_size, cd_offset
+            , 0 ))                                  # comment length
+        self.fp.close()
+        self.fp = None
+
+    def _new_entry(self, arcname, mtime, external_attr):
+        """Record a new archive file that starts at our current position."""
+        if arcname in self._names:
+            LOG.warning("Duplicate name in zip archive: {}".format(arcname))
+        self._names.add(arcname)
+        e = _ZipEntry( arcname       = arcname
+                     , mtime         = mtime
+                     , external_attr = external_attr
+                     , header_offset = self.fp.tell() )
+        self._entries.append(e)
+        return e
+
+    def _is_zip64(self, e):
+        """Do this entry's sizes outgrow a plain 32-bit header?"""
+        return (   self._LIMIT_32 <= e.file_size
+                or self._LIMIT_32 <= e.compress_size)
+
+    def _local_header(self, e, zip64):
+        """Return the local file header bytes that precede an entry's data."""
+        if zip64:
+            extra = self._extra_64([e.file_size, e.compress_size])
+            sizes = (self._LIMIT_32, self._LIMIT_32)
+            version = self._VERSION_64
+        else:
+            extra = b""
+            sizes = (e.compress_size, e.file_size)
+            version = self._VERSION
+        name, flags = e.encoded_name()
+        dos_time, dos_date = e.dos_time_date()
+        return self._LOCAL_HEADER.pack(
+                  self._SIG_LOCAL
+                , version, flags, zlib.DEFLATED, dos_time, dos_date
+                , e.crc, sizes[0], sizes[1]
+                , len(name), len(extra) ) + name + extra
+
+    def _central_header(self, e):
+        """Return the central directory header bytes for one entry."""
+        extra_values = []
+        file_size = e.file_size
+        if self._LIMIT_32 <= file_size:
+            extra_values.append(file_size)
+            file_size = self._LIMIT_32
+        compress_size = e.compress_size
+        if self._LIMIT_32 <= compress_size:
+            extra_values.append(compress_size)
+            compress_size = self._LIMIT_32
+        header_offset = e.header_offset
+        if self._LIMIT_32 <= header_offset:
+            extra_values.append(header_offset)
+            header_offset = self._LIMIT_32
+        extra = self._extra_64(extra_values) if extra_values else b""
+        version = self._VERSION_64 if extra_values else self._VERSION
+
+        name, flags = e.encoded_name()
+        dos_time, dos_date = e.dos_time_date()
+        return self._CENTRAL_HEADER.pack(
+                  self._SIG_CENTRAL
+                , (self._CREATE_SYSTEM << 8) | version
+                , version, flags, zlib.DEFLATED, dos_time, dos_date
+                , e.crc, compress_size, file_size
+                , len(name), len(extra)
+                , 0, 0, 0                           # comment, disk, int attr
+                , e.external_attr, header_offset ) + name + extra
+
+    def _extra_64(self, values):
+        """Return a Zip64 extended information extra field."""
+        return self._EXTRA_64_HEADER.pack(self._EXTRA_ID_64, 8 * len(values)) \
+             + struct.pack("<{}Q".format(len(values)), *values)
+
+
+class _ZipEntry:
+    """One file within a ZipWriter archive."""
+
+    FLAG_UTF8 = 0x800   # General purpose flag bit 11: name is UTF-8.
+
+    def __init__(self, arcname, mtime, external_attr, header_offset):
+        self.arcname       = arcname
+        self.mtime         = mtime
+        self.external_attr = external_attr
+        self.header_offset = header_offset
+        self.crc           = 0
+        self.file_size     = 0
+        self.compress_size = 0
+
+    def encoded_name(self):
+        """Return (name bytes, general purpose flags)."""
+        try:
+            return self.arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return self.arcname.encode("utf-8"), self.FLAG_UTF8
+
+    def dos_time_date(self):
+        """Return (MS-DOS time, MS-DOS date) of our mtime, local time."""
+        t = time.localtime(self.mtime)
+        year = max(t.tm_year, 1980)
+        dos_date = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+        dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+        return dos_time, dos_date
+
 # -- module-wide -------------------------------------------------------------
 
 def _write_manifest(abspath, change_ct, ctx):
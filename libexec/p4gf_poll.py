@@ -4,18 +4,37 @@
 Invokes code from the same script (p4gf_auth_server.py) that normal Git clients
 invoke when they connect to Git Fusion over sshd, but passes "poll_only=True"
 to suppress 'git pull' permission check or call to original git-upload-pack.
+
+Before polling, skips any repo whose Perforce history has not changed since
+the last poll: one 'p4 keys' fetches every repo's last-copied and last-polled
+changelist numbers, one 'p4 changes -m1' per repo finds the newest changelist
+that could affect that repo. --no-skip polls every repo regardless.
+
+With --jobs N, polls up to N repos at once, each in its own child process,
+most-behind repo first. Repos that another process has locked go to the back
+of the queue and are retried a few times before being reported as skipped.
+With --daemon SECONDS, repeats the whole poll every SECONDS until killed.
 """
 
+import argparse
+import collections
 import logging
 import os
+import signal
+import subprocess
 import sys
+import tempfile
+import time
 
 import p4gf_env_config    # pylint: disable=unused-import
 import p4gf_auth_server
+import p4gf_branch
+import p4gf_config
 import p4gf_const
 import p4gf_create_p4
 from p4gf_l10n import _, NTR, log_l10n
 import p4gf_log
+import p4gf_p4key as P4Key
 import p4gf_util
 import p4gf_version_3
 import p4gf_repo_dirs
@@ -25,6 +44,23 @@ import p4gf_lock
 # cannot use __name__ since it will often be "__main__"
 LOG = logging.getLogger("p4gf_poll")
 
+                        # How many times to requeue a locked repo before
+                        # giving up on it for this round, and how long to
+                        # wait before each retry.
+_LOCKED_RETRY_CT      = 3
+_LOCKED_RETRY_SECONDS = 5.0
+
+                        # How often to check on running child processes.
+_CHILD_POLL_SECONDS   = 0.1
+
+                        # Child process exit code: "repo was locked, did not
+                        # poll it." Parent requeues the repo, does not record
+                        # it as polled.
+_EX_LOCKED            = os.EX_TEMPFAIL
+
+_TERM_SIGNALS = [ signal.SIGHUP, signal.SIGINT, signal.SIGQUIT
+                , signal.SIGTERM ]
+
 
 def repo_is_locked(repo_name):
     """Determine if the repo is locked by GF."""
@@ -33,18 +69,27 @@ def repo_is_locked(repo_name):
     # common code closes all connections after each poll.
     #
     p4 = p4gf_create_p4.create_p4_temp_client()
-    is_locked = False
+    is_locked = _is_locked(p4, repo_name)
+    if is_locked:
+        sys.stdout.write(_("View '{repo_name}' is locked. Skipping poll update.\n"
+                         .format(repo_name=repo_name)))
+    p4gf_create_p4.destroy(p4)
+    return is_locked
+
+
+def _is_locked(p4, repo_name):
+    """Try, without blocking, to acquire and release the repo's lock.
+
+    Return True if some other process holds it.
+    """
     repo_name_tx = p4gf_translate.TranslateReponame.url_to_repo(repo_name, p4)
     # Do not block on repo lock - this will cause issues when called from cron
     try:
         with p4gf_lock.RepoLock(p4, repo_name_tx, blocking=False):
             pass
     except p4gf_lock.LockBusy:
-        sys.stdout.write(_("View '{repo_name}' is locked. Skipping poll update.\n"
-                         .format(repo_name=repo_name)))
-        is_locked = True
-    p4gf_create_p4.destroy(p4)
-    return is_locked
+        return True
+    return False
 
 
 def _list_for_server(p4):
@@ -62,6 +107,345 @@ def _list_for_server(p4):
     return result
 
 
+class RepoPoll:
+
+    """One repo's place in a round of polling."""
+
+    def __init__(self, repo_name, repo_name_tx):
+        self.repo_name      = repo_name     # as the user typed it, passed to
+                                            # p4gf_auth_server
+        self.repo_name_tx   = repo_name_tx  # internal repo name, for p4keys
+        self.head_change    = None  # newest changelist that could affect this
+                                    # repo, or None if unknown.
+        self.last_copied    = 0     # last-copied-changelist-number p4key
+        self.last_polled    = 0     # head_change as of the last good poll
+        self.retry_ct       = 0     # times requeued because locked
+        self.not_before     = 0.0   # time.time() before which not to retry
+        self.start_time     = None
+        self.seconds        = None
+        self.ec             = None
+
+    def lag(self):
+        """How many changelists behind is this repo? None if unknown."""
+        if self.head_change is None:
+            return None
+        return max(0, self.head_change - self.last_copied)
+
+    def is_unchanged(self):
+        """Has nothing been submitted since we last polled or copied?"""
+        if self.head_change is None:
+            return False
+        return (   self.head_change == self.last_polled
+                or self.head_change <= self.last_copied)
+
+    def priority(self):
+        """Sort key: unknown heads first, then largest lag first."""
+        lag = self.lag()
+        if lag is None:
+            return (0, 0)
+        return (1, -lag)
+
+
+class Poller:
+
+    """Decide which repos to poll, in what order, then poll them."""
+
+    def __init__(self, args, repo_list):
+        self.args        = args
+        self.repo_list   = repo_list
+        self.server_id   = p4gf_util.get_server_id()
+                        # repo_name_tx ==> RepoConfig, kept across daemon
+                        # rounds and refreshed only if Perforce has a newer
+                        # revision.
+        self.configs     = {}
+
+    def plan(self, p4):
+        """Return a list of RepoPoll to poll, most-behind first,
+        and a list of RepoPoll skipped as unchanged.
+        """
+        polls = [RepoPoll(r, p4gf_translate.TranslateReponame.url_to_repo(r, p4))
+                 for r in self.repo_list]
+        if self.args.no_skip:
+            return polls, []
+
+        # One 'p4 keys' for every repo's last-copied and last-polled keys.
+        pattern = NTR('git-fusion-*-{server_id}-last-*').format(
+            server_id=self.server_id)
+        keys = P4Key.get_all(p4, pattern)
+        for rp in polls:
+            rp.last_copied = _int(keys.get(
+                P4Key.calc_last_copied_change_p4key_name(
+                    rp.repo_name_tx, self.server_id)))
+            rp.last_polled = _int(keys.get(self._last_polled_key_name(rp)))
+            rp.head_change = self._head_change(p4, rp.repo_name_tx)
+
+        todo    = [rp for rp in polls if not rp.is_unchanged()]
+        skipped = [rp for rp in polls if rp.is_unchanged()]
+        todo.sort(key=RepoPoll.priority)
+        return todo, skipped
+
+    def record_polled(self, p4, rp):
+        """Remember the head changelist we just polled up to."""
+        if rp.head_change is None or self.args.no_skip:
+            return
+        P4Key.set(p4, self._last_polled_key_name(rp), str(rp.head_change))
+
+    def _last_polled_key_name(self, rp):
+        """Return the name of rp's last-polled p4key."""
+        return p4gf_const.P4GF_P4KEY_LAST_POLLED_CHANGE.format(
+            repo_name=rp.repo_name_tx, server_id=self.server_id)
+
+    def _head_change(self, p4, repo_name):
+        """Return the newest submitted changelist number that could change
+        what a poll would copy into repo_name. None if unknown.
+
+        That's any changelist under a branch view, a lightweight branch's
+        depot root, the repo's config files, or its tag objects.
+        """
+        try:
+            config = self.configs.get(repo_name)
+            if config:
+                config.refresh_if(p4)
+            else:
+                config = p4gf_config.RepoConfig.from_depot_file(repo_name, p4)
+                self.configs[repo_name] = config
+
+            paths = [ p4gf_const.P4GF_DEPOT_BRANCH_ROOT.format(
+                                  P4GF_DEPOT = p4gf_const.P4GF_DEPOT
+                                , repo_name  = repo_name
+                                , branch_id  = '...')
+                    , NTR('//{P4GF_DEPOT}/repos/{repo_name}/...').format(
+                                  P4GF_DEPOT = p4gf_const.P4GF_DEPOT
+                                , repo_name  = repo_name)
+                    , NTR('{objects_root}/repos/{repo_name}/tags/...').format(
+                                  objects_root = p4gf_const.objects_root()
+                                , repo_name    = repo_name)
+                    ]
+            for cfg in (config.repo_config, config.repo_config2):
+                for branch in p4gf_branch.dict_from_config(cfg, p4).values():
+                    if branch.deleted:
+                        continue
+                    if not branch.view_p4map:
+                        return None     # Stream or other late-bound view.
+                    for lhs in branch.view_p4map.lhs():
+                        if lhs.startswith('-'):
+                            continue
+                        paths.append(lhs.lstrip('+').strip('"'))
+
+            r = p4.run(['changes', '-m1', '-s', 'submitted'] + paths)
+            changes = [int(rr['change']) for rr in r
+                       if isinstance(rr, dict) and 'change' in rr]
+            return max(changes) if changes else 0
+        except Exception:   # pylint: disable=broad-except
+            LOG.exception("Cannot calculate head changelist for {}. Will poll."
+                          .format(repo_name))
+            return None
+
+    def run_sequential(self):
+        """Poll each repo in turn, in this process.
+
+        Return os.EX_OK, or the exit code of the first repo that failed.
+        As a --jobs child, return _EX_LOCKED if we skipped a locked repo.
+        """
+        result = os.EX_OK
+        locked = False
+        p4 = p4gf_create_p4.create_p4_temp_client()
+        todo, skipped = self.plan(p4)
+        p4gf_create_p4.destroy(p4)
+        self._report_skipped(skipped)
+
+        for rp in todo:
+            if repo_is_locked(rp.repo_name):
+                if self.args.verbose:
+                    sys.stdout.write(_('Skipping locked repo: {}\n').format(rp.repo_name))
+                locked = True
+                continue
+            if self.args.verbose:
+                sys.stdout.write(_('Updating: {}\n').format(rp.repo_name))
+            sys.argv = [
+                'p4gf_auth_server.py',
+                '--user={}'.format(p4gf_const.P4GF_USER),
+                'git-upload-pack',
+                rp.repo_name
+            ]
+            rp.start_time = time.time()
+            rp.ec = p4gf_auth_server.main(poll_only=True)
+            rp.seconds = time.time() - rp.start_time
+            self._report_done(rp)
+            if rp.ec != os.EX_OK:
+                result = result or rp.ec
+            elif rp.head_change is not None and not self.args.no_skip:
+                # p4gf_auth_server closed all connections. Open another.
+                p4 = p4gf_create_p4.create_p4_temp_client()
+                self.record_polled(p4, rp)
+                p4gf_create_p4.destroy(p4)
+        if locked and self.args.poll_child:
+            return result or _EX_LOCKED
+        return result
+
+    def run_round(self, children):
+        """Poll every repo, up to --jobs at a time, each in a child process.
+
+        Return the number of repos that failed.
+
+        :param children: dict to fill with pid ==> Popen for every running
+                         child, so that a signal handler can kill them.
+        """
+        round_start = time.time()
+        p4 = p4gf_create_p4.create_p4_temp_client()
+        try:
+            todo, skipped = self.plan(p4)
+            self._report_skipped(skipped)
+
+            pending = collections.deque(todo)
+            running = {}        # Popen ==> (RepoPoll, output TemporaryFile)
+            done    = []
+            locked  = []
+            while pending or running:
+                self._start_ready(p4, pending, running, locked, children)
+                time.sleep(_CHILD_POLL_SECONDS)
+                for proc in [proc for proc in running if proc.poll() is not None]:
+                    rp, out = running.pop(proc)
+                    children.pop(proc.pid, None)
+                    if proc.returncode == _EX_LOCKED:
+                        # Locked after our check. Never polled: try again.
+                        out.close()
+                        self._requeue_locked(rp, time.time(), pending, locked)
+                        continue
+                    rp.ec = proc.returncode
+                    rp.seconds = time.time() - rp.start_time
+                    self._report_done(rp, out)
+                    done.append(rp)
+                    if rp.ec == os.EX_OK:
+                        self.record_polled(p4, rp)
+        finally:
+            p4gf_create_p4.destroy(p4)
+
+        failed = [rp for rp in done if rp.ec != os.EX_OK]
+        slowest = max(done, key=lambda rp: rp.seconds) if done else None
+        msg = NTR('poll round: {polled} polled, {skipped} unchanged,'
+                  ' {locked} locked, {failed} failed, {sec:.1f}s{slowest}').format(
+              polled  = len(done)
+            , skipped = len(skipped)
+            , locked  = len(locked)
+            , failed  = len(failed)
+            , sec     = time.time() - round_start
+            , slowest = NTR(', slowest {} {:.1f}s').format(
+                          slowest.repo_name, slowest.seconds) if slowest else '')
+        LOG.info(msg)
+        if self.args.verbose:
+            sys.stdout.write(msg + '\n')
+        return len(failed)
+
+    def _start_ready(self, p4, pending, running, locked, children):
+        """Start children for pending repos until we run --jobs children
+        or run out of repos ready to start. Requeue any locked repos.
+        """
+        now = time.time()
+        for _i in range(len(pending)):
+            if len(running) >= self.args.jobs:
+                return
+            rp = pending.popleft()
+            if now < rp.not_before:
+                pending.append(rp)
+                continue
+            if _is_locked(p4, rp.repo_name):
+                self._requeue_locked(rp, now, pending, locked)
+                continue
+            if self.args.verbose:
+                sys.stdout.write(_('Updating: {}\n').format(rp.repo_name))
+            out = tempfile.TemporaryFile()
+            cmd = [ sys.executable, os.path.abspath(__file__)
+                  , '--no-skip', '--poll-child', rp.repo_name ]
+            rp.start_time = time.time()
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL,
+                                    stdout=out, stderr=subprocess.STDOUT)
+            running[proc] = (rp, out)
+            children[proc.pid] = proc
+
+    @staticmethod
+    def _requeue_locked(rp, now, pending, locked):
+        """Retry a locked repo later, or give up on it for this round."""
+        rp.retry_ct += 1
+        if _LOCKED_RETRY_CT < rp.retry_ct:
+            LOG.info("poll {}: locked, skipped".format(rp.repo_name))
+            sys.stdout.write(_("View '{repo_name}' is locked. Skipping poll update.\n"
+                             .format(repo_name=rp.repo_name)))
+            locked.append(rp)
+        else:
+            rp.not_before = now + _LOCKED_RETRY_SECONDS
+            pending.append(rp)
+
+    def _report_skipped(self, skipped):
+        """Log and maybe print the repos with nothing new to poll."""
+        for rp in skipped:
+            LOG.info("poll {repo}: unchanged at @{head}, skipped"
+                     .format(repo=rp.repo_name, head=rp.head_change))
+            if self.args.verbose:
+                sys.stdout.write(_('Skipping unchanged repo: {}\n')
+                                 .format(rp.repo_name))
+
+    def _report_done(self, rp, out=None):
+        """Log per-repo timing, and pass along any child output."""
+        LOG.info("poll {repo}: ec={ec} {sec:.1f}s lag={lag}"
+                 .format( repo = rp.repo_name
+                        , ec   = rp.ec
+                        , sec  = rp.seconds
+                        , lag  = rp.lag() ))
+        if out:
+            out.seek(0)
+            text = out.read().decode('utf-8', errors='replace')
+            out.close()
+            if text:
+                sys.stdout.write(''.join('{}: {}\n'.format(rp.repo_name, line)
+                                         for line in text.splitlines()))
+        if self.args.verbose:
+            sys.stdout.write(_('Updated: {repo} ({sec:.1f}s)\n')
+                             .format(repo=rp.repo_name, sec=rp.seconds))
+        if rp.ec != os.EX_OK:
+            sys.stderr.write(_('Poll failed for {repo}: exit code {ec}\n')
+                             .format(repo=rp.repo_name, ec=rp.ec))
+
+
+def _int(s):
+    """Return int(s), or 0 if s is missing or not a number."""
+    try:
+        return int(s)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _run_parallel(poller):
+    """Poll in child processes, once or, with --daemon, forever.
+
+    Return the number of repos that failed in the last round.
+    """
+    children = {}           # pid ==> Popen of every running child
+
+    def _signal_handler(signum, _frame):
+        """Stop every child, then exit."""
+        LOG.info("poll: signal {} received, stopping {} children"
+                 .format(signum, len(children)))
+        for proc in list(children.values()):
+            try:
+                proc.terminate()
+            except OSError:
+                pass
+        for proc in list(children.values()):
+            proc.wait()
+        sys.exit(os.EX_OK)
+
+    for signum in _TERM_SIGNALS:
+        signal.signal(signum, _signal_handler)
+
+    while True:
+        start = time.time()
+        failed_ct = poller.run_round(children)
+        if not poller.args.daemon:
+            return failed_ct
+        time.sleep(max(0.0, poller.args.daemon - (time.time() - start)))
+
+
 def _get_args():
     """Parse command-line args."""
     parser = p4gf_util.create_arg_parser(
@@ -70,6 +454,15 @@ def _get_args():
                         help=_('Update all repos'))
     parser.add_argument('-v', '--verbose', action=NTR('store_true'),
                         help=_('List each repo updated.'))
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar=NTR('N'),
+                        help=_('Update up to N repos at once, each in its own process.'))
+    parser.add_argument('--daemon', type=float, default=0, metavar=NTR('SECONDS'),
+                        help=_('Repeat the update every SECONDS seconds until killed.'))
+    parser.add_argument('--no-skip', action=NTR('store_true'),
+                        help=_('Update repos even if Perforce has no new changelists for them.'))
+                        # Internal: we are a --jobs child polling one repo.
+    parser.add_argument('--poll-child', action=NTR('store_true'),
+                        help=argparse.SUPPRESS)
     parser.add_argument(NTR('views'), metavar=NTR('view'), nargs='*',
                         help=_('name of view to update'))
     return parser.parse_args()
@@ -103,20 +496,13 @@ def main(args):
     #
     p4gf_create_p4.destroy(p4)
 
-    for repo_name in repo_list:
-        if repo_is_locked(repo_name):
-            if args.verbose:
-                sys.stdout.write(_('Skipping locked repo: {}\n').format(repo_name))
-            continue
-        if args.verbose:
-            sys.stdout.write(_('Updating: {}\n').format(repo_name))
-        sys.argv = [
-            'p4gf_auth_server.py',
-            '--user={}'.format(p4gf_const.P4GF_USER),
-            'git-upload-pack',
-            repo_name
-        ]
-        p4gf_auth_server.main(poll_only=True)
+    poller = Poller(args, repo_list)
+    if 1 < args.jobs or args.daemon:
+        # Child processes, not threads: p4gf_auth_server changes os.environ,
+        # the current working directory, and closes every p4 connection in
+        # its process when done.
+        return 1 if _run_parallel(poller) else os.EX_OK
+    return poller.run_sequential()
 
 
 def run_main():
@@ -9,9 +9,18 @@ were using 800MB of memory, the child will as well, even though all it may
 be doing is running `ps`.
 
 Note that on Darwin this is not a problem.
+
+ProcessRunner starts a small pool of runner children, all forked early
+while we're still small, that share one job queue. popen(), wait(), and
+call() wait for their command. popen_async() returns at once, so that
+independent commands can run in parallel. popen_stream() hands back the
+command's standard output as a pipe to read while the command runs,
+rather than one buffer copied back through the queue.
 """
 
 import atexit
+import copy
+import fcntl
 import io
 import logging
 import multiprocessing
@@ -20,14 +29,18 @@ import queue
 import signal
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 import traceback
 
 from p4gf_const import GIT_BIN as git_bin
 from p4gf_const import GIT_BIN_DEFAULT as git_bin_default
+from p4gf_const import P4GF_PROC_RUNNER_CT
 
 import p4gf_bootstrap  # pylint: disable=unused-import
 import p4gf_char
+import p4gf_histogram
 from   p4gf_l10n      import _, NTR
 import p4gf_log
 
@@ -36,6 +49,19 @@ LOG = logging.getLogger(__name__)
 ChildProc = None
 ParentProc = None
 
+# How ProcessRunner children run each job.
+_MODE_POPEN  = 'popen'      # capture stdout/stderr, feed stdin bytes
+_MODE_WAIT   = 'wait'       # stdin names a file, output not captured
+_MODE_CALL   = 'call'       # same as wait, but in the runner's cwd
+_MODE_STREAM = 'stream'     # stdout to a FIFO the caller reads, stdin
+                            # /dev/null or a FIFO the caller writes
+
+# Runner children to start if P4GF_PROC_RUNNER_CT is unset.
+_RUNNER_CT_DEFAULT = 2
+
+# How often a runner child checks whether its stream jobs have exited.
+_REAP_SECONDS = 0.05
+
 
 def translate_git_cmd(cmd):
     """Translate git commands from 'git' to value in GIT_BIN, which defaults to 'git'."""
@@ -137,23 +163,34 @@ def double_fork(func, stdin='/dev/null', stdout='/dev/null', stderr='/dev/null')
     os._exit(0)  # pylint: disable=protected-access
 
 
-def init():
-    """Launch the separate Python process for running commands.
+def init(runner_ct=None):
+    """Launch the separate Python processes for running commands.
 
     This should be invoked early in the process, before gobs of memory are
-    allocated, otherwise the child will consume gobs of memory as well.
+    allocated, otherwise the children will consume gobs of memory as well.
+
+    runner_ct defaults to the P4GF_PROC_RUNNER_CT environment variable,
+    else 2.
     """
     global ChildProc, ParentProc
     if ChildProc and ParentProc != os.getpid():
         ChildProc = None
     if not ChildProc:
         ParentProc = os.getpid()
-        ChildProc = ProcessRunner()
+        ChildProc = ProcessRunner(runner_ct or _runner_ct_from_env())
         ChildProc.start()
         return True
     return False
 
 
+def _runner_ct_from_env():
+    """Return P4GF_PROC_RUNNER_CT as a positive int, else our default."""
+    try:
+        return max(1, int(os.environ.get(P4GF_PROC_RUNNER_CT, _RUNNER_CT_DEFAULT)))
+    except ValueError:
+        return _RUNNER_CT_DEFAULT
+
+
 @atexit.register
 def stop():
     """Stop the child process, if any is running."""
@@ -231,6 +268,11 @@ def _popen_no_throw_internal(cmd_, expect_error, stdin=None, env=None):
         return None
     cmd = translate_git_cmd(cmd_)
     result = ChildProc.popen(cmd, stdin, env)
+    return _decode_and_log(result, cmd_, expect_error)
+
+
+def _decode_and_log(result, cmd_, expect_error):
+    """Convert a runner's binary output to text, record it to the log."""
     result['cmd'] = ' '.join(cmd_)   # use the untranslated cmd_ for logging
     if 'out' in result:
         result['out'] = p4gf_char.decode(result['out'])
@@ -318,58 +360,143 @@ def call(cmd_, stdin=None, env=None):
     return result['ec']
 
 
+def popen_async(cmd_, stdin=None, env=None):
+    """Start a command in a runner child and return at once.
+
+    Returns a PendingResult whose result() waits for and returns the same
+    dict that popen_no_throw() would. Start several commands before
+    waiting on any of them to run them in parallel, one per runner child.
+    """
+    if _validate_popen(cmd_) is None:
+        return None
+    job_id = ChildProc.submit(translate_git_cmd(cmd_), stdin, _MODE_POPEN, env)
+    return PendingResult(ChildProc, job_id, cmd_)
+
+
+class PendingResult:
+
+    """A popen_async() command that might still be running."""
+
+    def __init__(self, runner, job_id, cmd_):
+        self.runner  = runner
+        self.job_id  = job_id
+        self.cmd_    = cmd_
+        self._result = None
+
+    def result(self, expect_error=True):
+        """Wait for the command to finish, return its popen_no_throw() dict."""
+        if self._result is None:
+            self._result = _decode_and_log( self.runner.result(self.job_id)
+                                          , self.cmd_, expect_error )
+        return self._result
+
+    def discard(self):
+        """We no longer want this command's result. Drop it if it has
+        already arrived, or when it does. The command still runs.
+        """
+        if self._result is None:
+            self.runner.discard(self.job_id)
+
+
+def popen_stream(cmd_, env=None, feed=False):
+    """Start a command in a runner child, return a Stream to read its
+    standard output while it runs.
+
+    For commands with large output such as git-rev-list or git-fast-export:
+    no buffering of the entire output, no copy back through the runner's
+    queue. The command's standard input is /dev/null, unless feed: then
+    Stream.stdin is a pipe to the command's standard input, for commands
+    with large input such as git-fast-import.
+
+    The command holds no runner child while it runs. Other commands can run
+    while you read.
+    """
+    if _validate_popen(cmd_) is None:
+        return None
+    return ChildProc.stream(translate_git_cmd(cmd_), env, cmd_, feed)
+
+
+class Stream:
+
+    """A popen_stream() command's standard output, and eventually its
+    exit code and standard error.
+
+    Use as a context manager, or call wait() when done reading.
+    """
+
+    def __init__(self, runner, job_id, cmd_, stdout, stdin=None):
+        self.runner  = runner
+        self.job_id  = job_id
+        self.cmd_    = cmd_
+        self.stdout  = stdout       # binary file object
+        self.stdin   = stdin        # binary file object, or None if not feed
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.wait(expect_error=_exc_type is not None)
+        return False    # False == do not squelch any current exception
+
+    def wait(self, expect_error=False):
+        """Stop reading, wait for the command to exit.
+
+        Return its popen_no_throw() dict, with nothing in 'out'. If you
+        stop reading early, expect a non-zero exit code from SIGPIPE.
+        Closes stdin first, if you have not already.
+        """
+        if self._result is None:
+            if self.stdin:
+                try:
+                    self.stdin.close()
+                except (IOError, OSError):
+                    pass    # Command already gone, nothing to flush to.
+            self.stdout.close()
+            self._result = _decode_and_log( self.runner.result(self.job_id)
+                                          , self.cmd_, expect_error )
+        return self._result
+
+
 def _cmd_runner(event, incoming, outgoing):
     """Invoke subprocess.Popen in a separate process.
 
     This should never be called directly, but instead launched via
     multiprocessing.Process().
+
+    Every runner child in the pool takes jobs from the same incoming
+    queue, and tags each result with its job id before putting it on the
+    shared outgoing queue.
     """
     p4gf_log.reset()
     global LOG
     LOG = logging.getLogger(__name__)
     LOG.debug("_cmd_runner() running, pid={}".format(os.getpid()))
+    streams = []    # (job_id, Popen, stderr file) for running _MODE_STREAM jobs
+    streams_cond = threading.Condition()
+                    # Reap streams in their own thread, so that a
+                    # Stream.wait() need not wait for whatever long
+                    # popen job we happen to be running.
+    reaper = threading.Thread( target=_stream_reaper
+                             , args=(event, streams, streams_cond, outgoing)
+                             , daemon=True )
+    reaper.start()
     try:
         while not event.is_set():
             try:
                 # Use timeout so we loop around and check the event.
-                (cmd, stdin, cwd, wait_, call_, env) = incoming.get(timeout=1)
-                # By taking a command list vs a string, we implicitly avoid
-                # shell quoting. Also note that we are intentionally _not_
-                # using the shell, to avoid security vulnerabilities.
-                result = {"out": b'', "err": b''}
-                try:
-                    stdin_file = None
-                    if (wait_ or call_) and stdin:
-                        # Special-case: stdin names a file to feed to process.
-                        stdin_file = open(stdin)
-                    if wait_:
-                        p = subprocess.Popen(cmd, cwd=cwd, stdin=stdin_file,
-                                             restore_signals=False, env=env)
-                        LOG.debug('_cmd_runner() waiting for {}, pid={}'.format(cmd, p.pid))
-                        result["ec"] = p.wait()
-                    elif call_:
-                        p = subprocess.Popen(cmd, stdin=stdin_file,
-                                             restore_signals=False, env=env)
-                        LOG.debug('_cmd_runner() called {}, pid={}'.format(cmd, p.pid))
-                        result["ec"] = p.wait()
-                    else:
-                        p = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE, stdin=subprocess.PIPE,
-                                             restore_signals=False, env=env)
-                        LOG.debug('_cmd_runner() communicating with {}, pid={}'.format(cmd, p.pid))
-                        fd = p.communicate(stdin)
-                        # return the raw binary, let higher level funcs decode it
-                        result["out"] = fd[0]
-                        result["err"] = fd[1]
-                        result["ec"] = p.returncode
-                except IOError as e:
-                    LOG.warning("IOError in subprocess: {}".format(e))
-                    result["ec"] = os.EX_IOERR
-                    result["err"] = bytes(str(e), 'UTF-8')
-                finally:
-                    if stdin_file:
-                        stdin_file.close()
-                outgoing.put(result)
+                (job_id, mode, cmd, stdin, cwd, env) = incoming.get(timeout=1)
+                if mode == _MODE_STREAM:
+                    # stdin carries the FIFO paths for stream jobs.
+                    stream = _start_stream(job_id, cmd, stdin, cwd, env, outgoing)
+                    if stream:
+                        with streams_cond:
+                            streams.append(stream)
+                            streams_cond.notify()
+                else:
+                    result = _run_job(mode, cmd, stdin, cwd, env)
+                    result["id"] = job_id
+                    outgoing.put(result)
             except queue.Empty:
                 pass
         LOG.debug("_cmd_runner() process exiting, pid={}".format(os.getpid()))
@@ -378,39 +505,169 @@ def _cmd_runner(event, incoming, outgoing):
         event.set()
 
 
+def _run_job(mode, cmd, stdin, cwd, env):
+    """Run one popen/wait/call job to completion, return its result dict."""
+    # By taking a command list vs a string, we implicitly avoid
+    # shell quoting. Also note that we are intentionally _not_
+    # using the shell, to avoid security vulnerabilities.
+    result = {"out": b'', "err": b''}
+    stdin_file = None
+    try:
+        if mode != _MODE_POPEN and stdin:
+            # Special-case: stdin names a file to feed to process.
+            stdin_file = open(stdin)
+        if mode == _MODE_WAIT:
+            p = subprocess.Popen(cmd, cwd=cwd, stdin=stdin_file,
+                                 restore_signals=False, env=env)
+            LOG.debug('_cmd_runner() waiting for {}, pid={}'.format(cmd, p.pid))
+            result["ec"] = p.wait()
+        elif mode == _MODE_CALL:
+            p = subprocess.Popen(cmd, stdin=stdin_file,
+                                 restore_signals=False, env=env)
+            LOG.debug('_cmd_runner() called {}, pid={}'.format(cmd, p.pid))
+            result["ec"] = p.wait()
+        else:
+            p = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE, stdin=subprocess.PIPE,
+                                 restore_signals=False, env=env)
+            LOG.debug('_cmd_runner() communicating with {}, pid={}'.format(cmd, p.pid))
+            fd = p.communicate(stdin)
+            # return the raw binary, let higher level funcs decode it
+            result["out"] = fd[0]
+            result["err"] = fd[1]
+            result["ec"] = p.returncode
+    except IOError as e:
+        LOG.warning("IOError in subprocess: {}".format(e))
+        result["ec"] = os.EX_IOERR
+        result["err"] = bytes(str(e), 'UTF-8')
+    finally:
+        if stdin_file:
+            stdin_file.close()
+    return result
+
+
+def _start_stream(job_id, cmd, fifo_paths, cwd, env, outgoing):
+    """Launch a _MODE_STREAM job with its stdout into the caller's FIFO,
+    and its stdin from the caller's other FIFO, if any.
+
+    Always tell the caller ("started", job_id) whether it launched or not.
+    If launched, return a (job_id, Popen, stderr file) for _reap_streams()
+    to report once it exits. If not, report the failure now.
+    """
+    (stdout_path, stdin_path) = fifo_paths
+    err_file = tempfile.TemporaryFile()
+    try:
+        # Caller already holds the stdout FIFO's read end and the stdin
+        # FIFO's write end open, so neither open blocks.
+        fifo_fd = os.open(stdout_path, os.O_WRONLY)
+        stdin_fd = None
+        try:
+            stdin_fd = os.open(stdin_path, os.O_RDONLY) if stdin_path \
+                       else subprocess.DEVNULL
+            p = subprocess.Popen(cmd, cwd=cwd, stdin=stdin_fd,
+                                 stdout=fifo_fd, stderr=err_file, env=env)
+        finally:
+            os.close(fifo_fd)
+            if stdin_path and stdin_fd is not None:
+                os.close(stdin_fd)
+    except (IOError, OSError) as e:
+        LOG.warning("IOError in subprocess: {}".format(e))
+        err_file.close()
+        outgoing.put({"id": ("started", job_id), "pid": None})
+        outgoing.put({"id": job_id, "ec": os.EX_IOERR, "out": b'',
+                      "err": bytes(str(e), 'UTF-8')})
+        return None
+    LOG.debug('_cmd_runner() streaming {}, pid={}'.format(cmd, p.pid))
+    outgoing.put({"id": ("started", job_id), "pid": p.pid})
+    return (job_id, p, err_file)
+
+
+def _stream_reaper(event, streams, streams_cond, outgoing):
+    """Runner child thread: report each _MODE_STREAM job once it exits."""
+    try:
+        while not event.is_set():
+            with streams_cond:
+                if streams:
+                    streams[:] = _reap_streams(streams, outgoing)
+                # Sleep until the next poll, or until a new stream arrives.
+                streams_cond.wait(_REAP_SECONDS if streams else 1)
+    except Exception:  # pylint: disable=broad-except
+        LOG.exception("_stream_reaper() died unexpectedly, pid=%s", os.getpid())
+        event.set()
+
+
+def _reap_streams(streams, outgoing):
+    """Report each exited _MODE_STREAM job, return those still running."""
+    running = []
+    for (job_id, p, err_file) in streams:
+        ec = p.poll()
+        if ec is None:
+            running.append((job_id, p, err_file))
+            continue
+        err_file.seek(0)
+        outgoing.put({"id": job_id, "ec": ec, "out": b'', "err": err_file.read()})
+        err_file.close()
+    return running
+
+
 class ProcessRunner():
 
-    """Manages a child process which receives commands to be run via the subprocess module.
+    """Manages a pool of child processes which receive commands to be run
+    via the subprocess module.
 
-    Returns the output to the caller.
+    Returns the output to the caller. Any thread may submit commands and
+    wait for their results.
     """
 
-    def __init__(self):
+    def __init__(self, runner_ct=1):
+        self.runner_ct = runner_ct
         self.__event = None
         self.__input = None
         self.__output = None
-        self.__stats = {}
+        self.__stats = {}       # git_cmd ==> LogHistogram of elapsed ms
+        self.__next_id = 0
+        self.__pending = {}     # job id ==> (git_cmd, start time, cmd)
+        self.__results = {}     # job id ==> result that arrived while
+                                # we waited on some other job
+        self.__discarded = set()    # job ids whose results nobody wants
+                                # Guards the above and start().
+        self.__lock = threading.Lock()
+                                # Held by whichever thread is reading
+                                # results from the runner children.
+        self.__output_lock = threading.Lock()
 
     def log_stats(self):
         """Log statistics for git commands run."""
         # sort by time
+        with self.__lock:
+            stats = {k: copy.deepcopy(v) for k, v in self.__stats.items()}
+        by_time = sorted(stats.items(), key=lambda kv: kv[1].total,
+                         reverse=True)
         LOG.debug("\nProcessRunner statistics:\n" +
-                  "\n".join(["\t{:10.10}: {:6} {:6.3f}".format(k, v[0], v[1]) for (k, v)
-                            in [(k, self.__stats[k]) for k
-                                in sorted(self.__stats.keys(),
-                                          key=lambda k: self.__stats[k][1],
-                                          reverse=True)]]))
+                  "\n".join(["\t{:10.10}: {:6} {:6.3f}  p50<={:7,d}ms"
+                             " p95<={:7,d}ms max={:7,d}ms"
+                             .format(k, v.ct, v.total / 1000.0,
+                                     v.percentile(50),
+                                     v.percentile(95),
+                                     v.max)
+                             for (k, v) in by_time]))
+        if not LOG.isEnabledFor(logging.DEBUG2):
+            return
+        for (k, v) in by_time:
+            LOG.debug2("ProcessRunner git {} latency ms:\n".format(k)
+                       + "\n".join(p4gf_histogram.to_lines(v.to_histogram())))
 
     def start(self):
-        """Start the child process and prepare to run commands."""
+        """Start the child processes and prepare to run commands."""
         self.__event = multiprocessing.Event()  # pylint:disable=no-member
         self.__input = multiprocessing.Queue()  # pylint:disable=no-member
         self.__output = multiprocessing.Queue()  # pylint:disable=no-member
         pargs = [self.__event, self.__input, self.__output]
-        p = multiprocessing.Process(target=_cmd_runner,  # pylint:disable=not-callable
-                                    args=pargs, daemon=True)
-        p.start()
-        LOG.debug("ProcessRunner started child {}, pid={}".format(p.pid, os.getpid()))
+        for _i in range(self.runner_ct):
+            p = multiprocessing.Process(target=_cmd_runner,  # pylint:disable=not-callable
+                                        args=pargs, daemon=True)
+            p.start()
+            LOG.debug("ProcessRunner started child {}, pid={}".format(p.pid, os.getpid()))
         if LOG.isEnabledFor(logging.DEBUG3):
             sink = io.StringIO()
             traceback.print_stack(file=sink)
@@ -418,64 +675,171 @@ class ProcessRunner():
             sink.close()
 
     def stop(self):
-        """Signal the child process to terminate. Does not wait."""
-        if self.__event:
-            self.__event.set()
-            self.__event = None
-            self.__input = None
-            self.__output = None
+        """Signal the child processes to terminate. Does not wait."""
+        with self.__lock:
+            if self.__event:
+                self.__event.set()
+                self.__event = None
+                self.__input = None
+                self.__output = None
         self.log_stats()
 
-    def run_cmd(self, cmd_, stdin, _wait, _call, env):
-        """Invoke the given command via subprocess.Popen().
+    def submit(self, cmd_, stdin, mode, env):
+        """Queue the given command for the next idle runner child.
 
-        Return the exit code, standard output, and standard error in a dict.
+        Return a job id to pass to result().
         """
-        if not self.__input:
-            LOG.warning("ProcessRunner.run_cmd() called before start()")
-            self.start()
-
         # Make the child process use whatever happens to be our current
         # working directory, which seems to matter with Git.
         cwd = os.getcwd()
-        start_time = time.time()
         cmd = translate_git_cmd(cmd_)  # translate the 'git' command if needed
-        self.__input.put((cmd, stdin, cwd, _wait, _call, env))
-        result = None
-        while not self.__event.is_set():
-            try:
-                result = self.__output.get(timeout=1)
-                break
-            except queue.Empty:
-                pass
-        if not result:
-            raise RuntimeError(_('Error running: {command}').format(command=cmd))
-        if cmd_[0] == "git":
-            git_cmd = cmd_[1]
-            if git_cmd.startswith("--git-dir") or git_cmd.startswith("--work-tree"):
-                git_cmd = cmd_[2]
-            elapsed_time = time.time() - start_time
-            current = self.__stats.get(git_cmd, (0, 0))
-            self.__stats[git_cmd] = (current[0] + 1, current[1] + elapsed_time)
+        with self.__lock:
+            if not self.__input:
+                LOG.warning("ProcessRunner.submit() called before start()")
+                self.start()
+            self.__next_id += 1
+            job_id = self.__next_id
+            self.__pending[job_id] = (_git_cmd(cmd_), time.time(), cmd)
+            self.__input.put((job_id, mode, cmd, stdin, cwd, env))
+        return job_id
+
+    def result(self, job_id):
+        """Wait for a submit()ted command to finish.
+
+        Return the exit code, standard output, and standard error in a dict.
+        """
+        with self.__lock:
+            (git_cmd, start_time, cmd) = self.__pending.pop(job_id)
+        result = self._collect(job_id, cmd)
+        if git_cmd:
+            with self.__lock:
+                self.__stats.setdefault(git_cmd, p4gf_histogram.LogHistogram()) \
+                    .add(int(1000 * (time.time() - start_time)))
         return result
 
+    def discard(self, job_id):
+        """Forget a submit()ted command whose result() nobody will call.
+
+        Drop its result if it has already arrived, or when it does.
+        """
+        with self.__lock:
+            self.__pending.pop(job_id, None)
+            if self.__results.pop(job_id, None) is None:
+                self.__discarded.add(job_id)
+
+    def _collect(self, job_id, cmd):
+        """Return job_id's result, holding on to any other job's result
+        that arrives first.
+
+        One thread at a time reads results, on behalf of every thread
+        waiting for one.
+        """
+        while True:
+            with self.__lock:
+                if job_id in self.__results:
+                    return self.__results.pop(job_id)
+                event = self.__event
+                output = self.__output
+            if not event or event.is_set():
+                raise RuntimeError(_('Error running: {command}').format(command=cmd))
+            with self.__output_lock:
+                with self.__lock:
+                    if job_id in self.__results:
+                        continue    # Another reader got ours meanwhile.
+                try:
+                    r = output.get(timeout=1)
+                except queue.Empty:
+                    continue
+                with self.__lock:
+                    r_id = r.pop("id")
+                    if r_id in self.__discarded:
+                        self.__discarded.remove(r_id)
+                    else:
+                        self.__results[r_id] = r
+
+    def run_cmd(self, cmd_, stdin, mode, env):
+        """Invoke the given command via subprocess.Popen().
+
+        Return the exit code, standard output, and standard error in a dict.
+        """
+        return self.result(self.submit(cmd_, stdin, mode, env))
+
+    def stream(self, cmd, env, log_cmd, feed=False):
+        """Invoke the given command via subprocess.Popen(), its standard
+        output into a FIFO that we read, and if feed, its standard input
+        from a FIFO that we write.
+
+        Return a Stream.
+        """
+        fifo_dir = tempfile.mkdtemp(prefix=NTR('p4gf-proc-'))
+        fifo_path = os.path.join(fifo_dir, NTR('stdout'))
+        stdin_path = os.path.join(fifo_dir, NTR('stdin')) if feed else None
+        read_fd = None
+        write_fd = None
+        started = False
+        try:
+            os.mkfifo(fifo_path, 0o600)
+            # Non-blocking so that opening doesn't wait for a writer. Block
+            # again once the runner child has opened its end.
+            read_fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            if stdin_path:
+                # Opening a FIFO's write end fails without a reader, so
+                # hold a reader just long enough to open ours. Keep our
+                # write end open from here on: the command must not see
+                # end-of-file before we've written anything.
+                os.mkfifo(stdin_path, 0o600)
+                placeholder_fd = os.open(stdin_path, os.O_RDONLY | os.O_NONBLOCK)
+                try:
+                    write_fd = os.open(stdin_path, os.O_WRONLY)
+                finally:
+                    os.close(placeholder_fd)
+            job_id = self.submit(cmd, (fifo_path, stdin_path), _MODE_STREAM, env)
+            self._collect(("started", job_id), cmd)
+            started = True
+        finally:
+            if not started:
+                for fd in (read_fd, write_fd):
+                    if fd is not None:
+                        os.close(fd)
+            for path in (fifo_path, stdin_path):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            os.rmdir(fifo_dir)
+        flags = fcntl.fcntl(read_fd, fcntl.F_GETFL)
+        fcntl.fcntl(read_fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+        return Stream( self, job_id, log_cmd, os.fdopen(read_fd, 'rb')
+                     , os.fdopen(write_fd, 'wb') if write_fd is not None else None )
+
     def popen(self, cmd, stdin, env=None):
         """Invoke the given command via subprocess.Popen().
 
         Return the exit code, standard output, and standard error in a dict.
         """
-        return self.run_cmd(cmd, stdin, _wait=False, _call=False, env=env)
+        return self.run_cmd(cmd, stdin, _MODE_POPEN, env=env)
 
     def wait(self, cmd, stdin, env=None):
         """Invoke the given command via subprocess.Popen().
 
         Return the exit code, standard output, and standard error in a dict.
         """
-        return self.run_cmd(cmd, stdin, _wait=True, _call=False, env=env)
+        return self.run_cmd(cmd, stdin, _MODE_WAIT, env=env)
 
     def call(self, cmd, stdin, env=None):
         """Invoke the given command via subprocess.Popen().
 
         Return the exit code, standard output, and standard error in a dict.
         """
-        return self.run_cmd(cmd, stdin, _wait=False, _call=True, env=env)
+        return self.run_cmd(cmd, stdin, _MODE_CALL, env=env)
+
+
+def _git_cmd(cmd_):
+    """Return the git subcommand of a git command line, for statistics,
+    or None if not a git command.
+    """
+    if cmd_[0] != "git" or len(cmd_) < 2:
+        return None
+    git_cmd = cmd_[1]
+    if (git_cmd.startswith("--git-dir") or git_cmd.startswith("--work-tree")) \
+            and 2 < len(cmd_):
+        git_cmd = cmd_[2]
+    return git_cmd
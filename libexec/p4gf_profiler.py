@@ -39,6 +39,7 @@ from functools import wraps
 import logging
 import time
 import sys
+import weakref
 
 # pylint:disable=W9903
 # non-gettext-ed string
@@ -47,6 +48,8 @@ LOG = logging.getLogger(__name__)
 
 _ACTIVE_TIMERS = []
 _TIMERS = {}
+_COUNTER_REPORTS = {}       # name ==> function returning str or None
+_COUNTER_TOTALS = {}        # name ==> _CounterTotal, see add_counters()
 _INDENT = 2
 _SEP = '.'
 
@@ -166,13 +169,133 @@ def Timer(name):  # pylint: disable=invalid-name
     return _TIMERS[full_name]
 
 
+def add_counter_report(name, func):
+    """Include a line of counters in the report at exit.
+
+    func takes no arguments and returns a one-line str, or None to omit
+    itself from the report. One func per name, held until exit: pass a
+    module-level function, not a bound method. Instances that count
+    things call add_counters() instead.
+    """
+    _COUNTER_REPORTS[name] = func
+
+
+class Counters:
+
+    """Numbers that one instance counts for the report at exit.
+
+        self.stats = p4gf_profiler.Counters('hit_ct', 'miss_ct')
+        p4gf_profiler.add_counters("My cache", self, self.stats)
+        ...
+        self.stats.hit_ct += 1
+
+    Every counter starts at 0, or 0.0 if its name ends in '_seconds'.
+    The report lists them in the order named here, so there is no
+    per-class formatter to write.
+    """
+
+    def __init__(self, *names):
+        self._names = names
+        for name in names:
+            setattr(self, name, 0.0 if name.endswith('_seconds') else 0)
+
+    def add(self, other):
+        """Add other's counts to ours."""
+        for name in other._names:            # pylint: disable=protected-access
+            if name not in self._names:
+                self._names += (name,)
+                setattr(self, name, 0)
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def __str__(self):
+        """Return "name=value ..." for every counter, plus a hit rate if
+        we count hits and misses. Empty if every counter is 0.
+        """
+        values = [(name, getattr(self, name)) for name in self._names]
+        if not any(v for _name, v in values):
+            return ''
+        parts = ["{}={:.3f}".format(name, v) if isinstance(v, float)
+                 else "{}={:,}".format(name, v)
+                 for name, v in values]
+        lookup_ct = getattr(self, 'hit_ct', 0) + getattr(self, 'miss_ct', 0)
+        if 'hit_ct' in self._names and lookup_ct:
+            parts.append("hit_rate={:.1f}%".format(100.0 * self.hit_ct / lookup_ct))
+        return ' '.join(parts)
+
+    def __repr__(self):
+        return "Counters({})".format(self)
+
+
+def add_counters(name, owner, counters):
+    """Include owner's Counters in name's line of the report at exit.
+
+    All owners registered under one name share one line: the sum of
+    their counters. A line whose counters are all 0 is omitted.
+
+    Holds owner only by weak reference: counting never keeps an owner
+    alive. Once an owner is gone, its counters fold into the sum for its
+    name, so a long-lived process that creates many owners adds nothing
+    to the report but their counts.
+    """
+    total = _COUNTER_TOTALS.get(name)
+    if total is None:
+        total = _CounterTotal()
+        _COUNTER_TOTALS[name] = total
+    total.add(owner, counters)
+
+
+class _CounterTotal:
+
+    """One report line's worth of Counters, from owners live and gone."""
+
+    def __init__(self):
+        self.gone = Counters()
+        self.live = {}          # id(counters) ==> (weakref to owner, counters)
+
+    def add(self, owner, counters):
+        """Count owner's counters until it goes away, then fold them in."""
+        key = id(counters)
+
+        def _on_gone(_ref):
+            """Owner garbage collected. Keep its counts, not it."""
+            self.gone.add(counters)
+            self.live.pop(key, None)
+
+        self.live[key] = (weakref.ref(owner, _on_gone), counters)
+
+    def report_str(self):
+        """Return the sum of all counters, live and gone, as a str,
+        or None if all are 0.
+        """
+        total = Counters()
+        total.add(self.gone)
+        for _ref, counters in list(self.live.values()):
+            total.add(counters)
+        return str(total) or None
+
+
+def _counter_report_lines():
+    """Return a list of "name : counters" lines for the report."""
+    funcs = dict(_COUNTER_REPORTS)
+    for name, total in _COUNTER_TOTALS.items():
+        funcs[name] = total.report_str
+    lines = []
+    for name, func in sorted(funcs.items()):
+        counters = func()
+        if counters:
+            lines.append("{:42}: {}".format(name, counters))
+    return lines
+
+
 @atexit.register
 def Report():  # pylint: disable=invalid-name
     """Log all recorded timer activity."""
     top_timers = sorted([t for t in _TIMERS.values() if t.top_level], key=lambda t: t.name)
-    if top_timers:
+    counter_lines = _counter_report_lines()
+    if top_timers or counter_lines:
         LOG.profiler("\n".join(["Profiler report for {}".format(sys.argv)]
-                            + [str(t) for t in top_timers]))
+                            + [str(t) for t in top_timers]
+                            + counter_lines))
 
 
 def start_cprofiler():
@@ -0,0 +1,179 @@
+#! /usr/bin/env python3.3
+"""ReviewsIndex: a prefix tree over one Reviews user's Reviews lines.
+
+Atomic push locks a repo's views by adding them to its Git Fusion server's
+git-fusion-reviews-<server-id> user's Reviews. Before adding, we check
+whether any already-locked view intersects ours. That check used to load
+every Reviews line into a P4.Map and join it against our views: P4.Map
+construction alone is O(n^2) in the line count, and with hundreds of repos
+locked at once, Reviews runs to tens of thousands of lines.
+
+A path can intersect a Reviews line only if one's literal directory prefix
+(everything before the first wildcard) is a prefix of the other's. So we
+file each Reviews line in a tree under its literal prefix, and for each of
+our views collect only the lines along its path and beneath it: O(path
+depth) plus the number of real candidates. A P4.Map join over just those
+candidates gives the same answer as a join over all of Reviews.
+
+Reading Reviews means 'p4 user -o' of a spec that can run to megabytes.
+Every write to a Reviews user's spec increments a p4key, and we cache the
+parsed index per user until that p4key changes. The submit trigger
+increments it too, starting with trigger version 2016.1.1: Git Fusion
+refuses to run with any older trigger, whose Reviews writes we would miss.
+"""
+import logging
+
+from P4 import Map, P4Exception
+
+import p4gf_const
+import p4gf_p4key as P4Key
+import p4gf_util
+
+LOG = logging.getLogger(__name__)
+
+                        # Any of these in a path component ends its literal
+                        # prefix.
+_WILDCARDS = ('...', '*', '%%')
+
+                        # user ==> (p4key value, ReviewsIndex)
+_CACHE = {}
+
+
+def _literal_prefix(line):
+    """Return the lowercased path components that precede line's first
+    wildcard.
+
+    Lowercase so that a case-insensitive server's matches are never missed:
+    extra candidates cost a little time, the P4.Map join has the last word.
+    """
+    path = line.strip('"')
+    if path.startswith('-') or path.startswith('+'):
+        path = path[1:].strip('"')
+    result = []
+    for component in path.lstrip('/').split('/'):
+        if any(w in component for w in _WILDCARDS):
+            break
+        result.append(component.lower())
+    return result
+
+
+class _Node:
+
+    """One directory level in the prefix tree."""
+
+    __slots__ = ['children', 'line_indexes']
+
+    def __init__(self):
+        self.children     = {}      # component ==> _Node
+        self.line_indexes = []      # indexes of lines whose prefix ends here
+
+
+class ReviewsIndex:
+
+    """Reviews lines, filed under their literal directory prefix."""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self._root = _Node()
+        for i, line in enumerate(self.lines):
+            node = self._root
+            for component in _literal_prefix(line):
+                node = node.children.setdefault(component, _Node())
+            node.line_indexes.append(i)
+
+    def candidates(self, view_line):
+        """Return the indexes of every line that might intersect view_line."""
+        result = []
+        node = self._root
+        for component in _literal_prefix(view_line):
+            result.extend(node.line_indexes)
+            node = node.children.get(component)
+            if node is None:
+                return result
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            result.extend(n.line_indexes)
+            stack.extend(n.children.values())
+        return result
+
+    def intersects(self, view_lines):
+        """Does any of view_lines intersect our Reviews lines?
+
+        Exclusion lines in view_lines are kept for the join but never
+        searched for: they cannot add an intersection.
+        """
+        view_lines = list(view_lines)
+        index_set = set()
+        for line in view_lines:
+            if not line.lstrip('"').startswith('-'):
+                index_set.update(self.candidates(line))
+        if not index_set:
+            return False
+
+        # Keep candidates in their original order: later lines override
+        # earlier ones in a P4.Map.
+        reviews_map = Map()
+        for i in sorted(index_set):
+            reviews_map.insert(self.lines[i])
+        repo_map = Map()
+        for line in view_lines:
+            repo_map.insert(line)
+        joined = Map.join(reviews_map, repo_map)
+        for l in joined.lhs():
+            if not l.startswith('-'):
+                return True
+        return False
+
+
+def version_p4key_name(user):
+    """Return the name of the p4key that counts writes to user's Reviews."""
+    return p4gf_const.P4GF_P4KEY_REVIEWS_VERSION.format(user=user)
+
+
+def get(p4_reviews, user, p4=None):
+    """Return a ReviewsIndex of user's current Reviews.
+
+    :param p4_reviews: connection that may read user's spec.
+    :param p4: connection that may read p4keys, or None to skip the
+               cache and always read user's spec.
+    """
+    version = None
+    if p4:
+        try:
+            version = P4Key.get(p4, version_p4key_name(user))
+        except P4Exception:
+            LOG.debug("get() cannot read {}, not caching"
+                      .format(version_p4key_name(user)))
+        cached = _CACHE.get(user)
+        if version not in (None, '0') and cached and cached[0] == version:
+            LOG.debug2("get() user={} version={} cache hit".format(user, version))
+            return cached[1]
+
+    r = p4_reviews.run('user', '-o', user)
+    vardict = p4gf_util.first_dict(r)
+    index = ReviewsIndex(vardict.get('Reviews', []))
+    if version not in (None, '0'):
+        _CACHE[user] = (version, index)
+    LOG.debug2("get() user={} version={} lines={}"
+               .format(user, version, len(index.lines)))
+    return index
+
+
+def updated(p4, user, lines):
+    """We just set user's Reviews to lines.
+
+    Count the write so that other processes' caches know to re-read, and
+    cache our own copy. Caller must hold the ReviewsLock, so that nobody
+    else writes between our write and our increment.
+    """
+    _CACHE.pop(user, None)
+    if not p4:
+        return
+    try:
+        version = P4Key.increment(p4, version_p4key_name(user))
+    except P4Exception:
+        LOG.debug("updated() cannot increment {}"
+                  .format(version_p4key_name(user)))
+        return
+    _CACHE[user] = (version, ReviewsIndex(lines))
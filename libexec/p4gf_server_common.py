@@ -6,7 +6,6 @@ from contextlib import contextmanager, ExitStack
 import functools
 import logging
 import os
-import random
 import re
 import signal
 import sys
@@ -539,8 +538,9 @@ class Server(object):
         bad user experience).
 
         """
+        repo_lock = p4gf_lock.RepoLock(self.p4, self.repo_name, blocking=False)
+        waiter = p4gf_lock.LockWaiter(repo_lock.owners_key, "write locks")
         try:
-            repo_lock = p4gf_lock.RepoLock(self.p4, self.repo_name, blocking=False)
             while True:
                 # Acquire the write lock first, then try to get the p4key
                 # lock. If that lock is busy, release the write lock and
@@ -556,10 +556,12 @@ class Server(object):
                     break
                 except p4gf_lock.LockBusy:
                     p4gf_git_repo_lock.remove_write_lock(self.repo_name)
-                    # sleep randomly between 1/4 and 1 second
-                    time.sleep(random.randrange(1, 4) / 4.0)
+                    # Back off, or wake early when the holder releases.
+                    waiter.wait()
+            waiter.done()
             yield repo_lock
         finally:
+            waiter.done()
             repo_lock.release()
             p4gf_git_repo_lock.remove_write_lock(self.repo_name)
 
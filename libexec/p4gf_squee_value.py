@@ -283,3 +283,126 @@ TableKey = namedtuple("TableKey"
 
 # end SqueeValue
 # ----------------------------------------------------------------------------
+
+def squee_connect(file_path):
+    """Open an SQLite connection tuned for scratch storage.
+
+    Nothing we store needs to survive a crash: the push starts over.
+    """
+    db = sqlite3.connect( database        = file_path
+                        , isolation_level = "EXCLUSIVE" )
+                        # Don't wait for the filesystem to flush to disk.
+    db.execute("PRAGMA synchronous = OFF")
+                        # Append to a write-ahead log rather than rewrite
+                        # pages in place, and read the database through
+                        # mmap rather than read() calls.
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA mmap_size = {}".format(256 * 1024 * 1024))
+                        # Negative means KiB, not pages.
+    db.execute("PRAGMA cache_size = -{}".format(64 * 1024))
+    db.execute("PRAGMA temp_store = MEMORY")
+    return db
+
+
+class SqueeTable(object):
+    """One typed SQLite table, with a write-behind buffer.
+
+    SqueeValue pickles each value into a single TEXT column, and runs one
+    INSERT (or UPDATE) per __setitem__. SqueeTable stores each field in its
+    own typed column, holds rows in memory until it has a batch, then
+    writes them with a single executemany(INSERT OR REPLACE) and one
+    COMMIT. get() reads through the buffer, so callers never see stale
+    rows.
+
+    Rows are tuples, in column order. The first key_ct columns are the
+    primary key.
+    """
+
+    def __init__(self, db, name, columns, key_ct=1, buffer_max=10000):
+        """
+        :param db:         sqlite3 connection, shared by any number of tables.
+        :param name:       table name.
+        :param columns:    list of "name TYPE" column definitions.
+        :param key_ct:     how many leading columns form the primary key.
+        :param buffer_max: flush after this many buffered rows.
+        """
+        self._db         = db
+        self.name        = name
+        self._key_ct     = key_ct
+        self._buffer_max = buffer_max
+        self._buf        = {}       # key tuple ==> row tuple
+                        # first column value ==> buffered rows, for
+                        # multi-column keys.
+        self._buf_by_col0 = {} if 1 < key_ct else None
+                        # The most recent get(), because callers tend to ask
+                        # about the same row several times in a row.
+        self._last_key   = None
+        self._last_row   = None
+
+        col_names = [c.split()[0] for c in columns]
+        key_names = col_names[:key_ct]
+        db.execute("DROP TABLE IF EXISTS {}".format(name))
+        db.execute("CREATE TABLE {name}({cols}, PRIMARY KEY({keys}))"
+                   .format( name = name
+                          , cols = ", ".join(columns)
+                          , keys = ", ".join(key_names)))
+        self._sql_get = ("SELECT * FROM {name} WHERE {where}"
+                         .format( name  = name
+                                , where = " AND ".join("{}=?".format(k)
+                                                       for k in key_names)))
+        self._sql_put = ("INSERT OR REPLACE INTO {name} VALUES({q})"
+                         .format( name = name
+                                , q    = ", ".join("?" * len(col_names))))
+
+    def get(self, key):
+        """Return the row for a key tuple, or None."""
+        row = self._buf.get(key)
+        if row is not None:
+            return row
+        if key == self._last_key:
+            return self._last_row
+        row = self._db.execute(self._sql_get, key).fetchone()
+        self._last_key = key
+        self._last_row = row
+        return row
+
+    def put(self, row):
+        """Insert or replace one row."""
+        key = row[:self._key_ct]
+        self._buf[key] = row
+        if self._buf_by_col0 is not None:
+            self._buf_by_col0.setdefault(row[0], []).append(row)
+        if key == self._last_key:
+            self._last_key = None
+        if self._buffer_max <= len(self._buf):
+            self.flush()
+
+    def query(self, sql, args=()):
+        """Run a SELECT against rows already written, and return a cursor.
+
+        Does not see buffered rows. Combine with buffered() for range
+        queries that must.
+        """
+        return self._db.execute(sql, args)
+
+    def buffered(self, col0):
+        """Return buffered rows whose first column is col0.
+
+        Only for tables with multi-column keys. A row put more than once
+        appears once for each put.
+        """
+        return self._buf_by_col0.get(col0, [])
+
+    def flush(self):
+        """Write all buffered rows."""
+        if not self._buf:
+            return
+        LOG.debug("flush {} rows={}".format(self.name, len(self._buf)))
+        self._db.executemany(self._sql_put, self._buf.values())
+        self._db.commit()
+        self._buf = {}
+        if self._buf_by_col0 is not None:
+            self._buf_by_col0 = {}
+
+# end SqueeTable
+# ----------------------------------------------------------------------------
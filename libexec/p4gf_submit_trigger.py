@@ -61,6 +61,13 @@ P4TICKETS = None
 
 # If P4TRUST is set , export value via os.environ
 P4TRUST = None
+
+# Optional path to the unix socket of a running
+# 'p4gf_submit_trigger.py --p4-daemon' process. If set, triggers send their
+# p4 requests to it, to run over a long-lived P4Python connection, rather
+# than starting a 'p4' process for each request. If unset, or if the daemon
+# is not running, every request runs 'p4'.
+P4GF_DAEMON_SOCKET = None
 # End P4 configurables
 # -----------------------------------------------------------------------------
 
@@ -296,6 +303,7 @@ def set_globals_from_config_file():
     # pylint: disable=too-many-branches
     global P4GF_TRIGGER_CONF, DEFAULT_P4HOST, CHARSET, DEBUG_LOG_PATH
     global P4GF_P4_BIN_PATH, P4PORT, P4TICKETS, P4TRUST, CFG_EXTERNAL
+    global P4GF_DAEMON_SOCKET
     global P4GF_TRIGGER_CONF_SETTINGS
     # If the path is absolute, just try and read it
     if isinstance(P4GF_TRIGGER_CONF, str) and not os.path.isabs(P4GF_TRIGGER_CONF):
@@ -334,6 +342,10 @@ def set_globals_from_config_file():
                 if TRIG_CONFIG.has_option(CFG_SECTION, "P4TRUST"):
                     P4TRUST = TRIG_CONFIG.get(CFG_SECTION, "P4TRUST")
                     P4GF_TRIGGER_CONF_SETTINGS += "\n    P4TRUST={0}".format(P4TRUST)
+                if TRIG_CONFIG.has_option(CFG_SECTION, "P4GF_DAEMON_SOCKET"):
+                    P4GF_DAEMON_SOCKET = TRIG_CONFIG.get(CFG_SECTION, "P4GF_DAEMON_SOCKET")
+                    P4GF_TRIGGER_CONF_SETTINGS += "\n    P4GF_DAEMON_SOCKET={0}".format(
+                            P4GF_DAEMON_SOCKET)
                 if TRIG_CONFIG.has_option(CFG_SECTION, "DEBUG-LOG-PATH"):
                     DEBUG_LOG_PATH = TRIG_CONFIG.get(CFG_SECTION, "DEBUG-LOG-PATH")
                     P4GF_TRIGGER_CONF_SETTINGS += "\n    DEBUG_LOG_PATH={0}".format(DEBUG_LOG_PATH)
@@ -468,6 +480,8 @@ from contextlib import contextmanager
 import tempfile
 import getopt
 import io
+import socket
+import threading
 
 #   obsolete version key names - these keys removed if exist by --install
 P4GF_P4KEY_PRE_TRIGGER_VERSION      = NTR('git-fusion-pre-submit-trigger-version')
@@ -541,11 +555,12 @@ class P4gfConst:
     NON_GF_REVIEWS_END_MARKER_PATTERN   = '//GF-{0}/END'
     P4GF_REVIEWS_COMMON_LOCK            = NTR('git-fusion-reviews-common-lock')
     P4GF_REVIEWS_COMMON_LOCK_OWNER      = NTR('git-fusion-reviews-common-lock-owner')
+    P4GF_P4KEY_REVIEWS_VERSION          = NTR('git-fusion-reviews-version-{user}')
 
 # Is the Atomic Push submit trigger installed and at the correct version?
 #
     P4GF_P4KEY_TRIGGER_VERSION      = NTR('git-fusion-submit-trigger-version')
-    P4GF_TRIGGER_VERSION                = NTR('2016.1')
+    P4GF_TRIGGER_VERSION                = NTR('2016.1.1')
     P4GF_P4KEY_LOCK_USER                = NTR('git-fusion-user-{user_name}-lock')
 
 #
@@ -759,6 +774,19 @@ MSG_USAGE = _("""
     By default this command runs as Perforce user 'git-fusion-reviews--all-gf'.
     The optional superuser parameter must be a Perforce super user.
 
+    Reducing Trigger Latency
+    ------------------------
+    Each trigger invocation runs many p4 requests, each a separate 'p4'
+    process with its own connection to the server. To serve them instead
+    over long-lived P4Python connections, set P4GF_DAEMON_SOCKET in the
+    trigger configuration file to a unix socket path, then run under the
+    same OS account as p4d:
+
+        python p4gf_submit_trigger.py --p4-daemon [--config-path=/absolute/path/to/config] P4PORT
+
+    Triggers fall back to running 'p4' whenever the daemon is not running.
+    The daemon requires P4Python.
+
 
 """).format(MSG_EXAMPLE_UNIX  = MSG_EXAMPLE_UNIX
           , MSG_EXAMPLE_DOS   = MSG_EXAMPLE_DOS
@@ -815,6 +843,7 @@ Usage:
     p4gf_submit_trigger.py --verify-version-p4key P4PORT
     p4gf_submit_trigger.py --reset [--git-fusion-server=SERVER_ID] P4PORT [superuser]
     p4gf_submit_trigger.py --rebuild-all-gf-reviews P4PORT [superuser]
+    p4gf_submit_trigger.py --p4-daemon [--config-path=/absolute/path/to/config] P4PORT
     p4gf_submit_trigger.py --show-config [--config-path=/absolute/path/to/config]
     p4gf_submit_trigger.py --help
 """)
@@ -2324,8 +2353,16 @@ def p4_run(cmd, stdin=None, user=P4GF_USER, exit_on_error=True, client=P4CLIENT)
             stdin_data = encode(stdin_data)
         stdin = PIPE
 
+    start = time.time()
+    daemon_result = None
+    if stdin is None:
+        daemon_result = daemon_run(raw_cmd, user, client)
+    if daemon_result is not None:
+        (data, ret) = daemon_result
+        cmd = [NTR("p4-daemon"), "-u", user, "-c", client] + raw_cmd
+
     global CHARSET
-    while True:
+    while daemon_result is None:
         cmd = [P4GF_P4_BIN, "-p", P4PORT, "-u", user, "-G" , "-c", client] + CHARSET + raw_cmd
         if DEBUG_LOG_FILE:
             debug_log("p4 begin:   {0}".format(cmd), lineno=inspect.currentframe().f_back.f_lineno)
@@ -2368,6 +2405,7 @@ def p4_run(cmd, stdin=None, user=P4GF_USER, exit_on_error=True, client=P4CLIENT)
                             os._exit(P4FAIL)    # pylint: disable=protected-access
             data.append({"Error": ret})
         break
+    record_p4_time(daemon_result is not None, start)
     if exit_on_error and len(data) and 'code' in data[0] and data[0]['code'] == 'error':
         if NOLOGIN_REGEX.match(data[0]['data']):
             errdata = data[0]['data'].strip()
@@ -2438,6 +2476,7 @@ def p4_run_ztag(cmd, stdin=None, user=P4GF_USER, exit_on_error=True, client=P4CL
     cmd = [P4GF_P4_BIN, "-p", P4PORT, "-u", user, "-ztag", "-c", client] + CHARSET + raw_cmd
     if DEBUG_LOG_FILE:
         debug_log("p4 begin:   {0}".format(cmd), lineno=inspect.currentframe().f_back.f_lineno)
+    start = time.time()
     try:
         process = Popen(cmd, shell=False, stdin=stdin, stdout=PIPE, stderr=PIPE)
         if stdin_data is not None:
@@ -2465,6 +2504,7 @@ def p4_run_ztag(cmd, stdin=None, user=P4GF_USER, exit_on_error=True, client=P4CL
         l = l.strip()
         errdata += ' ' + _convert_bytes(l)
     ret = process.wait()
+    record_p4_time(False, start)
     if exit_on_error and ret:
         print_log(_("\n        Error in Git Fusion Trigger: {error}")
                   .format(error=errdata))
@@ -2488,6 +2528,400 @@ def p4_run_ztag(cmd, stdin=None, user=P4GF_USER, exit_on_error=True, client=P4CL
         debug_log("p4 end:   {0}".format(cmd), lineno=inspect.currentframe().f_back.f_lineno)
     return data
 
+# -- p4 daemon ----------------------------------------------------------------
+#
+# Each p4_run() starts a 'p4' process, which connects and authenticates to
+# the server, runs one command, and exits. One change-content trigger for a
+# large changelist runs dozens of them, and every submit on the server pays
+# for them, Git Fusion user or not.
+#
+# 'p4gf_submit_trigger.py --p4-daemon P4PORT' instead keeps P4Python
+# connections open, and serves requests from triggers over the unix socket
+# at P4GF_DAEMON_SOCKET. Responses mimic 'p4 -G' output, so that the
+# rest of this file cannot tell which path answered.
+#
+# Only requests without stdin go to the daemon. Whenever the daemon is not
+# configured, not running, or declines a request, we run 'p4' as always.
+
+                        # Seconds to wait for the daemon to accept a
+                        # connection. After that we wait as long as 'p4'
+                        # would.
+DAEMON_CONNECT_TIMEOUT = 2.0
+
+                        # Commands that change nothing on the server. If the
+                        # daemon dies mid-request, it is safe to run these
+                        # again with 'p4'. Anything else might have already
+                        # run: fail rather than run it twice.
+DAEMON_READ_ONLY_COMMANDS = ['changes', 'configure', 'depots', 'describe',
+                             'files', 'fstat', 'info', 'print', 'protects',
+                             'reviews', 'stream', 'streams', 'users']
+
+                        # Time spent in p4 requests, reported at the end
+                        # of each trigger invocation in the debug log.
+P4_RUN_STATS = {'daemon_ct': 0, 'daemon_sec': 0.0,
+                'p4_ct': 0, 'p4_sec': 0.0, 'fallback_ct': 0}
+
+                        # Set once the daemon fails us, so that we stop
+                        # trying it for the rest of this trigger.
+_DAEMON_DOWN = False
+
+
+def record_p4_time(via_daemon, start):
+    """Add one p4 request's elapsed time to P4_RUN_STATS."""
+    how = 'daemon' if via_daemon else 'p4'
+    P4_RUN_STATS[how + '_ct'] += 1
+    P4_RUN_STATS[how + '_sec'] += time.time() - start
+
+
+def p4_time_str():
+    """Return P4_RUN_STATS as a one-line string for the debug log."""
+    return ("p4 requests: daemon={0} in {1:.3f}s, p4={2} in {3:.3f}s, fallback={4}"
+            .format(P4_RUN_STATS['daemon_ct'], P4_RUN_STATS['daemon_sec'],
+                    P4_RUN_STATS['p4_ct'], P4_RUN_STATS['p4_sec'],
+                    P4_RUN_STATS['fallback_ct']))
+
+
+def _is_read_only(cmd):
+    """Is this p4 command safe to run a second time?"""
+    args = _strip_global_options(cmd)
+    if not args:
+        return False
+    if args[0] == 'key' or args[0] == 'keys':
+        return '-i' not in args and '-d' not in args and len(args) <= 2
+    return args[0] in DAEMON_READ_ONLY_COMMANDS
+
+
+def _strip_global_options(cmd):
+    """Return cmd without any leading p4 global options and their values."""
+    i = 0
+    while i < len(cmd) and cmd[i].startswith('-'):
+        i += 2 if cmd[i] == '-x' else 1
+    return cmd[i:]
+
+
+def daemon_run(cmd, user, client):
+    """Send one p4 request to the --p4-daemon.
+
+    Return (data, ret) as p4_run() would get from 'p4 -G': a list of
+    dicts and an exit code. Return None if there is no daemon, or if it
+    declined the request, and the caller should run 'p4' instead.
+    """
+    global _DAEMON_DOWN
+    if _DAEMON_DOWN or not P4GF_DAEMON_SOCKET or not hasattr(socket, 'AF_UNIX'):
+        return None
+    request = json.dumps({'port': P4PORT, 'user': user, 'client': client,
+                          'charset': CHARSET, 'cmd': cmd})
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+        try:
+            sock.connect(P4GF_DAEMON_SOCKET)
+        except (socket.error, OSError) as e:
+            if DEBUG_LOG_FILE:
+                debug_log("p4 daemon not available at {0}: {1}"
+                          .format(P4GF_DAEMON_SOCKET, e))
+            _DAEMON_DOWN = True
+            P4_RUN_STATS['fallback_ct'] += 1
+            return None
+        sock.settimeout(None)
+        try:
+            sock.sendall(encode(request) + b'\n')
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            response = json.loads(decode(b''.join(chunks)))
+        except (socket.error, OSError, ValueError) as e:
+            if DEBUG_LOG_FILE:
+                debug_log("p4 daemon failed: {0} {1}".format(cmd, e))
+            _DAEMON_DOWN = True
+            if not _is_read_only(cmd):
+                return ([{'code': 'error', 'severity': 3, 'generic': 0,
+                          'data': _("Git Fusion trigger lost its p4 daemon connection"
+                                    " during '{command}'.\n")
+                                  .format(command=' '.join(cmd))},
+                         {'Error': P4FAIL}], P4FAIL)
+            P4_RUN_STATS['fallback_ct'] += 1
+            return None
+    finally:
+        sock.close()
+    if 'data' not in response:
+        if DEBUG_LOG_FILE:
+            debug_log("p4 daemon declined: {0} {1}"
+                      .format(cmd, response.get('declined')))
+        P4_RUN_STATS['fallback_ct'] += 1
+        return None
+    data = response['data']
+    ret = response['ret']
+    if ret:
+        data.append({'Error': ret})     # as p4_run() does for 'p4' failures
+    return (data, ret)
+
+
+def _daemon_flatten(tagged):
+    """Convert one P4Python tagged dict to what 'p4 -G' would report.
+
+    P4Python collects numbered fields into lists: 'depotFile': [a, b].
+    'p4 -G' numbers them: 'depotFile0': a, 'depotFile1': b.
+    """
+    result = {'code': 'stat'}
+
+    def _flatten(key, value):
+        """Number each list element, recursively, as 'p4 -G' does."""
+        if isinstance(value, list):
+            sep = ',' if key[-1:].isdigit() else ''
+            for i, v in enumerate(value):
+                _flatten("{0}{1}{2}".format(key, sep, i), v)
+        else:
+            result[key] = value
+
+    for key, value in tagged.items():
+        _flatten(key, value)
+    return result
+
+
+def _daemon_handler_class(p4_module):
+    """Return an OutputHandler class that collects one request's output.
+
+    'p4 -G' reports results, errors and warnings interleaved, in the order
+    the server sent them. p4_run() callers check data[0] for errors, so we
+    must keep that order: collect everything through one handler rather
+    than from P4Python's separate results, errors and warnings lists.
+    """
+
+    class _Handler(p4_module.OutputHandler):
+
+        """Collect 'p4 -G' dicts, in order, for one P4Daemon request."""
+
+        def __init__(self):
+            p4_module.OutputHandler.__init__(self)
+            self.data = []
+            self.error = False          # any message of severity error+?
+            self.binary = False         # any output we cannot send as JSON?
+
+        def outputStat(self, h):
+            """Tagged result."""
+            self.data.append(_daemon_flatten(h))
+            return p4_module.OutputHandler.HANDLED
+
+        def outputInfo(self, i):
+            """Untagged info line."""
+            self.data.append({'code': 'text', 'data': i})
+            return p4_module.OutputHandler.HANDLED
+
+        def outputText(self, s):
+            """Untagged text."""
+            if isinstance(s, str):
+                self.data.append({'code': 'text', 'data': s})
+            else:
+                self.binary = True
+            return p4_module.OutputHandler.HANDLED
+
+        def outputBinary(self, b):
+            """Binary content."""
+            self.binary = True
+            return p4_module.OutputHandler.HANDLED
+
+        def outputMessage(self, m):
+            """Error or warning, as 'p4 -G' error dict. Drop info messages."""
+            severity = getattr(m, 'severity', 3)
+            if 2 <= severity:
+                self.data.append({'code': 'error', 'severity': severity,
+                                  'generic': getattr(m, 'generic', 0),
+                                  'data': str(m) + '\n'})
+            if 3 <= severity:
+                self.error = True
+            return p4_module.OutputHandler.HANDLED
+
+    return _Handler
+
+
+class P4Daemon:
+
+    """Run p4 requests for triggers over long-lived P4Python connections."""
+
+    def __init__(self, p4_module):
+        self.P4 = p4_module             # pylint: disable=invalid-name
+        self.handler_class = _daemon_handler_class(p4_module)
+        self.idle = {}                  # (port, user, charset) ==> [P4]
+        self.lock = threading.Lock()
+        self.request_ct = 0
+        self.declined_ct = 0
+        self.seconds = {}               # p4 command ==> [count, total seconds]
+
+    def _acquire(self, key):
+        """Return an idle, connected P4 for key, or a new one."""
+        with self.lock:
+            pool = self.idle.get(key)
+            while pool:
+                p4 = pool.pop()
+                if p4.connected():
+                    return p4
+        (port, user, charset) = key
+        p4 = self.P4.P4()
+        p4.port = port
+        p4.user = user
+        p4.prog = NTR('p4gf_submit_trigger-daemon')
+        p4.exception_level = 0
+        if charset:
+            p4.charset = charset
+        p4.connect()
+        if not charset and p4.server_unicode:
+            # Same as 'p4' on a unicode server: retry with utf8.
+            p4.disconnect()
+            p4.charset = 'utf8'
+            p4.connect()
+        return p4
+
+    def _release(self, key, p4):
+        """Return p4 to the idle pool for the next request."""
+        with self.lock:
+            self.idle.setdefault(key, []).append(p4)
+
+    def run(self, request):
+        """Run one request, return a response dict.
+
+        {'data': [...], 'ret': N} mimics 'p4 -G' output and exit code.
+        {'declined': reason} tells the trigger to run 'p4' itself.
+        """
+        cmd = request['cmd']
+        args = []
+        i = 0
+        while i < len(cmd) and cmd[i].startswith('-'):
+            if cmd[i] == '-ztag':           # P4Python is already tagged.
+                i += 1
+            elif cmd[i] == '-x':
+                f = open(cmd[i + 1])
+                try:
+                    args.extend(line.rstrip('\n') for line in f)
+                finally:
+                    f.close()
+                i += 2
+            else:
+                return {'declined': "global option {0}".format(cmd[i])}
+        if len(cmd) <= i:
+            return {'declined': "no command"}
+        command = cmd[i]
+        args = cmd[i + 1:] + args
+
+        charset = request['charset'][1] if len(request['charset']) == 2 else ''
+        key = (request['port'], request['user'], charset)
+        handler = self.handler_class()
+        p4 = self._acquire(key)
+        try:
+            p4.client = request['client']
+            try:
+                with p4.using_handler(handler):
+                    p4.run(command, args)
+            except self.P4.P4Exception as e:
+                # exception_level 0 raises only when the connection fails.
+                p4.disconnect()
+                if _is_read_only(cmd):
+                    return {'declined': str(e)}
+                return {'data': [{'code': 'error', 'severity': 3, 'generic': 0,
+                                  'data': str(e) + '\n'}], 'ret': P4FAIL}
+        finally:
+            if p4.connected():
+                self._release(key, p4)
+        if handler.binary:
+            # Cannot send that as JSON.
+            return {'declined': "binary output"}
+        return {'data': handler.data, 'ret': P4FAIL if handler.error else P4PASS}
+
+    def handle(self, line):
+        """Decode one request line, run it, return the encoded response."""
+        start = time.time()
+        command = None
+        try:
+            request = json.loads(decode(line))
+            command = ' '.join(_strip_global_options(request['cmd'])[:1])
+            response = self.run(request)
+        except Exception as e:      # pylint: disable=broad-except
+            response = {'declined': str(e)}
+        elapsed = time.time() - start
+        with self.lock:
+            self.request_ct += 1
+            if 'declined' in response:
+                self.declined_ct += 1
+            ct_sec = self.seconds.setdefault(command, [0, 0.0])
+            ct_sec[0] += 1
+            ct_sec[1] += elapsed
+        if DEBUG_LOG_FILE:
+            debug_log("p4 daemon: {0:.3f}s {1} {2}"
+                      .format(elapsed, command, response.get('declined', '')))
+        return encode(json.dumps(response))
+
+    def stats_str(self):
+        """Return request counts and average times, one command per line."""
+        with self.lock:
+            lines = ["requests={0} declined={1}"
+                     .format(self.request_ct, self.declined_ct)]
+            for command in sorted(self.seconds, key=str):
+                (ct, sec) = self.seconds[command]
+                lines.append("  {0:<12} {1:>8} {2:8.4f}s avg"
+                             .format(command, ct, sec / ct))
+        return '\n'.join(lines)
+
+
+def p4_daemon():
+    """Serve trigger p4 requests on P4GF_DAEMON_SOCKET until killed."""
+    try:
+        import P4
+    except ImportError:
+        print_log(_("The Git Fusion p4 daemon requires P4Python."))
+        return P4FAIL
+    try:
+        import socketserver
+    except ImportError:
+        import SocketServer as socketserver     # pylint: disable=import-error
+    import signal
+    if not P4GF_DAEMON_SOCKET:
+        print_log(_("Set P4GF_DAEMON_SOCKET in {config}.")
+                  .format(config=P4GF_TRIGGER_CONF))
+        return P4FAIL
+
+    daemon = P4Daemon(P4)
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        """One trigger's request: one line of JSON in, JSON out."""
+
+        def handle(self):
+            self.wfile.write(daemon.handle(self.rfile.readline()))
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+        """Serve each connection in its own thread."""
+
+        daemon_threads = True
+
+    if os.path.exists(P4GF_DAEMON_SOCKET):
+        os.remove(P4GF_DAEMON_SOCKET)
+    def _signal_handler(_signum, _frame):
+        """Exit, cleaning up on the way."""
+        sys.exit(P4PASS)
+    signal.signal(signal.SIGTERM, _signal_handler)
+
+    old_umask = os.umask(0o077)     # Only our OS account, p4d's, may connect.
+    try:
+        server = Server(P4GF_DAEMON_SOCKET, Handler)
+    finally:
+        os.umask(old_umask)
+    print_log(_("Git Fusion p4 daemon serving {port} on {path}")
+              .format(port=P4PORT, path=P4GF_DAEMON_SOCKET))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(P4GF_DAEMON_SOCKET)
+        print_log(daemon.stats_str())
+    return P4PASS
+
+
 
 def is_super(user):
     """Determine if user is a super user."""
@@ -2797,13 +3231,18 @@ def update_userspec(userspec, user, p4user=P4GF_USER):
     command = [P4GF_P4_BIN, '-p', P4PORT, '-c', P4CLIENT] +  CHARSET + user_cmd
     if DEBUG_LOG_FILE:
         debug_log("p4 begin:   {0}".format(command))
+    start = time.time()
     p = Popen(command, shell=False, stdout=PIPE, stderr=PIPE, stdin=file_)
     stderr_data = p.communicate()[1]
+    record_p4_time(False, start)
     if DEBUG_LOG_FILE:
         debug_log("p4 end:   {0}".format(command))
     if p.returncode:
         print_log(stderr_data.decode('utf-8'))  # pylint: disable=no-member
         print_log(_("Error in submitting user spec for user {user}").format(user=user))
+    else:
+        # Tell Git Fusion's cached copies of these Reviews to re-read.
+        inc_p4key(p4gf_const.P4GF_P4KEY_REVIEWS_VERSION.format(user=user), user=p4user)
     try:
         file_.close()
         os.remove(file_.name)
@@ -3682,6 +4121,9 @@ def print_config():
     print(fstr.format(option=NTR("P4TRUST"),
                       value=P4TRUST or
                       _("Not set or overriden. Environment setting will be used.")))
+    print(fstr.format(option=NTR("P4GF_DAEMON_SOCKET"),
+                      value=P4GF_DAEMON_SOCKET or
+                      _("Not set. Each p4 request runs the p4 command line tool.")))
 
     if not CFG_EXTERNAL:
         print(_("   ** {config} is missing or invalid.").format(config=P4GF_TRIGGER_CONF))
@@ -4116,6 +4558,7 @@ class Args:
         self.generate_tickets         = None
         self.show_config              = None
         self.install                  = None
+        self.p4_daemon                = None
         self.optional_command         = None
         self.oldchangelist            = None
         self.trigger_type             = None
@@ -4168,7 +4611,7 @@ def parse_argv():
                 'verify-version-counter','verify-version-p4key',
                 'generate-trigger-entries',
                 'install-trigger-entries', 'generate-tickets',
-                'install', 'show-config', 'no-config', 'help'])
+                'install', 'show-config', 'no-config', 'p4-daemon', 'help'])
     try:
         options, positional = getopt.getopt(sys.argv[1:], short_opt, long_opt)
     except getopt.GetoptError as err:
@@ -4226,6 +4669,9 @@ def parse_argv():
                 args.use_config = False
         elif opt == "--show-config":
             args.show_config = [True]
+        elif opt == "--p4-daemon" and validate_option_or_exit(1, 1, positional_len):
+            args.p4_daemon = positional
+            args.port = args.p4_daemon[0]
         if args.port:  #
             P4PORT = args.port
             if DEBUG_LOG_FILE:
@@ -4291,6 +4737,7 @@ def _set_p4gf_depot_from_p4key(user=P4GF_USER):
 def main():
     """Execute Git Fusion submit triggers."""
     # pylint: disable=too-many-branches, too-many-statements
+    start = time.time()
     args = parse_argv()
     global P4PORT
     exitcode = P4PASS
@@ -4344,8 +4791,9 @@ def main():
                           .format(trigger_type=args.trigger_type))
                 exitcode = P4FAIL
             if DEBUG_LOG_FILE:
-                debug_log("END   TRIGGER: user={0} change={1} trigger_type={2}".
-                        format(args.user, args.change, args.trigger_type))
+                debug_log("END   TRIGGER: user={0} change={1} trigger_type={2} {3:.3f}s {4}".
+                        format(args.user, args.change, args.trigger_type,
+                               time.time() - start, p4_time_str()))
     else:
         # we have been called with optional command arguments to perform a support task
         # parse_argv() has set P4PORT from the command line port argument
@@ -4375,6 +4823,9 @@ def main():
         elif args.show_config:
             print_config()
 
+        elif args.p4_daemon:
+            exitcode = p4_daemon()
+
         elif args.install:
             install(args.install, args.no_config)
 
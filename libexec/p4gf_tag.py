@@ -122,17 +122,30 @@ def _is_reachable(sha1, heads):
 
     """
     LOG.debug2('_is_reachable() checking for {}'.format(sha1))
-    for head_sha1 in heads:
-        # ### newer pygit2.Repository.merge_base(oid, oid) would do this for us,
-        # ### too bad we're not updating any time soon...
-        cmd = ['git', 'merge-base', '--is-ancestor', sha1, head_sha1]
-        result = p4gf_proc.popen_no_throw(cmd)
-        if LOG.isEnabledFor(logging.DEBUG2):
-            reachable = result['ec'] == 0
-            LOG.debug2('_is_reachable() {} is reachable {}'.format(sha1, reachable))
-        if result['ec'] == 0:
-            return True
-    return False
+    # ### newer pygit2.Repository.merge_base(oid, oid) would do this for us,
+    # ### too bad we're not updating any time soon...
+    #
+    # Ask about one window of heads at a time, one head per p4gf_proc
+    # runner, in parallel. Stop at the first head that reaches sha1 and
+    # discard the rest of its window's answers. Discarded commands still
+    # run, so never submit more than the runners can take at once: other
+    # p4gf_proc callers wait behind them.
+    window = p4gf_proc.ChildProc.runner_ct
+    reachable = False
+    for begin in range(0, len(heads), window):
+        pending = [p4gf_proc.popen_async(['git', 'merge-base', '--is-ancestor',
+                                          sha1, head_sha1])
+                   for head_sha1 in heads[begin:begin + window]]
+        for i, p in enumerate(pending):
+            if p.result()['ec'] == 0:
+                reachable = True
+                for rest in pending[i + 1:]:
+                    rest.discard()
+                break
+        if reachable:
+            break
+    LOG.debug2('_is_reachable() {} is reachable {}'.format(sha1, reachable))
+    return reachable
 
 
 @with_timer('preflight tags')
@@ -23,7 +23,9 @@ from   p4gf_filemode            import FileModeStr
 from   p4gf_l10n                import NTR, _
 import p4gf_log
 from   p4gf_object_type         import ObjectType
+import p4gf_p2g_blob_sink
 from   p4gf_p2g_print_handler   import PrintHandler
+from   p4gf_p2g_rev_list        import RevList
 import p4gf_p4filetype
 from   p4gf_progress_reporter   import Determinate
 import p4gf_util
@@ -101,21 +103,27 @@ class RepoCompareSingle:
         gwt_superset = set(gwt_to_p4file.keys()) | set(gwt_to_git.keys())
         self.max_gwt_char_ct = max(len(gwt) for gwt in gwt_superset)
 
+                        # One PrintHandler for the whole comparison,
+                        # writing to our temp repo, not ctx.repo.
+        blob_sink = p4gf_p2g_blob_sink.LooseBlobSink( self.ctx
+                                                    , repo = self.temp_repo )
                         # Make the progress reporter more useful.
-        with Determinate(len(gwt_to_p4file)):
+        with Determinate(len(gwt_to_p4file)) \
+                , PrintHandler(self.ctx, blob_sink=blob_sink) as printhandler:
 
             for gwt in sorted(gwt_superset):
                 diff_how_set = self._compare_file(
-                                       gwt    = gwt
-                                     , p4file = gwt_to_p4file.get(gwt)
-                                     , git    = gwt_to_git.get(gwt)
+                                       gwt          = gwt
+                                     , p4file       = gwt_to_p4file.get(gwt)
+                                     , git          = gwt_to_git.get(gwt)
+                                     , printhandler = printhandler
                                      )
                 self._report(gwt, diff_how_set)
 
                 for dh in diff_how_set:
                     self.how_ct[dh] += 1
 
-    def _compare_file(self, gwt, p4file, git):
+    def _compare_file(self, gwt, p4file, git, printhandler):
         """Compare a file's 'p4 files' and 'git-ls-tree' results.
         Return a set of mismatches.
         """
@@ -131,17 +139,19 @@ class RepoCompareSingle:
                           ):
             result.add(DiffHow.FILE_MODE)
 
-        if not self._sha1_match(p4file, git):
+        if not self._sha1_match(p4file, git, printhandler):
             result.add(DiffHow.FILE_SHA1)
 
         return result
 
-    def _sha1_match(self, p4file, git):
+    def _sha1_match(self, p4file, git, printhandler):
         """Calculate a blob sha1 for a Perforce file revision and
         compare to what Git has for the same blob.
+
+        printhandler is reused for every file: start it with an empty
+        RevList so that we see only this file's revision.
         """
-        printhandler            = PrintHandler(self.ctx)
-        printhandler.repo       = self.temp_repo
+        printhandler.revs       = RevList()
         printhandler.change_set = set()
         depot_file_rev = p4gf_util.to_path_rev( p4file['depotFile']
                                               , p4file['rev'])